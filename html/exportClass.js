@@ -72,6 +72,12 @@ function ExportClass() {
 	case 'printTblInfo':
 	    displayTableInfo(args);
 	    break;
+	case 'directDownload':
+	    displayDirectDownload(args);
+	    break;
+	case 'estimate':
+	    displayEstimate(args);
+	    break;
 	case 'error':
 	    alert('Error: ' + args);
 	    break;
@@ -81,6 +87,46 @@ function ExportClass() {
 	}
     }
 
+    var displayDirectDownload = function(downloadInfo) {
+	// Links are good for one download:
+	addTextToProgDiv('Download <a href="' + downloadInfo.url + '" download="' +
+			 downloadInfo.fileName + '">' + downloadInfo.fileName + '</a>');
+    }
+
+    var displayEstimate = function(estimate) {
+	// Estimated rows read, output size, and runtime per
+	// export and course; null entries could not be estimated:
+	var formatBytes = function(numBytes) {
+	    var units = ['B', 'KB', 'MB', 'GB', 'TB'];
+	    var i = 0;
+	    while (numBytes >= 1024 && i < units.length - 1) {
+		numBytes /= 1024;
+		i++;
+	    }
+	    return numBytes.toFixed(1) + units[i];
+	}
+	var formatSeconds = function(secs) {
+	    var hours = Math.floor(secs / 3600);
+	    var mins  = Math.floor((secs % 3600) / 60);
+	    return hours + 'h ' + mins + 'm ' + (secs % 60) + 's';
+	}
+	var html = '<b>Estimated cost</b><table><tr><th>Export</th><th>Course</th><th>Rows</th><th>Size</th><th>Runtime</th></tr>';
+	var exports = estimate.exports;
+	for (var i=0; i<exports.length; ++i) {
+	    var exp = exports[i];
+	    html += '<tr><td>' + exp.kind + '</td><td>' + (exp.course === null ? '' : exp.course) + '</td>';
+	    if (exp.rows === null) {
+		html += '<td colspan="3">n/a</td></tr>';
+	    } else {
+		html += '<td>' + exp.rows + (exp.fullScan ? ' (table scan)' : '') + '</td><td>' +
+		        formatBytes(exp.bytes) + '</td><td>' + formatSeconds(exp.seconds) + '</td></tr>';
+	    }
+	}
+	html += '<tr><td><b>Total</b></td><td></td><td>' + estimate.rows + '</td><td>' +
+	        formatBytes(estimate.bytes) + '</td><td>' + formatSeconds(estimate.seconds) + '</td></tr></table>';
+	addTextToProgDiv(html);
+    }
+
     var sendKeepAlive = function() {
 	var req = buildRequest("keepAlive", "");
 	ws.send(req);
@@ -440,6 +486,8 @@ function ExportClass() {
   var grades = document.getElementById("grades").checked;
   var metadata = document.getElementById("metadata").checked;
   var abtest = document.getElementById("abtest").checked;
+  var directDownload = document.getElementById("directDownload").checked;
+  var dryRun = document.getElementById("dryRun").checked;
 
 	if (!basicData &&
 	    !engagementData &&
@@ -544,9 +592,11 @@ function ExportClass() {
           "qualtrics": qualtrics,
           "grades": grades,
           "metadata": metadata,
-          "abtest": abtest
+          "abtest": abtest,
+          "directDownload": directDownload
 		     };
-	var req = buildRequest("getData", argObj);
+	// Dry run: only ask for the cost estimate:
+	var req = buildRequest(dryRun ? "estimate" : "getData", argObj);
 
 	// Start the progress timer; remember the existing
 	// screen content in the 'progress' div so that
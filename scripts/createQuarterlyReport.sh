@@ -336,7 +336,7 @@ else
        TIME_CONSTRAINT="time BETWEEN '${CAL_YEAR}${SUMMER_START}' AND '${CAL_YEAR}${SUMMER_END}'"
     elif [[ $QUARTER == '%' ]]
     then
-       TIME_CONSTRAINT="(time BETWEEN '${ACADEMIC_YEAR}${FALL_START}' AND ${ACADEMIC_YEAR}${FALL_END}' \
+       TIME_CONSTRAINT="(time BETWEEN '${ACADEMIC_YEAR}${FALL_START}' AND '${ACADEMIC_YEAR}${FALL_END}' \
                       OR time BETWEEN '${ACADEMIC_YEAR}${WINTER_START}' AND '${CAL_YEAR}${WINTER_END}' \
                       OR time BETWEEN '${CAL_YEAR}${SPRING_START}' AND '${CAL_YEAR}${SPRING_END}' \
                       OR time BETWEEN '${CAL_YEAR}${SUMMER_START}' AND '${CAL_YEAR}${SUMMER_END}' \
@@ -380,15 +380,34 @@ then
     			     AND academic_year LIKE '"$ACADEMIC_YEAR"';
                              "
 else
+    # Prefer the course-by-day activity index Misc.CourseActivityDay,
+    # which is maintained by src/courseActivityIndex.py. Only if it
+    # does not exist on this server do we probe EventXtract for
+    # each course:
+    ACTIVITY_INDEX_EXISTS=$(mysql $MYSQL_AUTH --batch --skip-column-names -e "
+                  SELECT COUNT(*)
+    	          FROM information_schema.TABLES
+    	          WHERE TABLE_SCHEMA = 'Misc'
+    	             AND TABLE_NAME = 'CourseActivityDay';")
+    if [[ $ACTIVITY_INDEX_EXISTS == 1 ]]
+    then
+        ACTIVITY_CONDITION="CourseInfo.course_display_name IN 
+                              (SELECT course_display_name
+                               FROM Misc.CourseActivityDay
+                               WHERE ${TIME_CONSTRAINT//time BETWEEN/activity_day BETWEEN}
+                              )"
+    else
+        ACTIVITY_CONDITION="EXISTS(SELECT 1
+			               FROM EventXtract
+			  	      WHERE EventXtract.course_display_name = CourseInfo.course_display_name
+			   	       AND $TIME_CONSTRAINT
+			              )"
+    fi
     COURSE_NAME_CREATION_CMD="DROP TABLE IF EXISTS Misc.RelevantCoursesTmp;
     			  CREATE TABLE Misc.RelevantCoursesTmp
     			  SELECT course_display_name, quarter, academic_year
                           FROM CourseInfo
-			  WHERE EXISTS(SELECT 1
-			               FROM EventXtract
-			  	      WHERE EventXtract.course_display_name = CourseInfo.course_display_name
-			   	       AND $TIME_CONSTRAINT
-			              );
+			  WHERE $ACTIVITY_CONDITION;
                           "
 fi			      
 
@@ -438,6 +457,44 @@ MYSQL_CMD="SELECT 'platform','course_display_name','quarter', 'academic_year','e
             "$ENROLLMENT_CONDITION";
            "
 
+# If Misc.CourseEnrollmentSummary is maintained on this server
+# (by src/courseEnrollmentSummary.py), take enrollment, certificate,
+# and is_internal counts from there, rather than aggregating
+# true_courseenrollment and certificates_generatedcertificate:
+ENROLLMENT_SUMMARY_EXISTS=$(mysql $MYSQL_AUTH --batch --skip-column-names -e "
+              SELECT COUNT(*)
+              FROM information_schema.TABLES
+              WHERE TABLE_SCHEMA = 'Misc'
+                 AND TABLE_NAME = 'CourseEnrollmentSummary';")
+if [[ $ENROLLMENT_SUMMARY_EXISTS == 1 ]]
+then
+    MYSQL_CMD="SELECT 'platform','course_display_name','quarter', 'academic_year','enrollment','num_certs', 'certs_ratio', 'is_internal'
+               UNION
+               SELECT 'OpenEdX',
+                      course_display_name,
+                      quarter,
+                      academic_year,
+                      theSummedUsers AS enrollment,
+                      theSummedAwards AS num_certs,
+                      IF(theSummedUsers = 0,0,100*theSummedAwards/theSummedUsers) AS certs_ratio_perc,
+                      IF(is_internal IS NULL,'n/a', IF(is_internal = 0,'no','yes')) AS is_internal
+               "$MYSQL_OUTPUT_SPEC"
+               FROM (SELECT Misc.RelevantCoursesTmp.course_display_name,
+                            Misc.RelevantCoursesTmp.quarter,
+                            Misc.RelevantCoursesTmp.academic_year,
+                            IF(Summary.enrollment IS NULL,0,Summary.enrollment) AS theSummedUsers,
+                            IF(Summary.num_certs IS NULL,0,Summary.num_certs) AS theSummedAwards,
+                            Summary.is_internal
+                       FROM Misc.RelevantCoursesTmp LEFT JOIN Misc.CourseEnrollmentSummary AS Summary
+                         ON Misc.RelevantCoursesTmp.course_display_name = Summary.course_display_name
+                     GROUP BY Misc.RelevantCoursesTmp.course_display_name,
+                              Misc.RelevantCoursesTmp.quarter,
+                              Misc.RelevantCoursesTmp.academic_year
+                    ) AS SummedUsers
+                "$ENROLLMENT_CONDITION";
+               "
+fi
+
 #*************
 #echo "COURSE_NAME_CREATION_CMD: "$COURSE_NAME_CREATION_CMD
 #echo "MYSQL_CMD: $MYSQL_CMD"
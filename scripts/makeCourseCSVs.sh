@@ -60,8 +60,25 @@
 # would have run in the Summer of 2014 (*academic* year 2013).
 # This option is used only when accessing the EdxTrackEvent table, which
 # is partitioned over quarter.
-
-USAGE="Usage: "`basename $0`" [-u uid][-p][-w mySqlPwd][-d destDirPath][-x xpunge][-i infoDest][-c cryptoPwd][-q quarter] courseNamePattern"
+#
+# The -j option controls how many of the three table extracts
+# run concurrently, each over its own MySQL connection. The
+# extracts are independent, and hit different tables, so by
+# default all three run at once. Use -j 1 for the old, strictly
+# sequential behavior.
+#
+# The -s option splits the EventXtract extract of a single course
+# into the given number of partitions. Each partition is scanned
+# over its own MySQL connection, all partitions at once. The
+# partition results are concatenated into the usual single
+# EventXtract .csv file. The -b option chooses how rows are
+# split: 'time' (default) divides the course's time span into
+# equal ranges, so the concatenated result stays grouped by
+# time range; 'hash' assigns rows to partitions by a hash of
+# anon_screen_name, which balances partitions when activity
+# is very unevenly spread over time. Useful for very large courses.
+
+USAGE="Usage: "`basename $0`" [-u uid][-p][-w mySqlPwd][-d destDirPath][-x xpunge][-i infoDest][-c cryptoPwd][-q quarter][-j parallelism][-s partitions][-b {time|hash}] courseNamePattern"
 
 # Get MySQL version on this machine
 MYSQL_VERSION=$(mysql --version | sed -ne 's/.*Distrib \([0-9][.][0-9]\).*/\1/p')
@@ -92,9 +109,16 @@ INFO_DEST=''
 pii=false
 ENCRYPT_PWD=''
 QUARTER=''
+PARALLELISM=3
+PARTITIONS=1
+PARTITION_BY='time'
+# Upper bounds for -j and -s; each extract or partition
+# is one concurrent query over its own MySQL connection:
+MAX_PARALLELISM=8
+MAX_PARTITIONS=8
 
 # Execute getopt
-ARGS=`getopt -o "u:pw:q:xd:i:c:n" -l "user:,password,mysqlpwd:,quarter:,xpunge,destDir:infoDest:,cryptoPwd:" \
+ARGS=`getopt -o "u:pw:q:xd:i:c:nj:s:b:" -l "user:,password,mysqlpwd:,quarter:,xpunge,destDir:infoDest:,cryptoPwd:,parallelism:,partitions:,partitionBy:" \
       -n "getopt.sh" -- "$@"`
 
 #Bad arguments
@@ -163,6 +187,54 @@ do
 	echo $USAGE
 	exit 1
       fi;;
+    -j|--parallelism)
+      shift
+      # Grab the number of concurrent extracts:
+      if [ -n "$1" ]
+      then
+        PARALLELISM=$1
+	re='^[1-9][0-9]*$'
+	if ! [[ $PARALLELISM =~ $re ]]
+	then
+	   echo "Parallelism must be a positive integer. Was '$PARALLELISM'"
+	   echo $USAGE
+	   exit 1
+	fi
+        shift
+      else
+	echo $USAGE
+	exit 1
+      fi;;
+    -s|--partitions)
+      shift
+      # Grab the number of EventXtract partitions:
+      if [ -n "$1" ]
+      then
+        PARTITIONS=$1
+	re='^[1-9][0-9]*$'
+	if ! [[ $PARTITIONS =~ $re ]]
+	then
+	   echo "Number of partitions must be a positive integer. Was '$PARTITIONS'"
+	   echo $USAGE
+	   exit 1
+	fi
+        shift
+      else
+	echo $USAGE
+	exit 1
+      fi;;
+    -b|--partitionBy)
+      shift
+      # Grab the partitioning method:
+      if [[ "$1" == 'time' || "$1" == 'hash' ]]
+      then
+        PARTITION_BY=$1
+        shift
+      else
+	echo "Partitioning method must be 'time' or 'hash'. Was '$1'"
+	echo $USAGE
+	exit 1
+      fi;;
     -x|--xpunge)
       xpungeFiles=true
       shift;;
@@ -207,6 +279,15 @@ then
 fi
 COURSE_SUBSTR=$1
 
+if [ $PARALLELISM -gt $MAX_PARALLELISM ]
+then
+    PARALLELISM=$MAX_PARALLELISM
+fi
+if [ $PARTITIONS -gt $MAX_PARTITIONS ]
+then
+    PARTITIONS=$MAX_PARTITIONS
+fi
+
 # ----------------------------- Determine Directory Path for CSV Tables -------------
 
 # Create a prefix for the table file names.
@@ -560,7 +641,67 @@ fi
 
 # Create the three MySQL export commands that
 # will write the table values. Two variants for each table:
-# with or without personally identifiable information:
+# with or without personally identifiable information.
+#
+# The PII variants join with the materialized lookup table
+# EdxPrivate.PIILookup, whose primary key is anon_screen_name.
+# That table is maintained by src/piiLookupTable.py. If it
+# does not exist on this server, we fall back to a view over
+# EdxPrivate.Account. The view's name is unique to this run,
+# so that concurrent PII exports don't clobber each other's
+# view. It is created once before the extracts start, and
+# dropped after all of them are done.
+#
+# PIILookup is only as current as its last cron refresh.
+# Learners that are not in it yet get their PII from a
+# second join with EdxPrivate.Account, which is only
+# consulted when the PIILookup join found no row:
+
+PII_LOOKUP_EXISTS=$(mysql $MYSQL_AUTH --batch --skip-column-names -e "
+              SELECT COUNT(*)
+	      FROM information_schema.TABLES
+	      WHERE TABLE_SCHEMA = 'EdxPrivate'
+	         AND TABLE_NAME = 'PIILookup';")
+if [[ $PII_LOOKUP_EXISTS == 1 ]]
+then
+    PII_TABLE=EdxPrivate.PIILookup
+    PII_FALLBACK_TABLE=EdxPrivate.Account
+    PII_VIEW_CREATE_CMD=''
+    PII_VIEW_DROP_CMD=''
+else
+    PII_TABLE=Edx.PIITable_$$
+    PII_VIEW_CREATE_CMD=" \
+       DROP VIEW IF EXISTS $PII_TABLE;
+       CREATE VIEW $PII_TABLE AS
+         SELECT anon_screen_name, name, screen_name, email, goals
+         FROM EdxPrivate.Account;"
+    PII_FALLBACK_TABLE=''
+    PII_VIEW_DROP_CMD="DROP VIEW IF EXISTS $PII_TABLE;"
+fi
+
+# Select list of the PII columns, for use after the
+# columns of the table being exported:
+if [ -n "$PII_FALLBACK_TABLE" ]
+then
+    PII_COLS="COALESCE(PIITable.name, AccountPII.name), \
+              COALESCE(PIITable.screen_name, AccountPII.screen_name), \
+              COALESCE(PIITable.email, AccountPII.email), \
+              COALESCE(PIITable.goals, AccountPII.goals)"
+else
+    PII_COLS="PIITable.name, PIITable.screen_name, PIITable.email, PIITable.goals"
+fi
+
+# Print the joins that add PII to the rows of an exported table.
+# Arg: the table's anon_screen_name column, e.g. Edx.EventXtract.anon_screen_name:
+piiJoins() {
+    echo "LEFT JOIN $PII_TABLE AS PIITable ON $1 = PIITable.anon_screen_name"
+    if [ -n "$PII_FALLBACK_TABLE" ]
+    then
+	echo "LEFT JOIN $PII_FALLBACK_TABLE AS AccountPII
+	        ON PIITable.anon_screen_name IS NULL
+	       AND $1 = AccountPII.anon_screen_name"
+    fi
+}
 
 # Get the course quarter in the form summer2014.
 # If the course substring contains wildcards, or
@@ -574,18 +715,13 @@ fi
 if $pii
 then
   EXPORT_EventXtract_CMD=" \
-   DROP VIEW IF EXISTS PIITable;
    USE Edx;
-   CREATE VIEW PIITable AS
-     SELECT anon_screen_name, name, screen_name, email, goals
-     FROM EdxPrivate.Account;
-   SELECT DISTINCT EventXtract.*, PIITable.name, PIITable.screen_name, PIITable.email, PIITable.goals \
+   SELECT DISTINCT EventXtract.*, $PII_COLS \
    INTO OUTFILE '"$EventXtract_VALUES"' \
      FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' \
      LINES TERMINATED BY '\r\n' \
    FROM Edx.EventXtract \
-   LEFT JOIN PIITable
-   ON  Edx.EventXtract.anon_screen_name = PIITable.anon_screen_name
+   $(piiJoins Edx.EventXtract.anon_screen_name)
    WHERE Edx.EventXtract.course_display_name LIKE '"$COURSE_SUBSTR"' "
 
   #Splice in the quarter condition if we have it:
@@ -596,8 +732,7 @@ then
 
   # Finish the command:
    EXPORT_EventXtract_CMD="${EXPORT_EventXtract_CMD} \
-     AND Edx.EventXtract.anon_screen_name != '9c1185a5c5e9fc54612808977ee8f548b2258d31';
-   DROP VIEW PIITable;"
+     AND Edx.EventXtract.anon_screen_name != '9c1185a5c5e9fc54612808977ee8f548b2258d31';"
 else
   EXPORT_EventXtract_CMD=" \
   USE Edx;
@@ -627,20 +762,14 @@ if $pii
 then
   EXPORT_ActivityGrade_CMD=" \
    USE Edx;
-   DROP VIEW IF EXISTS PIITable;
-   CREATE VIEW PIITable AS
-   SELECT anon_screen_name, name, screen_name, email, goals
-    FROM EdxPrivate.Account;
-   SELECT DISTINCT Edx.ActivityGrade.*, PIITable.name, PIITable.screen_name, PIITable.email, PIITable.goals \
+   SELECT DISTINCT Edx.ActivityGrade.*, $PII_COLS \
    INTO OUTFILE '"$ActivityGrade_VALUES"' \
      FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' \
      LINES TERMINATED BY '\r\n' \
    FROM Edx.ActivityGrade \
-   LEFT JOIN PIITable
-   ON  Edx.ActivityGrade.anon_screen_name = PIITable.anon_screen_name
+   $(piiJoins Edx.ActivityGrade.anon_screen_name)
    WHERE Edx.ActivityGrade.course_display_name LIKE '"$COURSE_SUBSTR"'
-     AND Edx.ActivityGrade.anon_screen_name != '9c1185a5c5e9fc54612808977ee8f548b2258d31';
-   DROP VIEW PIITable;"
+     AND Edx.ActivityGrade.anon_screen_name != '9c1185a5c5e9fc54612808977ee8f548b2258d31';"
 else
   EXPORT_ActivityGrade_CMD=" \
   SELECT DISTINCT Edx.ActivityGrade.* \
@@ -656,20 +785,14 @@ if $pii
 then
   EXPORT_VideoInteraction_CMD=" \
    USE Edx;
-   DROP VIEW IF EXISTS PIITable;
-   CREATE VIEW PIITable AS
-   SELECT anon_screen_name, name, screen_name, email, goals
-   FROM EdxPrivate.Account;
-   SELECT DISTINCT Edx.VideoInteraction.*, PIITable.name, PIITable.screen_name, PIITable.email, PIITable.goals \
+   SELECT DISTINCT Edx.VideoInteraction.*, $PII_COLS \
    INTO OUTFILE '"$VideoInteraction_VALUES"' \
      FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' \
      LINES TERMINATED BY '\r\n' \
    FROM Edx.VideoInteraction \
-   LEFT JOIN PIITable
-   ON  Edx.VideoInteraction.anon_screen_name = PIITable.anon_screen_name
+   $(piiJoins Edx.VideoInteraction.anon_screen_name)
    WHERE Edx.VideoInteraction.course_display_name LIKE '"$COURSE_SUBSTR"'
-     AND Edx.VideoInteraction.anon_screen_name != '9c1185a5c5e9fc54612808977ee8f548b2258d31';
-   DROP VIEW PIITable;"
+     AND Edx.VideoInteraction.anon_screen_name != '9c1185a5c5e9fc54612808977ee8f548b2258d31';"
 else
 EXPORT_VideoInteraction_CMD=" \
   SELECT DISTINCT Edx.VideoInteraction.* \
@@ -700,18 +823,201 @@ fi
 
 # ----------------------------- Execute the Main MySQL Commands -------------
 
-echo "Creating extract EventXtract ...<br>"
-echo "$EXPORT_EventXtract_CMD" | mysql $MYSQL_AUTH
-# Concatenate the col name header and the table:
-cat $EventXtract_HEADER_FILE $EventXtract_VALUES > $EVENT_EXTRACT_FNAME
+# Runs one extract over its own MySQL connection, and
+# concatenates the col name header and the table.
+# Writes the exit status to <values file>.status, for
+# checkExtracts. A failed extract leaves no csv file.
+# Args: table name, MySQL command, header file, values file,
+# final csv file:
+runExtract() {
+    echo "Creating extract $1 ...<br>"
+    echo "$2" | mysql $MYSQL_AUTH && cat $3 $4 > $5
+    local status=$?
+    echo $status > $4.status
+    if [ $status -ne 0 ]
+    then
+	rm -f $5
+	return $status
+    fi
+    echo "Finished extract $1.<br>"
+}
+
+# Starts runExtract in the background as soon as an extract
+# slot is free, and remembers its status file. Args: as for
+# runExtract:
+EXTRACT_STATUS_FILES=()
+startExtract() {
+    EXTRACT_STATUS_FILES+=("$1:$4.status")
+    waitForExtractSlot
+    runExtract "$@" &
+}
+
+# Called after all extracts finished. Reports each extract
+# started by startExtract that failed, or that was killed
+# before writing its status. Returns 1 if any failed.
+checkExtracts() {
+    local failed=0
+    for entry in ${EXTRACT_STATUS_FILES[@]}
+    do
+	local table=${entry%%:*}
+	local statusFile=${entry#*:}
+	if [[ ! -f $statusFile || $(cat $statusFile) != 0 ]]
+	then
+	    echo "Extract $table failed.<br>"
+	    failed=1
+	fi
+	rm -f $statusFile
+    done
+    return $failed
+}
+
+# Starts the EventXtract extract as $PARTITIONS partition
+# scans, each into its own tmp file. Each partition's command
+# is the regular EventXtract command with its own OUTFILE, and
+# with the partition condition added to the WHERE clause.
+# Partitions are disjoint in time or in anon_screen_name, both
+# of which are among the exported columns, so no row is lost
+# or duplicated by the DISTINCT of the individual scans.
+# Each partition is started via waitForExtractSlot, so that
+# partitions count against $PARALLELISM like all other extracts.
+# Must therefore run in the main shell, not in the background.
+# Each partition writes its exit status to <partFile>.status;
+# finishPartitionedEventXtract collects the partitions once
+# they are done. Falls back to the single scan if the course
+# has no rows.
+PART_FILES=()
+startPartitionedEventXtract() {
+    echo "Creating extract EventXtract in $PARTITIONS partitions by $PARTITION_BY ...<br>"
+    local partConditions=()
+    if [[ $PARTITION_BY == 'time' ]]
+    then
+	local timeSpanQuery="SELECT UNIX_TIMESTAMP(MIN(time)), UNIX_TIMESTAMP(MAX(time)) \
+			     FROM Edx.EventXtract \
+			     WHERE course_display_name LIKE '"$COURSE_SUBSTR"'"
+	if [[ ! -z $QUARTER ]]
+	then
+	    timeSpanQuery="${timeSpanQuery} AND quarter = '"$QUARTER"'"
+	fi
+	read minTime maxTime <<< $(mysql $MYSQL_AUTH --batch --skip-column-names -e "$timeSpanQuery;")
+	if [[ -z $minTime || $minTime == 'NULL' ]]
+	then
+	    startExtract EventXtract "$EXPORT_EventXtract_CMD" \
+		$EventXtract_HEADER_FILE $EventXtract_VALUES $EVENT_EXTRACT_FNAME
+	    return
+	fi
+	local rangeWidth=$(( (maxTime - minTime) / PARTITIONS + 1 ))
+	for (( part=0; part<PARTITIONS; part++ ))
+	do
+	    local lowTime=$(( minTime + part * rangeWidth ))
+	    local highTime=$(( lowTime + rangeWidth ))
+	    partConditions+=("AND Edx.EventXtract.time >= FROM_UNIXTIME($lowTime) AND Edx.EventXtract.time < FROM_UNIXTIME($highTime)")
+	done
+    else
+	for (( part=0; part<PARTITIONS; part++ ))
+	do
+	    partConditions+=("AND CRC32(Edx.EventXtract.anon_screen_name) % $PARTITIONS = $part")
+	done
+    fi
+
+    for (( part=0; part<PARTITIONS; part++ ))
+    do
+	local partFile=`mktemp -u -p /tmp`
+	PART_FILES+=($partFile)
+	# Swap in the partition's OUTFILE, and replace the
+	# command's final semicolon with the partition condition:
+	local partCmd=${EXPORT_EventXtract_CMD//$EventXtract_VALUES/$partFile}
+	partCmd="${partCmd%;} ${partConditions[$part]};"
+	waitForExtractSlot
+	( echo "$partCmd" | mysql $MYSQL_AUTH; echo $? > $partFile.status ) &
+    done
+}
+
+# Called after all extracts finished. Checks the exit status of
+# each partition that startPartitionedEventXtract started. If all
+# succeeded, concatenates header and partitions in partition order.
+# Removes the partition files either way. Returns 1 if any
+# partition failed.
+finishPartitionedEventXtract() {
+    if [ ${#PART_FILES[@]} -eq 0 ]
+    then
+	# Course had no rows; the single scan ran instead:
+	return 0
+    fi
+    local failed=0
+    local part=0
+    for partFile in ${PART_FILES[@]}
+    do
+	if [[ ! -f $partFile.status || $(cat $partFile.status) != 0 ]]
+	then
+	    echo "Extract EventXtract failed in partition $part.<br>"
+	    failed=1
+	fi
+	part=$(( part + 1 ))
+    done
+    if [ $failed -eq 0 ]
+    then
+	cat $EventXtract_HEADER_FILE ${PART_FILES[@]} > $EVENT_EXTRACT_FNAME
+    fi
+    for partFile in ${PART_FILES[@]}
+    do
+	rm -f $partFile $partFile.status
+    done
+    if [ $failed -ne 0 ]
+    then
+	return 1
+    fi
+    echo "Finished extract EventXtract.<br>"
+}
+
+# Waits until fewer than $PARALLELISM extracts are running:
+waitForExtractSlot() {
+    while [ $(jobs -rp | wc -l) -ge $PARALLELISM ]
+    do
+	wait -n
+    done
+}
+
+if $pii && [ -n "$PII_VIEW_CREATE_CMD" ]
+then
+    echo "$PII_VIEW_CREATE_CMD" | mysql $MYSQL_AUTH
+fi
+
+if [ $PARTITIONS -gt 1 ]
+then
+    startPartitionedEventXtract
+else
+    startExtract EventXtract "$EXPORT_EventXtract_CMD" \
+	$EventXtract_HEADER_FILE $EventXtract_VALUES $EVENT_EXTRACT_FNAME
+fi
 
-echo "Creating extract ActivityGrade ...<br>"
-echo "$EXPORT_ActivityGrade_CMD" | mysql $MYSQL_AUTH
-cat $ActivityGrade_HEADER_FILE $ActivityGrade_VALUES > $ACTIVITY_GRADE_FNAME
+startExtract ActivityGrade "$EXPORT_ActivityGrade_CMD" \
+    $ActivityGrade_HEADER_FILE $ActivityGrade_VALUES $ACTIVITY_GRADE_FNAME
 
-echo "Creating extract VideoInteraction ...<br>"
-echo "$EXPORT_VideoInteraction_CMD" | mysql $MYSQL_AUTH
-cat $VideoInteraction_HEADER_FILE $VideoInteraction_VALUES > $VIDEO_FNAME
+startExtract VideoInteraction "$EXPORT_VideoInteraction_CMD" \
+    $VideoInteraction_HEADER_FILE $VideoInteraction_VALUES $VIDEO_FNAME
+
+# Wait for all extracts to finish:
+wait
+EXTRACT_FAILED=false
+if ! checkExtracts
+then
+    EXTRACT_FAILED=true
+fi
+if ! finishPartitionedEventXtract
+then
+    EXTRACT_FAILED=true
+fi
+
+if $pii && [ -n "$PII_VIEW_DROP_CMD" ]
+then
+    echo "$PII_VIEW_DROP_CMD" | mysql $MYSQL_AUTH
+fi
+
+if $EXTRACT_FAILED
+then
+    echo "Export of class $COURSE_SUBSTR failed.<br>"
+    exit 1
+fi
 
 echo "Done exporting class $COURSE_SUBSTR to CSV<br>"
 
@@ -419,6 +419,19 @@ fi
 # If the forum output is to remain non-relatable to the rest
 # of the data, then don't use sed, but retain the existing
 # column names as the col names to output.
+#
+# Outside of testing, the anon_screen_name is looked up in the
+# precomputed map EdxPrivate.UserIdMap (see src/userIdMap.py),
+# which is indexed on forum_uid. Only posters who joined after
+# the map's last refresh fall back to the idForum2Anon() UDF.
+# The forum_uid column is nulled out before the lookup expression
+# is spliced in, b/c the expression itself mentions forum_uid.
+
+USER_ID_MAP_EXISTS=$(mysql $MYSQL_AUTH --batch --skip-column-names -e "
+              SELECT COUNT(*)
+	      FROM information_schema.TABLES
+	      WHERE TABLE_SCHEMA = 'EdxPrivate'
+	         AND TABLE_NAME = 'UserIdMap';")
 
 if $RELATABLE
 then
@@ -426,6 +439,10 @@ then
     then
 	COLS_TO_PULL=`echo $COL_NAMES | sed s/anon_screen_name/unittest.idForum2Anon\(forum_uid\)/ \
 	    | sed s/[^\(]forum_uid/,'null'/`
+    elif [[ $USER_ID_MAP_EXISTS == 1 ]]
+    then
+	COLS_TO_PULL=`echo $COL_NAMES | sed s/[^\(]forum_uid/,'null'/ \
+	    | sed "s/anon_screen_name/IFNULL((SELECT UserIdMap.anon_screen_name FROM EdxPrivate.UserIdMap WHERE UserIdMap.forum_uid = contents.forum_uid),EdxPrivate.idForum2Anon(forum_uid))/"`
     else
 	COLS_TO_PULL=`echo $COL_NAMES | sed s/anon_screen_name/EdxPrivate.idForum2Anon\(forum_uid\)/ \
 	    | sed s/[^\(]forum_uid/,'null'/`
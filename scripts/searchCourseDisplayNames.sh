@@ -185,6 +185,23 @@ MYSQL_CMD="SELECT course_display_name, COUNT(user_id) AS 'enrollment'
                    OR course_display_name LIKE 'ohsx%')
               AND isTrueCourseName(course_display_name) = 1;\G"
 
+# Read the counts from Misc.CourseEnrollmentSummary if it is
+# maintained on this server (by src/courseEnrollmentSummary.py):
+ENROLLMENT_SUMMARY_EXISTS=$(mysql $MYSQL_AUTH --batch --skip-column-names -e "
+              SELECT COUNT(*)
+              FROM information_schema.TABLES
+              WHERE TABLE_SCHEMA = 'Misc'
+                 AND TABLE_NAME = 'CourseEnrollmentSummary';")
+if [[ $ENROLLMENT_SUMMARY_EXISTS == 1 ]]
+then
+    MYSQL_CMD="SELECT course_display_name, enrollment
+               FROM Misc.CourseEnrollmentSummary
+               WHERE course_display_name LIKE '"$COURSE_SUBSTR"'
+                 AND (enrollment > "$MIN_ENROLLMENT"
+                      OR course_display_name LIKE 'ohsx%')
+                 AND is_true_course_name = 1;\G"
+fi
+
 # --skip-column-names suppresses the col name 
 # headers in the output:
 if $SILENT
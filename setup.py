@@ -9,6 +9,7 @@ setup(
     setup_requires   = ['nose>=1.1.2'],
     install_requires = ['online_learning_computations>=0.35',
 			'pymysql_utils>=0.51',
+			'numpy>=1.8',
 			],
     tests_require    = [],
 
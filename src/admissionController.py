@@ -0,0 +1,268 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+
+Throttles exports while the database server is busy, as during
+the nightly event loading. The controller samples:
+
+    - threadsRunning:        MySQL status Threads_running
+    - bufferPoolReadsPerSec: rate of Innodb_buffer_pool_reads, i.e. of
+                             InnoDB page reads that missed the buffer
+                             pool and went to disk
+    - replicationLag:        Seconds_Behind_Master, if exports are
+                             served from a replica
+    - diskUtilPercent:       busiest local disk's I/O utilization,
+                             from /proc/diskstats
+
+If any metric reaches its HIGH_WATERMARKS entry, the controller
+becomes throttled, and ExportScheduler runs at most THROTTLED_SLOTS
+export steps at once. Running exports give up their slots between
+courses until the limit is met. Only when all metrics are back at or
+below LOW_WATERMARKS does the controller return to normal, so that
+the state does not flip back and forth around a single threshold.
+
+Samples are taken every SAMPLE_INTERVAL seconds by a background
+thread, on a MySQL connection of the controller's own. The scheduler
+only reads the resulting state. It calls allowedSlots() while holding
+its lock, so it must never wait for a sample from an overloaded server.
+'''
+
+import os
+import threading
+import time
+
+from pymysql_utils.pymysql_utils import MySQLDB
+
+
+class AdmissionController(object):
+    '''
+    Tracks database and disk load, and tells the export
+    scheduler how many export steps may run.
+    '''
+
+    HIGH_WATERMARKS = {'threadsRunning'        : 32,
+                       'bufferPoolReadsPerSec' : 2000,
+                       'replicationLag'        : 300,
+                       'diskUtilPercent'       : 90}
+
+    LOW_WATERMARKS  = {'threadsRunning'        : 16,
+                       'bufferPoolReadsPerSec' : 500,
+                       'replicationLag'        : 60,
+                       'diskUtilPercent'       : 60}
+
+    # Export steps that may run at once while throttled:
+    THROTTLED_SLOTS = 1
+
+    # Seconds between samples:
+    SAMPLE_INTERVAL = 10
+
+    # Whether exports read from a replica, whose lag is then watched:
+    EXPORT_FROM_REPLICA = False
+
+    # Position of Seconds_Behind_Master in SHOW SLAVE STATUS rows:
+    SECONDS_BEHIND_MASTER_COLUMN = 32
+
+    DISKSTATS = '/proc/diskstats'
+
+    # The shared instance, and the lock that guards its creation:
+    _instance = None
+    _instanceLock = threading.Lock()
+
+    @classmethod
+    def getInstance(cls, mySQLUser, mySQLPwd=None):
+        '''
+        Return the shared controller, creating it on first use.
+
+        :rtype: AdmissionController
+        '''
+        with cls._instanceLock:
+            if cls._instance is None:
+                cls._instance = AdmissionController(lambda: cls.connect(mySQLUser, mySQLPwd))
+                cls._instance.start()
+            return cls._instance
+
+    @classmethod
+    def connect(cls, mySQLUser, mySQLPwd=None):
+        if mySQLPwd is None:
+            return MySQLDB(user=mySQLUser, db='information_schema')
+        return MySQLDB(user=mySQLUser, passwd=mySQLPwd, db='information_schema')
+
+    def __init__(self, connectFunc=None, disks=None, clock=time.time):
+        '''
+        :param connectFunc: function that returns a MySQLDB connection;
+            None to sample disks only.
+        :type connectFunc: {function | None}
+        :param disks: names of block devices to watch, as in /proc/diskstats;
+            None for all disks in /sys/block, except loop and ram devices.
+        :type disks: {[String] | None}
+        :param clock: function returning the current time in seconds
+        :type clock: function
+        '''
+        self.connectFunc = connectFunc
+        self.mysqlDb = None
+        self.disks = disks
+        self.clock = clock
+        # Guards the throttle state and metrics:
+        self.lock = threading.Lock()
+        # Serializes samples, which may take long:
+        self.samplingLock = threading.Lock()
+        self.throttled = False
+        self.metrics = {}
+        self.lastSampleTime = None
+        # Previous counter readings, for computing rates:
+        self.prevBufferPoolReads = None
+        self.prevIoTicks = {}
+
+    def start(self):
+        '''
+        Start sampling in a background thread.
+        '''
+        sampler = threading.Thread(target=self.sampleForever, name='AdmissionController')
+        sampler.daemon = True
+        sampler.start()
+
+    def sampleForever(self):
+        while True:
+            self.sampleIfDue()
+            time.sleep(AdmissionController.SAMPLE_INTERVAL)
+
+    def allowedSlots(self, maxRunning):
+        '''
+        Return the number of export steps that may run now,
+        according to the most recent sample. Never queries
+        the database.
+
+        :param maxRunning: number allowed under normal load
+        :type maxRunning: int
+        :rtype: int
+        '''
+        with self.lock:
+            throttled = self.throttled
+        return min(maxRunning, AdmissionController.THROTTLED_SLOTS) if throttled else maxRunning
+
+    def stateDescription(self):
+        '''
+        Return a short description of the throttle state
+        for progress messages, or None under normal load.
+
+        :rtype: {String | None}
+        '''
+        with self.lock:
+            if not self.throttled:
+                return None
+            causes = ['%s %s' % (metric, int(value)) for (metric, value) in sorted(self.metrics.items())
+                      if value >= AdmissionController.HIGH_WATERMARKS[metric]]
+            return 'Database server is busy%s; exports are throttled.' % \
+                   (' (%s)' % ', '.join(causes) if len(causes) > 0 else '')
+
+    def sampleIfDue(self):
+        '''
+        Take a sample, unless the previous one is less than
+        SAMPLE_INTERVAL seconds old. Only the update of the
+        state holds self.lock, not the sampling itself.
+        '''
+        with self.samplingLock:
+            now = self.clock()
+            if self.lastSampleTime is not None and now - self.lastSampleTime < AdmissionController.SAMPLE_INTERVAL:
+                return
+            previousSampleTime = self.lastSampleTime
+            self.lastSampleTime = now
+            try:
+                metrics = self.sample(now, previousSampleTime)
+            except Exception:
+                # Sampling problems must not stop exports; keep
+                # the previous state, and reconnect next time:
+                self.mysqlDb = None
+                return
+            with self.lock:
+                self.update(metrics)
+
+    def update(self, metrics):
+        '''
+        Apply new metric values to the throttle state.
+        Caller holds self.lock.
+
+        :param metrics: metric name --> value; missing metrics are not considered
+        :type metrics: {String : float}
+        '''
+        self.metrics = metrics
+        if self.throttled:
+            self.throttled = any(value > AdmissionController.LOW_WATERMARKS[metric]
+                                 for (metric, value) in metrics.items())
+        else:
+            self.throttled = any(value >= AdmissionController.HIGH_WATERMARKS[metric]
+                                 for (metric, value) in metrics.items())
+
+    def sample(self, now, previousSampleTime=None):
+        '''
+        Return the current metric values. Rates are only
+        available from the second sample on.
+
+        :param now: time of this sample
+        :type now: float
+        :param previousSampleTime: time of the previous sample, or None
+        :type previousSampleTime: {float | None}
+        :rtype: {String : float}
+        '''
+        metrics = {}
+        elapsed = now - previousSampleTime if previousSampleTime is not None else 0
+        diskUtil = self.diskUtilPercent(now)
+        if diskUtil is not None:
+            metrics['diskUtilPercent'] = diskUtil
+        if self.connectFunc is None:
+            return metrics
+        if self.mysqlDb is None:
+            self.mysqlDb = self.connectFunc()
+        status = dict((name.lower(), value) for (name, value) in
+                      self.mysqlDb.query("SHOW GLOBAL STATUS WHERE Variable_name IN ('Threads_running', 'Innodb_buffer_pool_reads')"))
+        if 'threads_running' in status:
+            metrics['threadsRunning'] = float(status['threads_running'])
+        if 'innodb_buffer_pool_reads' in status:
+            bufferPoolReads = int(status['innodb_buffer_pool_reads'])
+            if self.prevBufferPoolReads is not None and elapsed > 0:
+                metrics['bufferPoolReadsPerSec'] = (bufferPoolReads - self.prevBufferPoolReads) / float(elapsed)
+            self.prevBufferPoolReads = bufferPoolReads
+        if AdmissionController.EXPORT_FROM_REPLICA:
+            for row in self.mysqlDb.query('SHOW SLAVE STATUS'):
+                lag = row[AdmissionController.SECONDS_BEHIND_MASTER_COLUMN]
+                # NULL when replication is stopped; the data then
+                # does not get staler by exporting:
+                if lag is not None:
+                    metrics['replicationLag'] = float(lag)
+        return metrics
+
+    def diskUtilPercent(self, now):
+        '''
+        Return the I/O utilization of the busiest watched disk
+        since the previous call: the percentage of time the
+        disk had I/O in flight. None on the first call, or if
+        /proc/diskstats is not available.
+
+        :rtype: {float | None}
+        '''
+        try:
+            with open(AdmissionController.DISKSTATS, 'r') as fd:
+                lines = fd.readlines()
+        except IOError:
+            return None
+        disks = self.disks
+        if disks is None:
+            try:
+                disks = [disk for disk in os.listdir('/sys/block') if not disk.startswith(('loop', 'ram'))]
+            except OSError:
+                disks = []
+        utilization = None
+        for line in lines:
+            fields = line.split()
+            if len(fields) < 13 or fields[2] not in disks:
+                continue
+            # Milliseconds spent doing I/O:
+            ioTicks = int(fields[12])
+            if fields[2] in self.prevIoTicks:
+                (prevTime, prevTicks) = self.prevIoTicks[fields[2]]
+                if now > prevTime:
+                    diskUtil = min(100.0, 100.0 * (ioTicks - prevTicks) / ((now - prevTime) * 1000.0))
+                    utilization = diskUtil if utilization is None else max(utilization, diskUtil)
+            self.prevIoTicks[fields[2]] = (now, ioTicks)
+        return utilization
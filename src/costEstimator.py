@@ -0,0 +1,315 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+
+Predicts rows, output bytes, and runtime of export requests
+before they run. For each requested kind of export, and each
+course, the queries the exporter will issue (the query shapes of
+indexAdvisor.py) are EXPLAINed. The EXPLAIN row estimate is used
+when MySQL can select the course's rows via an index. When MySQL
+would scan the whole table, EXPLAIN only reports the table size;
+the course's share of the table is then estimated from its share
+of all enrollments. Output bytes follow from information_schema's
+average row length. Runtime follows from the rows read, at the
+rates MySQL reaches with index access and with table scans.
+
+Requests for many courses, such as wildcard requests, would need
+sample values and EXPLAINs for every course. Instead, at most
+MAX_ESTIMATED_COURSES courses, spread over the range of enrollments,
+are estimated, and their totals are scaled to all requested courses
+by the ratio of enrollments.
+
+The DataServer answers 'estimate' requests (dry runs) with these
+estimates, and sends them to the browser before each getData request
+runs. All estimates are appended to ESTIMATE_LOG, together with the
+actual runtime of executed requests, so that the rates can be
+calibrated, and the estimates used for ordering and admission of
+requests.
+'''
+
+from collections import OrderedDict
+import datetime
+import json
+
+from indexAdvisor import QUERY_SHAPES, IndexAdvisor, explainRowToDict, isFullScan
+
+
+# Query shapes (see indexAdvisor.QUERY_SHAPES) that each kind
+# of export issues for one course. Kinds that are not about a
+# single course have no shapes, and are not estimated:
+EXPORT_SHAPES = OrderedDict([
+    ('basicData',         ['basicEventXtract', 'basicActivityGrade', 'basicVideoInteraction']),
+    ('engagementData',    ['basicEventXtract']),
+    ('learnerPerf',       ['basicActivityGrade']),
+    ('demographics',      ['trueEnrollment']),
+    ('abtest',            ['abExperiment']),
+    ('qualtrics',         ['surveyMeta', 'surveyQuestion', 'surveyChoice', 'surveyResponse', 'surveyResponseMetadata']),
+    ('grades',            ['finalGrade']),
+    ('metadata',          ['courseInfo', 'edxProblem', 'edxVideo']),
+    ('edxForumRelatable', ['forum']),
+    ('edxForumIsolated',  ['forum']),
+    ('learnerPII',        ['studentEnrollment']),
+    ('emailList',         []),
+    ('quarterRep',        []),
+    ])
+
+def estimateRows(planRows, fullScan, tableRows, enrollment, totalEnrollment):
+    '''
+    Estimate the number of rows a query selects for one course.
+
+    :param planRows: EXPLAIN's row estimate for the query
+    :type planRows: int
+    :param fullScan: whether EXPLAIN shows a scan of the whole table or index
+    :type fullScan: Boolean
+    :param tableRows: number of rows in the table
+    :type tableRows: int
+    :param enrollment: enrollment of the course, or None if unknown
+    :type enrollment: {int | None}
+    :param totalEnrollment: sum of the enrollments of all courses
+    :type totalEnrollment: int
+    :rtype: int
+    '''
+    if not fullScan or enrollment is None or not totalEnrollment:
+        return planRows
+    return int(tableRows * float(enrollment) / totalEnrollment)
+
+
+class CostEstimator(object):
+    '''
+    Estimates rows, bytes, and seconds of exports.
+    '''
+
+    # Rows per second that MySQL delivers when it reads
+    # through an index, and when it scans a whole table:
+    INDEX_ROWS_PER_SEC = 50000
+    SCAN_ROWS_PER_SEC  = 500000
+
+    # Events per second that EngagementComputer processes:
+    ENGAGEMENT_EVENTS_PER_SEC = 20000
+
+    # Output bytes per learner of exports whose results are
+    # per-learner aggregates, rather than copies of table rows:
+    OUTPUT_BYTES_PER_LEARNER = {'engagementData' : 2048,
+                                'learnerPerf'    : 100}
+
+    # File to which estimates and actual runtimes are appended,
+    # one JSON object per line:
+    ESTIMATE_LOG = '/home/dataman/Data/exportEstimates.log'
+
+    # Requests for more courses estimate this many of them,
+    # and scale the result by enrollment:
+    MAX_ESTIMATED_COURSES = 10
+
+    def __init__(self, mysqlDb, enrollmentService=None):
+        '''
+        :param mysqlDb: open connection
+        :type mysqlDb: MySQLDB
+        :param enrollmentService: source of course enrollments; if None,
+            full scans are estimated as reading the whole table.
+        :type enrollmentService: {EnrollmentService | None}
+        '''
+        self.mysqlDb = mysqlDb
+        self.enrollmentService = enrollmentService
+        self.shapesByName = dict([(shape.name, shape) for shape in QUERY_SHAPES])
+        self.tableStatsCache = {}
+
+    def estimateRequest(self, exportKinds, courseNames, quarter=None):
+        '''
+        Estimate all exports of one request.
+
+        :param exportKinds: requested kinds of export, such as 'basicData'
+        :type exportKinds: [String]
+        :param courseNames: the courses to export
+        :type courseNames: [String]
+        :param quarter: quarter for the basic tables, such as 'fall2014';
+            None for each course's own quarter.
+        :type quarter: {String | None}
+        :return: dict with the list of per-export estimates under 'exports'
+            (see estimateExport()), and the totals 'rows', 'bytes', and 'seconds'
+            over the exports that could be estimated. If only a sample of the
+            courses was estimated, there is one export per kind, with 'course'
+            None, and the number of estimated courses under 'sampledCourses'.
+        :rtype: {String : <any>}
+        '''
+        if self.enrollmentService is not None:
+            allEnrollments = self.enrollmentService.allEnrollments()
+            totalEnrollment = sum(enrollment for (courseName, enrollment, isTrueName) in allEnrollments) #@UnusedVariable
+        else:
+            totalEnrollment = 0
+        exports = []
+        for kind in exportKinds:
+            if len(EXPORT_SHAPES.get(kind, [])) == 0:
+                exports.append({'kind' : kind, 'course' : None, 'rows' : None, 'bytes' : None, 'seconds' : None, 'fullScan' : False})
+        estimatedCourses = self.sampleCourses(courseNames)
+        courseExports = []
+        for courseName in estimatedCourses:
+            sampleValues = None
+            for kind in exportKinds:
+                if len(EXPORT_SHAPES.get(kind, [])) == 0:
+                    continue
+                if sampleValues is None:
+                    sampleValues = self.sampleValues(courseName, quarter)
+                courseExports.append(self.estimateExport(kind, courseName, sampleValues, totalEnrollment))
+        if len(estimatedCourses) == len(courseNames):
+            exports.extend(courseExports)
+        else:
+            scale = self.scaleFactor(estimatedCourses, courseNames)
+            for kind in exportKinds:
+                kindExports = [export for export in courseExports if export['kind'] == kind]
+                if len(kindExports) == 0:
+                    continue
+                exports.append({'kind'           : kind,
+                                'course'         : None,
+                                'rows'           : int(sum(export['rows'] for export in kindExports) * scale),
+                                'bytes'          : int(sum(export['bytes'] for export in kindExports) * scale),
+                                'seconds'        : int(round(sum(export['seconds'] for export in kindExports) * scale)),
+                                'fullScan'       : any(export['fullScan'] for export in kindExports),
+                                'sampledCourses' : len(estimatedCourses)})
+        estimated = [export for export in exports if export['rows'] is not None]
+        return {'exports' : exports,
+                'rows'    : sum(export['rows'] for export in estimated),
+                'bytes'   : sum(export['bytes'] for export in estimated),
+                'seconds' : sum(export['seconds'] for export in estimated)}
+
+    def sampleCourses(self, courseNames):
+        '''
+        Return the courses to estimate: all of them, if there are
+        at most MAX_ESTIMATED_COURSES, else that many, evenly spaced
+        in the order of enrollment, from smallest to largest.
+
+        :param courseNames: the requested courses
+        :type courseNames: [String]
+        :rtype: [String]
+        '''
+        numSamples = CostEstimator.MAX_ESTIMATED_COURSES
+        if len(courseNames) <= numSamples:
+            return courseNames
+        ordered = sorted(courseNames, key=lambda courseName: self.enrollmentOf(courseName))
+        return [ordered[int(round(sampleNum * (len(ordered) - 1) / float(numSamples - 1)))]
+                for sampleNum in range(numSamples)]
+
+    def scaleFactor(self, estimatedCourses, courseNames):
+        '''
+        Return the factor by which estimates of some courses are
+        multiplied to cover all courses: the ratio of their
+        enrollments, or of their numbers if enrollments are unknown.
+
+        :rtype: float
+        '''
+        estimatedEnrollment = sum(self.enrollmentOf(courseName) for courseName in estimatedCourses)
+        if estimatedEnrollment == 0:
+            return len(courseNames) / float(len(estimatedCourses))
+        return sum(self.enrollmentOf(courseName) for courseName in courseNames) / float(estimatedEnrollment)
+
+    def enrollmentOf(self, courseName):
+        if self.enrollmentService is None:
+            return 0
+        return self.enrollmentService.getEnrollment(courseName) or 0
+
+    def sampleValues(self, courseName, quarter=None):
+        '''
+        Return the values for the query shapes' placeholders
+        for one course; see IndexAdvisor.sampleValues.
+
+        :rtype: {String : String}
+        '''
+        return IndexAdvisor(self.mysqlDb, courseName, quarter).sampleValues
+
+    def estimateExport(self, kind, courseName, sampleValues, totalEnrollment=0):
+        '''
+        Estimate one kind of export for one course.
+
+        :param kind: kind of export, a key of EXPORT_SHAPES
+        :type kind: String
+        :param courseName: course to export
+        :type courseName: String
+        :param sampleValues: values for the shapes' placeholders (see IndexAdvisor.sampleValues)
+        :type sampleValues: {String : String}
+        :param totalEnrollment: sum of the enrollments of all courses
+        :type totalEnrollment: int
+        :return: dict with 'kind', 'course', 'rows' read, output 'bytes', 'seconds',
+            and 'fullScan', which is True if any query scans a whole table.
+        :rtype: {String : <any>}
+        '''
+        enrollment = self.enrollmentService.getEnrollment(courseName) if self.enrollmentService is not None else None
+        (totalRows, totalBytes, totalSeconds, anyFullScan) = (0, 0, 0.0, False)
+        for shapeName in EXPORT_SHAPES[kind]:
+            shape = self.shapesByName[shapeName]
+            try:
+                plan = [explainRowToDict(row) for row in
+                        self.mysqlDb.query('EXPLAIN ' + shape.instantiate(sampleValues))]
+            except Exception:
+                # Table does not exist on this server:
+                continue
+            (tableRows, avgRowLength) = self.tableStats(shape.db, shape.table)
+            fullScan = any(isFullScan(row) for row in plan)
+            planRows = max([row['rows'] or 0 for row in plan] + [0])
+            rows = estimateRows(planRows, fullScan, tableRows, enrollment, totalEnrollment)
+            totalRows += rows
+            totalBytes += rows * avgRowLength
+            totalSeconds += tableRows / float(CostEstimator.SCAN_ROWS_PER_SEC) if fullScan \
+                            else rows / float(CostEstimator.INDEX_ROWS_PER_SEC)
+            anyFullScan = anyFullScan or fullScan
+        if kind in CostEstimator.OUTPUT_BYTES_PER_LEARNER:
+            totalBytes = (enrollment or 0) * CostEstimator.OUTPUT_BYTES_PER_LEARNER[kind]
+        if kind == 'engagementData':
+            totalSeconds += totalRows / float(CostEstimator.ENGAGEMENT_EVENTS_PER_SEC)
+        return {'kind'     : kind,
+                'course'   : courseName,
+                'rows'     : totalRows,
+                'bytes'    : int(totalBytes),
+                'seconds'  : int(round(totalSeconds)),
+                'fullScan' : anyFullScan}
+
+    def tableStats(self, db, table):
+        '''
+        Return the number of rows and average row length
+        of a table from information_schema.
+
+        :rtype: (int, int)
+        '''
+        try:
+            return self.tableStatsCache[(db, table)]
+        except KeyError:
+            pass
+        try:
+            (tableRows, avgRowLength) = self.mysqlDb.query("SELECT TABLE_ROWS, AVG_ROW_LENGTH " +\
+                                                           "FROM information_schema.TABLES " +\
+                                                           "WHERE TABLE_SCHEMA = '%s' AND TABLE_NAME = '%s';" %\
+                                                           (db, table)).next()
+            stats = (int(tableRows or 0), int(avgRowLength or 0))
+        except StopIteration:
+            stats = (0, 0)
+        self.tableStatsCache[(db, table)] = stats
+        return stats
+
+    @staticmethod
+    def logEstimate(requestArgs, estimate, actualSeconds=None, logFile=None):
+        '''
+        Append an estimate to the estimate log.
+
+        :param requestArgs: arguments of the estimated request
+        :type requestArgs: {String : <any>}
+        :param estimate: result of estimateRequest()
+        :type estimate: {String : <any>}
+        :param actualSeconds: runtime of the request, if it was executed
+        :type actualSeconds: {float | None}
+        :param logFile: file to append to; default: CostEstimator.ESTIMATE_LOG
+        :type logFile: String
+        '''
+        # Never log passwords:
+        loggedArgs = dict([(key, value) for (key, value) in requestArgs.items() if 'pwd' not in key.lower()])
+        entry = {'time'          : datetime.datetime.now().isoformat(),
+                 'request'       : loggedArgs,
+                 'rows'          : estimate['rows'],
+                 'bytes'         : estimate['bytes'],
+                 'seconds'       : estimate['seconds'],
+                 'exports'       : estimate['exports'],
+                 'actualSeconds' : actualSeconds}
+        with open(logFile if logFile is not None else CostEstimator.ESTIMATE_LOG, 'a') as fd:
+            fd.write(json.dumps(entry, default=str) + '\n')
+
+    @staticmethod
+    def formatSeconds(seconds):
+        return str(datetime.timedelta(seconds=int(seconds)))
@@ -0,0 +1,199 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+
+Maintains Misc.CourseActivityDay, a compact index of the days
+on which each course had at least one event in Edx.EventXtract,
+with that day's number of events. Questions like 'which courses
+were active during the fall quarter' are answered from this
+index, rather than by probing EventXtract once per course. Both
+QuarterlyReportExporter.getQuarterCourseNames() and
+createQuarterlyReport.sh use it when it exists for byActivity
+course selection.
+
+The index is refreshed incrementally: the latest indexed day is
+recomputed, and all later days are added. Meant to run from cron
+after each event load, e.g.:
+
+    30 4 * * * python /home/dataman/Code/open_edx_class_export/src/courseActivityIndex.py -u dataman
+
+Events that are loaded with timestamps before the latest indexed
+day are only picked up by a full rebuild (--full).
+'''
+
+import argparse
+import getpass
+import os
+import sys
+
+from pymysql_utils.pymysql_utils import MySQLDB
+
+
+class CourseActivityIndex(object):
+    '''
+    Creation, refresh, and lookup of the course activity index.
+    '''
+
+    DB = 'Misc'
+    TABLE = 'CourseActivityDay'
+    SOURCE_TABLE = 'Edx.EventXtract'
+
+    def __init__(self, mysqlDb, db=None):
+        '''
+        :param mysqlDb: open connection
+        :type mysqlDb: MySQLDB
+        :param db: database that holds the index; default: CourseActivityIndex.DB
+        :type db: String
+        '''
+        self.mysqlDb = mysqlDb
+        self.db = db if db is not None else CourseActivityIndex.DB
+        self.fullName = '%s.%s' % (self.db, CourseActivityIndex.TABLE)
+
+    def exists(self):
+        '''
+        Return True if the index table exists.
+        '''
+        try:
+            self.mysqlDb.query("SELECT 1 FROM information_schema.TABLES " +\
+                               "WHERE TABLE_SCHEMA = '%s' AND TABLE_NAME = '%s';" %\
+                               (self.db, CourseActivityIndex.TABLE)).next()
+            return True
+        except StopIteration:
+            return False
+
+    def refresh(self, full=False):
+        '''
+        Bring the index up to date with EventXtract. If the
+        index does not exist yet, or full is True, it is rebuilt
+        from scratch. Else the latest indexed day is recomputed,
+        and later days are added.
+
+        :param full: if True, rebuild the whole index
+        :type full: Boolean
+        :return: number of course days in the index after the refresh
+        :rtype: int
+        '''
+        if full or not self.exists():
+            self.rebuild()
+        else:
+            latestDay = self.mysqlDb.query('SELECT MAX(activity_day) FROM %s;' % self.fullName).next()[0]
+            self.addDays(self.fullName, latestDay)
+        return self.mysqlDb.query('SELECT COUNT(*) FROM %s;' % self.fullName).next()[0]
+
+    def rebuild(self):
+        '''
+        Build the index under a scratch name, then atomically
+        rename it into place.
+        '''
+        scratchName = self.fullName + 'New'
+        oldName = self.fullName + 'Old'
+        self.mysqlDb.execute('DROP TABLE IF EXISTS %s;' % scratchName)
+        self.mysqlDb.execute(self.createTableDDL(scratchName))
+        self.addDays(scratchName)
+        if self.exists():
+            self.mysqlDb.execute('DROP TABLE IF EXISTS %s;' % oldName)
+            self.mysqlDb.execute('RENAME TABLE %s TO %s, %s TO %s;' %\
+                                 (self.fullName, oldName, scratchName, self.fullName))
+            self.mysqlDb.execute('DROP TABLE %s;' % oldName)
+        else:
+            self.mysqlDb.execute('RENAME TABLE %s TO %s;' % (scratchName, self.fullName))
+
+    def addDays(self, tableName, sinceDay=None):
+        '''
+        Aggregate the events of all days starting with sinceDay
+        into the given table. Days that are already present
+        are overwritten with the new counts.
+
+        :param tableName: full name of the index table to fill
+        :type tableName: String
+        :param sinceDay: first day to aggregate; None for all days
+        :type sinceDay: {datetime.date | String | None}
+        '''
+        timeCondition = "WHERE time >= '%s' " % str(sinceDay) if sinceDay is not None else ''
+        self.mysqlDb.execute('INSERT INTO %s (course_display_name, activity_day, num_events) ' % tableName +\
+                             'SELECT course_display_name, DATE(time), COUNT(*) ' +\
+                             'FROM %s ' % CourseActivityIndex.SOURCE_TABLE +\
+                             timeCondition +\
+                             'GROUP BY course_display_name, DATE(time) ' +\
+                             'ON DUPLICATE KEY UPDATE num_events = VALUES(num_events);')
+
+    def activityCondition(self, dateRanges, courseNameCol='course_display_name'):
+        '''
+        Return a SQL condition that is true for courses that
+        had activity on at least one day within any of the given
+        date ranges.
+
+        :param dateRanges: (firstDay, lastDay) pairs, such as ('2014-09-01', '2014-11-30');
+            both days are included.
+        :type dateRanges: [(String, String)]
+        :param courseNameCol: column or expression with the course name to test
+        :type courseNameCol: String
+        :rtype: String
+        '''
+        return '%s IN (SELECT course_display_name FROM %s WHERE %s)' % (courseNameCol, self.fullName, self.dayCondition(dateRanges))
+
+    def activeCourses(self, dateRanges):
+        '''
+        Return the names of all courses that had activity on
+        at least one day within any of the given date ranges.
+
+        :param dateRanges: (firstDay, lastDay) pairs; both days are included.
+        :type dateRanges: [(String, String)]
+        :rtype: [String]
+        '''
+        return [row[0] for row in self.mysqlDb.query('SELECT DISTINCT course_display_name FROM %s WHERE %s;' %\
+                                                      (self.fullName, self.dayCondition(dateRanges)))]
+
+    def dayCondition(self, dateRanges):
+        return '(%s)' % ' OR '.join(["activity_day BETWEEN '%s' AND '%s'" % dateRange for dateRange in dateRanges])
+
+    def createTableDDL(self, tableName):
+        return 'CREATE TABLE %s (' % tableName +\
+               '  course_display_name varchar(255) NOT NULL,' +\
+               '  activity_day date NOT NULL,' +\
+               '  num_events int NOT NULL,' +\
+               '  PRIMARY KEY (course_display_name, activity_day),' +\
+               '  KEY (activity_day)' +\
+               ') ENGINE=InnoDB;'
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(prog=os.path.basename(sys.argv[0]), formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('-u', '--user',
+                        action='store',
+                        help='User ID that is to log into MySQL. Default: the user who is invoking this script.')
+    parser.add_argument('-p', '--pwd',
+                        action='store_true',
+                        help='Request to be asked for pwd for operating MySQL;\n' +\
+                             '    default: content of scriptInvokingUser$Home/.ssh/mysql')
+    parser.add_argument('-w', '--password',
+                        action='store',
+                        help='User explicitly provided password to log into MySQL.')
+    parser.add_argument('--full',
+                        action='store_true',
+                        help='Rebuild the whole index, rather than adding the latest days.')
+
+    args = parser.parse_args();
+
+    user = args.user if args.user is not None else getpass.getuser()
+    if args.password and args.pwd:
+        raise ValueError('Use either -p, or -w, but not both.')
+    if args.pwd:
+        pwd = getpass.getpass("Enter %s's MySQL password on localhost: " % user)
+    elif args.password:
+        pwd = args.password
+    else:
+        try:
+            with open(os.path.join(os.path.expanduser('~' + user), '.ssh/mysql')) as fd:
+                pwd = fd.readline().strip()
+        except IOError:
+            pwd = ''
+
+    mysqlDb = MySQLDB(user=user, passwd=pwd, db=CourseActivityIndex.DB)
+    try:
+        numDays = CourseActivityIndex(mysqlDb).refresh(full=args.full)
+        print('%s.%s holds %s course days.' % (CourseActivityIndex.DB, CourseActivityIndex.TABLE, numDays))
+    finally:
+        mysqlDb.close()
@@ -0,0 +1,283 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+
+Server-resident catalog of all course_display_names with their
+enrollment counts. Answers MySQL LIKE patterns, such as 'Medicine/%'
+or '%HRP258%', from in-memory indexes, rather than forking
+searchCourseDisplayNames.sh, which runs a GROUP BY over all of
+true_courseenrollment for every lookup.
+
+Two indexes narrow the candidates for a pattern:
+
+   - a sorted list of the (lower-cased) course names, in which
+     bisect finds the range of names that start with the pattern's
+     literal prefix,
+   - a trigram index, mapping each three-character substring to the
+     names that contain it. The literal fragments between wildcards
+     are split into trigrams, and the posting sets are intersected.
+
+The smaller candidate set is then checked against the pattern,
+translated to a regular expression. Like MySQL's default collation,
+matching ignores case.
+
+The catalog is refreshed in a background thread. Each refresh builds
+a complete new index, which then replaces the old one in a single
+assignment, so lookups never see a partially built index.
+
+Names and enrollments come from the process-wide EnrollmentService.
+The set of courses is the same as that of searchCourseDisplayNames.sh:
+courses with more than MIN_ENROLLMENT learners (or any ohsx course),
+which edxprod.isTrueCourseName() accepts, and which pass the
+exclusion patterns of courseNameFilter.py.
+'''
+
+import bisect
+import re
+import threading
+import time
+
+from courseNameFilter import CourseNameFilter
+from enrollmentService import EnrollmentService
+
+
+def likeToRegex(likePattern):
+    '''
+    Translate a MySQL LIKE pattern into an equivalent, compiled,
+    case-insensitive regular expression. '%' matches any sequence
+    of characters, '_' any single character, and a backslash
+    escapes the next character.
+
+    :param likePattern: pattern in MySQL LIKE syntax
+    :type likePattern: String
+    :return: compiled regular expression that matches whole names
+    :rtype: re.RegexObject
+    '''
+    regexParts = []
+    escaped = False
+    for char in likePattern:
+        if escaped:
+            regexParts.append(re.escape(char))
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif char == '%':
+            regexParts.append('.*')
+        elif char == '_':
+            regexParts.append('.')
+        else:
+            regexParts.append(re.escape(char))
+    return re.compile('^' + ''.join(regexParts) + '$', re.IGNORECASE | re.DOTALL)
+
+def likeLiterals(likePattern):
+    '''
+    Return the literal prefix of a LIKE pattern, and the list
+    of literal fragments between its wildcards. Both are lower-cased.
+
+    :param likePattern: pattern in MySQL LIKE syntax
+    :type likePattern: String
+    :return: prefix before the first wildcard, and all literal fragments
+    :rtype: (String, [String])
+    '''
+    fragments = []
+    currFragment = []
+    prefix = None
+    escaped = False
+    for char in likePattern:
+        if escaped:
+            currFragment.append(char)
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif char in '%_':
+            if prefix is None:
+                prefix = ''.join(currFragment)
+            fragments.append(''.join(currFragment))
+            currFragment = []
+        else:
+            currFragment.append(char)
+    fragments.append(''.join(currFragment))
+    if prefix is None:
+        prefix = fragments[0]
+    return (prefix.lower(), [fragment.lower() for fragment in fragments if len(fragment) > 0])
+
+def trigrams(text):
+    return set(text[i:i+3] for i in range(len(text) - 2))
+
+
+class _CatalogIndex(object):
+    '''
+    Immutable snapshot of the catalog with its indexes.
+    '''
+
+    def __init__(self, namesAndEnrollments):
+        entries = sorted((name.lower(), name, enrollment) for (name, enrollment) in namesAndEnrollments)
+        self.lowerNames = [entry[0] for entry in entries]
+        self.names = [entry[1] for entry in entries]
+        self.enrollments = [entry[2] for entry in entries]
+        self.trigramIndex = {}
+        for (nameIndex, lowerName) in enumerate(self.lowerNames):
+            for trigram in trigrams(lowerName):
+                self.trigramIndex.setdefault(trigram, set()).add(nameIndex)
+
+    def candidates(self, likePattern):
+        '''
+        Return the indexes of all names that may match the pattern.
+        '''
+        (prefix, fragments) = likeLiterals(likePattern)
+        # Names that start with the literal prefix form
+        # a contiguous range in the sorted list:
+        start = bisect.bisect_left(self.lowerNames, prefix)
+        if len(prefix) > 0:
+            # First string after all strings with this prefix:
+            nextChar = unichr(ord(prefix[-1]) + 1) if isinstance(prefix, unicode) else chr(min(ord(prefix[-1]) + 1, 255))
+            end = bisect.bisect_left(self.lowerNames, prefix[:-1] + nextChar)
+        else:
+            end = len(self.lowerNames)
+        prefixRange = xrange(start, end)
+
+        patternTrigrams = set()
+        for fragment in fragments:
+            patternTrigrams.update(trigrams(fragment))
+        if len(patternTrigrams) == 0:
+            return prefixRange
+        trigramCandidates = None
+        # Intersect the smallest posting sets first:
+        for trigram in sorted(patternTrigrams, key=lambda tri: len(self.trigramIndex.get(tri, ()))):
+            postings = self.trigramIndex.get(trigram, None)
+            if postings is None:
+                return []
+            trigramCandidates = set(postings) if trigramCandidates is None else trigramCandidates & postings
+            if len(trigramCandidates) == 0:
+                return []
+        if len(trigramCandidates) < len(prefixRange):
+            return sorted(trigramCandidates)
+        return prefixRange
+
+    def match(self, likePattern):
+        regex = likeToRegex(likePattern)
+        return [(self.names[nameIndex], self.enrollments[nameIndex])
+                for nameIndex in self.candidates(likePattern)
+                if regex.match(self.names[nameIndex]) is not None]
+
+
+class CourseCatalog(object):
+    '''
+    Process-wide catalog of course names and enrollments,
+    kept current by a background thread. Obtain the shared
+    instance via getInstance().
+    '''
+
+    # Seconds between refreshes from the database:
+    REFRESH_INTERVAL = 10 * 60
+
+    # Courses must have more than this many learners to be listed
+    # (same as in searchCourseDisplayNames.sh):
+    MIN_ENROLLMENT = 9
+
+    # The shared instance, and the lock that guards its creation:
+    _instance = None
+    _instanceLock = threading.Lock()
+
+    @classmethod
+    def getInstance(cls, mySQLUser, mySQLPwd=None):
+        '''
+        Return the process-wide catalog, creating and loading it,
+        and starting its refresh thread on first call.
+
+        :param mySQLUser: MySQL user for the refresh queries
+        :type mySQLUser: String
+        :param mySQLPwd: MySQL password, or None
+        :type mySQLPwd: {String | None}
+        :rtype: CourseCatalog
+        '''
+        with cls._instanceLock:
+            if cls._instance is None:
+                catalog = CourseCatalog(lambda: cls.loadFromDb(mySQLUser, mySQLPwd))
+                catalog.refresh()
+                catalog.startRefreshThread()
+                cls._instance = catalog
+            return cls._instance
+
+    @classmethod
+    def loadFromDb(cls, mySQLUser, mySQLPwd):
+        '''
+        Obtain all course names with their enrollment from the
+        process-wide enrollment service.
+
+        :return: list of (course_display_name, enrollment)
+        :rtype: [(String, int)]
+        '''
+        return cls.selectCourses(EnrollmentService.getInstance(mySQLUser, mySQLPwd).allEnrollments())
+
+    @classmethod
+    def selectCourses(cls, allEnrollments):
+        '''
+        Pick the courses to list from the enrollments of all courses.
+
+        :param allEnrollments: list of (course_display_name, enrollment, isTrueCourseName)
+        :type allEnrollments: [(String, int, boolean)]
+        :return: list of (course_display_name, enrollment)
+        :rtype: [(String, int)]
+        '''
+        courseNameFilter = CourseNameFilter.getDefault()
+        return [(courseName, enrollment) for (courseName, enrollment, isTrueName) in allEnrollments
+                if (enrollment > cls.MIN_ENROLLMENT or courseName.lower().startswith('ohsx'))
+                   and isTrueName
+                   and not courseNameFilter.isExcluded(courseName)]
+
+    def __init__(self, loadFunc, refreshInterval=None):
+        '''
+        :param loadFunc: function without arguments that returns
+            a list of (course_display_name, enrollment) pairs
+        :type loadFunc: callable
+        :param refreshInterval: seconds between refreshes; default REFRESH_INTERVAL
+        :type refreshInterval: int
+        '''
+        self.loadFunc = loadFunc
+        self.refreshInterval = refreshInterval if refreshInterval is not None else CourseCatalog.REFRESH_INTERVAL
+        self.index = None
+        self.lastRefresh = None
+        self.refreshThread = None
+
+    def refresh(self):
+        '''
+        Reload the catalog, and swap in the new index.
+        '''
+        newIndex = _CatalogIndex(self.loadFunc())
+        self.index = newIndex
+        self.lastRefresh = time.time()
+
+    def isLoaded(self):
+        return self.index is not None
+
+    def match(self, likePattern):
+        '''
+        Return all courses whose name matches the MySQL LIKE pattern.
+
+        :param likePattern: pattern in MySQL LIKE syntax
+        :type likePattern: String
+        :return: list of (course_display_name, enrollment), sorted by name
+        :rtype: [(String, int)]
+        :raise ValueError: if the catalog has never been loaded.
+        '''
+        index = self.index
+        if index is None:
+            raise ValueError('Course catalog is not loaded.')
+        return index.match(likePattern)
+
+    def startRefreshThread(self):
+        self.refreshThread = threading.Thread(target=self._refreshLoop, name='CourseCatalogRefresh')
+        self.refreshThread.daemon = True
+        self.refreshThread.start()
+
+    def _refreshLoop(self):
+        while True:
+            time.sleep(self.refreshInterval)
+            try:
+                self.refresh()
+            except Exception:
+                # Keep serving the previous index; the
+                # next refresh will try again:
+                pass
@@ -0,0 +1,266 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+
+Maintains Misc.CourseEnrollmentSummary, which holds for each
+course its enrollment, its number of awarded certificates, whether
+it is Stanford-internal, and whether its name is a true course name.
+createQuarterlyReport.sh, searchCourseDisplayNames.sh, and the
+EnrollmentService read this table when it exists, instead of
+aggregating edxprod.true_courseenrollment and
+edxprod.certificates_generatedcertificate on every request.
+
+The table is refreshed incrementally: courses with enrollments or
+certificates that were created or modified since the latest ones
+already summarized are recounted from all of their enrollments and
+certificates. Meant to run from cron after each load of the edxprod
+tables.
+
+Enrollments and certificates that are deleted from edxprod leave no
+trace for the incremental refresh to find, so counts only go down
+with a full rebuild (--full). Schedule one weekly, e.g.:
+
+    45 4 * * 1-6 python /home/dataman/Code/open_edx_class_export/src/courseEnrollmentSummary.py -u dataman
+    45 4 * * 0   python /home/dataman/Code/open_edx_class_export/src/courseEnrollmentSummary.py -u dataman --full
+'''
+
+import argparse
+import getpass
+import os
+import sys
+
+from pymysql_utils.pymysql_utils import MySQLDB
+
+
+class CourseEnrollmentSummary(object):
+    '''
+    Creation, refresh, and lookup of the course enrollment summary.
+    '''
+
+    DB = 'Misc'
+    TABLE = 'CourseEnrollmentSummary'
+    ENROLLMENT_TABLE = 'edxprod.true_courseenrollment'
+    CERTIFICATE_TABLE = 'edxprod.certificates_generatedcertificate'
+    COURSE_INFO_TABLE = 'Edx.CourseInfo'
+
+    def __init__(self, mysqlDb, db=None):
+        '''
+        :param mysqlDb: open connection
+        :type mysqlDb: MySQLDB
+        :param db: database that holds the summary; default: CourseEnrollmentSummary.DB
+        :type db: String
+        '''
+        self.mysqlDb = mysqlDb
+        self.db = db if db is not None else CourseEnrollmentSummary.DB
+        self.fullName = '%s.%s' % (self.db, CourseEnrollmentSummary.TABLE)
+
+    def exists(self):
+        '''
+        Return True if the summary table exists.
+        '''
+        try:
+            self.mysqlDb.query("SELECT 1 FROM information_schema.TABLES " +\
+                               "WHERE TABLE_SCHEMA = '%s' AND TABLE_NAME = '%s';" %\
+                               (self.db, CourseEnrollmentSummary.TABLE)).next()
+            return True
+        except StopIteration:
+            return False
+
+    def refresh(self, full=False):
+        '''
+        Bring the summary up to date. If the summary does not
+        exist yet, or full is True, it is rebuilt from scratch.
+        Else only courses with new or modified enrollments or
+        certificates are recounted, from all of their enrollments
+        and certificates.
+
+        :param full: if True, rebuild the whole summary
+        :type full: Boolean
+        :return: number of recounted courses
+        :rtype: int
+        '''
+        if full or not self.exists():
+            self.rebuild()
+            return self.mysqlDb.query('SELECT COUNT(*) FROM %s;' % self.fullName).next()[0]
+        (latestEnrollment, latestCertificate) = self.mysqlDb.query('SELECT MAX(last_enrollment), MAX(last_certificate) ' +\
+                                                                   'FROM %s;' % self.fullName).next()
+        if latestEnrollment is None:
+            self.rebuild()
+            return self.mysqlDb.query('SELECT COUNT(*) FROM %s;' % self.fullName).next()[0]
+        changedCourses = self.changedCourses(latestEnrollment, latestCertificate)
+        if len(changedCourses) > 0:
+            # Courses that no longer have enrollments yield no
+            # row from summarize(), so remove the old ones first:
+            self.mysqlDb.execute('DELETE FROM %s WHERE course_display_name IN (%s);' %\
+                                 (self.fullName, self.courseList(changedCourses)))
+            self.summarize(self.fullName, changedCourses)
+        return len(changedCourses)
+
+    def rebuild(self):
+        '''
+        Build the summary under a scratch name, then atomically
+        rename it into place.
+        '''
+        scratchName = self.fullName + 'New'
+        oldName = self.fullName + 'Old'
+        self.mysqlDb.execute('DROP TABLE IF EXISTS %s;' % scratchName)
+        self.mysqlDb.execute(self.createTableDDL(scratchName))
+        self.summarize(scratchName)
+        if self.exists():
+            self.mysqlDb.execute('DROP TABLE IF EXISTS %s;' % oldName)
+            self.mysqlDb.execute('RENAME TABLE %s TO %s, %s TO %s;' %\
+                                 (self.fullName, oldName, scratchName, self.fullName))
+            self.mysqlDb.execute('DROP TABLE %s;' % oldName)
+        else:
+            self.mysqlDb.execute('RENAME TABLE %s TO %s;' % (scratchName, self.fullName))
+
+    def changedCourses(self, sinceEnrollment, sinceCertificate=None):
+        '''
+        Return the names of courses with enrollments created, or
+        certificates modified at or after the given times.
+
+        :param sinceEnrollment: time of the latest summarized enrollment
+        :type sinceEnrollment: {datetime.datetime | String}
+        :param sinceCertificate: time of the latest summarized certificate;
+            None if no certificate was summarized yet.
+        :type sinceCertificate: {datetime.datetime | String | None}
+        :rtype: [String]
+        '''
+        if sinceCertificate is None:
+            # No summarized course had a certificate at the last
+            # refresh, which happened after sinceEnrollment. So
+            # certificates of summarized courses were all modified
+            # since then:
+            sinceCertificate = sinceEnrollment
+        return [row[0] for row in
+                self.mysqlDb.query('SELECT course_display_name FROM %s ' % CourseEnrollmentSummary.ENROLLMENT_TABLE +\
+                                   "WHERE created >= '%s' " % str(sinceEnrollment) +\
+                                   'UNION ' +\
+                                   'SELECT course_id FROM %s ' % CourseEnrollmentSummary.CERTIFICATE_TABLE +\
+                                   "WHERE modified_date >= '%s';" % str(sinceCertificate))]
+
+    def summarize(self, tableName, courseNames=None):
+        '''
+        Count enrollments and certificates of the given courses
+        into the given table. Courses that are already present
+        are overwritten with the new counts.
+
+        :param tableName: full name of the summary table to fill
+        :type tableName: String
+        :param courseNames: courses to count; None for all courses
+        :type courseNames: {[String] | None}
+        '''
+        if courseNames is None:
+            enrollmentCondition = ''
+            certificateCondition = ''
+        else:
+            courseList = self.courseList(courseNames)
+            enrollmentCondition = 'WHERE course_display_name IN (%s) ' % courseList
+            certificateCondition = 'WHERE course_id IN (%s) ' % courseList
+        self.mysqlDb.execute('INSERT INTO %s (course_display_name, enrollment, num_certs, ' % tableName +\
+                             '                is_internal, is_true_course_name, last_enrollment, last_certificate) ' +\
+                             'SELECT Enrolled.course_display_name, ' +\
+                             '       Enrolled.enrollment, ' +\
+                             '       IF(Certified.num_certs IS NULL, 0, Certified.num_certs), ' +\
+                             '       Internal.is_internal, ' +\
+                             '       edxprod.isTrueCourseName(Enrolled.course_display_name), ' +\
+                             '       Enrolled.last_enrollment, ' +\
+                             '       Certified.last_certificate ' +\
+                             'FROM (SELECT course_display_name, COUNT(user_id) AS enrollment, MAX(created) AS last_enrollment ' +\
+                             '      FROM %s ' % CourseEnrollmentSummary.ENROLLMENT_TABLE +\
+                             enrollmentCondition +\
+                             '      GROUP BY course_display_name ' +\
+                             '     ) AS Enrolled ' +\
+                             'LEFT JOIN ' +\
+                             '     (SELECT course_id, SUM(status = \'downloadable\') AS num_certs, MAX(modified_date) AS last_certificate ' +\
+                             '      FROM %s ' % CourseEnrollmentSummary.CERTIFICATE_TABLE +\
+                             certificateCondition +\
+                             '      GROUP BY course_id ' +\
+                             '     ) AS Certified ' +\
+                             '  ON Certified.course_id = Enrolled.course_display_name ' +\
+                             'LEFT JOIN ' +\
+                             '     (SELECT course_display_name, MAX(is_internal) AS is_internal ' +\
+                             '      FROM %s ' % CourseEnrollmentSummary.COURSE_INFO_TABLE +\
+                             '      GROUP BY course_display_name ' +\
+                             '     ) AS Internal ' +\
+                             '  ON Internal.course_display_name = Enrolled.course_display_name ' +\
+                             'ON DUPLICATE KEY UPDATE enrollment = VALUES(enrollment), ' +\
+                             '                        num_certs = VALUES(num_certs), ' +\
+                             '                        is_internal = VALUES(is_internal), ' +\
+                             '                        is_true_course_name = VALUES(is_true_course_name), ' +\
+                             '                        last_enrollment = VALUES(last_enrollment), ' +\
+                             '                        last_certificate = VALUES(last_certificate);')
+
+    def courseList(self, courseNames):
+        '''
+        Return the course names as a list of SQL string literals.
+
+        :rtype: String
+        '''
+        return ','.join(["'%s'" % courseName.replace("'", "''") for courseName in courseNames])
+
+    def allEnrollments(self):
+        '''
+        Return the enrollment of every summarized course.
+
+        :return: list of (course_display_name, enrollment, isTrueCourseName)
+        :rtype: [(String, int, boolean)]
+        '''
+        return [(courseName, int(enrollment), isTrueName == 1)
+                for (courseName, enrollment, isTrueName) in
+                self.mysqlDb.query('SELECT course_display_name, enrollment, is_true_course_name ' +\
+                                   'FROM %s;' % self.fullName)]
+
+    def createTableDDL(self, tableName):
+        return 'CREATE TABLE %s (' % tableName +\
+               '  course_display_name varchar(255) NOT NULL,' +\
+               '  enrollment int NOT NULL,' +\
+               '  num_certs int NOT NULL,' +\
+               '  is_internal tinyint NULL,' +\
+               '  is_true_course_name tinyint NOT NULL,' +\
+               '  last_enrollment datetime NULL,' +\
+               '  last_certificate datetime NULL,' +\
+               '  PRIMARY KEY (course_display_name)' +\
+               ') ENGINE=InnoDB;'
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(prog=os.path.basename(sys.argv[0]), formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('-u', '--user',
+                        action='store',
+                        help='User ID that is to log into MySQL. Default: the user who is invoking this script.')
+    parser.add_argument('-p', '--pwd',
+                        action='store_true',
+                        help='Request to be asked for pwd for operating MySQL;\n' +\
+                             '    default: content of scriptInvokingUser$Home/.ssh/mysql')
+    parser.add_argument('-w', '--password',
+                        action='store',
+                        help='User explicitly provided password to log into MySQL.')
+    parser.add_argument('--full',
+                        action='store_true',
+                        help='Rebuild the whole summary, rather than recounting changed courses.')
+
+    args = parser.parse_args();
+
+    user = args.user if args.user is not None else getpass.getuser()
+    if args.password and args.pwd:
+        raise ValueError('Use either -p, or -w, but not both.')
+    if args.pwd:
+        pwd = getpass.getpass("Enter %s's MySQL password on localhost: " % user)
+    elif args.password:
+        pwd = args.password
+    else:
+        try:
+            with open(os.path.join(os.path.expanduser('~' + user), '.ssh/mysql')) as fd:
+                pwd = fd.readline().strip()
+        except IOError:
+            pwd = ''
+
+    mysqlDb = MySQLDB(user=user, passwd=pwd, db=CourseEnrollmentSummary.DB)
+    try:
+        numCourses = CourseEnrollmentSummary(mysqlDb).refresh(full=args.full)
+        print('Recounted %s courses in %s.%s.' % (numCourses, CourseEnrollmentSummary.DB, CourseEnrollmentSummary.TABLE))
+    finally:
+        mysqlDb.close()
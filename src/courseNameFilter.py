@@ -0,0 +1,114 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+
+Removes test, demo, and sandbox course names from course lists.
+The exclusion patterns live in the file courseNameExclusions.txt
+next to this module. All patterns are compiled into a single
+regular expression, so each name is examined in one pass,
+no matter how many patterns there are.
+
+From Python:
+
+    if not CourseNameFilter.getDefault().isExcluded(courseName):
+        ...
+
+As a Unix filter, which passes through all stdin lines that
+do not match any exclusion pattern:
+
+    ... | courseNameFilter.py [-c exclusionFile]
+
+scripts/filterCourseNames.sh is a wrapper around this command.
+'''
+
+import argparse
+import os
+import re
+import sys
+import threading
+
+
+class CourseNameFilter(object):
+    '''
+    Compiled set of course name exclusion patterns.
+    '''
+
+    DEFAULT_EXCLUSIONS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'courseNameExclusions.txt')
+
+    # Filter built from the default exclusion file, and
+    # the lock that guards its creation:
+    _default = None
+    _defaultLock = threading.Lock()
+
+    @classmethod
+    def getDefault(cls):
+        '''
+        Return the filter for DEFAULT_EXCLUSIONS_FILE. The
+        file is read only once per process.
+
+        :rtype: CourseNameFilter
+        '''
+        with cls._defaultLock:
+            if cls._default is None:
+                cls._default = CourseNameFilter(CourseNameFilter.DEFAULT_EXCLUSIONS_FILE)
+            return cls._default
+
+    def __init__(self, exclusionsFile):
+        '''
+        :param exclusionsFile: file with one regular expression per line;
+            lines starting with '#', and empty lines are ignored.
+        :type exclusionsFile: String
+        :raise IOError: if the file cannot be read
+        :raise ValueError: if the file contains an invalid pattern
+        '''
+        patterns = []
+        with open(exclusionsFile, 'r') as fd:
+            for line in fd:
+                pattern = line.strip()
+                if len(pattern) == 0 or pattern.startswith('#'):
+                    continue
+                try:
+                    re.compile(pattern)
+                except re.error as e:
+                    raise ValueError("Bad course name exclusion pattern '%s' in %s: %s" % (pattern, exclusionsFile, `e`))
+                patterns.append(pattern)
+        self.patterns = patterns
+        self.exclusionRegex = re.compile('|'.join('(?:%s)' % pattern for pattern in patterns))
+
+    def isExcluded(self, courseNameOrLine):
+        '''
+        Return True if the given course name, or line that
+        contains a course name, matches any exclusion pattern.
+        Matching is case insensitive.
+        '''
+        return self.exclusionRegex.search(courseNameOrLine.lower()) is not None
+
+    def filter(self, courseNamesOrLines):
+        '''
+        Return the elements of the given iterable that
+        do not match any exclusion pattern.
+
+        :param courseNamesOrLines: course names, or lines containing course names
+        :type courseNamesOrLines: iterable
+        :rtype: [String]
+        '''
+        return [courseNameOrLine for courseNameOrLine in courseNamesOrLines
+                if not self.isExcluded(courseNameOrLine)]
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(prog=os.path.basename(sys.argv[0]),
+                                     description='Copy stdin lines that are not test or demo course names to stdout.')
+    parser.add_argument('-c', '--config',
+                        action='store',
+                        default=CourseNameFilter.DEFAULT_EXCLUSIONS_FILE,
+                        help='File with exclusion patterns. Default: %s' % CourseNameFilter.DEFAULT_EXCLUSIONS_FILE)
+    args = parser.parse_args();
+
+    courseNameFilter = CourseNameFilter(args.config)
+    for line in sys.stdin:
+        line = line.strip()
+        if not courseNameFilter.isExcluded(line):
+            sys.stdout.write(line + '\n')
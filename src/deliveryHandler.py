@@ -0,0 +1,314 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+
+Tornado handler that delivers export results to researchers
+from https://<FQDN>:<CourseCSVServer.DELIVERY_PORT>/researcher/<dir>/
+when CourseCSVServer.SERVE_DELIVERIES is set. Unlike tornado.web.StaticFileHandler,
+which reads a whole file into memory and SHA1-hashes it before
+sending, files are streamed in chunks of CHUNK_SIZE bytes. The
+next chunk is only read once the previous one has been written
+to the socket, so memory use is constant regardless of file size.
+
+Supported are HTTP Range requests for a single byte range (206
+responses), If-Range for resuming interrupted downloads, and
+conditional requests via If-None-Match and If-Modified-Since.
+
+ETags are computed without reading file content: if the file's
+directory holds a MANIFEST file in sha1sum format ('<sha1>  <fileName>'
+per line) that lists the file, its checksum is the ETag. Otherwise
+the ETag is made from file size and modification time.
+
+Directories are delivered as a simple HTML listing. Paths with a
+component that starts with '.', such as the delivery storage
+index, are answered with 404. If the handler
+is given a DeliveryStorage, each file download is recorded with it,
+so that least recently downloaded deliveries are evicted first.
+
+If the handler is given credentials, all requests must carry them
+via HTTP Basic authentication, as the client letter instructs
+researchers (see clientInstructions.html).
+'''
+
+import base64
+import cgi
+import datetime
+import email.utils
+import mimetypes
+import os
+import stat
+import urllib
+
+import tornado.web
+
+
+def parseRange(rangeHeader, fileSize):
+    '''
+    Parse the value of an HTTP Range header that asks for
+    a single byte range.
+
+    :param rangeHeader: value of the Range header, e.g. 'bytes=100-199',
+        'bytes=100-', or 'bytes=-500'.
+    :type rangeHeader: String
+    :param fileSize: size of the requested file
+    :type fileSize: int
+    :return: (firstByte, lastByte), both inclusive; None if the header
+        is malformed or asks for several ranges, in which case
+        the whole file is to be delivered.
+    :rtype: {(int, int) | None}
+    :raise ValueError: if the range cannot be satisfied
+    '''
+    rangeHeader = rangeHeader.strip()
+    if not rangeHeader.startswith('bytes=') or ',' in rangeHeader:
+        return None
+    (firstStr, sep, lastStr) = rangeHeader[len('bytes='):].strip().partition('-')
+    if len(sep) == 0:
+        return None
+    try:
+        firstByte = int(firstStr) if len(firstStr) > 0 else None
+        lastByte = int(lastStr) if len(lastStr) > 0 else None
+    except ValueError:
+        return None
+    if firstByte is None:
+        # Suffix range: the last lastByte bytes:
+        if lastByte is None or lastByte == 0 or fileSize == 0:
+            raise ValueError('Empty suffix range %s for file of %s bytes' % (rangeHeader, fileSize))
+        return (max(0, fileSize - lastByte), fileSize - 1)
+    if lastByte is None:
+        lastByte = fileSize - 1
+    elif lastByte < firstByte:
+        return None
+    if firstByte >= fileSize:
+        raise ValueError('Range %s starts beyond end of file of %s bytes' % (rangeHeader, fileSize))
+    return (firstByte, min(lastByte, fileSize - 1))
+
+
+class DeliveryHandler(tornado.web.RequestHandler):
+    '''
+    Streams files below a root directory. Map it into an
+    application with the root as argument:
+
+        (r"/researcher/(.*)", DeliveryHandler, {'root' : '/home/dataman/Data/CustomExcerpts'})
+
+    An optional 'storage' argument is the DeliveryStorage that
+    tracks downloads. An optional 'credentials' argument is a
+    (userName, password) pair that requests must authenticate with.
+    '''
+
+    # Number of bytes read from disk and written to
+    # the socket at a time:
+    CHUNK_SIZE = 256 * 1024
+
+    # Name of the optional checksum file in delivery directories:
+    MANIFEST_NAME = 'MANIFEST'
+
+    # Realm for HTTP Basic authentication:
+    REALM = 'Researcher Deliveries'
+
+    def initialize(self, root, storage=None, credentials=None):
+        self.root = os.path.abspath(root) + os.path.sep
+        self.storage = storage
+        self.credentials = credentials
+        self.fileFd = None
+        self.bytesRemaining = 0
+
+    def prepare(self):
+        if self.credentials is None or self.authenticated():
+            return
+        self.set_status(401)
+        self.set_header('WWW-Authenticate', 'Basic realm="%s"' % DeliveryHandler.REALM)
+        self.finish()
+
+    def authenticated(self):
+        '''
+        Return True if the request's Authorization header
+        holds the handler's credentials.
+        '''
+        authHeader = self.request.headers.get('Authorization', '')
+        if not authHeader.startswith('Basic '):
+            return False
+        try:
+            (userName, sep, password) = base64.b64decode(authHeader[len('Basic '):].strip()).partition(':') #@UnusedVariable
+        except TypeError:
+            # Not base64:
+            return False
+        return (userName, password) == tuple(self.credentials)
+
+    def head(self, path):
+        self.get(path, includeBody=False)
+
+    @tornado.web.asynchronous
+    def get(self, path, includeBody=True):
+        relPath = urllib.unquote(path)
+        if any(component.startswith('.') for component in relPath.split('/')):
+            # Hidden files, e.g. the delivery storage index:
+            raise tornado.web.HTTPError(404)
+        absPath = os.path.abspath(os.path.join(self.root, relPath))
+        # abspath() strips a trailing slash, so requests for
+        # the root itself are compared with the slash added:
+        if not (absPath + os.path.sep).startswith(self.root):
+            raise tornado.web.HTTPError(403, "%s is not in the delivery directory", path)
+        if not os.path.exists(absPath):
+            raise tornado.web.HTTPError(404)
+        if os.path.isdir(absPath):
+            if not self.request.path.endswith('/'):
+                self.redirect(self.request.path + '/')
+                return
+            self.finish(self.directoryListing(absPath))
+            return
+        if not os.path.isfile(absPath):
+            raise tornado.web.HTTPError(403, "%s is not a file", path)
+
+        statResult = os.stat(absPath)
+        fileSize = statResult[stat.ST_SIZE]
+        modified = datetime.datetime.utcfromtimestamp(statResult[stat.ST_MTIME])
+        etag = self.computeFileEtag(absPath, statResult)
+
+        (mimeType, encoding) = mimetypes.guess_type(absPath) #@UnusedVariable
+        self.set_header('Content-Type', mimeType if mimeType is not None else 'application/octet-stream')
+        self.set_header('Last-Modified', modified)
+        self.set_header('Etag', etag)
+        self.set_header('Accept-Ranges', 'bytes')
+
+        if self.notModified(etag, modified):
+            self.set_status(304)
+            self.finish()
+            return
+
+        (firstByte, lastByte) = (0, fileSize - 1)
+        rangeHeader = self.request.headers.get('Range')
+        if rangeHeader is not None and self.rangeStillValid(etag, modified):
+            try:
+                byteRange = parseRange(rangeHeader, fileSize)
+            except ValueError:
+                self.set_status(416)
+                self.set_header('Content-Range', 'bytes */%s' % fileSize)
+                self.finish()
+                return
+            if byteRange is not None:
+                (firstByte, lastByte) = byteRange
+                self.set_status(206)
+                self.set_header('Content-Range', 'bytes %s-%s/%s' % (firstByte, lastByte, fileSize))
+
+        self.bytesRemaining = lastByte - firstByte + 1
+        # Always declare the length, so that Tornado neither
+        # buffers the body to compute it, nor uses chunked
+        # transfer encoding:
+        self.set_header('Content-Length', self.bytesRemaining)
+        if not includeBody or self.bytesRemaining == 0:
+            self.finish()
+            return
+
+        if self.storage is not None:
+            self.storage.recordAccessLater(absPath)
+        self.fileFd = open(absPath, 'rb')
+        self.fileFd.seek(firstByte)
+        self.sendNextChunk()
+
+    def sendNextChunk(self):
+        '''
+        Write the next chunk of the file, and arrange for
+        this method to be called again once the chunk has
+        been written to the socket.
+        '''
+        if self.fileFd is None:
+            # Connection was closed by the client:
+            return
+        chunk = self.fileFd.read(min(DeliveryHandler.CHUNK_SIZE, self.bytesRemaining))
+        self.bytesRemaining -= len(chunk)
+        if len(chunk) == 0 or self.bytesRemaining <= 0:
+            # File done (or truncated while we were sending):
+            self.closeFile()
+            self.finish(chunk)
+            return
+        self.write(chunk)
+        self.flush(callback=self.sendNextChunk)
+
+    def notModified(self, etag, modified):
+        '''
+        Return True if the client's conditional request
+        headers show that its copy is current.
+        '''
+        noneMatch = self.request.headers.get('If-None-Match')
+        if noneMatch is not None:
+            return noneMatch.strip() == '*' or etag in [tag.strip() for tag in noneMatch.split(',')]
+        modifiedSince = self.parseHttpDate(self.request.headers.get('If-Modified-Since'))
+        return modifiedSince is not None and modifiedSince >= modified
+
+    def rangeStillValid(self, etag, modified):
+        '''
+        Return True if a Range request is to be honored:
+        either it has no If-Range header, or the If-Range
+        header shows that the client's partial copy is of
+        the current file.
+        '''
+        ifRange = self.request.headers.get('If-Range')
+        if ifRange is None:
+            return True
+        ifRange = ifRange.strip()
+        if ifRange.startswith('"') or ifRange.startswith('W/'):
+            return ifRange == etag
+        return self.parseHttpDate(ifRange) == modified
+
+    def parseHttpDate(self, httpDate):
+        if httpDate is None:
+            return None
+        dateTuple = email.utils.parsedate(httpDate)
+        if dateTuple is None:
+            return None
+        return datetime.datetime.utcfromtimestamp(email.utils.mktime_tz(dateTuple + (0,)))
+
+    def computeFileEtag(self, absPath, statResult):
+        '''
+        Return the ETag of the given file: its checksum from the
+        directory's MANIFEST file, if there is one, else a
+        tag made from size and modification time.
+        '''
+        checksum = self.manifestChecksum(absPath)
+        if checksum is not None:
+            return '"%s"' % checksum
+        return '"%x-%x"' % (statResult[stat.ST_SIZE], int(statResult[stat.ST_MTIME]))
+
+    def manifestChecksum(self, absPath):
+        '''
+        Return the checksum that the MANIFEST file next to the
+        given file lists for it, or None.
+        '''
+        (dirName, fileName) = os.path.split(absPath)
+        try:
+            with open(os.path.join(dirName, DeliveryHandler.MANIFEST_NAME), 'r') as fd:
+                for line in fd:
+                    # sha1sum marks binary mode with '*' before the name:
+                    (checksum, sep, listedName) = line.strip().partition(' ')
+                    if len(sep) > 0 and listedName.strip().lstrip('*') == fileName:
+                        return checksum
+        except IOError:
+            pass
+        return None
+
+    def directoryListing(self, absPath):
+        '''
+        Return an HTML page that links to the entries of
+        the given directory.
+        '''
+        title = cgi.escape(self.request.path)
+        lines = ['<html><head><title>Index of %s</title></head><body>' % title,
+                 '<h1>Index of %s</h1><ul>' % title]
+        for entry in sorted(os.listdir(absPath)):
+            if entry.startswith('.'):
+                # E.g. the delivery storage index
+                continue
+            if os.path.isdir(os.path.join(absPath, entry)):
+                entry += '/'
+            lines.append('<li><a href="%s">%s</a></li>' % (urllib.quote(entry), cgi.escape(entry)))
+        lines.append('</ul></body></html>')
+        return '\n'.join(lines)
+
+    def closeFile(self):
+        if self.fileFd is not None:
+            self.fileFd.close()
+            self.fileFd = None
+
+    def on_connection_close(self):
+        self.closeFile()
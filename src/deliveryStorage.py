@@ -0,0 +1,413 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+
+Keeps the delivery area (CourseCSVServer.DELIVERY_HOME) within a
+quota. Each top-level delivery directory, such as
+CME_MedStats_2013-2015, or QuarterlyRep_fall2014, is tracked with
+its size and the time of its last download. Directories that have
+not been downloaded for MAX_AGE are expired; beyond that, least
+recently downloaded directories are evicted when space is needed.
+
+Before an export starts, the DataServer reserves the export's
+estimated size via reserve(). The reservation succeeds only if
+the estimate fits both under the quota and into the file system's
+free space, after evicting as needed. Otherwise DeliveryStorageFull
+is raised, and the export is refused before anything is written.
+Reservations are released when the export finishes, and expire
+after RESERVATION_TTL should their job die. While a reservation
+lasts, the directories its export writes to are protected from
+eviction. Exports add each directory to their reservation via
+protect() before writing into it, as wildcard requests do for
+every course.
+
+State is kept in a JSON index in the delivery area, protected by
+the same flock() scheme as the export cache, so that several
+DataServer threads and processes may share it.
+
+From the command line, lists the tracked directories, and with
+--evict removes expired ones, e.g. from cron:
+
+    15 3 * * * python /home/dataman/Code/open_edx_class_export/src/deliveryStorage.py --evict
+'''
+
+import Queue
+import argparse
+import datetime
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+
+# The index file locking of the export cache:
+from exportCache import _LockedIndex
+
+
+class DeliveryStorageFull(Exception):
+    '''
+    Raised when an export's estimated size cannot be
+    accommodated in the delivery area.
+    '''
+    pass
+
+
+class DeliveryStorage(object):
+    '''
+    Quota, retention, and space reservations of the delivery area.
+    '''
+
+    DELIVERY_HOME = '/home/dataman/Data/CustomExcerpts'
+
+    # Maximum number of bytes in all delivery directories,
+    # plus outstanding reservations:
+    QUOTA_BYTES = 500 * 1024 * 1024 * 1024 # 500GB
+
+    # Bytes that must remain free on the file system
+    # after a reservation:
+    MIN_FREE_BYTES = 20 * 1024 * 1024 * 1024 # 20GB
+
+    # Directories not downloaded for this long are removed:
+    MAX_AGE = datetime.timedelta(days=30)
+
+    # Reservations of jobs that died without releasing
+    # them are dropped after this time:
+    RESERVATION_TTL = datetime.timedelta(days=1)
+
+    INDEX_FILE_NAME = '.deliveryIndex.json'
+    LOCK_FILE_NAME  = '.deliveryIndex.lock'
+
+    def __init__(self, deliveryHome=None, quotaBytes=None, minFreeBytes=None, maxAge=None):
+        '''
+        Create an accessor for the delivery area. Accessors
+        are cheap; all state is on disk.
+
+        :param deliveryHome: root of the delivery area; default: DeliveryStorage.DELIVERY_HOME
+        :type deliveryHome: String
+        :param quotaBytes: quota of the delivery area; default: DeliveryStorage.QUOTA_BYTES
+        :type quotaBytes: int
+        :param minFreeBytes: file system space to leave free; default: DeliveryStorage.MIN_FREE_BYTES
+        :type minFreeBytes: int
+        :param maxAge: time without download after which directories expire;
+            default: DeliveryStorage.MAX_AGE
+        :type maxAge: datetime.timedelta
+        '''
+        self.deliveryHome = deliveryHome if deliveryHome is not None else DeliveryStorage.DELIVERY_HOME
+        self.quotaBytes = quotaBytes if quotaBytes is not None else DeliveryStorage.QUOTA_BYTES
+        self.minFreeBytes = minFreeBytes if minFreeBytes is not None else DeliveryStorage.MIN_FREE_BYTES
+        self.maxAge = maxAge if maxAge is not None else DeliveryStorage.MAX_AGE
+        self.indexPath = os.path.join(self.deliveryHome, DeliveryStorage.INDEX_FILE_NAME)
+        self.lockPath  = os.path.join(self.deliveryHome, DeliveryStorage.LOCK_FILE_NAME)
+        # Downloads noted by recordAccessLater(), and the
+        # thread that records them:
+        self.accessQueue = Queue.Queue()
+        self.accessRecorder = None
+        self.accessRecorderLock = threading.Lock()
+
+    def recordAccess(self, dirName):
+        '''
+        Note that the given delivery directory was just
+        created, or downloaded from.
+
+        :param dirName: name of a top-level delivery directory,
+            or a path within the delivery area
+        :type dirName: String
+        '''
+        dirName = self.topLevelDir(dirName)
+        if dirName is None:
+            return
+        with self._lockedIndex() as index:
+            entry = index['dirs'].setdefault(dirName, {'size' : 0, 'lastAccess' : 0})
+            entry['lastAccess'] = time.time()
+
+    def recordAccessLater(self, dirName):
+        '''
+        Like recordAccess(), but returns right away. The access is
+        recorded by a worker thread, so that callers on the Tornado
+        IOLoop do not wait for the index lock, which reserve()
+        holds while it measures the delivery area.
+
+        :param dirName: name of a top-level delivery directory,
+            or a path within the delivery area
+        :type dirName: String
+        '''
+        dirName = self.topLevelDir(dirName)
+        if dirName is None:
+            return
+        with self.accessRecorderLock:
+            if self.accessRecorder is None:
+                self.accessRecorder = threading.Thread(target=self._recordAccesses, name='DeliveryAccessRecorder')
+                self.accessRecorder.daemon = True
+                self.accessRecorder.start()
+        self.accessQueue.put(dirName)
+
+    def reserve(self, estimatedBytes, dirName=None):
+        '''
+        Reserve space for an export. Expired directories are
+        removed first; if the estimate still does not fit,
+        least recently downloaded directories are evicted.
+        If the estimate would not fit even after evicting all
+        unprotected directories, nothing is removed.
+
+        :param estimatedBytes: estimated size of the export's results
+        :type estimatedBytes: int
+        :param dirName: delivery directory that the export writes to;
+            it is protected from eviction while the reservation lasts.
+        :type dirName: {String | None}
+        :return: reservation ID for release()
+        :rtype: String
+        :raise DeliveryStorageFull: if the estimate cannot be accommodated
+        '''
+        dirName = self.topLevelDir(dirName) if dirName is not None else None
+        with self._lockedIndex() as index:
+            self._measure(index)
+            self._dropStaleReservations(index)
+            protectedDirs = self._reservedDirs(index)
+            if dirName is not None:
+                protectedDirs.add(dirName)
+            evictableBytes = sum(entry['size'] for (name, entry) in index['dirs'].items() if name not in protectedDirs)
+            if estimatedBytes > self._available(index) + evictableBytes:
+                raise DeliveryStorageFull('Export needs about %s, but only %s are available in %s.' %\
+                                          (self.humanReadable(estimatedBytes),
+                                           self.humanReadable(self._available(index) + evictableBytes),
+                                           self.deliveryHome))
+            self._evictExpired(index, protectedDirs)
+            byLastAccess = sorted([name for name in index['dirs'].keys() if name not in protectedDirs],
+                                  key=lambda name: index['dirs'][name]['lastAccess'])
+            while not self._fits(index, estimatedBytes) and len(byLastAccess) > 0:
+                self._removeDir(index, byLastAccess.pop(0))
+            if not self._fits(index, estimatedBytes):
+                # Other processes wrote to the file system meanwhile:
+                raise DeliveryStorageFull('Export needs about %s, but only %s are available in %s.' %\
+                                          (self.humanReadable(estimatedBytes),
+                                           self.humanReadable(self._available(index)),
+                                           self.deliveryHome))
+            reservationId = uuid.uuid4().hex
+            index['reservations'][reservationId] = {'bytes'   : estimatedBytes,
+                                                    'dirs'    : [dirName] if dirName is not None else [],
+                                                    'created' : time.time()}
+            return reservationId
+
+    def protect(self, reservationId, dirName):
+        '''
+        Protect one more delivery directory from eviction while
+        the given reservation lasts, and note it as accessed now.
+        The directory need not exist yet. Without a reservation,
+        only the access is noted.
+
+        :param reservationId: reservation of the export that writes to the directory, or None
+        :type reservationId: {String | None}
+        :param dirName: name of a top-level delivery directory,
+            or a path within the delivery area
+        :type dirName: String
+        '''
+        dirName = self.topLevelDir(dirName)
+        if dirName is None:
+            return
+        with self._lockedIndex() as index:
+            reservation = index['reservations'].get(reservationId, None) if reservationId is not None else None
+            if reservation is not None and dirName not in reservation['dirs']:
+                reservation['dirs'].append(dirName)
+            entry = index['dirs'].setdefault(dirName, {'size' : 0, 'lastAccess' : 0})
+            entry['lastAccess'] = time.time()
+
+    def release(self, reservationId):
+        '''
+        Release a reservation, and take note of the
+        actual sizes of its directories.
+        '''
+        with self._lockedIndex() as index:
+            reservation = index['reservations'].pop(reservationId, None)
+            if reservation is None:
+                return
+            for dirName in reservation['dirs']:
+                entry = index['dirs'].setdefault(dirName, {'size' : 0, 'lastAccess' : time.time()})
+                entry['size'] = self.dirSize(os.path.join(self.deliveryHome, dirName))
+
+    def evictExpired(self):
+        '''
+        Remove directories that were not downloaded for MAX_AGE.
+
+        :return: names of the removed directories
+        :rtype: [String]
+        '''
+        with self._lockedIndex() as index:
+            self._measure(index)
+            self._dropStaleReservations(index)
+            return self._evictExpired(index, self._reservedDirs(index))
+
+    def usage(self):
+        '''
+        Return the tracked directories with size and time of
+        last access, and the total of outstanding reservations.
+
+        :return: ({dirName : {'size' : int, 'lastAccess' : float}}, reservedBytes)
+        :rtype: (dict, int)
+        '''
+        with self._lockedIndex() as index:
+            self._measure(index)
+            self._dropStaleReservations(index)
+            return (dict(index['dirs']), sum(reservation['bytes'] for reservation in index['reservations'].values()))
+
+    def topLevelDir(self, dirNameOrPath):
+        '''
+        Return the name of the top-level delivery directory that
+        holds the given path, or None if the path is outside the
+        delivery area. Plain directory names are returned as is.
+        '''
+        if not os.path.isabs(dirNameOrPath):
+            return dirNameOrPath.strip('/').split('/')[0]
+        relPath = os.path.relpath(os.path.abspath(dirNameOrPath), self.deliveryHome)
+        if relPath == '.' or relPath.startswith('..'):
+            return None
+        return relPath.split(os.path.sep)[0]
+
+    def dirSize(self, dirPath):
+        totalSize = 0
+        for (dirPath, subDirs, fileNames) in os.walk(dirPath): #@UnusedVariable
+            for fileName in fileNames:
+                try:
+                    totalSize += os.lstat(os.path.join(dirPath, fileName)).st_size
+                except OSError:
+                    # Removed while we walked:
+                    pass
+        return totalSize
+
+    def freeBytes(self):
+        '''
+        Return the number of bytes that unprivileged
+        processes may still write to the delivery file system.
+        '''
+        fsStats = os.statvfs(self.deliveryHome)
+        return fsStats.f_bavail * fsStats.f_frsize
+
+    def humanReadable(self, numBytes):
+        for unit in ['bytes', 'KB', 'MB', 'GB']:
+            if abs(numBytes) < 1024:
+                return '%.1f%s' % (numBytes, unit) if unit != 'bytes' else '%d%s' % (numBytes, unit)
+            numBytes /= 1024.0
+        return '%.1fTB' % numBytes
+
+    # ----------------------------  Private Methods  ---------------------
+
+    def _measure(self, index):
+        '''
+        Bring the index's directory list and sizes up to date with
+        the delivery area. Directories that are new to the index, such
+        as those that predate the index, count as accessed now, so that
+        they are not all expired at once. Caller holds the index lock.
+        '''
+        currentDirs = set([name for name in os.listdir(self.deliveryHome)
+                           if not name.startswith('.') and os.path.isdir(os.path.join(self.deliveryHome, name))])
+        for name in index['dirs'].keys():
+            if name not in currentDirs:
+                del index['dirs'][name]
+        for name in currentDirs:
+            dirPath = os.path.join(self.deliveryHome, name)
+            entry = index['dirs'].setdefault(name, {'size' : 0, 'lastAccess' : time.time()})
+            entry['size'] = self.dirSize(dirPath)
+
+    def _recordAccesses(self):
+        '''
+        Worker thread of recordAccessLater(). Accesses that queued
+        up while the index was locked are recorded once per directory.
+        '''
+        while True:
+            dirNames = [self.accessQueue.get()]
+            try:
+                while True:
+                    dirNames.append(self.accessQueue.get_nowait())
+            except Queue.Empty:
+                pass
+            try:
+                with self._lockedIndex() as index:
+                    for dirName in set(dirNames):
+                        entry = index['dirs'].setdefault(dirName, {'size' : 0, 'lastAccess' : 0})
+                        entry['lastAccess'] = time.time()
+            except Exception as e:
+                logging.error('Could not record delivery downloads of %s: %s' % (', '.join(set(dirNames)), `e`))
+            finally:
+                for dirName in dirNames: #@UnusedVariable
+                    self.accessQueue.task_done()
+
+    def _dropStaleReservations(self, index):
+        oldest = time.time() - self._secs(DeliveryStorage.RESERVATION_TTL)
+        for (reservationId, reservation) in index['reservations'].items():
+            if reservation['created'] < oldest:
+                del index['reservations'][reservationId]
+
+    def _reservedDirs(self, index):
+        return set([dirName for reservation in index['reservations'].values()
+                    for dirName in reservation['dirs']])
+
+    def _evictExpired(self, index, protectedDirs):
+        oldest = time.time() - self._secs(self.maxAge)
+        expiredDirs = [name for (name, entry) in index['dirs'].items()
+                       if entry['lastAccess'] < oldest and name not in protectedDirs]
+        for name in expiredDirs:
+            self._removeDir(index, name)
+        return expiredDirs
+
+    def _available(self, index):
+        '''
+        Return the number of bytes that a new reservation may claim.
+        '''
+        reservedBytes = sum(reservation['bytes'] for reservation in index['reservations'].values())
+        usedBytes = sum(entry['size'] for entry in index['dirs'].values())
+        return min(self.quotaBytes - usedBytes - reservedBytes,
+                   self.freeBytes() - self.minFreeBytes - reservedBytes)
+
+    def _fits(self, index, estimatedBytes):
+        return estimatedBytes <= self._available(index)
+
+    def _removeDir(self, index, name):
+        shutil.rmtree(os.path.join(self.deliveryHome, name), ignore_errors=True)
+        index['dirs'].pop(name, None)
+
+    def _secs(self, timeDelta):
+        return timeDelta.days * 86400 + timeDelta.seconds
+
+    def _lockedIndex(self):
+        return _DeliveryIndex(self.indexPath, self.lockPath)
+
+
+class _DeliveryIndex(_LockedIndex):
+    '''
+    Locked index whose dict always has 'dirs' and 'reservations'.
+    '''
+
+    def __enter__(self):
+        index = super(_DeliveryIndex, self).__enter__()
+        index.setdefault('dirs', {})
+        index.setdefault('reservations', {})
+        return index
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(prog=os.path.basename(sys.argv[0]),
+                                     description='Show, or expire researcher deliveries.')
+    parser.add_argument('-d', '--deliveryHome',
+                        action='store',
+                        default=DeliveryStorage.DELIVERY_HOME,
+                        help='Root of the delivery area. Default: %s' % DeliveryStorage.DELIVERY_HOME)
+    parser.add_argument('--evict',
+                        action='store_true',
+                        help='Remove deliveries that were not downloaded for %s days.' % DeliveryStorage.MAX_AGE.days)
+    args = parser.parse_args();
+
+    storage = DeliveryStorage(args.deliveryHome)
+    if args.evict:
+        for dirName in storage.evictExpired():
+            print('Removed %s' % dirName)
+    (dirs, reservedBytes) = storage.usage()
+    for (dirName, entry) in sorted(dirs.items(), key=lambda item: item[1]['lastAccess']):
+        print('%10s  %s  %s' % (storage.humanReadable(entry['size']),
+                                time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['lastAccess'])),
+                                dirName))
+    print('Total: %s; reserved: %s; quota: %s' % (storage.humanReadable(sum(entry['size'] for entry in dirs.values())),
+                                                  storage.humanReadable(reservedBytes),
+                                                  storage.humanReadable(storage.quotaBytes)))
@@ -0,0 +1,244 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+
+Direct download of small exports. Instead of writing a result
+into DELIVERY_HOME via INTO OUTFILE, re-reading it for line counts
+and samples, and having the researcher fetch it separately, the
+exporting DataServer registers the export's query under a one-time
+token, and sends the browser a download link:
+
+    https://<FQDN>:8080/download/<token>
+
+When the link is fetched, DirectDownloadHandler runs the query on
+a connection of its own in a worker thread. Rows are CSV encoded,
+gzip compressed if the browser accepts that, and streamed to the
+browser as an HTTP chunked response. At most one chunk is queued
+for the socket at any time, so memory use is bounded by the chunk
+size. Nothing is written to disk.
+
+Exports that exceed CourseCSVServer.DIRECT_DOWNLOAD_MAX_ROWS are
+staged for pickup as before (see DataServer.offerDirectDownloads()).
+'''
+
+import csv
+import cStringIO
+import functools
+import logging
+import threading
+import time
+import uuid
+import zlib
+
+import tornado.web
+
+from pymysql_utils.pymysql_utils import MySQLDB
+
+
+class DirectDownload(object):
+    '''
+    One registered export: the query that produces its rows,
+    and what is needed to run it.
+    '''
+
+    def __init__(self, fileName, query, mySQLUser, mySQLPwd=None, header=None, db='Edx'):
+        '''
+        :param fileName: name under which the browser is to save the result
+        :type fileName: String
+        :param query: SELECT statement that produces the rows
+        :type query: String
+        :param mySQLUser: MySQL user for running the query
+        :type mySQLUser: String
+        :param mySQLPwd: MySQL password, or None
+        :type mySQLPwd: {String | None}
+        :param header: column names for a header row, or None for no header
+        :type header: {[String] | None}
+        :param db: default database of the query's connection
+        :type db: String
+        '''
+        self.fileName = fileName
+        self.query = query
+        self.mySQLUser = mySQLUser
+        self.mySQLPwd = mySQLPwd
+        self.header = header
+        self.db = db
+        self.created = time.time()
+
+    def rows(self):
+        '''
+        Run the query on a new connection, and yield its rows.
+        '''
+        if self.mySQLPwd is None:
+            mysqlDb = MySQLDB(user=self.mySQLUser, db=self.db)
+        else:
+            mysqlDb = MySQLDB(user=self.mySQLUser, passwd=self.mySQLPwd, db=self.db)
+        try:
+            for row in mysqlDb.query(self.query):
+                yield row
+        finally:
+            mysqlDb.close()
+
+
+class DirectDownloadRegistry(object):
+    '''
+    Pending direct downloads by token. Tokens are good for a single
+    fetch, and expire TTL seconds after registration.
+    '''
+
+    TTL = 15 * 60
+
+    # The shared instance, and the lock that guards its creation:
+    _instance = None
+    _instanceLock = threading.Lock()
+
+    @classmethod
+    def getInstance(cls):
+        with cls._instanceLock:
+            if cls._instance is None:
+                cls._instance = DirectDownloadRegistry()
+            return cls._instance
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl if ttl is not None else DirectDownloadRegistry.TTL
+        self.downloads = {}
+        self.lock = threading.Lock()
+
+    def register(self, download):
+        '''
+        Register a download, and return its token.
+
+        :param download: the export to offer
+        :type download: DirectDownload
+        :rtype: String
+        '''
+        token = uuid.uuid4().hex
+        with self.lock:
+            self.removeExpired()
+            self.downloads[token] = download
+        return token
+
+    def claim(self, token):
+        '''
+        Return the download registered under the given token,
+        and invalidate the token.
+
+        :return: the download, or None if the token is unknown or expired
+        :rtype: {DirectDownload | None}
+        '''
+        with self.lock:
+            self.removeExpired()
+            return self.downloads.pop(token, None)
+
+    def removeExpired(self):
+        # Caller holds self.lock
+        now = time.time()
+        for token in [token for (token, download) in self.downloads.items() if now - download.created > self.ttl]:
+            del self.downloads[token]
+
+
+class DirectDownloadHandler(tornado.web.RequestHandler):
+    '''
+    Streams registered downloads. Map it into an application as:
+
+        (r"/download/(.*)", DirectDownloadHandler)
+    '''
+
+    # Approximate number of CSV bytes per chunk:
+    CHUNK_SIZE = 64 * 1024
+
+    def initialize(self, registry=None):
+        self.registry = registry if registry is not None else DirectDownloadRegistry.getInstance()
+        self.ioLoop = None
+        self.compressor = None
+        self.cancelled = False
+        # Held by the worker thread from handing a chunk to the
+        # IOLoop until the chunk was written to the socket:
+        self.chunkSlot = threading.Semaphore(1)
+
+    @tornado.web.asynchronous
+    def get(self, token):
+        download = self.registry.claim(token)
+        if download is None:
+            raise tornado.web.HTTPError(404, "Download %s is unknown, expired, or was already fetched", token)
+        # The loop that serves this request's connection; the worker
+        # thread hands chunks to it via its thread-safe add_callback():
+        self.ioLoop = self.request.connection.stream.io_loop
+        self.set_header('Content-Type', 'text/csv')
+        self.set_header('Content-Disposition', 'attachment; filename="%s"' % download.fileName)
+        if 'gzip' in self.request.headers.get('Accept-Encoding', ''):
+            self.set_header('Content-Encoding', 'gzip')
+            self.compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        worker = threading.Thread(target=self.produce, args=(download,), name='DirectDownload')
+        worker.daemon = True
+        worker.start()
+
+    def produce(self, download):
+        '''
+        Worker thread: encode the download's rows, and hand
+        them to the IOLoop chunk by chunk.
+        '''
+        try:
+            csvBuf = cStringIO.StringIO()
+            csvWriter = csv.writer(csvBuf, lineterminator='\n')
+            if download.header is not None:
+                csvWriter.writerow(download.header)
+            for row in download.rows():
+                csvWriter.writerow(row)
+                if csvBuf.tell() >= DirectDownloadHandler.CHUNK_SIZE:
+                    if not self.handOver(csvBuf.getvalue()):
+                        return
+                    csvBuf = cStringIO.StringIO()
+                    csvWriter = csv.writer(csvBuf, lineterminator='\n')
+            if self.handOver(csvBuf.getvalue(), final=True):
+                self.ioLoop.add_callback(self.finishDownload)
+        except Exception as e:
+            logging.error('Direct download of %s failed: %s' % (download.fileName, `e`))
+            self.ioLoop.add_callback(self.abortDownload)
+
+    def handOver(self, data, final=False):
+        '''
+        Compress data if requested, wait until the previous chunk
+        was written, and schedule data to be written.
+
+        :return: False if the browser has gone away
+        :rtype: Boolean
+        '''
+        if self.compressor is not None:
+            data = self.compressor.compress(data)
+            if final:
+                data += self.compressor.flush()
+        self.chunkSlot.acquire()
+        if self.cancelled:
+            return False
+        self.ioLoop.add_callback(functools.partial(self.writeChunk, data))
+        return True
+
+    def writeChunk(self, data):
+        if self.cancelled:
+            return
+        if len(data) == 0:
+            self.chunkSlot.release()
+            return
+        self.write(data)
+        self.flush(callback=self.chunkSlot.release)
+
+    def finishDownload(self):
+        if not self.cancelled:
+            self.finish()
+
+    def abortDownload(self):
+        if self.cancelled:
+            return
+        if not self._headers_written:
+            self.send_error(500)
+        else:
+            # Headers are out; closing the connection before
+            # the terminating chunk tells the browser that the
+            # download is incomplete:
+            self.request.connection.stream.close()
+
+    def on_connection_close(self):
+        self.cancelled = True
+        # Unblock the worker, so that it notices:
+        self.chunkSlot.release()
@@ -0,0 +1,146 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+
+Cache of EngagementComputer results. Computing engagement
+replays all of a course's events, yet the result only changes
+when EventXtract changes. Both the per-course engagement export
+of exportClass.py, and the quarterly report's engagement
+summaries therefore consult this cache before constructing
+an EngagementComputer.
+
+An entry is the triple of files that EngagementComputer.writeResultsToDisk()
+produces: summary, detail (allData), and weeklyEffort. Entries are
+keyed by course, the videoOnly flag, the course start years setting,
+and the watermark of Edx.EventXtract (see exportCache.getTableWatermark()).
+The files are kept in an ExportCache of their own, which evicts
+least recently used files when the cache exceeds its size bound.
+'''
+
+import os
+import tempfile
+
+from exportCache import ExportCache, getTableWatermark
+
+
+class EngagementCache(object):
+    '''
+    Stores and retrieves the three result files of
+    engagement computations.
+    '''
+
+    CACHE_HOME = '/home/dataman/Data/EngagementCache'
+
+    MAX_CACHE_BYTES = 20 * 1024 * 1024 * 1024 # 20GB
+
+    # The three files of one engagement result, in the
+    # order returned by EngagementComputer.writeResultsToDisk():
+    PARTS = ('summary', 'detail', 'weeklyEffort')
+
+    def __init__(self, cacheHome=None, maxBytes=None):
+        '''
+        :param cacheHome: root directory of the cache; default: EngagementCache.CACHE_HOME
+        :type cacheHome: String
+        :param maxBytes: maximum total size of cached files; default: EngagementCache.MAX_CACHE_BYTES
+        :type maxBytes: int
+        '''
+        self.exportCache = ExportCache(cacheHome if cacheHome is not None else EngagementCache.CACHE_HOME,
+                                       maxBytes if maxBytes is not None else EngagementCache.MAX_CACHE_BYTES)
+
+    @staticmethod
+    def getWatermark(mysqlDb):
+        '''
+        Return the current watermark of the event table
+        from which engagement is computed.
+
+        :param mysqlDb: open MySQLDB instance
+        :type mysqlDb: MySQLDB
+        :rtype: {String | None}
+        '''
+        return getTableWatermark(mysqlDb, 'Edx', 'EventXtract')
+
+    @staticmethod
+    def makeKey(courseName, videoOnly, startYearsArr, watermark):
+        '''
+        Compute the key of one engagement result.
+
+        :param courseName: course whose engagement is computed
+        :type courseName: String
+        :param videoOnly: whether only video events were considered
+        :type videoOnly: boolean
+        :param startYearsArr: the EngagementComputer's coursesStartYearsArr, or None
+        :type startYearsArr: {[int] | None}
+        :param watermark: EventXtract watermark as returned by getWatermark()
+        :type watermark: {String | None}
+        :return: the key, or None if there is no watermark, in which
+            case lookup() misses, and store() does nothing.
+        :rtype: {String | None}
+        '''
+        if watermark is None:
+            return None
+        return ExportCache.makeKey(kind='engagement',
+                                   course=courseName,
+                                   videoOnly=bool(videoOnly),
+                                   startYears=sorted(startYearsArr) if startYearsArr is not None else None,
+                                   watermark=watermark)
+
+    def lookup(self, key):
+        '''
+        Return copies of the cached result files for the given
+        key in new temp files, or None if the result is not cached,
+        or only partially cached. Each temp file name ends with the
+        name of the file as EngagementComputer originally wrote it,
+        e.g. /tmp/tmpAb3_engagement_CME_MedStats_2013-2015_summary.csv.
+        Callers own the temp files.
+
+        :param key: key as returned by makeKey()
+        :type key: String
+        :return: paths of summary, detail, and weeklyEffort files, or None
+        :rtype: {(String, String, String) | None}
+        '''
+        if key is None:
+            return None
+        entries = []
+        for part in EngagementCache.PARTS:
+            entry = self.exportCache.lookup(self._partKey(key, part))
+            if entry is None:
+                return None
+            entries.append(entry)
+        resultFiles = []
+        for (part, entry) in zip(EngagementCache.PARTS, entries):
+            (fd, resultFile) = tempfile.mkstemp(suffix='_' + entry['meta'].get('fileName', part + '.csv'))
+            os.close(fd)
+            if self.exportCache.deliver(self._partKey(key, part), resultFile) is None:
+                # Evicted since the lookup above:
+                for staleFile in resultFiles + [resultFile]:
+                    os.remove(staleFile)
+                return None
+            resultFiles.append(resultFile)
+        return tuple(resultFiles)
+
+    def store(self, key, summaryFile, detailFile, weeklyEffortFile):
+        '''
+        Cache the result files of one engagement computation.
+        The files themselves remain untouched.
+
+        :param key: key as returned by makeKey()
+        :type key: String
+        :param summaryFile: path of the summary file
+        :type summaryFile: String
+        :param detailFile: path of the detail (allData) file
+        :type detailFile: String
+        :param weeklyEffortFile: path of the weeklyEffort file
+        :type weeklyEffortFile: String
+        '''
+        if key is None:
+            return
+        for (part, resultFile) in zip(EngagementCache.PARTS, (summaryFile, detailFile, weeklyEffortFile)):
+            # Remember the name without the temp file prefix,
+            # i.e. starting with 'engagement_':
+            fileName = os.path.basename(resultFile)
+            fileName = fileName[fileName.find('engagement'):] if 'engagement' in fileName else fileName
+            self.exportCache.store(self._partKey(key, part), resultFile, meta={'fileName' : fileName})
+
+    def _partKey(self, key, part):
+        return ExportCache.makeKey(engagementKey=key, part=part)
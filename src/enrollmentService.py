@@ -0,0 +1,204 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+
+Process-wide, in-memory table of the enrollment of every course.
+All enrollments are loaded from Misc.CourseEnrollmentSummary
+(see courseEnrollmentSummary.py) if that table exists, else with
+one grouped query over edxprod.true_courseenrollment, instead of running
+createQuarterlyReport.sh, or a query, for each course whose
+enrollment is needed.
+
+A background thread reloads the table every REFRESH_INTERVAL
+seconds. Should the table nevertheless be older than its TTL when
+it is read (e.g. because the database was unreachable during
+refreshes), it is reloaded before the read is answered.
+
+Users are QuarterlyReportExporter.getEnrollment(), and the course
+catalog (courseCatalog.py), which lists course names with their
+enrollment for the reqCourseNames requests of the browser.
+'''
+
+import threading
+import time
+
+from pymysql_utils.pymysql_utils import MySQLDB
+
+from courseEnrollmentSummary import CourseEnrollmentSummary
+
+
+class EnrollmentService(object):
+    '''
+    Enrollment of all courses, kept current by a background
+    thread. Obtain the shared instance via getInstance().
+    '''
+
+    # Seconds between background reloads:
+    REFRESH_INTERVAL = 10 * 60
+
+    # Maximum age in seconds of the enrollments that
+    # are handed out:
+    TTL = 30 * 60
+
+    # The shared instance, and the lock that guards its creation:
+    _instance = None
+    _instanceLock = threading.Lock()
+
+    @classmethod
+    def getInstance(cls, mySQLUser, mySQLPwd=None):
+        '''
+        Return the process-wide service, creating and loading it,
+        and starting its refresh thread on first call.
+
+        :param mySQLUser: MySQL user for the enrollment queries
+        :type mySQLUser: String
+        :param mySQLPwd: MySQL password, or None
+        :type mySQLPwd: {String | None}
+        :rtype: EnrollmentService
+        '''
+        with cls._instanceLock:
+            if cls._instance is None:
+                service = EnrollmentService(lambda: cls.loadFromDb(mySQLUser, mySQLPwd))
+                service.refresh()
+                service.startRefreshThread()
+                cls._instance = service
+            return cls._instance
+
+    @classmethod
+    def loadFromDb(cls, mySQLUser, mySQLPwd):
+        '''
+        Open a connection, and query the enrollment of all courses,
+        preferably from the course enrollment summary table.
+
+        :return: list of (course_display_name, enrollment, isTrueCourseName)
+        :rtype: [(String, int, boolean)]
+        '''
+        if mySQLPwd is None:
+            mysqlDb = MySQLDB(user=mySQLUser, db='edxprod')
+        else:
+            mysqlDb = MySQLDB(user=mySQLUser, passwd=mySQLPwd, db='edxprod')
+        try:
+            summary = CourseEnrollmentSummary(mysqlDb)
+            if summary.exists():
+                return summary.allEnrollments()
+            return cls.queryEnrollments(mysqlDb)
+        finally:
+            mysqlDb.close()
+
+    @staticmethod
+    def queryEnrollments(mysqlDb, db='edxprod', checkTrueCourseName=True):
+        '''
+        Query the enrollment of all courses over the given connection.
+
+        :param mysqlDb: open connection
+        :type mysqlDb: MySQLDB
+        :param db: database that holds true_courseenrollment
+        :type db: String
+        :param checkTrueCourseName: if True, have edxprod.isTrueCourseName()
+            judge each course name. Else all names count as true names.
+        :type checkTrueCourseName: boolean
+        :return: list of (course_display_name, enrollment, isTrueCourseName)
+        :rtype: [(String, int, boolean)]
+        '''
+        trueNameCol = "edxprod.isTrueCourseName(course_display_name)" if checkTrueCourseName else "1"
+        query = "SELECT course_display_name, COUNT(user_id), %s " % trueNameCol +\
+                "FROM %s.true_courseenrollment " % db +\
+                "GROUP BY course_display_name;"
+        return [(courseName, int(enrollment), isTrueName == 1)
+                for (courseName, enrollment, isTrueName) in mysqlDb.query(query)]
+
+    def __init__(self, loadFunc, refreshInterval=None, ttl=None):
+        '''
+        :param loadFunc: function without arguments that returns a list
+            of (course_display_name, enrollment, isTrueCourseName) triples
+        :type loadFunc: callable
+        :param refreshInterval: seconds between background reloads; default REFRESH_INTERVAL
+        :type refreshInterval: int
+        :param ttl: maximum age of handed out enrollments in seconds; default TTL
+        :type ttl: int
+        '''
+        self.loadFunc = loadFunc
+        self.refreshInterval = refreshInterval if refreshInterval is not None else EnrollmentService.REFRESH_INTERVAL
+        self.ttl = ttl if ttl is not None else EnrollmentService.TTL
+        # Pair of the enrollment dict, and the set of true
+        # course names. Replaced as a whole by each refresh:
+        self.snapshot = None
+        self.lastRefresh = None
+        self.refreshLock = threading.Lock()
+        self.refreshThread = None
+
+    def refresh(self):
+        '''
+        Reload all enrollments, and swap in the new table.
+        '''
+        with self.refreshLock:
+            enrollments = {}
+            trueCourseNames = set()
+            for (courseName, enrollment, isTrueName) in self.loadFunc():
+                enrollments[courseName] = enrollment
+                if isTrueName:
+                    trueCourseNames.add(courseName)
+            self.snapshot = (enrollments, trueCourseNames)
+            self.lastRefresh = time.time()
+
+    def getEnrollment(self, courseName):
+        '''
+        Return the enrollment of one course.
+
+        :param courseName: exact course_display_name
+        :type courseName: String
+        :return: number of learners, or None if the course has none.
+        :rtype: {int | None}
+        '''
+        (enrollments, trueCourseNames) = self.currentSnapshot() #@UnusedVariable
+        return enrollments.get(courseName, None)
+
+    def getEnrollments(self, courseNames):
+        '''
+        Return the enrollments of the given courses.
+
+        :param courseNames: exact course_display_names
+        :type courseNames: [String]
+        :return: dict mapping course names to enrollment;
+            courses without learners are absent.
+        :rtype: {String : int}
+        '''
+        (enrollments, trueCourseNames) = self.currentSnapshot() #@UnusedVariable
+        return dict([(courseName, enrollments[courseName]) for courseName in courseNames if courseName in enrollments])
+
+    def allEnrollments(self):
+        '''
+        Return the enrollment of every course.
+
+        :return: list of (course_display_name, enrollment, isTrueCourseName)
+        :rtype: [(String, int, boolean)]
+        '''
+        (enrollments, trueCourseNames) = self.currentSnapshot()
+        return [(courseName, enrollment, courseName in trueCourseNames)
+                for (courseName, enrollment) in enrollments.items()]
+
+    def currentSnapshot(self):
+        '''
+        Return the enrollment dict and the set of true course
+        names, reloading them first if they are older than the TTL.
+        '''
+        if self.snapshot is None or time.time() - self.lastRefresh > self.ttl:
+            self.refresh()
+        return self.snapshot
+
+    def startRefreshThread(self):
+        self.refreshThread = threading.Thread(target=self._refreshLoop, name='EnrollmentRefresh')
+        self.refreshThread.daemon = True
+        self.refreshThread.start()
+
+    def _refreshLoop(self):
+        while True:
+            time.sleep(self.refreshInterval)
+            try:
+                self.refresh()
+            except Exception:
+                # Keep serving the previous table; the
+                # next refresh, or a read after the TTL
+                # expired will try again:
+                pass
@@ -0,0 +1,333 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+
+Content-addressed cache for finished export artifacts. Popular
+courses are exported over and over by different researchers. As
+long as the underlying table has not changed, the result of such
+an export is identical each time. This module stores each finished
+artifact once, under a key that is computed from everything the
+artifact depends on: table, course, quarter, column set, PII flag,
+and a watermark of the source table. Later requests with the same
+key are satisfied by hardlinking (or, across file systems, copying)
+the cached file into the new delivery directory.
+
+The cache directory holds the artifacts plus an index file
+(index.json) with size, creation time, and time of last use of
+each entry. When the total size exceeds the cache's maximum, the
+least recently used entries are evicted.
+
+Index updates are protected by an flock() on a lock file in the
+cache directory, so that the cache may be shared among threads
+and processes (e.g. the multiprocessing workers of the quarterly
+report).
+'''
+
+import datetime
+import errno
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+
+# Queries for the time of the latest load into a database, for
+# tables whose engine does not maintain UPDATE_TIME. The tables
+# of the Edx schema are all filled from the tracking log loads
+# that json_to_relation records in Edx.LoadInfo:
+LOAD_LOG_QUERIES = {'Edx' : 'SELECT MAX(load_date_time) FROM Edx.LoadInfo;'}
+
+def getTableWatermark(mysqlDb, dbName, tableName):
+    '''
+    Return a string that changes whenever the given table's
+    content changes. We use information_schema, so that the
+    check is cheap even for very large tables. If MySQL maintains
+    UPDATE_TIME for the table, that time is the watermark. For
+    engines that do not maintain UPDATE_TIME (InnoDB before 5.7),
+    the watermark is the table's creation time plus the time of
+    the latest load into its database (see LOAD_LOG_QUERIES). If
+    neither is available, there is no reliable watermark, and
+    None is returned; callers must then not use the cache.
+
+    :param mysqlDb: open MySQLDB instance
+    :type mysqlDb: MySQLDB
+    :param dbName: database in which the table resides
+    :type dbName: String
+    :param tableName: name of the table
+    :type tableName: String
+    :return: watermark string, or None if the table's changes cannot be tracked.
+    :rtype: {String | None}
+    '''
+    query = "SELECT UPDATE_TIME, CREATE_TIME " +\
+            "FROM information_schema.TABLES " +\
+            "WHERE TABLE_SCHEMA = '%s' AND TABLE_NAME = '%s';" % (dbName, tableName)
+    try:
+        (updateTime, createTime) = mysqlDb.query(query).next()
+    except StopIteration:
+        return None
+    if updateTime is not None:
+        return str(updateTime)
+    if dbName not in LOAD_LOG_QUERIES:
+        return None
+    try:
+        latestLoad = mysqlDb.query(LOAD_LOG_QUERIES[dbName]).next()[0]
+    except Exception:
+        # No load log on this server:
+        return None
+    if latestLoad is None:
+        return None
+    return '%s|%s' % (str(createTime), str(latestLoad))
+
+
+class ExportCache(object):
+    '''
+    Size-bounded, content-addressed store of export artifacts.
+    '''
+
+    # Default root of the cache. Should be on the same file
+    # system as CourseCSVServer.DELIVERY_HOME, so that deliveries
+    # can be hardlinks rather than copies:
+    CACHE_HOME = '/home/dataman/Data/ExportCache'
+
+    # Maximum number of bytes held in the cache before
+    # least recently used entries are evicted:
+    MAX_CACHE_BYTES = 200 * 1024 * 1024 * 1024 # 200GB
+
+    # Entries older than this are treated as misses, even if
+    # the watermark still matches. Protects against tables whose
+    # watermark is only approximate:
+    MAX_ENTRY_AGE = datetime.timedelta(days=7)
+
+    INDEX_FILE_NAME = 'index.json'
+    LOCK_FILE_NAME  = 'index.lock'
+
+    def __init__(self, cacheHome=None, maxBytes=None, maxEntryAge=None):
+        '''
+        Create an accessor for the cache at cacheHome. The
+        directory is created if necessary. Accessors are cheap;
+        all state is on disk.
+
+        :param cacheHome: root directory of the cache; default: ExportCache.CACHE_HOME
+        :type cacheHome: String
+        :param maxBytes: maximum total size of cached artifacts; default: ExportCache.MAX_CACHE_BYTES
+        :type maxBytes: int
+        :param maxEntryAge: age beyond which entries are not used any more; default ExportCache.MAX_ENTRY_AGE
+        :type maxEntryAge: datetime.timedelta
+        '''
+        self.cacheHome = cacheHome if cacheHome is not None else ExportCache.CACHE_HOME
+        self.maxBytes  = maxBytes if maxBytes is not None else ExportCache.MAX_CACHE_BYTES
+        self.maxEntryAge = maxEntryAge if maxEntryAge is not None else ExportCache.MAX_ENTRY_AGE
+        if not os.path.isdir(self.cacheHome):
+            try:
+                os.makedirs(self.cacheHome)
+            except OSError as e:
+                # Another process may have beaten us to it:
+                if e.errno != errno.EEXIST:
+                    raise
+        self.indexPath = os.path.join(self.cacheHome, ExportCache.INDEX_FILE_NAME)
+        self.lockPath  = os.path.join(self.cacheHome, ExportCache.LOCK_FILE_NAME)
+
+    @staticmethod
+    def makeKey(**keyParts):
+        '''
+        Compute a cache key from any number of keyword
+        arguments, such as table='EventXtract', course='Medicine/HRP258/Statistics_in_Medicine',
+        quarter='fall2013', columns='*', pii=False, watermark='2014-11-01 10:02:03'.
+        Order of the keywords does not matter.
+
+        :return: hex digest that identifies the artifact.
+        :rtype: String
+        '''
+        canonical = json.dumps(keyParts, sort_keys=True, default=str)
+        return hashlib.sha1(canonical).hexdigest()
+
+    def lookup(self, key):
+        '''
+        Return the cache entry for the given key, or None
+        if the key is not cached, or the entry is too old.
+        A hit counts as a use for the LRU eviction.
+
+        :param key: key as returned by makeKey()
+        :type key: String
+        :return: dict with at least 'path', 'size', 'created', 'lastUsed', and 'meta',
+            or None.
+        :rtype: {dict | None}
+        '''
+        with self._lockedIndex() as index:
+            entry = index.get(key, None)
+            if entry is None:
+                return None
+            entryPath = os.path.join(self.cacheHome, entry['file'])
+            if not os.path.exists(entryPath) or \
+               time.time() - entry['created'] > self._maxEntryAgeSecs():
+                self._removeEntry(index, key)
+                return None
+            entry['lastUsed'] = time.time()
+            result = dict(entry)
+            result['path'] = entryPath
+            return result
+
+    def store(self, key, srcPath, meta=None):
+        '''
+        Place a copy of srcPath into the cache under the given key.
+        The source file remains untouched. If possible, the cache
+        copy is a hardlink. After storing, entries are evicted as
+        needed to stay within the size bound.
+
+        :param key: key as returned by makeKey()
+        :type key: String
+        :param srcPath: path to the finished artifact
+        :type srcPath: String
+        :param meta: optional dict of JSON-serializable information
+            to keep with the entry, such as the artifact's number of lines.
+        :type meta: {dict | None}
+        :return: path of the cached artifact
+        :rtype: String
+        '''
+        # Keep the artifact's extension(s), e.g. '.csv', or '.csv.zip':
+        baseName = os.path.basename(srcPath)
+        dotPos = baseName.find('.')
+        extension = baseName[dotPos:] if dotPos > -1 else ''
+        cacheFileName = key + extension
+        cachePath = os.path.join(self.cacheHome, cacheFileName)
+
+        # Populate under a temporary name first, so that readers
+        # never see a partially written artifact:
+        (tmpFd, tmpPath) = tempfile.mkstemp(dir=self.cacheHome, prefix='.incoming_')
+        os.close(tmpFd)
+        os.remove(tmpPath)
+        self.linkOrCopy(srcPath, tmpPath)
+        os.rename(tmpPath, cachePath)
+
+        with self._lockedIndex() as index:
+            now = time.time()
+            index[key] = {'file'     : cacheFileName,
+                          'size'     : os.path.getsize(cachePath),
+                          'created'  : now,
+                          'lastUsed' : now,
+                          'meta'     : meta if meta is not None else {}
+                          }
+            self._evict(index)
+        return cachePath
+
+    def deliver(self, key, destPath):
+        '''
+        Materialize the artifact cached under key at destPath.
+        Any existing file at destPath is replaced.
+
+        :param key: key as returned by makeKey()
+        :type key: String
+        :param destPath: full path where the artifact is to appear
+        :type destPath: String
+        :return: the cache entry (see lookup()), or None if the key was not cached.
+        :rtype: {dict | None}
+        '''
+        entry = self.lookup(key)
+        if entry is None:
+            return None
+        try:
+            os.remove(destPath)
+        except OSError:
+            pass
+        self.linkOrCopy(entry['path'], destPath)
+        os.chmod(destPath, 0644)
+        return entry
+
+    def linkOrCopy(self, srcPath, destPath):
+        '''
+        Hardlink srcPath to destPath. If source and destination
+        are on different file systems, or the file system does
+        not support hardlinks, copy instead.
+        '''
+        try:
+            os.link(srcPath, destPath)
+        except OSError:
+            shutil.copyfile(srcPath, destPath)
+
+    def totalBytes(self):
+        '''
+        Return the number of bytes currently held in the cache.
+        '''
+        with self._lockedIndex() as index:
+            return sum(entry['size'] for entry in index.values())
+
+    def clear(self):
+        '''
+        Remove all entries.
+        '''
+        with self._lockedIndex() as index:
+            for key in index.keys():
+                self._removeEntry(index, key)
+
+    # ----------------------------  Private Methods  ---------------------
+
+    def _evict(self, index):
+        '''
+        Remove least recently used entries from the passed-in
+        index until the cache is within its size bound. Caller
+        must hold the index lock.
+        '''
+        totalSize = sum(entry['size'] for entry in index.values())
+        if totalSize <= self.maxBytes:
+            return
+        byAge = sorted(index.keys(), key=lambda key: index[key]['lastUsed'])
+        for key in byAge:
+            if totalSize <= self.maxBytes:
+                break
+            totalSize -= index[key]['size']
+            self._removeEntry(index, key)
+
+    def _removeEntry(self, index, key):
+        entry = index.pop(key, None)
+        if entry is None:
+            return
+        try:
+            os.remove(os.path.join(self.cacheHome, entry['file']))
+        except OSError:
+            pass
+
+    def _maxEntryAgeSecs(self):
+        return self.maxEntryAge.days * 86400 + self.maxEntryAge.seconds
+
+    def _lockedIndex(self):
+        return _LockedIndex(self.indexPath, self.lockPath)
+
+
+class _LockedIndex(object):
+    '''
+    Context manager that holds an exclusive flock() on the cache's
+    lock file while the index dict is in use. On normal exit the
+    (possibly modified) index is written back.
+    '''
+
+    def __init__(self, indexPath, lockPath):
+        self.indexPath = indexPath
+        self.lockPath  = lockPath
+
+    def __enter__(self):
+        self.lockFd = open(self.lockPath, 'a')
+        fcntl.flock(self.lockFd, fcntl.LOCK_EX)
+        try:
+            with open(self.indexPath, 'r') as fd:
+                self.index = json.load(fd)
+        except (IOError, ValueError):
+            # No index yet, or index corrupted;
+            # start over:
+            self.index = {}
+        return self.index
+
+    def __exit__(self, excType, excValue, tb):
+        try:
+            if excType is None:
+                tmpPath = self.indexPath + '.tmp'
+                with open(tmpPath, 'w') as fd:
+                    json.dump(self.index, fd)
+                os.rename(tmpPath, self.indexPath)
+        finally:
+            fcntl.flock(self.lockFd, fcntl.LOCK_UN)
+            self.lockFd.close()
+        return False
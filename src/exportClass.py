@@ -36,6 +36,19 @@ import traceback
 from engagement import EngagementComputer
 from pymysql_utils.pymysql_utils import MySQLDB
 
+from admissionController import AdmissionController
+from courseCatalog import CourseCatalog
+from courseNameFilter import CourseNameFilter
+from costEstimator import CostEstimator, EXPORT_SHAPES
+from deliveryHandler import DeliveryHandler
+from deliveryStorage import DeliveryStorage, DeliveryStorageFull
+from directDownload import DirectDownload, DirectDownloadHandler, DirectDownloadRegistry
+from engagementCache import EngagementCache
+from exportScheduler import ExportJob, ExportScheduler
+from enrollmentService import EnrollmentService
+from exportCache import ExportCache, getTableWatermark
+from learnerPerformance import LearnerPerformanceComputer
+from userIdMap import UserIdMap
 from quarterlyReportExporter import QuarterlyReportExporter
 
 
@@ -95,20 +108,26 @@ class CourseCSVServer(WebSocketHandler):
     # is the name of the course with slashes replaced by underscores:
     DELIVERY_HOME = '/home/dataman/Data/CustomExcerpts'
 
+    # Port of this service. Direct downloads are served from it:
+    DELIVERY_PORT = 8080
+
+    # If True, researchers pick up deliveries from this service's
+    # DeliveryHandler at DELIVERY_PORT, which streams files, and records
+    # downloads for eviction (see deliveryHandler.py). If False, delivery
+    # URLs point to the Apache server at https://<FQDN>/researcher/:
+    SERVE_DELIVERIES = False
+
+    # File in the server user's home dir with the 'userName:password'
+    # login that DeliveryHandler requires. It must match the login
+    # that clientInstructions.html gives researchers:
+    DELIVERY_CREDENTIALS_FILE = '.ssh/delivery'
+
     # Regex to chop the front off a filename like:
     # '/tmp/tmpvOBuB1_engagement_CME_MedStats_2013-2015_weeklyEffort.csv'
     # group(0) will contain 'engagement...' to the end:
     #ENGAGEMENT_FILE_CHOPPER_PATTERN = re.compile(r'[^_]*_(.*)')
     ENGAGEMENT_FILE_CHOPPER_PATTERN = re.compile(r'(engage.*)')
 
-    # Bogus course name elimination pattern. This pattern is
-    # to find course names that are just for demos or trials:
-    # Sandbox, sandbox, /demo, and /Demo... The '?:' just
-    # causes the parenthesized expression to not be captured.
-    # Would be no harm to let the parens be a capture group
-    # as well, by elminiating the ?:.
-    BOGUS_COURSE_NAME_PATTERN = re.compile(r'(?:[sS]andbox|/[dD]emo)')
-
     # Regex to chop the front off a filename like:
     # '/tmp/tmpvOBuB1_forum_CME_MedStats_2013-2015.csv'
     # group(0) will contain 'forum...' to the end:
@@ -118,6 +137,77 @@ class CourseCSVServer(WebSocketHandler):
     # col in something like 'foo bar': returns 'foo':
     COURSE_NAME_SEP_PATTERN = re.compile(r'([^\s]*)')
 
+    # Column sets of the three basic tables as exported
+    # by makeCourseCSVs.sh when no PII is requested. The
+    # column set is part of the export cache key (see exportCache.py),
+    # so this list must change whenever the script's column
+    # list changes. Order is the order in which the script
+    # reports the tables in its infoDest file:
+    BASIC_TABLE_COLUMNS = OrderedDict([
+        ('EventXtract', 'anon_screen_name,event_type,ip_country,time,quarter,' +\
+                        'course_display_name,resource_display_name,success,' +\
+                        'video_code,video_current_time,video_speed,video_old_time,' +\
+                        'video_new_time,video_seek_type,video_new_speed,video_old_speed,' +\
+                        'goto_from,goto_dest'),
+        ('ActivityGrade', '*'),
+        ('VideoInteraction', '*')
+        ])
+
+    # Root of the content-addressed cache of finished
+    # export artifacts, and its size bound. Should be on
+    # the same file system as DELIVERY_HOME, so that deliveries
+    # from the cache are hardlinks:
+    EXPORT_CACHE_HOME = ExportCache.CACHE_HOME
+    EXPORT_CACHE_MAX_BYTES = 200 * 1024 * 1024 * 1024 # 200GB
+
+    # Cache of engagement computation results, shared with
+    # the quarterly report (see engagementCache.py):
+    ENGAGEMENT_CACHE_HOME = EngagementCache.CACHE_HOME
+    ENGAGEMENT_CACHE_MAX_BYTES = EngagementCache.MAX_CACHE_BYTES
+
+    # Number of basic-table extracts (EventXtract, ActivityGrade,
+    # VideoInteraction) that makeCourseCSVs.sh runs concurrently.
+    # Can be overridden per request via 'basicDataParallelism':
+    BASIC_DATA_PARALLELISM = 3
+    MAX_BASIC_DATA_PARALLELISM = 8
+
+    # Number of partitions into which the EventXtract scan of
+    # a single course is split, and the partitioning method
+    # ('time' or 'hash'). With 1, the table is scanned in one
+    # piece. Can be overridden per request via 'eventXtractPartitions'
+    # and 'eventXtractPartitionBy':
+    EVENT_XTRACT_PARTITIONS = 1
+    EVENT_XTRACT_PARTITION_BY = 'time'
+    # Requests may ask for at most this many partitions:
+    MAX_EVENT_XTRACT_PARTITIONS = 8
+
+    # Largest number of rows that exports of grades, A/B
+    # experiments, metadata, or single-course demographics may
+    # have to be streamed straight to the browser when the request
+    # includes 'directDownload'. Larger results are staged in
+    # DELIVERY_HOME for pickup (see directDownload.py):
+    DIRECT_DOWNLOAD_MAX_ROWS = 100000
+
+    # Rough size of the results of each kind of export for one
+    # course. Before an export starts, this much space is reserved
+    # in DELIVERY_HOME for each requested kind (times the number of
+    # courses for wildcard requests); see deliveryStorage.py:
+    ESTIMATED_EXPORT_BYTES = {
+        'basicData'         : 5 * 1024 * 1024 * 1024,
+        'engagementData'    : 500 * 1024 * 1024,
+        'learnerPerf'       : 100 * 1024 * 1024,
+        'demographics'      : 100 * 1024 * 1024,
+        'abtest'            : 10 * 1024 * 1024,
+        'qualtrics'         : 50 * 1024 * 1024,
+        'grades'            : 50 * 1024 * 1024,
+        'metadata'          : 10 * 1024 * 1024,
+        'edxForumRelatable' : 500 * 1024 * 1024,
+        'edxForumIsolated'  : 500 * 1024 * 1024,
+        'learnerPII'        : 100 * 1024 * 1024,
+        'emailList'         : 200 * 1024 * 1024,
+        'quarterRep'        : 50 * 1024 * 1024,
+        }
+
     def __init__(self, application, request, testing=False ):
         '''
         Invoked when browser accesses this server via ws://...
@@ -301,8 +391,41 @@ class CourseCSVServer(WebSocketHandler):
         return (os.path.join(sslDir, certFileName),
                 os.path.join(sslDir, privateKeyFileName))
 
+    @classmethod
+    def getDeliveryCredentials(self):
+        '''
+        Return the login that DeliveryHandler requires of
+        researchers. It is read from DELIVERY_CREDENTIALS_FILE
+        in the current user's home dir, which holds a single
+        line 'userName:password'.
+
+        @return: two-tuple with user name and password.
+        @rtype: (str,str)
+        @raise ValueError: if the file cannot be read, or holds no login.
+        '''
+        credentialsPath = os.path.join(os.path.expanduser("~"), CourseCSVServer.DELIVERY_CREDENTIALS_FILE)
+        try:
+            with open(credentialsPath, 'r') as fd:
+                (userName, sep, password) = fd.readline().strip().partition(':')
+        except IOError as e:
+            raise(ValueError("Could not read delivery credentials from %s: %s" % (credentialsPath, `e`)))
+        if len(userName) == 0 or len(password) == 0:
+            raise(ValueError("Expected 'userName:password' in %s" % credentialsPath))
+        return (userName, password)
+
 class DataServer(threading.Thread):
 
+    # Header and select list of demographics exports. The staged
+    # file and the direct download select these columns from
+    # demographicsFromClause(), so that both deliver the same rows:
+    DEMOGRAPHICS_HEADER = "'anon_screen_name','gender','year_of_birth','level_of_education','country_three_letters','country_name'"
+    DEMOGRAPHICS_COLS = "Demographics.anon_screen_name," +\
+                        "Demographics.gender," +\
+                        "CAST(Demographics.year_of_birth AS CHAR) AS year_of_birth," +\
+                        "Demographics.level_of_education," +\
+                        "Demographics.country_three_letters," +\
+                        "Demographics.country_name "
+
     def __init__(self, requestDict, mainThread, testing=False):
 
         threading.Thread.__init__(self)
@@ -340,6 +463,22 @@ class DataServer(threading.Thread):
         # Make fullEmailTargetDir predictable:
         self.fullEmailTargetDir = None
 
+        # Quota and space reservations of DELIVERY_HOME, and
+        # the reservation of the current request:
+        self.deliveryStorage = DeliveryStorage(CourseCSVServer.DELIVERY_HOME)
+        self.deliveryReservation = None
+
+        # Run slot of the current request, and its progress
+        # through per-course steps (see exportScheduler.py):
+        self.scheduler = ExportScheduler.getInstance()
+        if not testing and self.scheduler.admissionController is None:
+            self.scheduler.admissionController = AdmissionController.getInstance(self.currUser, self.mySQLPwd)
+        self.lastThrottleState = None
+        self.scheduledJob = None
+        self.courseStepsDone = 0
+        self.courseStepsTotal = 0
+        self.lastQueuePosition = None
+
     def ensureOpenMySQLDb(self):
         try:
             with open('/home/%s/.ssh/mysql' % self.currUser, 'r') as fd:
@@ -396,6 +535,20 @@ class DataServer(threading.Thread):
                 courseIdWasPresent = False
                 pass
 
+            # Dry run: report what the request would cost,
+            # without running, or touching earlier outputs:
+            if requestName == 'estimate':
+                if courseIdWasPresent and (courseId == 'None' or courseId is None):
+                    courseList = self.queryCourseNameList('%')
+                else:
+                    courseList = None
+                estimate = self.estimateRequest(args, courseList)
+                if estimate is None:
+                    self.writeError('Could not estimate the cost of this request.')
+                    return
+                self.writeResult('estimate', estimate)
+                return
+
             # Ensure that email start date is present if
             # email export is requested:
             emailStartDate = args.get('emailStartDate', None)
@@ -448,12 +601,37 @@ class DataServer(threading.Thread):
                     # Need list of all courses, b/c we'll do
                     # engagement analysis for all; use MySQL wildcard:
                     courseList = self.queryCourseNameList('%')
+                    # Direct download is for small, single-course results:
+                    args['directDownload'] = False
+
+                # Tell the browser what the request is expected
+                # to cost before running it:
+                estimate = self.estimateRequest(args, courseList)
+                if estimate is not None:
+                    self.writeResult('estimate', estimate)
+
+                # Wait for a run slot; short requests, and requests of
+                # researchers who were served less recently, go first:
+                self.waitForRunSlot(args, courseList, estimate)
+
+                # Refuse the request before it writes anything if its
+                # results would not fit into the delivery area. Space
+                # is reserved only once the request runs, so that
+                # queued requests neither hold space, nor outlive
+                # their reservations. The finally clause below frees
+                # the run slot:
+                try:
+                    self.reserveDeliverySpace(args, courseList, estimate)
+                except DeliveryStorageFull as e:
+                    self.writeError('Export not started: %s Please retry later, or request less data.' % str(e))
+                    return
 
                 if args.get('basicData', False):
                     self.setTimer()
                     if courseList is not None:
                         for courseName in courseList:
                             args['courseId'] = courseName
+                            self.betweenCourses()
                             self.exportClass(args)
                     else:
                         self.exportClass(args)
@@ -462,33 +640,33 @@ class DataServer(threading.Thread):
                     if courseList is not None:
                         for courseName in courseList:
                             args['courseId'] = courseName
+                            self.betweenCourses()
                             self.exportTimeEngagement(args)
                     else:
                         self.exportTimeEngagement(args)
 
                 if args.get('learnerPerf', False):
                     self.setTimer()
+                    # Learner performance for many courses
+                    # comes from a single pass:
                     if courseList is not None:
-                        for courseName in courseList:
-                            args['courseId'] = courseName
-                            self.exportLearnerPerf(args)
-                    else:
-                        self.exportLearnerPerf(args)
+                        args['courseList'] = courseList
+                    self.exportLearnerPerf(args)
 
                 if args.get('demographics', False):
                     self.setTimer()
+                    # Demographics for many courses come
+                    # from a single scan:
                     if courseList is not None:
-                        for courseName in courseList:
-                            args['courseId'] = courseName
-                            self.exportDemographics(args)
-                    else:
-                        self.exportDemographics(args)
+                        args['courseList'] = courseList
+                    self.exportDemographics(args)
 
                 if args.get('abtest', False):
                     self.setTimer()
                     if courseList is not None:
                         for courseName in courseList:
                             args['courseId'] = courseName
+                            self.betweenCourses()
                             self.exportABExperiment(args)
                     else:
                         self.exportABExperiment(args)
@@ -498,6 +676,7 @@ class DataServer(threading.Thread):
                     if courseList is not None:
                         for courseName in courseList:
                             args['courseId'] = courseName
+                            self.betweenCourses()
                             self.exportQualtrics(args)
                     else:
                         self.exportQualtrics(args)
@@ -507,6 +686,7 @@ class DataServer(threading.Thread):
                     if courseList is not None:
                         for courseName in courseList:
                             args['courseId'] = courseName
+                            self.betweenCourses()
                             self.exportGrades(args)
                     else:
                         self.exportGrades(args)
@@ -516,6 +696,7 @@ class DataServer(threading.Thread):
                     if courseList is not None:
                         for courseName in courseList:
                             args['courseId'] = courseName
+                            self.betweenCourses()
                             self.exportMetadata(args)
                     else:
                         self.exportMetadata(args)
@@ -525,6 +706,7 @@ class DataServer(threading.Thread):
                     if courseList is not None:
                         for courseName in courseList:
                             args['courseId'] = courseName
+                            self.betweenCourses()
                             self.exportForum(args)
                     else:
                         self.exportForum(args)
@@ -534,6 +716,7 @@ class DataServer(threading.Thread):
                     if courseList is not None:
                         for courseName in courseList:
                             args['courseId'] = courseName
+                            self.betweenCourses()
                             self.exportPIIDetails(args)
                     else:
                         self.exportPIIDetails(args)
@@ -556,6 +739,8 @@ class DataServer(threading.Thread):
                 # microseconds won't get printed:
                 duration = endTime - datetime.timedelta(microseconds=endTime.microseconds)
                 self.writeResult('progress', "<br>Runtime: %s<br>" % str(duration))
+                if estimate is not None:
+                    self.logEstimate(args, estimate, endTime.total_seconds())
 
                 # Add an example client letter,
                 # unless export method wrote directly to
@@ -583,11 +768,169 @@ class DataServer(threading.Thread):
             #self.writeError("Server could not extract request name/args from %s" % safeResp)
             self.writeError("%s" % `e`)
         finally:
+            if self.scheduledJob is not None:
+                self.scheduler.release(self.scheduledJob)
+                self.scheduledJob = None
+            if self.deliveryReservation is not None:
+                self.deliveryStorage.release(self.deliveryReservation)
+                self.deliveryReservation = None
             try:
                 self.mysqlDb.close()
             except Exception as e:
                 self.writeError("Error during MySQL driver close: '%s'" % `e`)
 
+    def estimateRequest(self, args, courseList=None):
+        '''
+        Estimate rows, output bytes, and runtime of each export
+        the given request asks for (see costEstimator.py), and
+        log the estimate.
+
+        :param args: arguments of a getData or estimate request
+        :type args: {String : <any>}
+        :param courseList: courses of a wildcard request, or None
+        :type courseList: {[String] | None}
+        :return: the estimate, or None if none could be made
+        :rtype: {{String : <any>} | None}
+        '''
+        if self.testing or self.mysqlDb is None:
+            return None
+        exportKinds = [exportKind for exportKind in EXPORT_SHAPES.keys() if self.str2bool(args.get(exportKind, False))]
+        if courseList is not None:
+            courseNames = courseList
+        elif len(args.get('courseId', '') or '') > 0:
+            # The exports select courses with LIKE, so a
+            # courseId may be a pattern for several courses:
+            courseNames = self.queryCourseNameList(args['courseId']) or [args['courseId']]
+        else:
+            courseNames = []
+        courseQuarter = args.get('basicDataQuarter', None)
+        courseAcademicYear = args.get('basicDataAcademicYear', None)
+        if (courseQuarter is None) or (courseAcademicYear is None) or \
+            (courseQuarter == 'blank') or (courseAcademicYear == 'blank'):
+            quarter = None
+        else:
+            quarter = "%s%s" % (courseQuarter,courseAcademicYear)
+        try:
+            estimator = CostEstimator(self.mysqlDb, EnrollmentService.getInstance(self.currUser, self.mySQLPwd))
+            estimate = estimator.estimateRequest(exportKinds, courseNames, quarter)
+        except Exception as e:
+            self.mainThread.logErr('Could not estimate request cost: %s' % `e`)
+            return None
+        self.logEstimate(args, estimate)
+        return estimate
+
+    def waitForRunSlot(self, args, courseList=None, estimate=None):
+        '''
+        Queue the request with the export scheduler, and block
+        until it may run. While waiting, the browser is told the
+        request's position in the queue.
+
+        :param args: arguments of a getData request
+        :type args: {String : <any>}
+        :param courseList: courses of a wildcard request, or None
+        :type courseList: {[String] | None}
+        :param estimate: result of estimateRequest(), or None
+        :type estimate: {{String : <any>} | None}
+        '''
+        # Per-course steps are the points at which a long
+        # request may give its slot to shorter ones:
+        perCourseKinds = ['basicData', 'engagementData', 'abtest', 'qualtrics', 'grades',
+                          'metadata', 'edxForumRelatable', 'learnerPII']
+        numKinds = len([exportKind for exportKind in perCourseKinds if self.str2bool(args.get(exportKind, False))])
+        if self.str2bool(args.get('edxForumIsolated', False)) and not self.str2bool(args.get('edxForumRelatable', False)):
+            numKinds += 1
+        self.courseStepsDone = 0
+        self.courseStepsTotal = len(courseList) * numKinds if courseList is not None else 0
+        requester = getattr(self.mainThread.request, 'remote_ip', None) or self.currUser
+        self.scheduledJob = ExportJob(requester,
+                                      estimate['seconds'] if estimate is not None else None,
+                                      args.get('courseId', ''))
+        self.scheduler.admit(self.scheduledJob, self.reportQueuePosition)
+
+    def betweenCourses(self):
+        '''
+        Called by wildcard requests before each per-course step.
+        Lets a long request give its run slot to waiting short
+        ones; the request then waits for a slot again.
+        '''
+        if self.scheduledJob is None or self.courseStepsTotal == 0:
+            return
+        fractionDone = self.courseStepsDone / float(self.courseStepsTotal)
+        self.courseStepsDone += 1
+        if self.scheduler.yieldSlot(self.scheduledJob, fractionDone, self.reportQueuePosition):
+            self.mainThread.logInfo('Request %s resumed after yielding to shorter requests' % `self.scheduledJob`)
+
+    def reportQueuePosition(self, position):
+        # Called about every ExportScheduler.POLL_INTERVAL seconds
+        # while waiting; only changes are sent to the browser:
+        throttleState = self.throttleStateChange()
+        if throttleState is not None:
+            self.writeResult('progress', throttleState)
+        if position == self.lastQueuePosition:
+            return
+        self.lastQueuePosition = position
+        self.writeResult('progress', "<br>Waiting for other exports to finish; position in queue: %s" % position)
+
+    def logEstimate(self, args, estimate, actualSeconds=None):
+        try:
+            CostEstimator.logEstimate(args, estimate, actualSeconds)
+        except IOError as e:
+            self.mainThread.logErr('Could not log request cost estimate: %s' % `e`)
+
+    def reserveDeliverySpace(self, args, courseList=None, estimate=None):
+        '''
+        Reserve space in DELIVERY_HOME for the results of the
+        given export request. Exports that the cost estimate
+        covers reserve their estimated bytes; all others reserve
+        ESTIMATED_EXPORT_BYTES. The reservation is released when
+        the request is done.
+
+        :param args: arguments of a getData request
+        :type args: {String : <any>}
+        :param courseList: courses of a wildcard request, or None
+        :type courseList: {[String] | None}
+        :param estimate: result of estimateRequest(), or None
+        :type estimate: {{String : <any>} | None}
+        :raise DeliveryStorageFull: if the results would not fit
+        '''
+        if self.testing:
+            return
+        numCourses = len(courseList) if courseList is not None else 1
+        estimatedKinds = set()
+        estimatedBytes = 0
+        if estimate is not None:
+            for export in estimate['exports']:
+                if export['bytes'] is not None:
+                    estimatedKinds.add(export['kind'])
+                    estimatedBytes += export['bytes']
+        for (exportKind, bytesPerCourse) in CourseCSVServer.ESTIMATED_EXPORT_BYTES.items():
+            if exportKind in estimatedKinds:
+                continue
+            if self.str2bool(args.get(exportKind, False)):
+                # Email lists and quarterly reports are not per course:
+                estimatedBytes += bytesPerCourse * (1 if exportKind in ['emailList', 'quarterRep'] else numCourses)
+        # Reserve even if nothing is estimated, so that the
+        # directories the request writes to are protected. Wildcard
+        # requests add each course's directory as they reach it
+        # (see protectDeliveryDir()):
+        self.deliveryReservation = self.deliveryStorage.reserve(estimatedBytes, getattr(self, 'fullTargetDir', None))
+        if getattr(self, 'fullEmailTargetDir', None) is not None:
+            self.deliveryStorage.protect(self.deliveryReservation, self.fullEmailTargetDir)
+
+    def protectDeliveryDir(self, dirPath):
+        '''
+        Note that this request is about to write into the given
+        delivery directory. The directory counts as accessed now,
+        and while the request runs, it is protected from eviction
+        by other requests and by the cron job.
+
+        :param dirPath: delivery directory, which need not exist yet
+        :type dirPath: String
+        '''
+        if self.testing:
+            return
+        self.deliveryStorage.protect(self.deliveryReservation, dirPath)
+
     def checkForOldOutputFiles(self, actions, mayDelete, courseDisplayName, emailStartDate):
         '''
         Given an action requested by the end user (e.g. 'basicData', 'engagementData', etc.)
@@ -813,6 +1156,26 @@ class DataServer(threading.Thread):
         infoXchangeFile = tempfile.NamedTemporaryFile()
         self.infoTmpFiles['exportClass'] = infoXchangeFile
 
+        # Non-PII basic tables may already have been exported
+        # by someone else, and the source tables may not have
+        # changed since. In that case deliver from the export cache.
+        # PII exports are never cached, b/c we don't keep clear-text
+        # PII anywhere outside the requested delivery:
+        # The script and the cache write to the course's
+        # own directory, also in wildcard requests:
+        self.protectDeliveryDir(os.path.dirname(self.getBasicTableFileNames(theCourseID).values()[0]))
+
+        cacheKeys = None
+        if not inclPII:
+            try:
+                cacheKeys = self.getBasicTableCacheKeys(theCourseID, quarter)
+                if cacheKeys is not None and self.deliverBasicTablesFromCache(theCourseID, cacheKeys, infoXchangeFile):
+                    return True
+            except Exception as e:
+                # Cache trouble must never prevent an export:
+                self.mainThread.logErr('Export cache unavailable; exporting from db: %s' % `e`)
+                cacheKeys = None
+
         # Build the CL command for script makeCourseCSV.sh
         scriptCmd = [self.exportCSVScript,'-u',self.currUser]
         if self.mySQLPwd is not None:
@@ -829,6 +1192,25 @@ class DataServer(threading.Thread):
         if quarter is not None:
             scriptCmd.extend(['-q', quarter])
 
+        # Number of table extracts the script is to run at once:
+        try:
+            parallelism = int(detailDict.get('basicDataParallelism', CourseCSVServer.BASIC_DATA_PARALLELISM))
+        except (ValueError, TypeError):
+            parallelism = CourseCSVServer.BASIC_DATA_PARALLELISM
+        scriptCmd.extend(['-j', str(min(max(1, parallelism), CourseCSVServer.MAX_BASIC_DATA_PARALLELISM))])
+
+        # Number of concurrent scans over which to split EventXtract:
+        try:
+            partitions = int(detailDict.get('eventXtractPartitions', CourseCSVServer.EVENT_XTRACT_PARTITIONS))
+        except (ValueError, TypeError):
+            partitions = CourseCSVServer.EVENT_XTRACT_PARTITIONS
+        partitions = min(partitions, CourseCSVServer.MAX_EVENT_XTRACT_PARTITIONS)
+        if partitions > 1:
+            partitionBy = detailDict.get('eventXtractPartitionBy', CourseCSVServer.EVENT_XTRACT_PARTITION_BY)
+            if partitionBy not in ['time', 'hash']:
+                partitionBy = CourseCSVServer.EVENT_XTRACT_PARTITION_BY
+            scriptCmd.extend(['-s', str(partitions), '-b', partitionBy])
+
         #************
         self.mainThread.logDebug("Script cmd is: %s" % str(scriptCmd))
         #************
@@ -841,25 +1223,157 @@ class DataServer(threading.Thread):
         # be up to five sample lines from each file. The
         # sample batches will be separated by the string
         # "herrgottzemenschnochamal!"
+        # The extracts run concurrently, and the script reports
+        # the start and end of each one. Forward those messages
+        # line by line as they arrive, rather than all at the end:
         try:
-            #pipeFromScript = subprocess.Popen(scriptCmd,stdout=subprocess.PIPE,stderr=subprocess.PIPE).stdout
-            pipeFromScript = subprocess.Popen(scriptCmd,stdout=subprocess.PIPE,stderr=subprocess.PIPE)
-            while pipeFromScript.poll() is None:
-                (msgFromScript,errmsg) = pipeFromScript.communicate()
-                if len(errmsg) > 0:
-                    self.writeResult('progress', errmsg)
-                else:
-                    self.writeResult('progress', msgFromScript)
-
-            #**********8
-            #for msgFromScript in pipeFromScript:
-            #    self.writeResult('progress', msgFromScript)
-            #**********8
+            pipeFromScript = subprocess.Popen(scriptCmd,stdout=subprocess.PIPE,stderr=subprocess.STDOUT)
+            for msgFromScript in iter(pipeFromScript.stdout.readline, ''):
+                self.writeResult('progress', msgFromScript)
+            pipeFromScript.wait()
         except Exception as e:
             self.writeError(`e`)
+            return True
+        if pipeFromScript.returncode != 0:
+            self.writeError('Export of basic tables for %s failed; see progress messages.' % theCourseID)
+
+        if cacheKeys is not None and pipeFromScript.returncode == 0:
+            try:
+                self.storeBasicTablesInCache(theCourseID, cacheKeys, infoXchangeFile)
+            except Exception as e:
+                self.mainThread.logErr('Could not add basic tables to export cache: %s' % `e`)
+
+        return True
+
+    def getBasicTableCacheKeys(self, courseId, quarter):
+        '''
+        Return the export cache keys for the three non-PII
+        basic tables of the given course and quarter.
 
+        :param courseId: course name, possibly with MySQL wildcards
+        :type courseId: String
+        :param quarter: quarter in the form 'fall2013', or None
+        :type quarter: {String | None}
+        :return: dict mapping table names to cache keys, in the order
+            of CourseCSVServer.BASIC_TABLE_COLUMNS; None if the changes
+            of some table cannot be tracked.
+        :rtype: {OrderedDict | None}
+        '''
+        cacheKeys = OrderedDict()
+        for (tableName, columns) in CourseCSVServer.BASIC_TABLE_COLUMNS.items():
+            watermark = getTableWatermark(self.mysqlDb, 'Edx', tableName)
+            if watermark is None:
+                return None
+            cacheKeys[tableName] = ExportCache.makeKey(table=tableName,
+                                                       course=courseId,
+                                                       quarter=quarter,
+                                                       columns=columns,
+                                                       pii=False,
+                                                       watermark=watermark
+                                                       )
+        return cacheKeys
+
+    def getBasicTableFileNames(self, courseId):
+        '''
+        Return the full paths where makeCourseCSVs.sh places the
+        three basic tables for the given course. The directory
+        leaf is computed exactly as the script does it: a course
+        triplet part1/part2/part3 becomes part1_part2_part3,
+        MySQL '%' wildcards become '_any', and leading underscores
+        and remaining slashes are removed.
+
+        :param courseId: course name, possibly with MySQL wildcards
+        :type courseId: String
+        :return: dict mapping table names to full file paths
+        :rtype: OrderedDict
+        '''
+        tripletMatch = re.match(r'([^/]*)/([^/]*)/(.*)', courseId)
+        if tripletMatch is not None:
+            dirLeaf = '_'.join(tripletMatch.groups())
+        else:
+            dirLeaf = courseId
+        dirLeaf = dirLeaf.replace('%', '_any')
+        dirLeaf = re.sub(r'^_*|/', '', dirLeaf)
+        targetDir = os.path.join(CourseCSVServer.DELIVERY_HOME, dirLeaf)
+        fileNames = OrderedDict()
+        for tableName in CourseCSVServer.BASIC_TABLE_COLUMNS.keys():
+            fileNames[tableName] = os.path.join(targetDir, '%s_%s.csv' % (dirLeaf, tableName))
+        return fileNames
+
+    def deliverBasicTablesFromCache(self, courseId, cacheKeys, infoXchangeFile):
+        '''
+        If all three basic tables are in the export cache, link
+        them into the delivery directory, and write the infoXchangeFile
+        in the same format as makeCourseCSVs.sh would have.
+
+        :return: True if the tables were delivered from the cache,
+            else False. In the latter case nothing was delivered.
+        :rtype: Boolean
+        '''
+        exportCache = ExportCache(CourseCSVServer.EXPORT_CACHE_HOME, CourseCSVServer.EXPORT_CACHE_MAX_BYTES)
+        # Only a hit for all tables is useful, b/c the
+        # script always exports all three:
+        for cacheKey in cacheKeys.values():
+            if exportCache.lookup(cacheKey) is None:
+                return False
+        fileNames = self.getBasicTableFileNames(courseId)
+        targetDir = os.path.dirname(fileNames.values()[0])
+        if not os.path.isdir(targetDir):
+            os.makedirs(targetDir)
+        numLines = OrderedDict()
+        for (tableName, cacheKey) in cacheKeys.items():
+            self.writeResult('progress', "Delivering extract %s from export cache...<br>" % tableName)
+            entry = exportCache.deliver(cacheKey, fileNames[tableName])
+            if entry is None:
+                # Evicted between lookup and delivery:
+                return False
+            numLines[tableName] = entry['meta'].get('numLines', None)
+            if numLines[tableName] is None:
+                numLines[tableName] = self.getNumFileLines(fileNames[tableName])
+
+        for tableName in fileNames.keys():
+            infoXchangeFile.write(fileNames[tableName] + '\n')
+            infoXchangeFile.write(str(numLines[tableName]) + '\n')
+        for tableName in fileNames.keys():
+            infoXchangeFile.write('herrgottzemenschnochamal!\n')
+            with open(fileNames[tableName], 'r') as fd:
+                for lineNum,line in enumerate(fd):
+                    if lineNum >= CourseCSVServer.NUM_OF_TABLE_SAMPLE_LINES:
+                        break
+                    infoXchangeFile.write(line)
+        infoXchangeFile.flush()
+        self.writeResult('progress', "Done exporting class %s to CSV (from cache)<br>" % courseId)
         return True
 
+    def storeBasicTablesInCache(self, courseId, cacheKeys, infoXchangeFile):
+        '''
+        After makeCourseCSVs.sh has run, place the three basic
+        tables into the export cache. The line counts the script
+        wrote to infoXchangeFile are kept with the cache entries.
+        Nothing is cached unless all three files exist, and hold
+        more than their header line; an extract that failed
+        unnoticed must not be replayed to later requests.
+        '''
+        exportCache = ExportCache(CourseCSVServer.EXPORT_CACHE_HOME, CourseCSVServer.EXPORT_CACHE_MAX_BYTES)
+        # The script writes alternating file name and line count:
+        numLinesByFile = {}
+        with open(infoXchangeFile.name, 'r') as fd:
+            for tableName in cacheKeys.keys(): #@UnusedVariable
+                fileName = fd.readline().strip()
+                numLines = fd.readline().strip()
+                if len(fileName) > 0 and numLines.isdigit():
+                    numLinesByFile[fileName] = int(numLines)
+        fileNames = self.getBasicTableFileNames(courseId)
+        for fileName in fileNames.values():
+            if not os.path.exists(fileName):
+                return
+            if numLinesByFile.get(fileName, None) is None:
+                numLinesByFile[fileName] = self.getNumFileLines(fileName)
+            if numLinesByFile[fileName] <= 1:
+                return
+        for (tableName, fileName) in fileNames.items():
+            exportCache.store(cacheKeys[tableName], fileName, meta={'numLines' : numLinesByFile.get(fileName, None)})
+
     def exportTimeEngagement(self, detailDict):
         '''
         Export two CSV files: a summary of time effort aggregated over all students,
@@ -904,24 +1418,42 @@ class DataServer(threading.Thread):
             # no limit on the start year:
             startYearsArr = None
 
-        # Get an engine that will compute the time engagement:
-        invokingUser = getpass.getuser()
-        # EngagementComputer will open its own MySQLDB instance:
-        self.mysqlDb.close()
         # Are we only to consider video events?
         engageVideoOnly = detailDict.get('engageVideoOnly', False)
-        try:
-            engagementComp = EngagementComputer(coursesStartYearsArr=startYearsArr,
-                                        mySQLUser=invokingUser,
-                                        courseToProfile=courseId,
-                                        videoOnly=(True if engageVideoOnly else False)
-                                        )
-
-            engagementComp.run()
-            (summaryFile, detailFile, weeklyEffortFile) = engagementComp.writeResultsToDisk()
-        finally:
-            # Re-open MySQLDB instance for this instance:
-            self.ensureOpenMySQLDb()
+
+        # Was this computation done before, by this or
+        # another export, or by the quarterly report?
+        # (Unit tests' engagement tables are not in Edx, so
+        # the EventXtract watermark would not reflect them):
+        if self.testing:
+            engagementCache = None
+            cachedFiles = None
+        else:
+            engagementCache = EngagementCache(CourseCSVServer.ENGAGEMENT_CACHE_HOME, CourseCSVServer.ENGAGEMENT_CACHE_MAX_BYTES)
+            cacheKey = EngagementCache.makeKey(courseId, engageVideoOnly, startYearsArr, EngagementCache.getWatermark(self.mysqlDb))
+            cachedFiles = engagementCache.lookup(cacheKey)
+        if cachedFiles is not None:
+            self.writeResult('progress', "Using engagement results computed earlier from the same event data.")
+            (summaryFile, detailFile, weeklyEffortFile) = cachedFiles
+        else:
+            # Get an engine that will compute the time engagement:
+            invokingUser = getpass.getuser()
+            # EngagementComputer will open its own MySQLDB instance:
+            self.mysqlDb.close()
+            try:
+                engagementComp = EngagementComputer(coursesStartYearsArr=startYearsArr,
+                                            mySQLUser=invokingUser,
+                                            courseToProfile=courseId,
+                                            videoOnly=(True if engageVideoOnly else False)
+                                            )
+
+                engagementComp.run()
+                (summaryFile, detailFile, weeklyEffortFile) = engagementComp.writeResultsToDisk()
+            finally:
+                # Re-open MySQLDB instance for this instance:
+                self.ensureOpenMySQLDb()
+            if engagementCache is not None:
+                engagementCache.store(cacheKey, summaryFile, detailFile, weeklyEffortFile)
 
         # The files will be in paths like:
         #     /tmp/tmpAK5svP_engagement_Engineering_CRYP999_Cryptopgraphy_Repository_summary.csv
@@ -1204,13 +1736,27 @@ class DataServer(threading.Thread):
         except OSError:
             pass
 
+        # The anon_screen_name and forum id of each learner come
+        # from the precomputed EdxPrivate.UserIdMap (see userIdMap.py).
+        # Only learners who joined after the map's last refresh
+        # fall back to computing the ids with the hashing UDFs.
+        # Servers without the map use the UDFs throughout:
+        if UserIdMap(self.mysqlDb).exists():
+            anonScreenNameExpr = 'IFNULL(UserIdMap.anon_screen_name, EdxPrivate.idInt2Anon(Enrollment.user_int_id))'
+            forumIdExpr = 'IFNULL(UserIdMap.forum_uid, EdxPrivate.idInt2Forum(auth_user.id))'
+            userIdMapJoin = '     LEFT JOIN %s.%s AS UserIdMap ON UserIdMap.user_int_id = Enrollment.user_int_id' %\
+                            (UserIdMap.DB, UserIdMap.TABLE)
+        else:
+            anonScreenNameExpr = 'EdxPrivate.idInt2Anon(Enrollment.user_int_id)'
+            forumIdExpr = 'EdxPrivate.idInt2Forum(auth_user.id)'
+            userIdMapJoin = ''
         try:
             for courseName in self.queryCourseNameList(courseId):
                 mySqlCmd = ' '.join([
-                'SELECT EdxPrivate.idInt2Anon(Enrollment.user_int_id) AS anon_screen_name, ',
+                'SELECT %s AS anon_screen_name, ' % anonScreenNameExpr,
                 '       Enrollment.user_int_id, ',
                 '       auth_user.username AS screen_name, ',
-                '       EdxPrivate.idInt2Forum(auth_user.id) AS forum_id, ',
+                '       %s AS forum_id, ' % forumIdExpr,
                 '       auth_user.email, ',
                 '       edxprod.student_anonymoususerid.anonymous_user_id as external_lti_id, ',
                 '       auth_user.date_joined, ',
@@ -1221,14 +1767,14 @@ class DataServer(threading.Thread):
                 'FROM edxprod.auth_user, ',
                 '     edxprod.student_anonymoususerid,',
                 '     ( SELECT user_id as user_int_id, ',
-                '              EdxPrivate.idInt2Anon(user_id) as anon_screen_name, ',
                 '          course_id AS course_display_name  ',
                 '       FROM edxprod.student_courseenrollment  ',
-                '       WHERE EdxPrivate.idInt2Anon(user_id) != "9c1185a5c5e9fc54612808977ee8f548b2258d31"  ',
-                '       AND course_id="%s"' % courseName,
+                '       WHERE course_id="%s"' % courseName,
                 '     ) AS Enrollment',
+                userIdMapJoin,
                 'WHERE edxprod.student_anonymoususerid.user_id = Enrollment.user_int_id',
-                '  AND edxprod.auth_user.id = Enrollment.user_int_id;'
+                '  AND edxprod.auth_user.id = Enrollment.user_int_id',
+                '  AND %s != "9c1185a5c5e9fc54612808977ee8f548b2258d31";' % anonScreenNameExpr
                 ])
 
             for piiResultLine in self.mysqlDb.query(mySqlCmd):
@@ -1281,15 +1827,25 @@ class DataServer(threading.Thread):
     def exportDemographics(self, detailDict):
         '''
         Exports demographic information for each learner in a given
-        course. Places name of result file into self.mainThread.latestDemographicsFilename,
-        so that unittests can find it. The output table will include
-        the following:
+        course, or in a set of courses. Places name of result file into
+        self.mainThread.latestDemographicsFilename, so that unittests
+        can find it. The output table will include the following:
             anon_screen_name, gender, year_of_birth, level_of_education, country_three_letters, country_name
 
-        :param detailDict: dict of arguments; expected: 'courseId'
+        The set of courses is either given explicitly as a list in
+        detailDict['courseList'], or it comprises all courses that match
+        the MySQL pattern detailDict['courseId']. If more than one course
+        is involved, all of them are exported in a single scan, and the
+        output gains a leading course_display_name column; rows are sorted
+        by course. If in addition detailDict['demographicsPerCourse'] is
+        True, that sorted result is split into one file per course,
+        each in the single-course format.
+
+        :param detailDict: dict of arguments; expected: 'courseId'; optional:
+            'courseList', 'demographicsPerCourse'
         :type detailDict: {String : String}
-        :return full path of outputfile
-        :rtype String
+        :return full path of outputfile, or list of per-course outputfiles
+        :rtype {String | [String]}
         '''
 
         # For unittests: None-out the self.mainThread.latestDemographicsFilename
@@ -1314,77 +1870,212 @@ class DataServer(threading.Thread):
         # File name for eventual final result:
         outFileDemographicsName = os.path.join(self.fullTargetDir, '%s_demographics.csv' % courseNameNoSpaces)
 
-        #*************
-        #print("outFileDemographicsName: '%s'" % outFileDemographicsName)
-        #*************
-        for courseName in self.queryCourseNameList(courseId):
-            if self.testing:
-                courseName   = 'testtest/MedStats/2013-2015'
-                userGradeDb  = 'unittest'
-                trueEnrollDb = 'unittest'
-            else:
-                userGradeDb  = 'EdxPrivate'
-                trueEnrollDb = 'edxprod'
-            mySqlCmd = ' '.join([
-                            "SELECT 'anon_screen_name','gender','year_of_birth','level_of_education','country_three_letters','country_name' " +\
-                            "UNION " +\
-                            "SELECT Demographics.anon_screen_name," +\
-                            "Demographics.gender," +\
-                            "CAST(Demographics.year_of_birth AS CHAR) AS year_of_birth," +\
-                            "Demographics.level_of_education," +\
-                            "Demographics.country_three_letters," +\
-                            "Demographics.country_name " +\
-                            "INTO OUTFILE '" + outFileDemographicsName + "' FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' LINES TERMINATED BY '\n' "
-                            "FROM (SELECT anon_screen_name" +\
-                            "        FROM " + trueEnrollDb + ".true_courseenrollment LEFT JOIN " + userGradeDb + ".UserGrade" +\
-                            "      ON user_int_id = user_id" +\
-                            "        WHERE " + trueEnrollDb + ".true_courseenrollment.course_display_name = '" + courseName + "') AS Students " +\
-                            "LEFT JOIN Demographics" +\
-                            "  ON Demographics.anon_screen_name = Students.anon_screen_name;"                                                                       ])
-            #***************
-            #self.mainThread.logDebug("mySqlCmd: %s" % mySqlCmd)
-            #with open('/home/dataman/Data/EdX/NonTransformLogs/exportClass.log', 'a') as errFd:
-            #    errFd.write("mySqlCmd: '%s'\n" % str(mySqlCmd))
-            #***************
+        if self.testing:
+            courseNames  = ['testtest/MedStats/2013-2015']
+            userGradeDb  = 'unittest'
+            trueEnrollDb = 'unittest'
+        else:
+            courseNames = detailDict.get('courseList', None)
+            if courseNames is None:
+                courseNames = self.queryCourseNameList(courseId if courseId is not None else '%')
+            userGradeDb  = 'EdxPrivate'
+            trueEnrollDb = 'edxprod'
+
+        if len(courseNames) == 0:
+            self.writeError('In exportDemographics: no course matches %s.' % courseId)
+            return
+
+        colHeader = DataServer.DEMOGRAPHICS_HEADER
+        demographicCols = DataServer.DEMOGRAPHICS_COLS
+        fromClause = DataServer.demographicsFromClause(courseNames, userGradeDb, trueEnrollDb)
+
+        if len(courseNames) == 1 and \
+           self.offerDirectDownloads(detailDict,
+                                     [('%s_demographics.csv' % courseNameNoSpaces,
+                                       colHeader.replace("'", '').split(','),
+                                       fromClause)],
+                                     selectList=demographicCols):
+            return None
+
+        if len(courseNames) == 1:
+            mySqlCmd = "SELECT " + colHeader + " " +\
+                       "UNION " +\
+                       "SELECT " + demographicCols +\
+                       "INTO OUTFILE '" + outFileDemographicsName + "' FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' LINES TERMINATED BY '\n' " +\
+                       fromClause + ";"
+            self.runOutfileQuery(mySqlCmd)
+        else:
+            # Several courses: MySQL writes the sorted rows
+            # to a tmp file, which we append to the header.
+            # Can't use the built-in tempfile module, b/c it
+            # creates the file, which makes MySQL complain:
+            random.seed(self)
+            tmpFileForDemographics = '/tmp/classExportDemographicsTmp' + str(time.time()) + str(random.randint(1,10000)) + '.csv'
+            mySqlCmd = "SELECT Students.course_display_name," + demographicCols +\
+                       "INTO OUTFILE '" + tmpFileForDemographics + "' FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' LINES TERMINATED BY '\n' " +\
+                       fromClause +\
+                       "ORDER BY Students.course_display_name;"
             try:
-                resIterator = self.mysqlDb.query(mySqlCmd)
-                resIterator.next()
-            except StopIteration:
-                pass
-            except Exception as e:
-                raise
-                #***************
-                #with open('/home/dataman/Data/EdX/NonTransformLogs/exportClass.log', 'a') as errFd:
-                #    exc_type, exc_value, exc_traceback = sys.exc_info() #@UnusedVariable
-                #    traceback.print_tb(exc_traceback, file=errFd)
-                #    errFd.write("********MySQL query failed: '%s'\n" % `e`)
-                #***************
+                self.runOutfileQuery(mySqlCmd)
+                with open(outFileDemographicsName, 'w') as fd:
+                    fd.write(string.replace("'course_display_name'," + colHeader, "'", '"') + '\n')
+                self.catFiles(outFileDemographicsName, tmpFileForDemographics, mode='a')
+            finally:
+                try:
+                    os.remove(tmpFileForDemographics)
+                except OSError:
+                    pass
+
+        if len(courseNames) > 1 and self.str2bool(detailDict.get('demographicsPerCourse', False)):
+            outFileNames = self.splitDemographicsByCourse(outFileDemographicsName)
+            os.remove(outFileDemographicsName)
+        else:
+            outFileNames = [outFileDemographicsName]
+
         # Save information for printTableInfo() method to find:
         infoXchangeFile = tempfile.NamedTemporaryFile()
         self.infoTmpFiles['exportDemographics'] = infoXchangeFile
 
-        infoXchangeFile.write(outFileDemographicsName + '\n')
-        infoXchangeFile.write(str(self.getNumFileLines(outFileDemographicsName)) + '\n')
+        sampleBatches = []
+        for outFileName in outFileNames:
+            try:
+                (numLines, sampleLines) = self.getFileStats(outFileName)
+            except IOError as e:
+                self.mainThread.logErr('Could not read demographics file %s: %s' % (outFileName, `e`))
+                (numLines, sampleLines) = (0, [])
+            infoXchangeFile.write(outFileName + '\n')
+            infoXchangeFile.write(str(numLines) + '\n')
+            sampleBatches.append(''.join(sampleLines))
 
         # Add sample lines:
         infoXchangeFile.write('herrgottzemenschnochamal!\n')
-        try:
-            with open(outFileDemographicsName, 'r') as fd:
-                head = []
-                for lineNum,line in enumerate(fd):
-                    head.append(line)
-                    if lineNum >= CourseCSVServer.NUM_OF_TABLE_SAMPLE_LINES:
-                        break
-                infoXchangeFile.write(''.join(head))
+        for sampleBatch in sampleBatches:
+            infoXchangeFile.write(sampleBatch)
             infoXchangeFile.write('herrgottzemenschnochamal!\n')
-        except IOError as e:
-            self.mainThread.logErr('Could not write result sample lines: %s' % `e`)
-
 
         # Allow unit tests to find the result file:
-        self.mainThread.latestDemographicsFilename = outFileDemographicsName
+        self.mainThread.latestDemographicsFilename = outFileNames[0]
+
+        return outFileNames[0] if len(outFileNames) == 1 else outFileNames
+
+    @staticmethod
+    def demographicsFromClause(courseNames, userGradeDb='EdxPrivate', trueEnrollDb='edxprod'):
+        '''
+        Return FROM and WHERE of the demographics queries: one row
+        per enrolled learner and course. UserGrade has one row per
+        learner and graded course, so the join with it would repeat
+        learners who have grades in several courses; the Students
+        table is therefore made DISTINCT. The staged, direct download,
+        and multi-course queries all use this clause, so that they
+        deliver the same rows.
+
+        :param courseNames: courses whose learners are to be exported
+        :type courseNames: [String]
+        :param userGradeDb: database of the UserGrade table
+        :type userGradeDb: String
+        :param trueEnrollDb: database of the true_courseenrollment table
+        :type trueEnrollDb: String
+        :rtype: String
+        '''
+        courseNameList = ','.join(["'%s'" % courseName for courseName in courseNames])
+        return "FROM (SELECT DISTINCT anon_screen_name, " + trueEnrollDb + ".true_courseenrollment.course_display_name" +\
+               "        FROM " + trueEnrollDb + ".true_courseenrollment LEFT JOIN " + userGradeDb + ".UserGrade" +\
+               "      ON user_int_id = user_id" +\
+               "        WHERE " + trueEnrollDb + ".true_courseenrollment.course_display_name IN (" + courseNameList + ")) AS Students " +\
+               "LEFT JOIN Demographics" +\
+               "  ON Demographics.anon_screen_name = Students.anon_screen_name "
+
+    def offerDirectDownloads(self, detailDict, downloadSpecs, selectList='* '):
+        '''
+        If the request asks for direct download, and the results
+        together have no more than DIRECT_DOWNLOAD_MAX_ROWS rows,
+        register each result for direct download, and send the
+        download links to the browser. Else the caller is to stage
+        the results in DELIVERY_HOME as usual.
+
+        :param detailDict: dict of request arguments; direct download is
+            offered only if 'directDownload' is True.
+        :type detailDict: {String : <any>}
+        :param downloadSpecs: one (fileName, header, fromClause) triple per result.
+            The header is a list of column names, or None. The fromClause
+            holds FROM and WHERE of the result's query.
+        :type downloadSpecs: [(String, {[String] | None}, String)]
+        :param selectList: column list of the queries, followed by a space
+        :type selectList: String
+        :return: True if the links were sent, False if the results are to be staged.
+        :rtype: Boolean
+        '''
+        if self.testing or not self.str2bool(detailDict.get('directDownload', False)):
+            return False
+        numRows = 0
+        for (fileName, header, fromClause) in downloadSpecs: #@UnusedVariable
+            numRows += self.mysqlDb.query("SELECT COUNT(*) " + fromClause).next()[0]
+        if numRows > CourseCSVServer.DIRECT_DOWNLOAD_MAX_ROWS:
+            self.writeResult('progress', "%s rows exceed the direct download limit of %s; staging %s for pickup instead.<br>" %\
+                             (numRows, CourseCSVServer.DIRECT_DOWNLOAD_MAX_ROWS, ', '.join([spec[0] for spec in downloadSpecs])))
+            return False
+        registry = DirectDownloadRegistry.getInstance()
+        for (fileName, header, fromClause) in downloadSpecs:
+            token = registry.register(DirectDownload(fileName,
+                                                     "SELECT " + selectList + fromClause,
+                                                     self.currUser,
+                                                     self.mySQLPwd,
+                                                     header=header,
+                                                     db=self.mainThread.defaultDb))
+            self.writeResult('directDownload', {'fileName' : fileName,
+                                                'url' : "https://%s:%s/download/%s" % (self.mainThread.FQDN, CourseCSVServer.DELIVERY_PORT, token)})
+        return True
 
-        return outFileDemographicsName
+    def runOutfileQuery(self, mySqlCmd):
+        '''
+        Run a query whose result goes to a file via INTO OUTFILE,
+        and which therefore returns no rows.
+        '''
+        try:
+            self.mysqlDb.query(mySqlCmd).next()
+        except StopIteration:
+            pass
+
+    def splitDemographicsByCourse(self, multiCourseFileName):
+        '''
+        Split a multi-course demographics file, which is sorted by
+        its leading course_display_name column, into one file per
+        course. The per-course files have the single-course format,
+        i.e. no course column. Done in one pass over the input.
+
+        :param multiCourseFileName: output of a multi-course exportDemographics()
+        :type multiCourseFileName: String
+        :return: paths of the per-course files
+        :rtype: [String]
+        '''
+        perCourseFileNames = []
+        currCourse = None
+        outFd = None
+        try:
+            with open(multiCourseFileName, 'r') as inFd:
+                # Header without the course column:
+                header = inFd.readline().split(',', 1)[1]
+                for line in inFd:
+                    # MySQL encloses the course name in double quotes:
+                    if line.startswith('"'):
+                        courseEnd = line.index('",')
+                        (course, rest) = (line[1:courseEnd], line[courseEnd+2:])
+                    else:
+                        (course, rest) = line.split(',', 1)
+                    if course != currCourse:
+                        if outFd is not None:
+                            outFd.close()
+                        currCourse = course
+                        courseNameNoSpaces = string.replace(string.replace(course,' ',''), '/', '_')
+                        perCourseFileName = os.path.join(self.fullTargetDir, '%s_demographics.csv' % courseNameNoSpaces)
+                        perCourseFileNames.append(perCourseFileName)
+                        outFd = open(perCourseFileName, 'w')
+                        outFd.write(header)
+                    outFd.write(rest)
+        finally:
+            if outFd is not None:
+                outFd.close()
+        return perCourseFileNames
 
     def exportABExperiment(self, detailDict):
         '''
@@ -1397,6 +2088,11 @@ class DataServer(threading.Thread):
         courseId = detailDict.get('courseId', '')
         courseNameNoSpaces = string.replace(string.replace(courseId,' ',''), '/', '_')
 
+        if self.offerDirectDownloads(detailDict,
+                                     [('%s_ABExperiment.csv' % courseNameNoSpaces, None,
+                                       "FROM Edx.ABExperiment WHERE course_display_name = '%s'" % courseId)]):
+            return None
+
         # Export AB test data
         abtestOutfile = os.path.join(self.fullTargetDir, '%s_ABExperiment.csv' % courseNameNoSpaces)
         abtestQuery =   """
@@ -1446,119 +2142,82 @@ class DataServer(threading.Thread):
         courseId = detailDict.get('courseId', '')
         courseNameNoSpaces = string.replace(string.replace(courseId,' ',''), '/', '_')
 
-        # Get list of survey IDs
-        idgetter = "SELECT SurveyId FROM EdxQualtrics.survey_meta WHERE course_display_name = '%s' AND responses_actual is not NULL" % courseId
-        svGen = list(self.mysqlDb.query(idgetter))
-        svIDs = "'" + "', '".join(svID for svID in svGen) + "'"
-
-        # Export survey data
         questionOutfile = os.path.join(self.fullTargetDir, '%s_question.csv' % courseNameNoSpaces)
-        questionQuery =   """
-                        SELECT *
-                        INTO OUTFILE '%s'
-                        FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' LINES TERMINATED BY '\n'
-                        FROM EdxQualtrics.question
-                        WHERE SurveyId IN (%s);
-                        """ % (questionOutfile, svIDs)
-        try:
-            self.mysqlDb.query(questionQuery).next()
-        except StopIteration:
-            pass
-
         choiceOutfile = os.path.join(self.fullTargetDir, '%s_choice.csv' % courseNameNoSpaces)
-        choiceQuery = """
-                        SELECT *
-                        INTO OUTFILE '%s'
-                        FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' LINES TERMINATED BY '\n'
-                        FROM EdxQualtrics.choice
-                        WHERE SurveyId IN (%s);
-                        """ % (choiceOutfile, svIDs)
-        try:
-            self.mysqlDb.query(choiceQuery).next()
-        except StopIteration:
-            pass
-
-        # Export response data
         responseOutfile = os.path.join(self.fullTargetDir, '%s_survey_responses.csv' % courseNameNoSpaces)
-        responseQuery = """
-                        SELECT SurveyId, ResponseId, QuestionNumber, AnswerChoiceId, Description
-                        INTO OUTFILE '%s'
-                        FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' LINES TERMINATED BY '\n'
-                        FROM EdxQualtrics.response
-                        WHERE SurveyId IN (%s);
-                        """ % (responseOutfile, svIDs)
-        try:
-            self.mysqlDb.query(responseQuery).next()
-        except StopIteration:
-            pass
-
-        # Export response metadata
         responsemetaOutfile = os.path.join(self.fullTargetDir, '%s_survey_response_metadata.csv' % courseNameNoSpaces)
-        responsemetaQuery = """
-                            SELECT SurveyID, ResponseID, anon_screen_name, Country, StartDate, EndDate
-                            INTO OUTFILE '%s'
-                            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' LINES TERMINATED BY '\n'
-                            FROM EdxQualtrics.response_metadata
-                            WHERE SurveyId IN (%s);
-                            """ % (responsemetaOutfile, svIDs)
-        try:
-            self.mysqlDb.query(responsemetaQuery).next()
-        except StopIteration:
-            pass
 
-        # Save information for printTableInfo() method to find:
+        # Stage the course's survey IDs in a table, so that
+        # the four dumps can join against it, rather than each
+        # shipping a list of IDs in an IN clause. The dumps run
+        # concurrently over their own connections, so the table
+        # can't be TEMPORARY; its name is unique to this request:
+        random.seed(self)
+        surveyIdTable = '%s.QualtricsSurveyIds_%s_%s' % (CourseCSVServer.SUPPORT_TABLES_DB,
+                                                         int(time.time()),
+                                                         random.randint(1,10000))
+        self.mysqlDb.execute("CREATE TABLE %s (SurveyId varchar(50) NOT NULL PRIMARY KEY) ENGINE=MEMORY " % surveyIdTable +\
+                             "SELECT DISTINCT SurveyId " +\
+                             "FROM EdxQualtrics.survey_meta " +\
+                             "WHERE course_display_name = '%s' AND responses_actual is not NULL;" % courseId)
+        try:
+            # Output file, columns, source table, and table alias of each dump:
+            dumps = [(questionOutfile, 'Question.*', 'EdxQualtrics.question', 'Question'),
+                     (choiceOutfile, 'Choice.*', 'EdxQualtrics.choice', 'Choice'),
+                     (responseOutfile,
+                      'Response.SurveyId, ResponseId, QuestionNumber, AnswerChoiceId, Description',
+                      'EdxQualtrics.response', 'Response'),
+                     (responsemetaOutfile,
+                      'ResponseMeta.SurveyID, ResponseID, anon_screen_name, Country, StartDate, EndDate',
+                      'EdxQualtrics.response_metadata', 'ResponseMeta')
+                     ]
+            # Source table --> error messages of its dump, if any:
+            dumpErrors = {}
+            dumpThreads = []
+            for (outFile, cols, sourceTable, alias) in dumps:
+                dumpQuery = "SELECT %s " % cols +\
+                            "INTO OUTFILE '%s' " % outFile +\
+                            "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' LINES TERMINATED BY '\n' " +\
+                            "FROM %s AS %s " % (sourceTable, alias) +\
+                            "JOIN %s AS SurveyIds ON %s.SurveyId = SurveyIds.SurveyId;" % (surveyIdTable, alias)
+                dumpErrors[sourceTable] = []
+                dumpThread = threading.Thread(target=self.runQueryOnOwnConnection, args=(dumpQuery, dumpErrors[sourceTable]))
+                dumpThread.start()
+                dumpThreads.append(dumpThread)
+            for dumpThread in dumpThreads:
+                dumpThread.join()
+        finally:
+            self.mysqlDb.execute('DROP TABLE IF EXISTS %s;' % surveyIdTable)
+
+        failedTables = [sourceTable for (outFile, cols, sourceTable, alias) in dumps if len(dumpErrors[sourceTable]) > 0] #@UnusedVariable
+        for sourceTable in failedTables:
+            self.mainThread.logErr('Survey table export from %s failed: %s' % (sourceTable, '; '.join(dumpErrors[sourceTable])))
+        if len(failedTables) > 0:
+            self.writeError('Survey export for %s failed for %s; the corresponding files are missing or incomplete.' %\
+                            (courseId, ', '.join(failedTables)))
+
+        # Save information for printTableInfo() method to find.
+        # Line counts and sample lines are gathered in one pass
+        # over each file:
         infoXchangeFile = tempfile.NamedTemporaryFile()
         self.infoTmpFiles['exportQualtrics'] = infoXchangeFile
 
-        infoXchangeFile.write(questionOutfile + '\n')
-        infoXchangeFile.write(str(self.getNumFileLines(questionOutfile)) + '\n')
-
-        infoXchangeFile.write(choiceOutfile + '\n')
-        infoXchangeFile.write(str(self.getNumFileLines(choiceOutfile)) + '\n')
-
-        infoXchangeFile.write(responseOutfile + '\n')
-        infoXchangeFile.write(str(self.getNumFileLines(responseOutfile)) + '\n')
-
-        infoXchangeFile.write(responsemetaOutfile + '\n')
-        infoXchangeFile.write(str(self.getNumFileLines(responsemetaOutfile)) + '\n')
+        sampleBatches = []
+        for outFile in [questionOutfile, choiceOutfile, responseOutfile, responsemetaOutfile]:
+            try:
+                (numLines, sampleLines) = self.getFileStats(outFile)
+            except IOError as e:
+                self.mainThread.logErr('Could not read survey table %s: %s' % (outFile, `e`))
+                (numLines, sampleLines) = (0, [])
+            infoXchangeFile.write(outFile + '\n')
+            infoXchangeFile.write(str(numLines) + '\n')
+            sampleBatches.append(''.join(sampleLines))
 
         # Add sample lines:
         infoXchangeFile.write('herrgottzemenschnochamal!\n')
-        try:
-            with open(questionOutfile, 'r') as fd:
-                head = []
-                for lineNum,line in enumerate(fd):
-                    head.append(line)
-                    if lineNum >= CourseCSVServer.NUM_OF_TABLE_SAMPLE_LINES:
-                        break
-                infoXchangeFile.write(''.join(head))
-            infoXchangeFile.write('herrgottzemenschnochamal!\n')
-            with open(choiceOutfile, 'r') as fd:
-                head = []
-                for lineNum,line in enumerate(fd):
-                    head.append(line)
-                    if lineNum >= CourseCSVServer.NUM_OF_TABLE_SAMPLE_LINES:
-                        break
-                infoXchangeFile.write(''.join(head))
-            infoXchangeFile.write('herrgottzemenschnochamal!\n')
-            with open(responseOutfile, 'r') as fd:
-                head = []
-                for lineNum,line in enumerate(fd):
-                    head.append(line)
-                    if lineNum >= CourseCSVServer.NUM_OF_TABLE_SAMPLE_LINES:
-                        break
-                infoXchangeFile.write(''.join(head))
-            infoXchangeFile.write('herrgottzemenschnochamal!\n')
-            with open(responsemetaOutfile, 'r') as fd:
-                head = []
-                for lineNum,line in enumerate(fd):
-                    head.append(line)
-                    if lineNum >= CourseCSVServer.NUM_OF_TABLE_SAMPLE_LINES:
-                        break
-                infoXchangeFile.write(''.join(head))
+        for sampleBatch in sampleBatches:
+            infoXchangeFile.write(sampleBatch)
             infoXchangeFile.write('herrgottzemenschnochamal!\n')
-        except IOError as e:
-            self.mainThread.logErr('Could not write result sample lines: %s' % `e`)
 
         return (questionOutfile, choiceOutfile, responseOutfile, responsemetaOutfile)
 
@@ -1574,6 +2233,11 @@ class DataServer(threading.Thread):
         courseId = detailDict.get('courseId', '')
         courseNameNoSpaces = string.replace(string.replace(courseId,' ',''), '/', '_')
 
+        if self.offerDirectDownloads(detailDict,
+                                     [('%s_FinalGrade.csv' % courseNameNoSpaces, None,
+                                       "FROM EdxPrivate.FinalGrade WHERE course_id = '%s'" % courseId)]):
+            return None
+
         # Export grades data
         gradesOutfile = os.path.join(self.fullTargetDir, '%s_FinalGrade.csv' % courseNameNoSpaces)
         gradesQuery =   """
@@ -1623,6 +2287,15 @@ class DataServer(threading.Thread):
         courseId = detailDict.get('courseId', '')
         courseNameNoSpaces = string.replace(string.replace(courseId,' ',''), '/', '_')
 
+        if self.offerDirectDownloads(detailDict,
+                                     [('%s_CourseInfo.csv' % courseNameNoSpaces, None,
+                                       "FROM Edx.CourseInfo WHERE course_display_name = '%s'" % courseId),
+                                      ('%s_EdxProblem.csv' % courseNameNoSpaces, None,
+                                       "FROM Edx.EdxProblem WHERE course_display_name = '%s'" % courseId),
+                                      ('%s_EdxVideo.csv' % courseNameNoSpaces, None,
+                                       "FROM Edx.EdxVideo WHERE course_display_name = '%s'" % courseId)]):
+            return None
+
         # Export course info data
         metadataOutfile = os.path.join(self.fullTargetDir, '%s_CourseInfo.csv' % courseNameNoSpaces)
         metadataQuery =   """
@@ -1715,7 +2388,19 @@ class DataServer(threading.Thread):
 
 
     def exportLearnerPerf(self, detailDict):
-        #***** To be completed:
+        '''
+        Exports learner performance statistics computed from ActivityGrade:
+        one table with a row per learner and course, and one with a row per
+        problem and course (see learnerPerformance.py). The courses are
+        those in detailDict['courseList'], if present, else those matching
+        the MySQL pattern detailDict['courseId']. All courses are fetched
+        in one query. Both tables are zip-encrypted together.
+
+        :param detailDict: dict of arguments; expected: 'courseId', 'cryptoPwd'; optional: 'courseList'
+        :type detailDict: {String : String}
+        :return full path of the zip file
+        :rtype String
+        '''
         if self.mysqlDb is None:
             self.writeError('In exportLearnerPerf: Database is disconnected; have to give up.')
             return
@@ -1731,79 +2416,49 @@ class DataServer(threading.Thread):
         else:
             courseNameNoSpaces = 'allCourses'
 
-        # File name for eventual final result:
+        # File names for eventual final result:
         outFileLearnerPerfName = os.path.join(self.fullTargetDir, '%s_learnerPerf.csv' % courseNameNoSpaces)
+        outFileProblemPerfName = os.path.join(self.fullTargetDir, '%s_problemPerf.csv' % courseNameNoSpaces)
 
-        # Get tmp file name for MySQL to write its
-        # result table to. Can't use built-in tempfile module,
-        # b/c it creates a file, which then has MySQL
-        # complain.
-        # Create a random num sequence seeded with
-        # this instance object:
-        random.seed(self)
-        tmpFileForLearnerPerf =  '/tmp/classExportLearnerPerfTmp' + str(time.time()) + str(random.randint(1,10000)) + '.csv'
-        # Ensure the file doesn't exist (highly unlikely):
-        try:
-            os.remove(tmpFileForLearnerPerf)
-        except OSError:
-            pass
+        courseNames = detailDict.get('courseList', None)
+        if courseNames is None:
+            courseNames = self.queryCourseNameList(courseId if courseId is not None else '%')
 
-        try:
-            for courseName in self.queryCourseNameList(courseId):
-                mySqlCmd = ' '.join([
-                                     "SELECT  anon_screen_name," +\
-                                              "COUNT(DISTINCT module_id) AS num_problems," +\
-                                              "AVG(percent_grade) AS avg_problem_grade,"+\
-                                              "AVG(num_attempts) AS avg_num_attempts" +\
-                                     "FROM ActivityGrade " +\
-                                     "WHERE num_attempts > -1 " +\
-                                       "AND course_display_name = '" + courseName + "' " +\
-                                     "GROUP BY anon_screen_name"
-                                     ])
-            for learnerPerfResultLine in self.mysqlDb.query(mySqlCmd):
-                tmpFileForLearnerPerf.write(','.join(learnerPerfResultLine) + '\n')
-
-            # Create the final output file, prepending the column
-            # name header:
-            with open(outFileLearnerPerfName, 'w') as fd:
-                fd.write('anon_screen_name,num_problems,avg_program_grade,avg_num_attempts\n')
-            self.catFiles(outFileLearnerPerfName, tmpFileForLearnerPerf, mode='a')
+        perfComputer = LearnerPerformanceComputer(self.mysqlDb)
+        perfComputer.fetch(courseNames=courseNames)
+        (learnerRows, problemRows) = perfComputer.compute()
+        with open(outFileLearnerPerfName, 'w') as fd:
+            perfComputer.writeCSV(learnerRows, LearnerPerformanceComputer.LEARNER_HEADER, fd)
+        with open(outFileProblemPerfName, 'w') as fd:
+            perfComputer.writeCSV(problemRows, LearnerPerformanceComputer.PROBLEM_HEADER, fd)
 
-        finally:
-            try:
-                os.remove(tmpFileForLearnerPerf)
-            except OSError:
-                pass
         # Save information for printTableInfo() method to find:
         infoXchangeFile = tempfile.NamedTemporaryFile()
-        self.infoTmpFiles['exportPIIDetails'] = infoXchangeFile
+        self.infoTmpFiles['exportLearnerPerf'] = infoXchangeFile
 
-        infoXchangeFile.write(outFileLearnerPerfName + '\n')
-        infoXchangeFile.write(str(self.getNumFileLines(outFileLearnerPerfName)) + '\n')
+        sampleBatches = []
+        for outFileName in [outFileLearnerPerfName, outFileProblemPerfName]:
+            (numLines, sampleLines) = self.getFileStats(outFileName)
+            infoXchangeFile.write(outFileName + '\n')
+            infoXchangeFile.write(str(numLines) + '\n')
+            sampleBatches.append(''.join(sampleLines))
 
         # Add sample lines:
         infoXchangeFile.write('herrgottzemenschnochamal!\n')
-        try:
-            with open(outFileLearnerPerfName, 'r') as fd:
-                head = []
-                for lineNum,line in enumerate(fd):
-                    head.append(line)
-                    if lineNum >= CourseCSVServer.NUM_OF_TABLE_SAMPLE_LINES:
-                        break
-                infoXchangeFile.write(''.join(head))
+        for sampleBatch in sampleBatches:
+            infoXchangeFile.write(sampleBatch)
             infoXchangeFile.write('herrgottzemenschnochamal!\n')
-        except IOError as e:
-            self.mainThread.logErr('Could not write result sample lines: %s' % `e`)
 
         # zip-encrypt the Zip file:
         cryptoPwd = detailDict.get("cryptoPwd", '')
-        self.zipFiles(outFileLearnerPerfName + '.zip', cryptoPwd, [outFileLearnerPerfName])
+        self.zipFiles(outFileLearnerPerfName + '.zip', cryptoPwd, [outFileLearnerPerfName, outFileProblemPerfName])
 
-        # Remove the un-encrypted original:
-        try:
-            os.remove(outFileLearnerPerfName)
-        except OSError:
-            pass
+        # Remove the un-encrypted originals:
+        for outFileName in [outFileLearnerPerfName, outFileProblemPerfName]:
+            try:
+                os.remove(outFileName)
+            except OSError:
+                pass
 
         return outFileLearnerPerfName + '.zip'
 
@@ -1909,23 +2564,38 @@ class DataServer(threading.Thread):
         except KeyError:
             self.mainThread.logErr('In exportQuarterlyReport: academic year was not included; could not export quarterly reqport.')
             return
-        if academic_year == '%' or quarter == '%':
-            self.mainThread.logErr('In exportQuarterlyReport: wildcards in quarter and academic year not yet supported.')
+
+        exporter = QuarterlyReportExporter(mySQLUser=self.currUser,mySQLPwd=self.mySQLPwd, parent=self, testing=self.testing)
+
+        # Quarter and year may each be lists, ranges, or '%'.
+        # Reports covering several quarters are computed in one
+        # run, with one row per quarter and course:
+        try:
+            periods = exporter.getPeriods(academic_year, quarter)
+        except ValueError as e:
+            self.writeError('In exportQuarterlyReport: %s' % str(e))
+            return
+        if len(periods) == 0:
+            self.writeError('In exportQuarterlyReport: no courses ran in academic year(s) %s.' % academic_year)
             return
+        multiPeriod = len(periods) > 1
+        if not multiPeriod:
+            (academic_year, quarter) = periods[0]
+        periodLabel = exporter.getPeriodLabel(periods)
 
         doEnrollment   = detailDict.get('quarterRepEnroll', False)
         doEngagement   = detailDict.get('quarterRepEngage', False)
         doDemographics = detailDict.get('quarterRepDemographics', False)
 
         mayOverwrite = detailDict.get('wipeExisting', False)
-        enrollmentFileName = 'enrollment_%s%s.csv' % (quarter, self.getCalendarYear(quarter, academic_year))
-        engagementFileName = 'engagement_%s%s.csv' % (quarter, self.getCalendarYear(quarter, academic_year))
-        demographicsFileName = 'demographics_%s%s.csv' % (quarter, self.getCalendarYear(quarter, academic_year))
-        courseIDMapFileName = 'courseidmap_%s%s.csv' % (quarter, self.getCalendarYear(quarter, academic_year))
+        enrollmentFileName = 'enrollment_%s.csv' % periodLabel
+        engagementFileName = 'engagement_%s.csv' % periodLabel
+        demographicsFileName = 'demographics_%s.csv' % periodLabel
+        courseIDMapFileName = 'courseidmap_%s.csv' % periodLabel
 
         # Create a Web accessible delivery directory early to check
         # whether target overwrite warning must be issued:
-        pickupDirNameRoot = 'QuarterlyRep_%s%s' % (quarter,self.getCalendarYear(quarter, academic_year))
+        pickupDirNameRoot = 'QuarterlyRep_%s' % periodLabel
         (pickupDir, existed) = self.constructCourseSpecificDeliveryDir(pickupDirNameRoot) #@UnusedVariable
         pickupEnrollmentPath = os.path.join(pickupDir, enrollmentFileName)
         pickupEngagementPath = os.path.join(pickupDir, engagementFileName)
@@ -1934,18 +2604,15 @@ class DataServer(threading.Thread):
 
         if doEnrollment and os.path.exists(pickupEnrollmentPath) and not mayOverwrite:
             # Did enrollment file exist (or maybe just engagement):
-            self.writeError("Quarterly report enrollment result for %s%s already existed, and Remove Previous Exports... was not checked." %\
-                            (quarter, self.getCalendarYear(quarter,academic_year)))
+            self.writeError("Quarterly report enrollment result for %s already existed, and Remove Previous Exports... was not checked." % periodLabel)
             return
 
         if doEngagement and os.path.exists(pickupEngagementPath) and not mayOverwrite:
-            self.writeError("Quarterly report engagement result for %s%s already existed, and Remove Previous Exports... was not checked." %\
-                            (quarter, self.getCalendarYear(quarter,academic_year)))
+            self.writeError("Quarterly report engagement result for %s already existed, and Remove Previous Exports... was not checked." % periodLabel)
             return
 
         if doDemographics and os.path.exists(pickupDemographicsPath) and not mayOverwrite:
-            self.writeError("Quarterly report demographics result for %s%s already existed, and Remove Previous Exports... was not checked." %\
-                            (quarter, self.getCalendarYear(quarter,academic_year)))
+            self.writeError("Quarterly report demographics result for %s already existed, and Remove Previous Exports... was not checked." % periodLabel)
             return
 
         # Write CourseIDMap table to file.
@@ -1965,14 +2632,15 @@ class DataServer(threading.Thread):
         infoXchangeFile = tempfile.NamedTemporaryFile(delete=True)
         self.infoTmpFiles['QuarterlyReport'] = infoXchangeFile
 
-        exporter = QuarterlyReportExporter(mySQLUser=self.currUser,mySQLPwd=self.mySQLPwd, parent=self, testing=self.testing)
-
         minEnrollment = detailDict.get('quarterRepMinEnroll', None) # Use default in createQuarterlyReport.sh
         byActivity   = detailDict.get('quarterRepByActivity', None)
 
         if doEnrollment:
             self.writeResult('progress', "Start enrollment computations...")
-            resFileNameEnroll = exporter.enrollment(academic_year, quarter, printResultFilePath=False, minEnrollment=minEnrollment, byActivity=byActivity)
+            if multiPeriod:
+                resFileNameEnroll = exporter.enrollmentForPeriods(periods, minEnrollment=minEnrollment, byActivity=byActivity)
+            else:
+                resFileNameEnroll = exporter.enrollment(academic_year, quarter, printResultFilePath=False, minEnrollment=minEnrollment, byActivity=byActivity)
             if resFileNameEnroll is None:
                 self.writeError('Call to quarterly exporter for enrollment failed. See error log.')
                 return
@@ -1984,7 +2652,10 @@ class DataServer(threading.Thread):
 
         if doEngagement:
             self.writeResult('progress', "Start engagement computations...")
-            resFileNameEngage = exporter.engagement(academic_year, quarter, printResultFilePath=False)
+            if multiPeriod:
+                resFileNameEngage = exporter.engagementForPeriods(periods, byActivity=byActivity)
+            else:
+                resFileNameEngage = exporter.engagement(academic_year, quarter, printResultFilePath=False)
             self.writeResult('progress', "Finished engagement computations.<br>")
             shutil.copyfile(resFileNameEngage, pickupEngagementPath)
             infoXchangeFile.write(pickupEngagementPath + '\n')
@@ -1992,7 +2663,10 @@ class DataServer(threading.Thread):
 
         if doDemographics:
             self.writeResult('progress', "Start demographics computations...")
-            resFileNameDemographics = exporter.demographics(academic_year, quarter, byActivity, printResultFilePath=False)
+            if multiPeriod:
+                resFileNameDemographics = exporter.demographicsForPeriods(periods, byActivity=byActivity)
+            else:
+                resFileNameDemographics = exporter.demographics(academic_year, quarter, byActivity, printResultFilePath=False)
             self.writeResult('progress', "Finished demographics computations.<br>")
             shutil.copyfile(resFileNameDemographics, pickupDemographicsPath)
             infoXchangeFile.write(pickupDemographicsPath + '\n')
@@ -2075,6 +2749,54 @@ class DataServer(threading.Thread):
         else:
             return sum(1 for line in open(fileFdOrPath)) #@UnusedVariable
 
+    def getFileStats(self, filePath):
+        '''
+        Read a file once, returning both its number of lines,
+        and its first NUM_OF_TABLE_SAMPLE_LINES + 1 lines as samples.
+
+        :param filePath: file to examine
+        :type filePath: String
+        :return: number of lines, and list of sample lines
+        :rtype: (int, [String])
+        '''
+        sampleLines = []
+        numLines = 0
+        with open(filePath, 'r') as fd:
+            for line in fd:
+                if numLines <= CourseCSVServer.NUM_OF_TABLE_SAMPLE_LINES:
+                    sampleLines.append(line)
+                numLines += 1
+        return (numLines, sampleLines)
+
+    def runQueryOnOwnConnection(self, query, errors):
+        '''
+        Run one query over a new MySQL connection, so that several
+        queries can run concurrently in separate threads. Intended
+        for statements whose results go to files via INTO OUTFILE.
+
+        :param query: the query to run
+        :type query: String
+        :param errors: list to which an error message is appended if the query fails
+        :type errors: [String]
+        '''
+        try:
+            if self.mySQLPwd is None:
+                mysqlDb = MySQLDB(user=self.currUser, db=CourseCSVServer.SUPPORT_TABLES_DB)
+            else:
+                mysqlDb = MySQLDB(user=self.currUser, passwd=self.mySQLPwd, db=CourseCSVServer.SUPPORT_TABLES_DB)
+        except Exception as e:
+            errors.append(`e`)
+            return
+        try:
+            try:
+                mysqlDb.query(query).next()
+            except StopIteration:
+                pass
+        except Exception as e:
+            errors.append(`e`)
+        finally:
+            mysqlDb.close()
+
     def zipFiles(self, destZipFileName, cryptoPwd, filePathsToZip):
         '''
         Creates an encrypted zip file.
@@ -2156,6 +2878,9 @@ class DataServer(threading.Thread):
         # with underscores:
         courseName = courseName.replace('/','_')
         self.fullTargetDir = os.path.join(CourseCSVServer.DELIVERY_HOME, courseName).strip()
+        # Existing and new deliveries count as recently used,
+        # and must not be evicted while we write to them:
+        self.protectDeliveryDir(self.fullTargetDir)
         if os.path.isdir(self.fullTargetDir):
             return (self.fullTargetDir, PreExisted.EXISTED)
         else:
@@ -2183,6 +2908,7 @@ class DataServer(threading.Thread):
         :rtype: (String, PreExisting)
         '''
         self.fullEmailTargetDir = os.path.join(CourseCSVServer.DELIVERY_HOME, 'Email_' + emailListStartDate)
+        self.protectDeliveryDir(self.fullEmailTargetDir)
         if os.path.isdir(self.fullEmailTargetDir):
             return (self.fullEmailTargetDir, PreExisted.EXISTED)
         else:
@@ -2311,6 +3037,10 @@ class DataServer(threading.Thread):
                         tblName = 'EdxProblem'
                     elif tableFileName.find('EdxVideo') > -1:
                         tblName = 'EdxVideo'
+                    elif tableFileName.find('learnerPerf') > -1:
+                        tblName = 'LearnerPerformance'
+                    elif tableFileName.find('problemPerf') > -1:
+                        tblName = 'ProblemPerformance'
                     else:
                         tblName = 'unknown table name'
 
@@ -2336,7 +3066,7 @@ class DataServer(threading.Thread):
         # (i.e. the 'CourseSubdir' in:
         # /home/dataman/Data/CustomExcerpts/CourseSubdir/<tables>.csv:)
         tableDir = os.path.basename(os.path.dirname(tableFileName))
-        url = "https://%s/researcher/%s/" % (self.mainThread.FQDN, tableDir)
+        url = self.getDeliveryURL(tableDir)
 
         return url
 
@@ -2411,6 +3141,18 @@ class DataServer(threading.Thread):
                  If includeEnrollment is True, append enrollment to each course name.
         :rtype: {[String] | None}
         '''
+        # Answer from the in-memory course catalog if possible.
+        # Unit tests use their own course tables, which the
+        # catalog does not know about:
+        if not self.testing:
+            try:
+                catalog = CourseCatalog.getInstance(self.currUser, self.mySQLPwd)
+                if includeEnrollment:
+                    return ['%s\t%s' % (courseName, enrollment) for (courseName, enrollment) in catalog.match(courseID)]
+                return [courseName for (courseName, enrollment) in catalog.match(courseID)] #@UnusedVariable
+            except Exception as e:
+                self.mainThread.logErr('Course catalog unavailable; querying db: %s' % `e`)
+
         courseNames = []
         # The --silent suppresses a column header line
         # from being displayed ('course_display_name' and 'enrollment'):
@@ -2440,6 +3182,10 @@ class DataServer(threading.Thread):
                     pass
             if len(courseName) > 0:
                 courseNames.append(courseName)
+        # Remove test and demo courses, as the catalog does.
+        # The unit test course names would not survive the filter:
+        if not self.testing:
+            courseNames = CourseNameFilter.getDefault().filter(courseNames)
         return courseNames
 
     def reportProgress(self):
@@ -2459,11 +3205,30 @@ class DataServer(threading.Thread):
             self.mainThread.logDebug('Sent %d heartbeats.' % numHeartbeatsSent)
             self.mainThread.latestHeartbeatLogTime = time.time()
 
-        msg = {"resp" : "progress", "args" : "."}
+        msg = {"resp" : "progress", "args" : self.throttleStateChange() or "."}
         if not self.testing:
             self.mainThread.write_message(msg)
         self.setTimer(CourseCSVServer.PROGRESS_INTERVAL)
 
+    def throttleStateChange(self):
+        '''
+        If exports became throttled because of database load, or
+        stopped being throttled, since the previous call, return
+        a progress message that says so; else return None.
+
+        :rtype: {String | None}
+        '''
+        admissionController = self.scheduler.admissionController
+        if admissionController is None:
+            return None
+        throttleState = admissionController.stateDescription()
+        if throttleState == self.lastThrottleState:
+            return None
+        self.lastThrottleState = throttleState
+        if throttleState is None:
+            return "<br>Database load is back to normal; exports are no longer throttled.<br>"
+        return "<br>%s<br>" % throttleState
+
     def getDeliveryURL(self, courseIdOrCustomExportFileName):
         '''
         Given a course ID string, return a URL from which
@@ -2484,7 +3249,10 @@ class DataServer(threading.Thread):
 #         dateFormat = '%d-%b-%y_%I-%M_%f'
 #         today = datetime.datetime.today().strftime(dateFormat)
 #         url = "https://%s/researcher/%s_%s" % (self.mainThread.FQDN, courseIdAsDirName, today)
-        url = "https://%s/researcher/%s/" % (self.mainThread.FQDN, courseIdAsDirName)
+        if CourseCSVServer.SERVE_DELIVERIES:
+            url = "https://%s:%s/researcher/%s/" % (self.mainThread.FQDN, CourseCSVServer.DELIVERY_PORT, courseIdAsDirName)
+        else:
+            url = "https://%s/researcher/%s/" % (self.mainThread.FQDN, courseIdAsDirName)
         return url
 
     def setTimer(self, time=None):
@@ -2553,7 +3321,14 @@ if __name__ == '__main__':
     print("Export file: %s" % __file__)
     #******************
 
-    application = tornado.web.Application([(r"/exportClass", CourseCSVServer),])
+    handlers = [(r"/exportClass", CourseCSVServer),
+                (r"/download/(.*)", DirectDownloadHandler),
+                ]
+    if CourseCSVServer.SERVE_DELIVERIES:
+        handlers.append((r"/researcher/(.*)", DeliveryHandler, {'root' : CourseCSVServer.DELIVERY_HOME,
+                                                                'storage' : DeliveryStorage(CourseCSVServer.DELIVERY_HOME),
+                                                                'credentials' : CourseCSVServer.getDeliveryCredentials()}))
+    application = tornado.web.Application(handlers)
     #application.listen(8080)
 
     (certFile,keyFile) = CourseCSVServer.getCertAndKey()
@@ -2562,7 +3337,7 @@ if __name__ == '__main__':
 
     http_server = tornado.httpserver.HTTPServer(application,ssl_options=sslArgsDict)
 
-    application.listen(8080, ssl_options=sslArgsDict)
+    application.listen(CourseCSVServer.DELIVERY_PORT, ssl_options=sslArgsDict)
 
     try:
         tornado.ioloop.IOLoop.instance().start()
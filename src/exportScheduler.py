@@ -0,0 +1,271 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+
+Orders export requests that wait for one of a limited number of
+run slots. Without ordering, a quick grades export starts right
+away, but competes for MySQL and disk with every long dump that
+is running, and no slot is ever held back for it.
+
+Among the waiting jobs, the one with the lowest effective cost
+runs next. A job's effective cost is its estimated remaining
+runtime (see costEstimator.py), multiplied by its requester's
+fair-share factor, and divided by its aging factor:
+
+    effective = remaining * (1 + usage / FAIR_SHARE_SECONDS)
+                          / (1 + waited / AGING_SECONDS)
+
+Usage is the export runtime a requester received recently (decaying
+with half-life USAGE_HALF_LIFE), plus the remaining runtime of the
+requester's running jobs. So short jobs go first (shortest job first),
+researchers who just received a lot of service wait behind those who
+did not, and every job's effective cost eventually drops below that of
+any newly arriving job, so that big jobs still run.
+
+Long jobs that consist of many per-course steps call yieldSlot()
+between courses. If they are estimated to run longer than
+YIELD_ABOVE_SECONDS, and an interactive-sized job (at most
+INTERACTIVE_SECONDS) is waiting while all slots are busy, they give
+up their slot, and queue again for the remainder of their work.
+
+If the scheduler has an admission controller (see
+admissionController.py), the number of slots shrinks while the
+database server is busy. Jobs of any size then give up their slots
+between courses until no more than the allowed number run.
+'''
+
+import threading
+import time
+
+
+class ExportJob(object):
+    '''
+    One export request, as seen by the scheduler.
+    '''
+
+    def __init__(self, requester, estimatedSeconds=None, description=''):
+        '''
+        :param requester: identity for fair sharing, such as the browser's IP address
+        :type requester: String
+        :param estimatedSeconds: estimated runtime, or None if unknown
+        :type estimatedSeconds: {int | float | None}
+        :param description: for log messages
+        :type description: String
+        '''
+        if estimatedSeconds is None:
+            estimatedSeconds = ExportScheduler.DEFAULT_SECONDS
+        self.requester = requester
+        self.estimatedSeconds = max(estimatedSeconds, ExportScheduler.MIN_SECONDS)
+        self.remainingSeconds = self.estimatedSeconds
+        self.description = description
+        self.enqueued = None
+        self.started = None
+
+    def __repr__(self):
+        return '<ExportJob %s of %s, %ss remaining>' % (self.description, self.requester, int(self.remainingSeconds))
+
+
+class ExportScheduler(object):
+    '''
+    Admits export jobs into a fixed number of run slots in order
+    of effective cost. Threads call admit() before running a job,
+    which blocks until the job's turn, and release() when done.
+    '''
+
+    # Number of exports that run at the same time:
+    MAX_RUNNING = 2
+
+    # Runtime assumed for jobs without an estimate, and the
+    # smallest runtime any estimate is taken to mean:
+    DEFAULT_SECONDS = 600
+    MIN_SECONDS = 1
+
+    # Waiting this long halves a job's effective cost:
+    AGING_SECONDS = 600
+
+    # Recent usage of this many seconds doubles
+    # the effective cost of a requester's jobs:
+    FAIR_SHARE_SECONDS = 1800
+
+    # Half-life of recorded usage:
+    USAGE_HALF_LIFE = 3600
+
+    # Running jobs estimated above YIELD_ABOVE_SECONDS give up their
+    # slot between courses to waiting jobs of at most INTERACTIVE_SECONDS:
+    ALLOW_YIELD = True
+    YIELD_ABOVE_SECONDS = 1800
+    INTERACTIVE_SECONDS = 300
+
+    # Seconds between re-evaluations of the queue by waiting
+    # threads; effective costs change as jobs age:
+    POLL_INTERVAL = 5
+
+    # The shared instance, and the lock that guards its creation:
+    _instance = None
+    _instanceLock = threading.Lock()
+
+    @classmethod
+    def getInstance(cls):
+        with cls._instanceLock:
+            if cls._instance is None:
+                cls._instance = ExportScheduler()
+            return cls._instance
+
+    def __init__(self, maxRunning=None, clock=time.time):
+        '''
+        :param maxRunning: number of run slots; default MAX_RUNNING
+        :type maxRunning: int
+        :param clock: function returning the current time in seconds
+        :type clock: function
+        '''
+        self.maxRunning = maxRunning if maxRunning is not None else ExportScheduler.MAX_RUNNING
+        self.clock = clock
+        self.waiting = []
+        self.running = []
+        # Requester --> (seconds of service, time it was recorded):
+        self.usage = {}
+        # Limits the number of slots under high database load; see
+        # admissionController.py. None for always maxRunning slots:
+        self.admissionController = None
+        self.condition = threading.Condition()
+
+    def admit(self, job, waitCallback=None):
+        '''
+        Queue the job, and block until it may run.
+
+        :param job: the job to run
+        :type job: ExportJob
+        :param waitCallback: called with the job's 1-based position in
+            the queue about every POLL_INTERVAL seconds while waiting
+        :type waitCallback: function
+        '''
+        with self.condition:
+            job.enqueued = self.clock()
+            self.waiting.append(job)
+            try:
+                while len(self.running) >= self.slotLimit() or self.nextJob() is not job:
+                    if waitCallback is not None:
+                        waitCallback(self.queuePosition(job))
+                    self.condition.wait(ExportScheduler.POLL_INTERVAL)
+            finally:
+                self.waiting.remove(job)
+            job.started = self.clock()
+            self.running.append(job)
+            # More slots may be free:
+            self.condition.notify_all()
+
+    def release(self, job):
+        '''
+        Free the job's slot, and charge its runtime to its requester.
+
+        :param job: a job previously admitted
+        :type job: ExportJob
+        '''
+        with self.condition:
+            if job not in self.running:
+                return
+            self.running.remove(job)
+            now = self.clock()
+            self.usage[job.requester] = (self.recentUsage(job.requester, now) + now - job.started, now)
+            self.condition.notify_all()
+
+    def yieldSlot(self, job, fractionDone, waitCallback=None):
+        '''
+        Called by running jobs between steps. If shouldYield(),
+        give the slot to a waiting job, and queue again for the
+        remaining work.
+
+        :param job: a running job
+        :type job: ExportJob
+        :param fractionDone: fraction of the job's work that is done
+        :type fractionDone: float
+        :param waitCallback: see admit()
+        :type waitCallback: function
+        :return: True if the job yielded
+        :rtype: Boolean
+        '''
+        with self.condition:
+            job.remainingSeconds = max(job.estimatedSeconds * (1.0 - fractionDone), ExportScheduler.MIN_SECONDS)
+            if not self.shouldYield(job):
+                return False
+            self.release(job)
+            self.admit(job, waitCallback)
+        return True
+
+    def shouldYield(self, job):
+        '''
+        Whether a running job should give up its slot: more jobs
+        run than the admission controller allows, or the job is
+        large, all slots are taken, and an interactive-sized job
+        is waiting.
+
+        :rtype: Boolean
+        '''
+        with self.condition:
+            slotLimit = self.slotLimit()
+            if len(self.running) > slotLimit:
+                return True
+            if not ExportScheduler.ALLOW_YIELD or job.estimatedSeconds <= ExportScheduler.YIELD_ABOVE_SECONDS:
+                return False
+            if len(self.running) < slotLimit:
+                return False
+            return any(waitingJob.remainingSeconds <= ExportScheduler.INTERACTIVE_SECONDS for waitingJob in self.waiting)
+
+    def slotLimit(self):
+        '''
+        Return the number of jobs that may run now.
+
+        :rtype: int
+        '''
+        if self.admissionController is None:
+            return self.maxRunning
+        return self.admissionController.allowedSlots(self.maxRunning)
+
+    def nextJob(self):
+        '''
+        Return the waiting job with the lowest effective cost, or None.
+
+        :rtype: {ExportJob | None}
+        '''
+        with self.condition:
+            if len(self.waiting) == 0:
+                return None
+            now = self.clock()
+            return min(self.waiting, key=lambda job: (self.effectiveCost(job, now), job.enqueued))
+
+    def queuePosition(self, job):
+        '''
+        Return the 1-based position of a waiting job in
+        the current order, or 0 if it is not waiting.
+
+        :rtype: int
+        '''
+        with self.condition:
+            now = self.clock()
+            ordered = sorted(self.waiting, key=lambda waitingJob: (self.effectiveCost(waitingJob, now), waitingJob.enqueued))
+            return ordered.index(job) + 1 if job in ordered else 0
+
+    def effectiveCost(self, job, now):
+        '''
+        Return the job's remaining runtime, adjusted for its
+        requester's fair share and for the time it has waited.
+        Caller holds self.condition.
+
+        :rtype: float
+        '''
+        usage = self.recentUsage(job.requester, now) +\
+                sum(runningJob.remainingSeconds for runningJob in self.running if runningJob.requester == job.requester)
+        fairShare = 1.0 + usage / float(ExportScheduler.FAIR_SHARE_SECONDS)
+        aging = 1.0 + (now - job.enqueued) / float(ExportScheduler.AGING_SECONDS)
+        return job.remainingSeconds * fairShare / aging
+
+    def recentUsage(self, requester, now):
+        '''
+        Return the requester's recorded usage, decayed to now.
+        Caller holds self.condition.
+
+        :rtype: float
+        '''
+        (seconds, recorded) = self.usage.get(requester, (0.0, now))
+        return seconds * 0.5 ** ((now - recorded) / float(ExportScheduler.USAGE_HALF_LIFE))
@@ -0,0 +1,429 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+
+Index advisor for the export query workload. All exporters
+select rows of one course from large tables. Whether MySQL
+can use an index for these selections determines whether an
+export takes seconds or hours. This module knows the shape
+of each query the exporters issue (exportClass.py and the
+scripts in ../scripts). For a given sample course it runs
+EXPLAIN on each shape, and reports:
+
+   - shapes for which MySQL plans a full table scan (access type ALL),
+     or uses no index at all,
+   - tables that lack an index with the shape's filter columns
+     as a leading prefix (the recommended composite index).
+
+The shapes in QUERY_SHAPES are hand-written approximations of the
+exporters' queries, not derived from them: each keeps the table and
+the WHERE conditions that decide the access path, but not the joins,
+select lists, or OUTFILE clauses. When an exporter's filter on one
+of these tables changes, its shape must be updated to match.
+
+With --create, the recommended indexes are added, and each
+affected shape is timed before and after index creation. Each
+timing is of a second, warm run of the query, so that before and
+after are not skewed by which table pages happen to be cached.
+
+Usage from the command line:
+
+    indexAdvisor.py [-u user][-p][-w pwd][-q quarter][--create] courseDisplayName
+'''
+
+import argparse
+from collections import OrderedDict
+import getpass
+import os
+import sys
+import time
+
+from pymysql_utils.pymysql_utils import MySQLDB
+
+
+# anon_screen_name that the exporters exclude from
+# every table (the edX staff test user):
+EXCLUDED_ANON_SCREEN_NAME = '9c1185a5c5e9fc54612808977ee8f548b2258d31'
+
+class QueryShape(object):
+    '''
+    One kind of query issued by an exporter: the table it
+    reads, the WHERE clause with placeholders for sample
+    values, and the columns an index needs to lead with
+    for the query to be answered from the index.
+    '''
+
+    def __init__(self, name, db, table, whereClause, indexCols, usedBy):
+        '''
+        :param name: short identifier of the shape, used in reports
+        :type name: String
+        :param db: database of the table
+        :type db: String
+        :param table: table the query reads
+        :type table: String
+        :param whereClause: WHERE clause without the 'WHERE' keyword. May
+            contain %(course)s, %(quarter)s, and %(surveyId)s placeholders.
+        :type whereClause: String
+        :param indexCols: columns of the recommended composite index, in order
+        :type indexCols: [String]
+        :param usedBy: exporter that issues the query, for the report
+        :type usedBy: String
+        '''
+        self.name = name
+        self.db = db
+        self.table = table
+        self.whereClause = whereClause
+        self.indexCols = indexCols
+        self.usedBy = usedBy
+
+    def fullTableName(self):
+        return '%s.%s' % (self.db, self.table)
+
+    def recommendedIndexName(self):
+        return 'exportIdx_' + '_'.join(self.indexCols)
+
+    def instantiate(self, sampleValues, countOnly=False):
+        '''
+        Return the query as a SELECT statement with sample
+        values filled in. If countOnly is True, the statement
+        is a SELECT COUNT(*), which has the same access path as
+        the exporter's query, but does not ship rows to the client.
+        '''
+        where = self.whereClause % sampleValues
+        selectPart = 'SELECT COUNT(*)' if countOnly else 'SELECT *'
+        return '%s FROM %s WHERE %s' % (selectPart, self.fullTableName(), where)
+
+# The query shapes of all exporters. Where the same table is
+# filtered in the same way by several exporters, there is only
+# one shape:
+QUERY_SHAPES = [
+    QueryShape('basicEventXtract', 'Edx', 'EventXtract',
+               "course_display_name LIKE '%(course)s' AND quarter = '%(quarter)s' " +\
+               "AND anon_screen_name != '" + EXCLUDED_ANON_SCREEN_NAME + "'",
+               ['course_display_name', 'quarter'],
+               'makeCourseCSVs.sh, engagement'),
+    QueryShape('basicActivityGrade', 'Edx', 'ActivityGrade',
+               "course_display_name LIKE '%(course)s' " +\
+               "AND anon_screen_name != '" + EXCLUDED_ANON_SCREEN_NAME + "'",
+               ['course_display_name'],
+               'makeCourseCSVs.sh, exportLearnerPerf'),
+    QueryShape('basicVideoInteraction', 'Edx', 'VideoInteraction',
+               "course_display_name LIKE '%(course)s' AND quarter = '%(quarter)s' " +\
+               "AND anon_screen_name != '" + EXCLUDED_ANON_SCREEN_NAME + "'",
+               ['course_display_name', 'quarter'],
+               'makeCourseCSVs.sh'),
+    QueryShape('forum', 'EdxForum', 'contents',
+               "course_display_name LIKE '%(course)s'",
+               ['course_display_name'],
+               'makeForumCSV.sh'),
+    QueryShape('abExperiment', 'Edx', 'ABExperiment',
+               "course_display_name = '%(course)s'",
+               ['course_display_name'],
+               'exportABExperiment'),
+    QueryShape('finalGrade', 'EdxPrivate', 'FinalGrade',
+               "course_id = '%(course)s'",
+               ['course_id'],
+               'exportGrades'),
+    QueryShape('courseInfo', 'Edx', 'CourseInfo',
+               "course_display_name = '%(course)s'",
+               ['course_display_name'],
+               'exportMetadata, createQuarterlyReport.sh'),
+    QueryShape('edxProblem', 'Edx', 'EdxProblem',
+               "course_display_name = '%(course)s'",
+               ['course_display_name'],
+               'exportMetadata'),
+    QueryShape('edxVideo', 'Edx', 'EdxVideo',
+               "course_display_name = '%(course)s'",
+               ['course_display_name'],
+               'exportMetadata'),
+    QueryShape('surveyMeta', 'EdxQualtrics', 'survey_meta',
+               "course_display_name = '%(course)s' AND responses_actual IS NOT NULL",
+               ['course_display_name'],
+               'exportQualtrics'),
+    QueryShape('surveyQuestion', 'EdxQualtrics', 'question',
+               "SurveyId IN ('%(surveyId)s')",
+               ['SurveyId'],
+               'exportQualtrics'),
+    QueryShape('surveyChoice', 'EdxQualtrics', 'choice',
+               "SurveyId IN ('%(surveyId)s')",
+               ['SurveyId'],
+               'exportQualtrics'),
+    QueryShape('surveyResponse', 'EdxQualtrics', 'response',
+               "SurveyId IN ('%(surveyId)s')",
+               ['SurveyId'],
+               'exportQualtrics'),
+    QueryShape('surveyResponseMetadata', 'EdxQualtrics', 'response_metadata',
+               "SurveyId IN ('%(surveyId)s')",
+               ['SurveyId'],
+               'exportQualtrics'),
+    QueryShape('trueEnrollment', 'edxprod', 'true_courseenrollment',
+               "course_display_name LIKE '%(course)s'",
+               ['course_display_name'],
+               'exportDemographics, searchCourseDisplayNames.sh, createQuarterlyReport.sh'),
+    QueryShape('studentEnrollment', 'edxprod', 'student_courseenrollment',
+               "course_id = '%(course)s'",
+               ['course_id'],
+               'exportPIIDetails'),
+    ]
+
+def explainRowToDict(explainRow):
+    '''
+    Turn one row of EXPLAIN output into a dict. MySQL 5.7
+    added the 'partitions' and 'filtered' columns to the
+    10 columns of earlier versions; both layouts are accepted.
+
+    :param explainRow: one row as returned by MySQLDB.query()
+    :type explainRow: tuple
+    :return: dict with keys 'table', 'type', 'possible_keys', 'key', 'rows', and 'Extra'
+    :rtype: {String : <any>}
+    '''
+    if len(explainRow) >= 12:
+        (theId, selectType, table, partitions, accessType, possibleKeys, #@UnusedVariable
+         key, keyLen, ref, rows, filtered, extra) = explainRow[:12]   #@UnusedVariable
+    else:
+        (theId, selectType, table, accessType, possibleKeys, #@UnusedVariable
+         key, keyLen, ref, rows, extra) = explainRow[:10]    #@UnusedVariable
+    return {'table'         : table,
+            'type'          : accessType,
+            'possible_keys' : possibleKeys,
+            'key'           : key,
+            'rows'          : rows,
+            'Extra'         : extra
+            }
+
+def isFullScan(explainDict):
+    '''
+    Return True if the EXPLAIN row describes a
+    read of the whole table or of a whole index.
+    '''
+    return explainDict['type'] in ['ALL', 'index'] or explainDict['key'] is None
+
+def hasIndexPrefix(tableIndexes, indexCols):
+    '''
+    Return True if any of a table's indexes starts with
+    the given columns, in order.
+
+    :param tableIndexes: map from index name to the index's column names in order
+    :type tableIndexes: {String : [String]}
+    :param indexCols: wanted leading columns
+    :type indexCols: [String]
+    :rtype: Boolean
+    '''
+    wanted = [col.lower() for col in indexCols]
+    for cols in tableIndexes.values():
+        if [col.lower() for col in cols[:len(wanted)]] == wanted:
+            return True
+    return False
+
+class IndexAdvisor(object):
+    '''
+    Runs EXPLAIN on all QUERY_SHAPES, and optionally creates
+    the recommended indexes.
+    '''
+
+    def __init__(self, mysqlDb, course, quarter=None, shapes=None):
+        '''
+        :param mysqlDb: open connection
+        :type mysqlDb: MySQLDB
+        :param course: sample course_display_name for the query shapes
+        :type course: String
+        :param quarter: sample quarter, such as 'fall2014'. If None,
+            the quarter of the course in CourseInfo is used.
+        :type quarter: {String | None}
+        :param shapes: the shapes to examine; default: QUERY_SHAPES
+        :type shapes: [QueryShape]
+        '''
+        self.mysqlDb = mysqlDb
+        self.shapes = shapes if shapes is not None else QUERY_SHAPES
+        self.sampleValues = {'course'   : course,
+                             'quarter'  : quarter if quarter is not None else self.findQuarter(course),
+                             'surveyId' : self.findSurveyId(course)
+                             }
+
+    def findQuarter(self, course):
+        try:
+            (quarter, academicYear) = self.mysqlDb.query("SELECT quarter, academic_year " +\
+                                                         "FROM Edx.CourseInfo " +\
+                                                         "WHERE course_display_name = '%s';" % course).next()
+            return '%s%s' % (quarter, academicYear)
+        except StopIteration:
+            return 'fall2014'
+
+    def findSurveyId(self, course):
+        try:
+            return self.mysqlDb.query("SELECT SurveyId " +\
+                                      "FROM EdxQualtrics.survey_meta " +\
+                                      "WHERE course_display_name = '%s';" % course).next()[0]
+        except StopIteration:
+            # EXPLAIN works just as well with a SurveyId that does not exist:
+            return 'SV_none'
+
+    def getTableIndexes(self, db, table):
+        '''
+        Return a dict mapping each index name of the given table
+        to the list of its columns, in index order.
+        '''
+        indexes = {}
+        query = "SELECT INDEX_NAME, COLUMN_NAME " +\
+                "FROM information_schema.STATISTICS " +\
+                "WHERE TABLE_SCHEMA = '%s' AND TABLE_NAME = '%s' " % (db, table) +\
+                "ORDER BY INDEX_NAME, SEQ_IN_INDEX;"
+        for (indexName, colName) in self.mysqlDb.query(query):
+            indexes.setdefault(indexName, []).append(colName)
+        return indexes
+
+    def explain(self, shape):
+        '''
+        Run EXPLAIN on one shape.
+        :return: list of EXPLAIN rows as dicts (see explainRowToDict())
+        :rtype: [{String : <any>}]
+        '''
+        return [explainRowToDict(row)
+                for row in self.mysqlDb.query('EXPLAIN ' + shape.instantiate(self.sampleValues))]
+
+    def timeShape(self, shape):
+        '''
+        Return the number of seconds a COUNT(*) version of
+        the shape's query takes with the sample values. The
+        query is run twice, and the second, warm run is timed.
+        SQL_NO_CACHE keeps the second run from being answered
+        from the query cache.
+        '''
+        query = shape.instantiate(self.sampleValues, countOnly=True).replace('SELECT ', 'SELECT SQL_NO_CACHE ', 1)
+        for row in self.mysqlDb.query(query): #@UnusedVariable
+            pass
+        startTime = time.time()
+        for row in self.mysqlDb.query(query): #@UnusedVariable
+            pass
+        return time.time() - startTime
+
+    def analyze(self):
+        '''
+        Examine all shapes.
+        :return: list of findings, one dict per shape, with keys 'shape',
+            'fullScan', 'plan', 'missingIndex', and 'error'. Shapes whose
+            table does not exist have only 'shape' and 'error'.
+        :rtype: [{String : <any>}]
+        '''
+        findings = []
+        for shape in self.shapes:
+            try:
+                plan = self.explain(shape)
+                tableIndexes = self.getTableIndexes(shape.db, shape.table)
+            except Exception as e:
+                findings.append({'shape' : shape, 'error' : `e`})
+                continue
+            findings.append({'shape'        : shape,
+                             'plan'         : plan,
+                             'fullScan'     : any(isFullScan(row) for row in plan),
+                             'missingIndex' : not hasIndexPrefix(tableIndexes, shape.indexCols),
+                             'error'        : None
+                             })
+        return findings
+
+    def createRecommendedIndexes(self, findings):
+        '''
+        Add the recommended index for each finding that reports
+        one missing. Each shape on an affected table is timed before
+        and after. Several shapes may share one recommended index;
+        it is created only once, after all of them were timed.
+
+        :param findings: result of analyze()
+        :type findings: [{String : <any>}]
+        :return: list of (shapeName, indexDDL, secondsBefore, secondsAfter)
+        :rtype: [(String, String, float, float)]
+        '''
+        shapesByDDL = OrderedDict()
+        for finding in findings:
+            if finding['error'] is not None or not finding['missingIndex']:
+                continue
+            shape = finding['shape']
+            ddl = 'ALTER TABLE %s ADD INDEX %s (%s);' % (shape.fullTableName(),
+                                                        shape.recommendedIndexName(),
+                                                        ','.join(shape.indexCols))
+            shapesByDDL.setdefault(ddl, []).append(shape)
+        timings = []
+        for (ddl, shapes) in shapesByDDL.items():
+            secondsBefore = [self.timeShape(shape) for shape in shapes]
+            self.mysqlDb.execute(ddl)
+            for (shape, seconds) in zip(shapes, secondsBefore):
+                timings.append((shape.name, ddl, seconds, self.timeShape(shape)))
+        return timings
+
+    def report(self, findings, timings=None, outFd=sys.stdout):
+        '''
+        Write a human readable summary of analyze() and, if
+        available, createRecommendedIndexes() results.
+        '''
+        for finding in findings:
+            shape = finding['shape']
+            if finding['error'] is not None:
+                outFd.write('%-24s %-38s could not examine: %s\n' % (shape.name, shape.fullTableName(), finding['error']))
+                continue
+            keys = ','.join(str(row['key']) for row in finding['plan'])
+            rows = sum(row['rows'] or 0 for row in finding['plan'])
+            status = []
+            if finding['fullScan']:
+                status.append('FULL SCAN')
+            if finding['missingIndex']:
+                status.append('MISSING INDEX (%s)' % ','.join(shape.indexCols))
+            outFd.write('%-24s %-38s key=%-20s rows~%-10s %s\n' % (shape.name,
+                                                                     shape.fullTableName(),
+                                                                     keys,
+                                                                     rows,
+                                                                     ' '.join(status) if len(status) > 0 else 'OK'))
+            outFd.write('    used by: %s\n' % shape.usedBy)
+        if timings:
+            outFd.write('\nCreated indexes:\n')
+            for (shapeName, ddl, secondsBefore, secondsAfter) in timings:
+                outFd.write('%-24s %8.2fs -> %8.2fs   %s\n' % (shapeName, secondsBefore, secondsAfter, ddl))
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(prog=os.path.basename(sys.argv[0]), formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('-u', '--user',
+                        action='store',
+                        help='User ID that is to log into MySQL. Default: the user who is invoking this script.')
+    parser.add_argument('-p', '--pwd',
+                        action='store_true',
+                        help='Request to be asked for pwd for operating MySQL;\n' +\
+                             '    default: content of scriptInvokingUser$Home/.ssh/mysql')
+    parser.add_argument('-w', '--password',
+                        action='store',
+                        help='User explicitly provided password to log into MySQL.')
+    parser.add_argument('-q', '--quarter',
+                        action='store',
+                        help="Sample quarter, such as fall2014. Default: the course's quarter in CourseInfo.")
+    parser.add_argument('--create',
+                        action='store_true',
+                        help='Create the recommended indexes, and report query times before and after.')
+    parser.add_argument('course',
+                        action='store',
+                        help='Sample course_display_name with which to instantiate the query shapes.')
+
+    args = parser.parse_args();
+
+    user = args.user if args.user is not None else getpass.getuser()
+    if args.password and args.pwd:
+        raise ValueError('Use either -p, or -w, but not both.')
+    if args.pwd:
+        pwd = getpass.getpass("Enter %s's MySQL password on localhost: " % user)
+    elif args.password:
+        pwd = args.password
+    else:
+        try:
+            with open(os.path.join(os.path.expanduser('~' + user), '.ssh/mysql')) as fd:
+                pwd = fd.readline().strip()
+        except IOError:
+            pwd = ''
+
+    mysqlDb = MySQLDB(user=user, passwd=pwd, db='Edx')
+    try:
+        advisor = IndexAdvisor(mysqlDb, args.course, args.quarter)
+        findings = advisor.analyze()
+        timings = advisor.createRecommendedIndexes(findings) if args.create else None
+        advisor.report(findings, timings)
+    finally:
+        mysqlDb.close()
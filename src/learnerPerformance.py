@@ -0,0 +1,285 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+
+Computes learner performance statistics from ActivityGrade
+for one or many courses in a single pass. Rows are fetched in
+bulk, converted to NumPy arrays batch by batch, and aggregated
+with vectorized group operations (bincount, lexsort, reduceat)
+rather than with one GROUP BY query per course.
+
+Two tables result:
+
+   - per learner and course: number of problems, total and mean
+     attempts, mean, variance, and quartiles of percent_grade,
+     and first/last submission times.
+   - per problem and course: the same statistics over all learners
+     who attempted the problem.
+
+Variances are population variances. Grade statistics ignore
+rows without a percent_grade; groups without any grade get
+empty cells.
+'''
+
+import datetime
+
+import numpy as np
+
+
+# anon_screen_name that the exporters exclude from
+# every table (the edX staff test user):
+EXCLUDED_ANON_SCREEN_NAME = '9c1185a5c5e9fc54612808977ee8f548b2258d31'
+
+def groupStats(groupIds, values, numGroups, quantiles=(0.25, 0.5, 0.75)):
+    '''
+    Vectorized count, mean, population variance, and quantiles
+    of values per group. NaN values are ignored. Quantiles are
+    linearly interpolated, as in numpy.percentile().
+
+    :param groupIds: group number of each value, in range(numGroups)
+    :type groupIds: numpy.ndarray of int
+    :param values: the values
+    :type values: numpy.ndarray of float
+    :param numGroups: number of groups
+    :type numGroups: int
+    :param quantiles: quantiles to compute, each between 0 and 1
+    :type quantiles: (float)
+    :return: dict with 'count', 'mean', 'var', and one array per quantile
+        under key 'q<quantile>', e.g. 'q0.5'. Arrays are indexed by group number;
+        groups without values have count 0 and NaN statistics.
+    :rtype: {String : numpy.ndarray}
+    '''
+    valid = ~np.isnan(values)
+    groupIds = groupIds[valid]
+    values = values[valid]
+
+    counts = np.bincount(groupIds, minlength=numGroups)
+    sums = np.bincount(groupIds, weights=values, minlength=numGroups)
+    sumSquares = np.bincount(groupIds, weights=values * values, minlength=numGroups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+        variances = np.maximum(sumSquares / counts - means * means, 0.)
+
+    result = {'count' : counts, 'mean' : means, 'var' : variances}
+
+    # Sort by group, and by value within each group. Then
+    # each group's values occupy one contiguous, sorted run,
+    # which starts at the cumulative count of all earlier groups:
+    order = np.lexsort((values, groupIds))
+    sortedValues = values[order]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    hasValues = counts > 0
+    for quantile in quantiles:
+        pos = quantile * (counts - 1)
+        lowPos = np.floor(pos).astype(np.int64)
+        highPos = np.ceil(pos).astype(np.int64)
+        fraction = pos - lowPos
+        quantileValues = np.full(numGroups, np.nan)
+        lowVals = sortedValues[(starts + lowPos)[hasValues]]
+        highVals = sortedValues[(starts + highPos)[hasValues]]
+        quantileValues[hasValues] = lowVals + (highVals - lowVals) * fraction[hasValues]
+        result['q%s' % quantile] = quantileValues
+    return result
+
+def groupMinMax(groupIds, values, numGroups):
+    '''
+    Minimum and maximum of values per group, ignoring NaNs.
+
+    :return: arrays of minima and maxima, indexed by group number;
+        NaN for groups without values.
+    :rtype: (numpy.ndarray, numpy.ndarray)
+    '''
+    valid = ~np.isnan(values)
+    groupIds = groupIds[valid]
+    values = values[valid]
+    minima = np.full(numGroups, np.nan)
+    maxima = np.full(numGroups, np.nan)
+    if len(values) == 0:
+        return (minima, maxima)
+    order = np.argsort(groupIds, kind='mergesort')
+    sortedGroups = groupIds[order]
+    sortedValues = values[order]
+    # Index where each group's run begins:
+    runStarts = np.concatenate(([0], np.nonzero(np.diff(sortedGroups))[0] + 1))
+    runGroups = sortedGroups[runStarts]
+    minima[runGroups] = np.minimum.reduceat(sortedValues, runStarts)
+    maxima[runGroups] = np.maximum.reduceat(sortedValues, runStarts)
+    return (minima, maxima)
+
+
+class LearnerPerformanceComputer(object):
+    '''
+    Fetches ActivityGrade rows for a set of courses, and
+    computes per-learner and per-problem statistics.
+    '''
+
+    # Number of rows converted to arrays at a time:
+    BATCH_SIZE = 100000
+
+    LEARNER_HEADER = ['course_display_name', 'anon_screen_name', 'num_problems',
+                      'total_attempts', 'avg_num_attempts',
+                      'avg_percent_grade', 'var_percent_grade',
+                      'percent_grade_q25', 'median_percent_grade', 'percent_grade_q75',
+                      'first_submit', 'last_submit']
+
+    PROBLEM_HEADER = ['course_display_name', 'module_id', 'num_learners',
+                      'total_attempts', 'avg_num_attempts',
+                      'avg_percent_grade', 'var_percent_grade',
+                      'percent_grade_q25', 'median_percent_grade', 'percent_grade_q75',
+                      'first_submit', 'last_submit']
+
+    def __init__(self, mysqlDb=None, batchSize=None):
+        '''
+        :param mysqlDb: open connection; may be None if rows are
+            passed to addRows() directly
+        :type mysqlDb: {MySQLDB | None}
+        :param batchSize: number of rows converted to arrays at a time
+        :type batchSize: int
+        '''
+        self.mysqlDb = mysqlDb
+        self.batchSize = batchSize if batchSize is not None else LearnerPerformanceComputer.BATCH_SIZE
+        # Maps from (course, anon_screen_name), and (course, module_id)
+        # to dense integer ids:
+        self.learnerIds = {}
+        self.problemIds = {}
+        self.batches = []
+
+    def fetch(self, courseNames=None, quarter=None, academicYear=None):
+        '''
+        Fetch and add the ActivityGrade rows of the given courses,
+        or of all courses that ran in the given quarter and academic
+        year, in a single query.
+
+        :param courseNames: explicit list of course_display_name
+        :type courseNames: {[String] | None}
+        :param quarter: fall, winter, spring, or summer; used if courseNames is None
+        :type quarter: {String | None}
+        :param academicYear: academic year of the quarter
+        :type academicYear: {int | None}
+        '''
+        if courseNames is not None:
+            if len(courseNames) == 0:
+                return
+            courseCondition = "course_display_name IN (%s)" % ','.join(["'%s'" % courseName for courseName in courseNames])
+        elif quarter is not None and academicYear is not None:
+            courseCondition = "course_display_name IN (SELECT course_display_name " +\
+                              "FROM Edx.CourseInfo " +\
+                              "WHERE quarter = '%s' AND academic_year = %s)" % (quarter, academicYear)
+        else:
+            raise ValueError('Need either course names, or quarter and academic year.')
+        query = "SELECT course_display_name, anon_screen_name, module_id, " +\
+                "percent_grade, num_attempts, " +\
+                "UNIX_TIMESTAMP(first_submit), UNIX_TIMESTAMP(last_submit) " +\
+                "FROM Edx.ActivityGrade " +\
+                "WHERE num_attempts > -1 " +\
+                "AND anon_screen_name != '%s' " % EXCLUDED_ANON_SCREEN_NAME +\
+                "AND %s;" % courseCondition
+        self.addRows(self.mysqlDb.query(query))
+
+    def addRows(self, rows):
+        '''
+        Add rows of the form (course_display_name, anon_screen_name,
+        module_id, percent_grade, num_attempts, firstSubmitEpochSecs,
+        lastSubmitEpochSecs). Any of the numeric fields may be None.
+
+        :param rows: iterable of row tuples
+        :type rows: iterable
+        '''
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batchSize:
+                self.addBatch(batch)
+                batch = []
+        if len(batch) > 0:
+            self.addBatch(batch)
+
+    def addBatch(self, batch):
+        learnerIds = self.learnerIds
+        problemIds = self.problemIds
+        learnerCol = np.empty(len(batch), dtype=np.int64)
+        problemCol = np.empty(len(batch), dtype=np.int64)
+        for (rowNum, row) in enumerate(batch):
+            learnerKey = (row[0], row[1])
+            problemKey = (row[0], row[2])
+            learnerCol[rowNum] = learnerIds.setdefault(learnerKey, len(learnerIds))
+            problemCol[rowNum] = problemIds.setdefault(problemKey, len(problemIds))
+        # None becomes NaN in float arrays:
+        numericCols = np.array([row[3:7] for row in batch], dtype=np.float64)
+        self.batches.append((learnerCol, problemCol, numericCols))
+
+    def compute(self):
+        '''
+        Compute the statistics over all rows added so far.
+
+        :return: lists of learner rows, and of problem rows, each
+            as described by LEARNER_HEADER and PROBLEM_HEADER, sorted
+            by course and learner/problem.
+        :rtype: ([[<any>]], [[<any>]])
+        '''
+        if len(self.batches) == 0:
+            return ([], [])
+        learnerCol = np.concatenate([batch[0] for batch in self.batches])
+        problemCol = np.concatenate([batch[1] for batch in self.batches])
+        numericCols = np.concatenate([batch[2] for batch in self.batches])
+        (grades, attempts, firstSubmits, lastSubmits) = numericCols.T
+
+        learnerRows = self.aggregate(learnerCol, problemCol, self.learnerIds, grades, attempts, firstSubmits, lastSubmits)
+        problemRows = self.aggregate(problemCol, learnerCol, self.problemIds, grades, attempts, firstSubmits, lastSubmits)
+        return (learnerRows, problemRows)
+
+    def aggregate(self, groupCol, otherCol, groupKeys, grades, attempts, firstSubmits, lastSubmits):
+        '''
+        Compute one output table, grouping by groupCol. The
+        number of distinct values of otherCol per group is the
+        table's num_problems or num_learners column.
+        '''
+        numGroups = len(groupKeys)
+        # Distinct (group, other) pairs:
+        pairs = np.unique(groupCol * (otherCol.max() + 1) + otherCol)
+        numDistinctOthers = np.bincount(pairs // (otherCol.max() + 1), minlength=numGroups)
+        attemptStats = groupStats(groupCol, attempts, numGroups, quantiles=())
+        totalAttempts = np.bincount(groupCol, weights=np.nan_to_num(attempts), minlength=numGroups)
+        gradeStats = groupStats(groupCol, grades, numGroups)
+        firstSubmit = groupMinMax(groupCol, firstSubmits, numGroups)[0]
+        lastSubmit = groupMinMax(groupCol, lastSubmits, numGroups)[1]
+
+        rows = []
+        for (key, groupId) in sorted(groupKeys.items()):
+            rows.append([key[0], key[1],
+                         int(numDistinctOthers[groupId]),
+                         int(totalAttempts[groupId]),
+                         attemptStats['mean'][groupId],
+                         gradeStats['mean'][groupId],
+                         gradeStats['var'][groupId],
+                         gradeStats['q0.25'][groupId],
+                         gradeStats['q0.5'][groupId],
+                         gradeStats['q0.75'][groupId],
+                         self.formatTime(firstSubmit[groupId]),
+                         self.formatTime(lastSubmit[groupId])])
+        return rows
+
+    def writeCSV(self, rows, header, fd):
+        '''
+        Write rows as computed by compute() to an open file.
+        NaN statistics are written as empty cells.
+        '''
+        fd.write(','.join(header) + '\n')
+        for row in rows:
+            fd.write(','.join([self.formatValue(value) for value in row]) + '\n')
+
+    def formatValue(self, value):
+        if isinstance(value, float):
+            return '' if np.isnan(value) else '%.4f' % value
+        if value is None:
+            return ''
+        valueStr = str(value)
+        if ',' in valueStr or '"' in valueStr:
+            return '"%s"' % valueStr.replace('"', '""')
+        return valueStr
+
+    def formatTime(self, epochSecs):
+        if np.isnan(epochSecs):
+            return None
+        return datetime.datetime.fromtimestamp(epochSecs).strftime('%Y-%m-%d %H:%M:%S')
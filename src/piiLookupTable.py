@@ -0,0 +1,215 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+
+Maintains EdxPrivate.PIILookup, a materialized copy of the
+PII columns of EdxPrivate.Account, with anon_screen_name as
+primary key. PII exports of the basic tables (makeCourseCSVs.sh)
+join with this table, rather than creating a view over Account
+for each export. The join is a primary key lookup, and
+concurrent PII exports no longer share (and clobber) one
+view in the Edx schema.
+
+The table is refreshed incrementally: learners that are new in
+Account are added, rows whose PII columns changed in Account
+are updated, and learners whose user_int_id is no longer in
+edxprod.auth_user are deleted, so that their PII stops appearing
+in exports. The user_int_id of each learner comes from
+EdxPrivate.UserIdMap (see userIdMap.py), which each refresh brings
+up to date first. A full refresh builds a new table and swaps it in
+atomically, so that exports running during the rebuild are not
+affected. Meant to run from cron, e.g. nightly:
+
+    15 2 * * * python /home/dataman/Code/open_edx_class_export/src/piiLookupTable.py -u dataman
+'''
+
+import argparse
+import getpass
+import os
+import sys
+
+from pymysql_utils.pymysql_utils import MySQLDB
+
+from userIdMap import UserIdMap
+
+
+class PIILookupTable(object):
+    '''
+    Creation and refresh of the materialized PII lookup table.
+    '''
+
+    DB = 'EdxPrivate'
+    TABLE = 'PIILookup'
+    SOURCE_TABLE = 'EdxPrivate.Account'
+    AUTH_USER_TABLE = 'edxprod.auth_user'
+
+    # The PII columns that exports add to each row:
+    PII_COLS = ['name', 'screen_name', 'email', 'goals']
+
+    def __init__(self, mysqlDb):
+        '''
+        :param mysqlDb: open connection with privileges on EdxPrivate and edxprod
+        :type mysqlDb: MySQLDB
+        '''
+        self.mysqlDb = mysqlDb
+        self.fullName = '%s.%s' % (PIILookupTable.DB, PIILookupTable.TABLE)
+        self.userIdMap = UserIdMap(mysqlDb)
+
+    def exists(self):
+        '''
+        Return True if the lookup table exists.
+        '''
+        try:
+            self.mysqlDb.query("SELECT 1 FROM information_schema.TABLES " +\
+                               "WHERE TABLE_SCHEMA = '%s' AND TABLE_NAME = '%s';" %\
+                               (PIILookupTable.DB, PIILookupTable.TABLE)).next()
+            return True
+        except StopIteration:
+            return False
+
+    def hasUserIntId(self):
+        '''
+        Return True if the lookup table has the user_int_id
+        column, which tables created before it was added lack.
+        '''
+        try:
+            self.mysqlDb.query("SELECT 1 FROM information_schema.COLUMNS " +\
+                               "WHERE TABLE_SCHEMA = '%s' AND TABLE_NAME = '%s' AND COLUMN_NAME = 'user_int_id';" %\
+                               (PIILookupTable.DB, PIILookupTable.TABLE)).next()
+            return True
+        except StopIteration:
+            return False
+
+    def refresh(self, full=False):
+        '''
+        Bring the lookup table up to date with Account and
+        auth_user. If the table does not exist yet, or full is
+        True, the table is rebuilt from scratch. Else only new
+        and changed learners are written, and deleted learners
+        are removed.
+
+        :param full: if True, rebuild the whole table
+        :type full: Boolean
+        :return: number of rows in the table after the refresh
+        :rtype: int
+        '''
+        self.userIdMap.refresh()
+        if full or not self.exists() or not self.hasUserIntId():
+            self.rebuild()
+        else:
+            self.addNewLearners(self.fullName)
+            self.updateChangedLearners()
+            self.removeDeletedLearners()
+        return self.mysqlDb.query('SELECT COUNT(*) FROM %s;' % self.fullName).next()[0]
+
+    def rebuild(self):
+        '''
+        Build the table under a scratch name, then atomically
+        rename it into place.
+        '''
+        scratchName = self.fullName + 'New'
+        oldName = self.fullName + 'Old'
+        self.mysqlDb.execute('DROP TABLE IF EXISTS %s;' % scratchName)
+        self.mysqlDb.execute(self.createTableDDL(scratchName))
+        self.addNewLearners(scratchName)
+        if self.exists():
+            self.mysqlDb.execute('DROP TABLE IF EXISTS %s;' % oldName)
+            self.mysqlDb.execute('RENAME TABLE %s TO %s, %s TO %s;' %\
+                                 (self.fullName, oldName, scratchName, self.fullName))
+            self.mysqlDb.execute('DROP TABLE %s;' % oldName)
+        else:
+            self.mysqlDb.execute('RENAME TABLE %s TO %s;' % (scratchName, self.fullName))
+
+    def addNewLearners(self, tableName):
+        '''
+        Insert all Account rows whose anon_screen_name is not yet
+        in the given table, and whose learner is in auth_user. If
+        Account holds several rows for one learner, the first one wins.
+        '''
+        colList = ','.join(PIILookupTable.PII_COLS)
+        self.mysqlDb.execute('INSERT IGNORE INTO %s (anon_screen_name,user_int_id,%s) ' % (tableName, colList) +\
+                             'SELECT Account.anon_screen_name,IdMap.user_int_id,%s ' % ','.join(['Account.%s' % col for col in PIILookupTable.PII_COLS]) +\
+                             'FROM %s AS Account ' % PIILookupTable.SOURCE_TABLE +\
+                             'JOIN %s AS IdMap ' % self.userIdMap.fullName +\
+                             '  ON IdMap.anon_screen_name = Account.anon_screen_name ' +\
+                             'JOIN %s AS AuthUser ' % PIILookupTable.AUTH_USER_TABLE +\
+                             '  ON AuthUser.id = IdMap.user_int_id ' +\
+                             'LEFT JOIN %s AS Lookup ' % tableName +\
+                             '  ON Account.anon_screen_name = Lookup.anon_screen_name ' +\
+                             'WHERE Lookup.anon_screen_name IS NULL;')
+
+    def updateChangedLearners(self):
+        '''
+        Copy PII columns that changed in Account, e.g. a new
+        email address, into the lookup table.
+        '''
+        setClause = ','.join(['Lookup.%s = Account.%s' % (col, col) for col in PIILookupTable.PII_COLS])
+        changedClause = ' OR '.join(['NOT (Lookup.%s <=> Account.%s)' % (col, col) for col in PIILookupTable.PII_COLS])
+        self.mysqlDb.execute('UPDATE %s AS Lookup ' % self.fullName +\
+                             'JOIN %s AS Account ' % PIILookupTable.SOURCE_TABLE +\
+                             '  ON Lookup.anon_screen_name = Account.anon_screen_name ' +\
+                             'SET %s ' % setClause +\
+                             'WHERE %s;' % changedClause)
+
+    def removeDeletedLearners(self):
+        '''
+        Delete the rows of learners whose user_int_id is
+        no longer in auth_user.
+        '''
+        self.mysqlDb.execute('DELETE Lookup FROM %s AS Lookup ' % self.fullName +\
+                             'LEFT JOIN %s AS AuthUser ' % PIILookupTable.AUTH_USER_TABLE +\
+                             '  ON AuthUser.id = Lookup.user_int_id ' +\
+                             'WHERE AuthUser.id IS NULL;')
+
+    def createTableDDL(self, tableName):
+        return 'CREATE TABLE %s (' % tableName +\
+               '  anon_screen_name varchar(40) NOT NULL PRIMARY KEY,' +\
+               '  user_int_id int NOT NULL,' +\
+               '  name varchar(255),' +\
+               '  screen_name varchar(255),' +\
+               '  email varchar(255),' +\
+               '  goals text,' +\
+               '  INDEX (user_int_id)' +\
+               ') ENGINE=InnoDB;'
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(prog=os.path.basename(sys.argv[0]), formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('-u', '--user',
+                        action='store',
+                        help='User ID that is to log into MySQL. Default: the user who is invoking this script.')
+    parser.add_argument('-p', '--pwd',
+                        action='store_true',
+                        help='Request to be asked for pwd for operating MySQL;\n' +\
+                             '    default: content of scriptInvokingUser$Home/.ssh/mysql')
+    parser.add_argument('-w', '--password',
+                        action='store',
+                        help='User explicitly provided password to log into MySQL.')
+    parser.add_argument('--full',
+                        action='store_true',
+                        help='Rebuild the whole table, rather than adding new and changed learners.')
+
+    args = parser.parse_args();
+
+    user = args.user if args.user is not None else getpass.getuser()
+    if args.password and args.pwd:
+        raise ValueError('Use either -p, or -w, but not both.')
+    if args.pwd:
+        pwd = getpass.getpass("Enter %s's MySQL password on localhost: " % user)
+    elif args.password:
+        pwd = args.password
+    else:
+        try:
+            with open(os.path.join(os.path.expanduser('~' + user), '.ssh/mysql')) as fd:
+                pwd = fd.readline().strip()
+        except IOError:
+            pwd = ''
+
+    mysqlDb = MySQLDB(user=user, passwd=pwd, db=PIILookupTable.DB)
+    try:
+        numRows = PIILookupTable(mysqlDb).refresh(full=args.full)
+        print('%s.%s holds %s learners.' % (PIILookupTable.DB, PIILookupTable.TABLE, numRows))
+    finally:
+        mysqlDb.close()
@@ -5,6 +5,8 @@ Created on Sep 1, 2014
 '''
 
 import argparse
+from collections import OrderedDict
+import csv
 import getpass
 import os
 import subprocess
@@ -12,13 +14,17 @@ import tempfile
 import sys
 import multiprocessing
 import functools
+import threading
 
+from courseActivityIndex import CourseActivityIndex
 from engagement import EngagementComputer
+from engagementCache import EngagementCache
+from enrollmentService import EnrollmentService
 from pymysql_utils.pymysql_utils import MySQLDB
 
 
 #*****def computeEngagementMulticore(quarterlyReportExporterObj, courseName):
-def computeEngagementMulticore(dbHost, mySQLUser, mySQLPwd, courseName):
+def computeEngagementMulticore(dbHost, mySQLUser, mySQLPwd, eventWatermark, courseName):
     '''
     Computes engagement for one course.
     This function is used in a pool.map() statement to 
@@ -33,12 +39,30 @@ def computeEngagementMulticore(dbHost, mySQLUser, mySQLPwd, courseName):
     :param quarterlyReportExporterObj: an QuarterlyReportExporter object that will be called
               on to do the actual work.
     :type quarterlyReportExporterObj: QuarterlyReportExporter
+    :param eventWatermark: watermark of EventXtract for the engagement cache;
+              None to bypass the cache.
+    :type eventWatermark: {str | None}
     :param courseName: name of course whose engagement is to be computed
     :type courseName: str
-    :return one file name that contains the summary engagement of just
-            the given course (i.e. a one-row csv file with column header).
-    :rtype str
+    :return the course name, and one file name that contains the summary
+            engagement of just the given course (i.e. a one-row csv file 
+            with column header). The course name lets callers of
+            imap_unordered() tell which course finished.
+    :rtype (str, str)
     '''
+    # Engagement of the course may have been computed
+    # earlier, e.g. for a researcher's export. The quarterly
+    # report uses all events, not just video events, and
+    # no start year restriction:
+    if eventWatermark is not None:
+        engagementCache = EngagementCache()
+        cacheKey = EngagementCache.makeKey(courseName, False, None, eventWatermark)
+        cachedFiles = engagementCache.lookup(cacheKey)
+        if cachedFiles is not None:
+            (summaryFile, detailFile, weeklyEffortFile) = cachedFiles
+            os.remove(detailFile)
+            os.remove(weeklyEffortFile)
+            return (courseName, summaryFile)
   
     comp = EngagementComputer(dbHost=dbHost, 
                               mySQLUser=mySQLUser, 
@@ -47,7 +71,38 @@ def computeEngagementMulticore(dbHost, mySQLUser, mySQLPwd, courseName):
  
     comp.run()
     (summaryFile, detailFile, weeklyEffortFile) = comp.writeResultsToDisk() #@UnusedVariable
-    return summaryFile
+    if eventWatermark is not None:
+        engagementCache.store(cacheKey, summaryFile, detailFile, weeklyEffortFile)
+    return (courseName, summaryFile)
+
+# Exporter of each demographics worker process, with
+# that process' own MySQL connection:
+demographicsWorkerExporter = None
+
+def initDemographicsWorker(dbHost, mySQLUser, mySQLPwd, testing):
+    '''
+    Pool initializer for the worker processes of 
+    QuarterlyReportExporter.demographicsPerCourse(). Opens
+    one MySQL connection per process, which then serves
+    all the courses that are handed to the process.
+    '''
+    global demographicsWorkerExporter
+    demographicsWorkerExporter = QuarterlyReportExporter(dbHost=dbHost, 
+                                                         mySQLUser=mySQLUser, 
+                                                         mySQLPwd=mySQLPwd,
+                                                         testing=testing)
+
+def computeDemographicsMulticore(courseName):
+    '''
+    Computes the demographics row of one course in a worker
+    process that was initialized by initDemographicsWorker().
+    
+    :param courseName: name of course whose demographics are to be computed
+    :type courseName: str
+    :return result row of the course
+    :rtype [<any>]
+    '''
+    return demographicsWorkerExporter.demographicsOneCourse(courseName)
     
 class QuarterlyReportExporter(object):
     '''
@@ -59,6 +114,45 @@ class QuarterlyReportExporter(object):
 
     NUM_OF_CORES_TO_USE = int(round(0.5 + 2*multiprocessing.cpu_count()/3))
     
+    # Worker pool for engagement computations. Created on
+    # first use, and then kept for the life of the process,
+    # rather than forking new workers for every report:
+    engagementPool = None
+    engagementPoolLock = threading.Lock()
+    
+    # Columns of the demographics result:
+    DEMOGRAPHICS_HEADER = ["platform",
+                           "course_display_name",
+                           "gender_female",
+                           "gender_male",
+                           "gender_other",
+                           "gender_withheld",
+                           "num_countries",
+                           "edu_Doctorate",
+                           "edu_Masters_ProfessionalDegree",
+                           "edu_Bachelors",
+                           "edu_Associates",
+                           "edu_Secondary_HighSchool",
+                           "edu_Secondary_Junior",
+                           "edu_Elementary_Primary",
+                           "edu_None",
+                           "edu_Other",
+                           "edu_UserWithheld",
+                           "edu_SignupBeforeLevelCollected",
+                           "age_1-10",
+                           "age_11-20",
+                           "age_21-30",
+                           "age_31-40",
+                           "age_41-50",
+                           "age_51-60",
+                           "age_61-70",
+                           "age_71-80",
+                           "age_81-90",
+                           "age_unspecified"]
+    
+    # Quarters in the order in which they occur in an academic year:
+    QUARTERS = ['fall', 'winter', 'spring', 'summer']
+    
     FALL_START='-09-01'
     FALL_END='-11-30'
     WINTER_START='-12-01'
@@ -102,7 +196,10 @@ class QuarterlyReportExporter(object):
             self.currUser = getpass.getuser()
         self.defaultDb = 'Edx'
         self.mysqlDb = None
-        self.enrollmentCache = {}
+        self.enrollmentService = None
+        # Course names of quarters and lists of quarters,
+        # as found by getQuarterCourseNames() and getPeriodCourseNames():
+        self.courseNamesCache = {}
         self.thisScriptDir = os.path.dirname(__file__)        
         self.courseInfoScript = os.path.join(self.thisScriptDir, '../scripts/createQuarterlyReport.sh')
         self.ensureOpenMySQLDb()
@@ -218,10 +315,9 @@ class QuarterlyReportExporter(object):
         allCourseNames = self.getQuarterCourseNames(academicYear, quarter, byActivity)
         colHeaderGrabbed = False
 
-        pool = multiprocessing.Pool(QuarterlyReportExporter.NUM_OF_CORES_TO_USE)
-        partial_computeEngagementMulticore = functools.partial(computeEngagementMulticore, self.dbHost, self.mySQLUser, self.mySQLPwd)
-        summaryFiles = pool.map(partial_computeEngagementMulticore, allCourseNames)
-        for summaryFile in summaryFiles:
+        # Each summary is added to the result as soon as its
+        # course is done, whichever course that is:
+        for (courseName, summaryFile) in self.engagementSummaries(allCourseNames): #@UnusedVariable
             # Pull the summary data from the engagement summary
             # file, grabbing the col header only from the first
             # file:
@@ -241,6 +337,7 @@ class QuarterlyReportExporter(object):
                     # Grab second line from summary file and 
                     # write to outfile:
                     outFile.write(fd.readline())
+                    outFile.flush()
                 except IOError:
                     self.output('No rows in %s' % summaryFile)
                     continue
@@ -249,7 +346,36 @@ class QuarterlyReportExporter(object):
         outFile.close()
         return resFileName
 
-    def demographics(self,academicYear, quarter, byActivity=False, outFile=None, printResultFilePath=True):
+    def engagementSummaries(self, courseNames):
+        '''
+        Compute the engagement summaries of the given courses in
+        the engagement worker pool. Yields each course's result as
+        soon as the course is done, and reports progress.
+        
+        :param courseNames: course_display_name of each course
+        :type courseNames: [String]
+        :return: generator of (courseName, summaryFile) pairs
+        :rtype: generator
+        '''
+        # Hand out the largest courses first, so that a big
+        # course that happens to be last in the list does not
+        # run alone while the other cores are idle:
+        enrollments = self.getCourseEnrollments(courseNames)
+        coursesLargestFirst = sorted(courseNames, key=lambda courseName: enrollments.get(courseName, 0), reverse=True)
+
+        # Unit tests' events are not in EventXtract, so
+        # they bypass the engagement cache:
+        eventWatermark = None if self.testing else EngagementCache.getWatermark(self.mysqlDb)
+
+        pool = QuarterlyReportExporter.getEngagementPool()
+        partial_computeEngagementMulticore = functools.partial(computeEngagementMulticore, self.dbHost, self.mySQLUser, self.mySQLPwd, eventWatermark)
+        numDone = 0
+        for (courseName, summaryFile) in pool.imap_unordered(partial_computeEngagementMulticore, coursesLargestFirst):
+            numDone += 1
+            self.reportProgress('Engagement done for %s (%s of %s courses).<br>' % (courseName, numDone, len(coursesLargestFirst)))
+            yield (courseName, summaryFile)
+
+    def demographics(self,academicYear, quarter, byActivity=False, outFile=None, printResultFilePath=True, perCourse=False):
         '''
         We create a CSV file with one row for each course that ran
         during the requested quarter. Columns are (with interspersed
@@ -303,6 +429,10 @@ class QuarterlyReportExporter(object):
         :param printResultFilePath: whether or not to print msg to stdout about where 
             result file is to be found
         :type printResultFilePath: bool
+        :param perCourse: if True, compute each course separately, distributing the
+            courses over worker processes. Otherwise all courses are computed by one
+            grouped query, with per-course computation only as fallback.
+        :type perCourse: bool
         :return full path of file where results are stored
         :rtype string 
         '''
@@ -319,256 +449,14 @@ class QuarterlyReportExporter(object):
 
         allCourseNames = self.getQuarterCourseNames(academicYear, quarter, byActivity)
         
-        # There is probably a way to do all steps in
-        # a single, hairy SQL query. Instead, we take
-        # each category in turn (gender, edu, age). For
-        # each course we end up with an array of results,
-        # which we'll put into a dict with the course name
-        # as key. Be very careful about arrays being treated
-        # as references, when you think you are making a
-        # new one:
-        courseResults = {}
+        courseResults = self.demographicsRows(allCourseNames, perCourse)
+        
+        # Now populate the result table, course rows in the
+        # order of allCourseNames; first the col headers:
+        outFile.write(','.join(QuarterlyReportExporter.DEMOGRAPHICS_HEADER) + '\n')
+        
         for courseName in allCourseNames:
-            thisCourseRow = ['openedx',courseName]
-            # Create a MySQL temp table with just the unique
-            # anon_screen_name of this course:
-            if self.testing:
-                db = 'unittest'
-                dbPrivate = 'unittest'
-                dbEdxprod = 'unittest'
-            else:
-                db = self.defaultDb
-                dbPrivate = 'EdxPrivate'
-                dbEdxprod = 'edxprod'
-            self.mysqlDb.dropTable('%s.CourseMembers' % db)
-            self.mysqlDb.createTable('%s.CourseMembers' % db, {'anon_screen_name' : 'varchar(40)'}, temporary=True)
-            self.mysqlDb.execute("INSERT INTO %s.CourseMembers (anon_screen_name) " % db +\
-                                 "SELECT %s.UserGrade.anon_screen_name " % dbPrivate +\
-                                 "FROM %s.UserGrade, %s.true_courseenrollment " % (dbPrivate, dbEdxprod) +\
-                                 "WHERE %s.UserGrade.user_int_id = %s.true_courseenrollment.user_id " % (dbPrivate, dbEdxprod) +\
-                                 "AND %s.true_courseenrollment.course_display_name = '%s';" % (dbEdxprod, courseName))
-            # Create another temp table to hold demographics in that course,
-            # one row for each learner (i.e. for each anon_screen_name):
-            self.mysqlDb.dropTable('%s.CourseDemographics' % db)
-            self.mysqlDb.createTable('%s.CourseDemographics' % db, 
-                                     {'gender' : 'varchar(6)',
-                                      'year_of_birth' : 'int',
-                                      'level_of_education' : 'varchar(42)',
-                                      'three_letter_country' : 'varchar(3)'
-                                      }, temporary=True)
-            # Populate the temp table: each row is demographics for one learner
-            # in the course we are working on. The final GROUP BY is 
-            # needed b/c some learners have multiple entries in UserCountry,
-            # if they came in from IPs of varying countries during separate
-            # events. The GROUP BY will pick one of those countries, rather
-            # than taking the cross product of the first join with UserCountry
-            # entries for the same learner:  
-            self.mysqlDb.execute ("INSERT INTO %s.CourseDemographics (gender, year_of_birth, level_of_education, three_letter_country) " % db +\
-                                  "SELECT %s.Demographics.gender, " % db +\
-                                  "%s.Demographics.year_of_birth, " % db +\
-                                  "%s.Demographics.level_of_education, " % db +\
-                                  "%s.UserCountry.three_letter_country " % db  +\
-                                  "FROM (%s.CourseMembers LEFT JOIN %s.Demographics " % (db,db)  +\
-                                  "  ON %s.CourseMembers.anon_screen_name = %s.Demographics.anon_screen_name) " % (db,db)  +\
-                                  " LEFT JOIN %s.UserCountry " % db +\
-                                  "  ON %s.CourseMembers.anon_screen_name = %s.UserCountry.anon_screen_name " % (db,db)  +\
-                                  "GROUP BY %s.UserCountry.anon_screen_name;" % db)
-        
-            # Now we have rows like:
-            #    'f','1997','Secondary/High School','USA'
-            # Need to pick out the various counts now.
-            # The nicest query would be something like:
-            #
-            #     SELECT Withhelds.withheld_count AS gender_withheld,
-            #            Males.male_count AS gender_male,
-            #            Females.female_count AS gender_female,
-            #            Others.other_count AS gender_other
-            #     FROM (SELECT
-            #             COUNT(gender) AS male_count FROM CourseDemographics WHERE gender = 'm') AS Males,
-            #          (SELECT
-            #             COUNT(gender) AS female_count FROM CourseDemographics WHERE gender = 'f') AS Females,
-            #          (SELECT
-            #             COUNT(gender) AS other_count FROM CourseDemographics WHERE gender = 'o') AS Others,
-            #          (SELECT
-            #             COUNT(gender) AS withheld_count FROM CourseDemographics WHERE gender = '') AS Withhelds;            
-            #     
-            #                 oneCourseDemographic = ['openedx',courseName]
-            #
-            # Unfortunately, MySQL doesn't let you refer to a tmp table twice.
-            # So we do it in pieces; first gender:
-            queryIt = self.mysqlDb.query("SELECT COUNT(gender) FROM %s.CourseDemographics WHERE gender = 'f';" % db)
-            thisCourseRow.append(queryIt.next()[0])
-            queryIt = self.mysqlDb.query("SELECT COUNT(gender) FROM %s.CourseDemographics WHERE gender = 'm';" % db)
-            thisCourseRow.append(queryIt.next()[0])
-            queryIt = self.mysqlDb.query("SELECT COUNT(gender) FROM %s.CourseDemographics WHERE gender = 'o';" % db)
-            thisCourseRow.append(queryIt.next()[0])
-            queryIt = self.mysqlDb.query("SELECT COUNT(gender) FROM %s.CourseDemographics WHERE gender = '';" % db)
-            thisCourseRow.append(queryIt.next()[0])
-            # Country count:
-            queryIt = self.mysqlDb.query("SELECT COUNT(DISTINCT three_letter_country) FROM %s.CourseDemographics;" % db)
-            thisCourseRow.append(queryIt.next()[0])
-            # Education levels: from the following query we'll get results as tuples
-            # like this: ('Doctorate', 10)
-            # We'll build a dict to collect them, using the col names of
-            # the final result table as keys; any scheme would do.
-            # I'm sure this could be done very elegantly, but I
-            # bet you understand this version:
-            queryIt = self.mysqlDb.query("SELECT level_of_education, COUNT(level_of_education) FROM %s.CourseDemographics GROUP BY level_of_education;" % db)
-            eduDict = {}
-            for resTuple in queryIt:
-                if resTuple[0] == 'p':
-                    eduDict['edu_Doctorate'] = resTuple[1]
-                elif resTuple[0] == 'm':
-                    eduDict['edu_Masters_ProfessionalDegree'] = resTuple[1]
-                elif resTuple[0] == 'b':
-                    eduDict['edu_Bachelors'] = resTuple[1]
-                elif resTuple[0] == 'a':
-                    eduDict['edu_Associates'] = resTuple[1]
-                elif resTuple[0] == 'hs':
-                    eduDict['edu_Secondary_HighSchool'] = resTuple[1]
-                elif resTuple[0] == 'jhs':
-                    eduDict['edu_Secondary_Junior'] = resTuple[1]
-                elif resTuple[0] == 'el':
-                    eduDict['edu_Primary_Elementary'] = resTuple[1]
-                elif resTuple[0] == 'none':
-                    eduDict['edu_None'] = resTuple[1]
-                elif resTuple[0] == 'other':
-                    eduDict['edu_Other'] = resTuple[1]
-                elif resTuple[0] == '':
-                    eduDict['edu_UserWithheld'] = resTuple[1]
-                elif resTuple[0] == 'NULL':
-                    eduDict['edu_SignupBeforeLevelCollected'] = resTuple[1]
-                
-            # Transfer to the res row in the proper order:
-            thisCourseRow.append(eduDict.get('edu_Doctorate', 0))
-            thisCourseRow.append(eduDict.get('edu_Masters_ProfessionalDegree', 0))
-            thisCourseRow.append(eduDict.get('edu_Associates', 0))
-            thisCourseRow.append(eduDict.get('edu_Secondary_HighSchool', 0))
-            thisCourseRow.append(eduDict.get('edu_Secondary_Junior', 0))
-            thisCourseRow.append(eduDict.get('edu_Primary_Elementary', 0))
-            thisCourseRow.append(eduDict.get('edu_None', 0))
-            thisCourseRow.append(eduDict.get('edu_Other', 0))
-            thisCourseRow.append(eduDict.get('edu_UserWithheld', 0))
-            thisCourseRow.append(eduDict.get('edu_SignupBeforeLevelCollected', 0))
-            
-            # Now the age ranges. This one is crufty SQL (for me):
-            #   SELECT CONCAT(
-            #                1 + FLOOR((YEAR(CURDATE()) - year_of_birth)/10) * 10,
-            #         '-',
-            #                10 + FLOOR((YEAR(CURDATE()) - year_of_birth)/10) * 10
-            #         ) AS age_range,
-            #        COUNT(*) AS numLearnersAged
-            #   FROM CourseDemographics
-            #   GROUP BY 1
-            #   ORDER BY age_range;
-            #                           
-            # Yields something like:
-            # +-----------+-----------------+
-            # | age_range | numLearnersAged |
-            # +-----------+-----------------+
-            # | NULL      |            1425 |
-            # | 1-10      |               6 |
-            # | 101-110   |               3 |
-            # | 11-20     |             357 |
-            # | 121-130   |               2 |
-            # | 21-30     |            4941 |
-            # | 31-40     |            2595 |
-            # | 41-50     |            1038 |
-            # | 51-60     |             392 |
-            # | 61-70     |             154 |
-            # | 71-80     |              24 |
-            # | 81-90     |               4 |
-            # +-----------+-----------------+
-            #
-            # The GROUP BY 1 groups by age_range
-             
-            queryIt = self.mysqlDb.query("SELECT CONCAT( " +\
-                                            "1 + FLOOR((YEAR(CURDATE()) - year_of_birth)/10) * 10, " +\
-                                         "'-'," +\
-                                            "10 + FLOOR((YEAR(CURDATE()) - year_of_birth)/10) * 10" +\
-                                         "   ) AS age_range, " +\
-                                         "COUNT(*) AS numLearnersAged " +\
-                                         "FROM %s.CourseDemographics " % db +\
-                                         "GROUP BY 1 " +\
-                                         "ORDER BY age_range;"
-                                         )
-            # We build a dict again to make *sure* the values
-            # will be added to the result row in order:
-            ageDict = {}
-            for ageRangeRow in queryIt:
-                if ageRangeRow is None or \
-                    type(ageRangeRow) != tuple or \
-                    len(ageRangeRow) < 1 or \
-                    ageRangeRow[0] is None:
-                    next
-                elif ageRangeRow[0].startswith('NULL'):
-                    ageDict['age_unspecified'] = ageRangeRow[1]
-                elif ageRangeRow[0].startswith('1-'):
-                    ageDict['age_1-10'] = ageRangeRow[1]
-                elif ageRangeRow[0].startswith('11-'):
-                    ageDict['age_11-20'] = ageRangeRow[1]
-                elif ageRangeRow[0].startswith('21-'):
-                    ageDict['age_21-30'] = ageRangeRow[1]
-                elif ageRangeRow[0].startswith('31-'):
-                    ageDict['age_31-40'] = ageRangeRow[1]
-                elif ageRangeRow[0].startswith('41-'):
-                    ageDict['age_41-50'] = ageRangeRow[1]
-                elif ageRangeRow[0].startswith('51-'):
-                    ageDict['age_51-60'] = ageRangeRow[1]
-                elif ageRangeRow[0].startswith('61-'):
-                    ageDict['age_61-70'] = ageRangeRow[1]
-                elif ageRangeRow[0].startswith('71-'):
-                    ageDict['age_71-80'] = ageRangeRow[1]
-                elif ageRangeRow[0].startswith('81-'):
-                    ageDict['age_81-90'] = ageRangeRow[1]
-            thisCourseRow.append(ageDict.get('age_1-10', 0))
-            thisCourseRow.append(ageDict.get('age_11-20', 0))
-            thisCourseRow.append(ageDict.get('age_21-30', 0))
-            thisCourseRow.append(ageDict.get('age_31-40', 0))
-            thisCourseRow.append(ageDict.get('age_41-50', 0))
-            thisCourseRow.append(ageDict.get('age_51-60', 0))
-            thisCourseRow.append(ageDict.get('age_61-70', 0))
-            thisCourseRow.append(ageDict.get('age_71-80', 0))
-            thisCourseRow.append(ageDict.get('age_81-90', 0))
-            thisCourseRow.append(ageDict.get('age_unspecified', 0))
-            
-            courseResults[courseName] = thisCourseRow
-            # loop back for next course
-        
-        # Now populate the result table; order of course rows 
-        # doesn't matter; first the col headers:
-        outFile.write(','.join([
-                                "platform",
-                                "course_display_name",
-                                "gender_female",
-                                "gender_male",
-                                "gender_other",
-                                "gender_withheld",
-                                "num_countries",
-                                "edu_Doctorate",
-                                "edu_Masters_ProfessionalDegree",
-                                "edu_Bachelors",
-                                "edu_Associates",
-                                "edu_Secondary_HighSchool",
-                                "edu_Secondary_Junior",
-                                "edu_Elementary_Primary",
-                                "edu_None",
-                                "edu_Other",
-                                "edu_UserWithheld",
-                                "edu_SignupBeforeLevelCollected",
-                                "age_1-10",
-                                "age_11-20",
-                                "age_21-30",
-                                "age_31-40",
-                                "age_41-50",
-                                "age_51-60",
-                                "age_61-70",
-                                "age_71-80",
-                                "age_81-90",
-                                "age_unspecified"
-                                ]) + '\n')
-        
-        for row in courseResults.values():
+            row = courseResults[courseName]
             # For the join() all cols need to be
             # strings; so use a list comprehension
             # for the conversion:
@@ -579,6 +467,195 @@ class QuarterlyReportExporter(object):
         return resFileName
 
 
+    def demographicsRows(self, allCourseNames, perCourse=False):
+        '''
+        Compute the demographics result rows of the given courses.
+        
+        :param allCourseNames: course_display_name of each course
+        :type allCourseNames: [String]
+        :param perCourse: see demographics()
+        :type perCourse: bool
+        :return: dict mapping each course name to its result row
+        :rtype: {String : [<any>]}
+        '''
+        if perCourse:
+            return self.demographicsPerCourse(allCourseNames)
+        try:
+            return self.demographicsAllCourses(allCourseNames)
+        except Exception as e:
+            # E.g. the grouped query exceeded server limits
+            # for a very large quarter:
+            self.output('Quarter-wide demographics query failed (%s); computing per course.' % `e`)
+            return self.demographicsPerCourse(allCourseNames)
+
+    def demographicsDbNames(self):
+        '''
+        Return the names of the databases that hold Demographics and
+        UserCountry, UserGrade, and true_courseenrollment, respectively.
+        Unit tests keep all those tables in db 'unittest'.
+        
+        :rtype: (String, String, String)
+        '''
+        if self.testing:
+            return ('unittest', 'unittest', 'unittest')
+        return (self.defaultDb, 'EdxPrivate', 'edxprod')
+
+    def demographicsCountCols(self, demographicsTable, countryTable):
+        '''
+        Return the SELECT expressions that compute the demographics
+        columns of one course: each counts the learners that fall into 
+        one category ('conditional aggregation'). The expressions are
+        in the order of the result columns.
+        
+        :param demographicsTable: name or alias of table with gender, year_of_birth,
+            and level_of_education columns
+        :type demographicsTable: String
+        :param countryTable: name or alias of table with three_letter_country column
+        :type countryTable: String
+        :rtype: [String]
+        '''
+        countIf = lambda condition: "COUNT(IF(%s, 1, NULL))" % condition
+        
+        selectCols = [countIf("%s.gender = 'f'" % demographicsTable),
+                      countIf("%s.gender = 'm'" % demographicsTable),
+                      countIf("%s.gender = 'o'" % demographicsTable),
+                      countIf("%s.gender = ''" % demographicsTable),
+                      "COUNT(DISTINCT %s.three_letter_country)" % countryTable]
+        # Education levels, in the order of the result columns.
+        # Note: the CSV rows have never included the Bachelors
+        # count, though the header does; that layout is kept.
+        # Learners who signed up before the level was collected
+        # have the string 'NULL':
+        for eduLevel in ['p', 'm', 'a', 'hs', 'jhs', 'el', 'none', 'other', '', 'NULL']:
+            selectCols.append(countIf("%s.level_of_education = '%s'" % (demographicsTable, eduLevel)))
+        # Age ranges 1-10, 11-20, ..., 81-90, and unspecified:
+        for decade in range(9):
+            selectCols.append(countIf("FLOOR((YEAR(CURDATE()) - %s.year_of_birth)/10) = %s" % (demographicsTable, decade)))
+        selectCols.append(countIf("%s.year_of_birth IS NULL" % demographicsTable))
+        return selectCols
+
+    def demographicsAllCourses(self, allCourseNames):
+        '''
+        Compute the demographics rows of all given courses with
+        one grouped query.
+        
+        :param allCourseNames: course_display_name of each course
+        :type allCourseNames: [String]
+        :return: dict mapping each course name to its result row
+        :rtype: {String : [<any>]}
+        '''
+        (db, dbPrivate, dbEdxprod) = self.demographicsDbNames()
+        selectCols = self.demographicsCountCols('Demographics', 'Countries')
+        
+        # Courses without any learners get all zeros:
+        courseResults = {}
+        for courseName in allCourseNames:
+            courseResults[courseName] = ['openedx', courseName] + [0] * len(selectCols)
+        if len(allCourseNames) == 0:
+            return courseResults
+        
+        # The Members derived table holds one row for each learner
+        # in each of the courses. Some learners have multiple entries
+        # in UserCountry, if they came in from IPs of varying countries
+        # during separate events. The Countries derived table picks
+        # one of those countries, rather than taking the cross product
+        # with the Demographics rows of the same learner:
+        courseList = ','.join(["'%s'" % courseName for courseName in allCourseNames])
+        queryIt = self.mysqlDb.query("SELECT Members.course_display_name, " +\
+                                     ', '.join(selectCols) + ' ' +\
+                                     "FROM (SELECT DISTINCT %s.true_courseenrollment.course_display_name, " % dbEdxprod +\
+                                     "             %s.UserGrade.anon_screen_name " % dbPrivate +\
+                                     "      FROM %s.UserGrade, %s.true_courseenrollment " % (dbPrivate, dbEdxprod) +\
+                                     "      WHERE %s.UserGrade.user_int_id = %s.true_courseenrollment.user_id " % (dbPrivate, dbEdxprod) +\
+                                     "        AND %s.true_courseenrollment.course_display_name IN (%s) " % (dbEdxprod, courseList) +\
+                                     "     ) AS Members " +\
+                                     "LEFT JOIN %s.Demographics AS Demographics " % db +\
+                                     "  ON Members.anon_screen_name = Demographics.anon_screen_name " +\
+                                     "LEFT JOIN (SELECT anon_screen_name, MIN(three_letter_country) AS three_letter_country " +\
+                                     "           FROM %s.UserCountry " % db +\
+                                     "           GROUP BY anon_screen_name " +\
+                                     "          ) AS Countries " +\
+                                     "  ON Members.anon_screen_name = Countries.anon_screen_name " +\
+                                     "GROUP BY Members.course_display_name;")
+        for resTuple in queryIt:
+            courseResults[resTuple[0]] = ['openedx'] + list(resTuple)
+        return courseResults
+
+    def demographicsPerCourse(self, allCourseNames):
+        '''
+        Compute the demographics rows of the given courses one course
+        at a time, via temp tables. The courses are distributed across
+        NUM_OF_CORES_TO_USE worker processes, each with its own MySQL
+        connection. Since MySQL temporary tables are private to
+        a connection, the workers do not interfere.
+        
+        :param allCourseNames: course_display_name of each course
+        :type allCourseNames: [String]
+        :return: dict mapping each course name to its result row
+        :rtype: {String : [<any>]}
+        '''
+        if len(allCourseNames) == 0:
+            return {}
+        pool = multiprocessing.Pool(min(QuarterlyReportExporter.NUM_OF_CORES_TO_USE, len(allCourseNames)),
+                                    initDemographicsWorker,
+                                    (self.dbHost, self.mySQLUser, self.mySQLPwd, self.testing))
+        try:
+            # map() returns the rows in the order of allCourseNames:
+            courseRows = pool.map(computeDemographicsMulticore, allCourseNames)
+        finally:
+            pool.close()
+            pool.join()
+        return dict(zip(allCourseNames, courseRows))
+
+    def demographicsOneCourse(self, courseName):
+        '''
+        Compute the demographics row of one course, using
+        temp tables CourseMembers and CourseDemographics.
+        
+        :param courseName: course_display_name of the course
+        :type courseName: String
+        :return: result row, starting with 'openedx', and the course name
+        :rtype: [<any>]
+        '''
+        (db, dbPrivate, dbEdxprod) = self.demographicsDbNames()
+        # Create a MySQL temp table with just the unique
+        # anon_screen_name of this course:
+        self.mysqlDb.dropTable('%s.CourseMembers' % db)
+        self.mysqlDb.createTable('%s.CourseMembers' % db, {'anon_screen_name' : 'varchar(40)'}, temporary=True)
+        self.mysqlDb.execute("INSERT INTO %s.CourseMembers (anon_screen_name) " % db +\
+                             "SELECT DISTINCT %s.UserGrade.anon_screen_name " % dbPrivate +\
+                             "FROM %s.UserGrade, %s.true_courseenrollment " % (dbPrivate, dbEdxprod) +\
+                             "WHERE %s.UserGrade.user_int_id = %s.true_courseenrollment.user_id " % (dbPrivate, dbEdxprod) +\
+                             "AND %s.true_courseenrollment.course_display_name = '%s';" % (dbEdxprod, courseName))
+        # Create another temp table to hold demographics in that course,
+        # one row for each learner (i.e. for each anon_screen_name):
+        self.mysqlDb.dropTable('%s.CourseDemographics' % db)
+        self.mysqlDb.createTable('%s.CourseDemographics' % db, 
+                                 {'gender' : 'varchar(6)',
+                                  'year_of_birth' : 'int',
+                                  'level_of_education' : 'varchar(42)',
+                                  'three_letter_country' : 'varchar(3)'
+                                  }, temporary=True)
+        # Populate the temp table: each row is demographics for one learner
+        # in the course we are working on. The GROUP BY picks one
+        # country for learners with multiple UserCountry entries,
+        # as in demographicsAllCourses():
+        self.mysqlDb.execute("INSERT INTO %s.CourseDemographics (gender, year_of_birth, level_of_education, three_letter_country) " % db +\
+                             "SELECT %s.Demographics.gender, " % db +\
+                             "%s.Demographics.year_of_birth, " % db +\
+                             "%s.Demographics.level_of_education, " % db +\
+                             "MIN(%s.UserCountry.three_letter_country) " % db  +\
+                             "FROM (%s.CourseMembers LEFT JOIN %s.Demographics " % (db,db)  +\
+                             "  ON %s.CourseMembers.anon_screen_name = %s.Demographics.anon_screen_name) " % (db,db)  +\
+                             " LEFT JOIN %s.UserCountry " % db +\
+                             "  ON %s.CourseMembers.anon_screen_name = %s.UserCountry.anon_screen_name " % (db,db)  +\
+                             "GROUP BY %s.CourseMembers.anon_screen_name;" % db)
+        # MySQL doesn't let a query refer to a tmp table twice,
+        # but conditional aggregation only reads it once:
+        selectCols = self.demographicsCountCols('CourseDemographics', 'CourseDemographics')
+        queryIt = self.mysqlDb.query("SELECT " + ', '.join(selectCols) + " FROM %s.CourseDemographics;" % db)
+        return ['openedx', courseName] + list(queryIt.next())
+
     def getQuarterCourseNames(self, academicYear, quarter,  byActivity):
         '''
         Returns an array of course names that ran during the given
@@ -594,39 +671,288 @@ class QuarterlyReportExporter(object):
             are included.
         :type byActivity: boolean
         '''
+        # Enrollment, engagement, and demographics of one
+        # report all need the same course names:
+        cacheKey = (academicYear, quarter, byActivity)
+        try:
+            return self.courseNamesCache[cacheKey]
+        except KeyError:
+            pass
+        if self.testing:
+            db = 'unittest'
+        else:
+            db = 'Edx'
         if byActivity:
             if quarter == '%':
                 # All quarters of given year:
-                timeConstraint = "(time BETWEEN '%s' AND '%s' OR " % self.getQuarterCalendarStartEndDates('fall', academicYear) +\
-                                 " time BETWEEN '%s' AND '%s' OR " % self.getQuarterCalendarStartEndDates('winter', academicYear) +\
-                                 " time BETWEEN '%s' AND '%s' OR " % self.getQuarterCalendarStartEndDates('spring', academicYear) +\
-                                 " time BETWEEN '%s' AND '%s')"  % self.getQuarterCalendarStartEndDates('summer', academicYear)
-                               
+                dateRanges = [self.getQuarterCalendarStartEndDates(oneQuarter, academicYear)
+                              for oneQuarter in ['fall', 'winter', 'spring', 'summer']]
             else:
-                (quarterStartDate, quarterEndDate) = self.getQuarterCalendarStartEndDates(quarter, academicYear) 
-                timeConstraint = "time BETWEEN '%s' AND '%s' " % (quarterStartDate, quarterEndDate)
-             
-            courseNameIt = self.mysqlDb.query("SELECT course_display_name, quarter, academic_year " +\
-                                              "FROM CourseInfo " +\
-                                              "WHERE EXISTS(SELECT 1 " +\
-                                              "               FROM EventXtract " +\
-                                                "              WHERE EventXtract.course_display_name = CourseInfo.course_display_name " +\
-                                                 "                AND %s);" % timeConstraint
-                                         % (str(academicYear), quarter))
-        else:
-            if self.testing:
-                db = 'unittest'
+                dateRanges = [self.getQuarterCalendarStartEndDates(quarter, academicYear)]
+            
+            # Prefer the course-by-day activity index over
+            # probing EventXtract for every course:
+            activityIndex = CourseActivityIndex(self.mysqlDb, db='unittest' if self.testing else None)
+            if activityIndex.exists():
+                activityCondition = activityIndex.activityCondition(dateRanges, 'CourseInfo.course_display_name')
             else:
-                db = 'Edx'
+                timeConstraint = ' OR '.join(["time BETWEEN '%s' AND '%s'" % dateRange for dateRange in dateRanges])
+                activityCondition = "EXISTS(SELECT 1 " +\
+                                    "       FROM %s.EventXtract " % db +\
+                                    "       WHERE EventXtract.course_display_name = CourseInfo.course_display_name " +\
+                                    "         AND (%s))" % timeConstraint
+            courseNameIt = self.mysqlDb.query("SELECT DISTINCT course_display_name " +\
+                                              "FROM %s.CourseInfo " % db +\
+                                              "WHERE %s;" % activityCondition)
+        else:
             courseNameIt = self.mysqlDb.query("SELECT course_display_name " +\
                                              "FROM " + db + ".CourseInfo " +\
                                              "WHERE academic_year LIKE '%s' AND quarter LIKE '%s';"\
                                              % (str(academicYear), quarter))
 
         allCourseNames = [name[0] for name in courseNameIt]
+        self.courseNamesCache[cacheKey] = allCourseNames
         return allCourseNames
 
 
+    def getPeriods(self, academicYearSpec, quarterSpec):
+        '''
+        Expand specifications of academic years and quarters into
+        the list of (academicYear, quarter) periods they denote, in
+        chronological order. Years may be given as an int, a
+        comma separated list ('2013,2015'), a range ('2013-2015'), 
+        or '%' (or 'all') for all years in CourseInfo. Quarters may be one 
+        quarter, a comma separated list ('fall,spring'), or '%' (or 'all') 
+        for all four.
+        
+        :param academicYearSpec: academic year(s)
+        :type academicYearSpec: {int | str}
+        :param quarterSpec: quarter(s)
+        :type quarterSpec: str
+        :return: list of (academicYear, quarter)
+        :rtype: [(int, str)]
+        '''
+        academicYearSpec = str(academicYearSpec).replace(' ', '')
+        if academicYearSpec in ['%', 'all']:
+            db = 'unittest' if self.testing else 'Edx'
+            years = sorted([int(row[0]) for row in 
+                            self.mysqlDb.query("SELECT DISTINCT academic_year FROM %s.CourseInfo WHERE academic_year > 0;" % db)])
+        else:
+            years = []
+            for yearPart in academicYearSpec.split(','):
+                try:
+                    if '-' in yearPart:
+                        (firstYear, lastYear) = yearPart.split('-')
+                        years.extend(range(int(firstYear), int(lastYear) + 1))
+                    else:
+                        years.append(int(yearPart))
+                except ValueError:
+                    raise ValueError("Academic year must be a year, a list or range of years, or '%%'; was '%s'" % academicYearSpec)
+        quarterSpec = str(quarterSpec).lower().replace(' ', '')
+        if quarterSpec in ['%', 'all']:
+            quarters = QuarterlyReportExporter.QUARTERS
+        else:
+            quarters = quarterSpec.split(',')
+            for quarter in quarters:
+                if quarter not in QuarterlyReportExporter.QUARTERS:
+                    raise ValueError("Quarter must be one of %s, a list of them, or '%%'; was '%s'" % \
+                                     (','.join(QuarterlyReportExporter.QUARTERS), quarterSpec))
+        return [(year, quarter) 
+                for year in sorted(set(years)) 
+                for quarter in QuarterlyReportExporter.QUARTERS if quarter in quarters]
+
+    def getPeriodCourseNames(self, periods, byActivity):
+        '''
+        Return the course names of each of the given periods, as
+        getQuarterCourseNames() would for each period. Courses of
+        all periods are found with a single query.
+        
+        :param periods: list of (academicYear, quarter)
+        :type periods: [(int, str)]
+        :param byActivity: see getQuarterCourseNames()
+        :type byActivity: boolean
+        :return: ordered dict mapping each period to its list of course names
+        :rtype: OrderedDict
+        '''
+        cacheKey = (tuple(periods), byActivity)
+        try:
+            return self.courseNamesCache[cacheKey]
+        except KeyError:
+            pass
+        db = 'unittest' if self.testing else 'Edx'
+        periodCourseNames = OrderedDict([(period, []) for period in periods])
+        if len(periods) == 0:
+            return periodCourseNames
+        activityIndex = CourseActivityIndex(self.mysqlDb, db='unittest' if self.testing else None)
+        if not byActivity:
+            yearList  = ','.join([str(year) for year in set([period[0] for period in periods])])
+            quarterList = ','.join(["'%s'" % quarter for quarter in set([period[1] for period in periods])])
+            rowIt = self.mysqlDb.query("SELECT academic_year, quarter, course_display_name " +\
+                                       "FROM %s.CourseInfo " % db +\
+                                       "WHERE academic_year IN (%s) AND quarter IN (%s);" % (yearList, quarterList))
+            for (academicYear, quarter, courseName) in rowIt:
+                courseNames = periodCourseNames.get((int(academicYear), quarter.lower()), None)
+                if courseNames is not None and courseName not in courseNames:
+                    courseNames.append(courseName)
+        elif activityIndex.exists():
+            # Quarters do not overlap, so each activity day falls into
+            # at most one period. The CASE expression computes the
+            # index of that period in the periods list:
+            dateRanges = [self.getQuarterCalendarStartEndDates(str(quarter), academicYear) for (academicYear, quarter) in periods]
+            periodNumExpr = 'CASE ' +\
+                            ' '.join(["WHEN activity_day BETWEEN '%s' AND '%s' THEN %s" % (dateRange[0], dateRange[1], periodNum)
+                                      for (periodNum, dateRange) in enumerate(dateRanges)]) +\
+                            ' END'
+            rowIt = self.mysqlDb.query("SELECT DISTINCT %s, course_display_name " % periodNumExpr +\
+                                       "FROM %s " % activityIndex.fullName +\
+                                       "WHERE %s " % activityIndex.dayCondition(dateRanges) +\
+                                       "  AND course_display_name IN (SELECT course_display_name FROM %s.CourseInfo);" % db)
+            for (periodNum, courseName) in rowIt:
+                periodCourseNames[periods[int(periodNum)]].append(courseName)
+        else:
+            for (academicYear, quarter) in periods:
+                periodCourseNames[(academicYear, quarter)] = self.getQuarterCourseNames(academicYear, quarter, byActivity)
+        self.courseNamesCache[cacheKey] = periodCourseNames
+        return periodCourseNames
+
+    def getPeriodLabel(self, periods):
+        '''
+        Return a label for a list of periods, such as 'fall2013',
+        or 'fall2013-summer2015'. Quarters are labeled with the
+        calendar year in which they ran.
+        
+        :param periods: chronologically ordered list of (academicYear, quarter)
+        :type periods: [(int, str)]
+        :rtype: str
+        '''
+        labels = ['%s%s' % (quarter, academicYear if quarter == 'fall' else academicYear + 1) 
+                  for (academicYear, quarter) in [periods[0], periods[-1]]]
+        return labels[0] if labels[0] == labels[1] else '-'.join(labels)
+
+    def enrollmentForPeriods(self, periods, minEnrollment=None, byActivity=False, outFile=None):
+        '''
+        Like enrollment(), but for multiple periods. The rows of all 
+        periods are in one file; each row's quarter and academic_year
+        columns tell the period. Unless byActivity, enrollment and
+        certificates of all periods are aggregated in one run of 
+        createQuarterlyReport.sh.
+        
+        :param periods: chronologically ordered list of (academicYear, quarter)
+        :type periods: [(int, str)]
+        :return full path of file where results are stored
+        :rtype string
+        '''
+        if outFile is None:
+            outFile = tempfile.NamedTemporaryFile(suffix='quarterRep_%s_enrollment.csv' % self.getPeriodLabel(periods), delete=False)
+            resFileName = outFile.name
+            outFile.close()
+        else:
+            resFileName = outFile
+        if byActivity:
+            # Course selection by activity needs one specific quarter
+            # per script run:
+            scriptRuns = [(str(academicYear), quarter) for (academicYear, quarter) in periods]
+        else:
+            # One run with wildcards for whichever of year and quarter
+            # vary; rows of unwanted periods are dropped below:
+            years = set([str(period[0]) for period in periods])
+            quarters = set([period[1] for period in periods])
+            scriptRuns = [(years.pop() if len(years) == 1 else '%', quarters.pop() if len(quarters) == 1 else '%')]
+        
+        wantedPeriods = set([(str(academicYear), quarter) for (academicYear, quarter) in periods])
+        headerWritten = False
+        with open(resFileName, 'w') as resFd:
+            resWriter = csv.writer(resFd, lineterminator='\n')
+            for (academicYear, quarter) in scriptRuns:
+                # The script refuses to overwrite its output file:
+                tmpFile = tempfile.NamedTemporaryFile(suffix='_enrollment.csv', delete=True)
+                tmpFileName = tmpFile.name
+                tmpFile.close()
+                self.enrollment(academicYear, quarter, minEnrollment=minEnrollment, byActivity=byActivity, 
+                                outFile=tmpFileName, printResultFilePath=False)
+                try:
+                    with open(tmpFileName, 'r') as fd:
+                        for (lineNum, row) in enumerate(csv.reader(fd)):
+                            if lineNum == 0:
+                                if not headerWritten:
+                                    resWriter.writerow(row)
+                                    headerWritten = True
+                                continue
+                            # Rows: platform,course_display_name,quarter,academic_year,...
+                            if byActivity or (row[3], row[2].lower()) in wantedPeriods:
+                                resWriter.writerow(row)
+                except IOError:
+                    # No courses in this period:
+                    continue
+                finally:
+                    if os.path.exists(tmpFileName):
+                        os.remove(tmpFileName)
+        return resFileName
+
+    def engagementForPeriods(self, periods, byActivity=False, outFile=None):
+        '''
+        Like engagement(), but for multiple periods. Each row
+        starts with academic_year and quarter. Courses that ran
+        in several of the periods are computed only once.
+        
+        :param periods: chronologically ordered list of (academicYear, quarter)
+        :type periods: [(int, str)]
+        :return full path of file where results are stored
+        :rtype string
+        '''
+        if outFile is None:
+            outFile = tempfile.NamedTemporaryFile(suffix='quarterRep_%s_engagement.csv' % self.getPeriodLabel(periods), delete=False)
+        else:
+            outFile = open(outFile, 'w')
+        periodCourseNames = self.getPeriodCourseNames(periods, byActivity)
+        allCourseNames = sorted(set([courseName for courseNames in periodCourseNames.values() for courseName in courseNames]))
+        
+        colHeaderLine = None
+        summaryLines = {}
+        for (courseName, summaryFile) in self.engagementSummaries(allCourseNames):
+            with open(summaryFile, 'r') as fd:
+                header = fd.readline()
+                if colHeaderLine is None and len(header) > 0:
+                    colHeaderLine = header
+                summaryLines[courseName] = fd.readline()
+        
+        if colHeaderLine is not None:
+            outFile.write('academic_year,quarter,' + colHeaderLine)
+        for ((academicYear, quarter), courseNames) in periodCourseNames.items():
+            for courseName in courseNames:
+                summaryLine = summaryLines.get(courseName, '')
+                if len(summaryLine) > 0:
+                    outFile.write('%s,%s,%s' % (academicYear, quarter, summaryLine))
+        outFile.close()
+        return outFile.name
+
+    def demographicsForPeriods(self, periods, byActivity=False, outFile=None, perCourse=False):
+        '''
+        Like demographics(), but for multiple periods. Each row
+        starts with academic_year and quarter. The demographics of
+        all courses of all periods are computed in one pass; courses
+        that ran in several of the periods are computed only once.
+        
+        :param periods: chronologically ordered list of (academicYear, quarter)
+        :type periods: [(int, str)]
+        :return full path of file where results are stored
+        :rtype string
+        '''
+        if outFile is None:
+            outFile = tempfile.NamedTemporaryFile(suffix='quarterRep_%s_demographics.csv' % self.getPeriodLabel(periods), delete=False)
+        else:
+            outFile = open(outFile, 'w')
+        periodCourseNames = self.getPeriodCourseNames(periods, byActivity)
+        allCourseNames = sorted(set([courseName for courseNames in periodCourseNames.values() for courseName in courseNames]))
+        courseResults = self.demographicsRows(allCourseNames, perCourse)
+        
+        outFile.write(','.join(['academic_year', 'quarter'] + QuarterlyReportExporter.DEMOGRAPHICS_HEADER) + '\n')
+        for ((academicYear, quarter), courseNames) in periodCourseNames.items():
+            for courseName in courseNames:
+                outFile.write(','.join([str(colValue) for colValue in [academicYear, quarter] + courseResults[courseName]]) + '\n')
+        outFile.close()
+        return outFile.name
+
     def getQuarterCalendarStartEndDates(self, quarter, academic_year):
         '''
         Returns 2-tuple: start and end calendar date of given quarter
@@ -651,7 +977,9 @@ class QuarterlyReportExporter(object):
             return(str(academic_year) + QuarterlyReportExporter.FALL_START,
                    str(academic_year) + QuarterlyReportExporter.FALL_END)
         if quarter == 'winter':
-            return(str(calYear) + QuarterlyReportExporter.WINTER_START,
+            # Starts in December of the academic year, as
+            # in createQuarterlyReport.sh:
+            return(str(academic_year) + QuarterlyReportExporter.WINTER_START,
                    str(calYear) + QuarterlyReportExporter.WINTER_END)
         if quarter == 'spring':
             return(str(calYear) + QuarterlyReportExporter.SPRING_START,
@@ -691,49 +1019,72 @@ class QuarterlyReportExporter(object):
                 self.output('Failed to access MySQL.')
         return self.mysqlDb
 
+    @classmethod
+    def getEngagementPool(cls):
+        '''
+        Return the process-wide pool of engagement workers,
+        creating it on first call.
+        
+        :rtype: multiprocessing.Pool
+        '''
+        with cls.engagementPoolLock:
+            if cls.engagementPool is None:
+                cls.engagementPool = multiprocessing.Pool(QuarterlyReportExporter.NUM_OF_CORES_TO_USE)
+            return cls.engagementPool
+
+    def getEnrollmentService(self):
+        '''
+        Return the enrollment service. Normally that is the
+        process-wide EnrollmentService. Unit tests get a private
+        one over their own true_courseenrollment table.
+        
+        :rtype: EnrollmentService
+        '''
+        if self.enrollmentService is None:
+            if self.testing:
+                self.enrollmentService = EnrollmentService(lambda: EnrollmentService.queryEnrollments(self.mysqlDb, 
+                                                                                                      db='unittest', 
+                                                                                                      checkTrueCourseName=False))
+            else:
+                self.enrollmentService = EnrollmentService.getInstance(self.mySQLUser, self.mySQLPwd)
+        return self.enrollmentService
+
+    def getCourseEnrollments(self, courseNames):
+        '''
+        Return the enrollment of each of the given courses.
+        
+        :param courseNames: course_display_name of each course
+        :type courseNames: [String]
+        :return: dict mapping course names to enrollment; courses
+            without any enrollment are absent.
+        :rtype: {String : int}
+        '''
+        return self.getEnrollmentService().getEnrollments(courseNames)
+
     def getEnrollment(self, courseDisplayName):
         '''
-        Given a MySQL regexp courseNameWildcard string, return a list
-        of matchine course_display_name in the db. If self.mysql
-        is None, indicating that the __init__() method was unable
-        to log into the db, then return None.
+        Return the enrollment of the given course.
 
         :param courseDisplayName: Course name whose enrollment to find.
         :type courseDisplayName: String
 
-        :return: An array of matching course_display_name, which may
-                 be empty. None if _init__() was unable to log into db.
-                 If includeEnrollment is True, append enrollment to each course name.
-        :rtype: {[String] | None}
+        :return: number of learners in the course; None if the 
+                 course has none, or is unknown.
+        :rtype: {int | None}
         '''
-        
-        # Was asked for this exact name before?
-        try:
-            return self.enrollmentCache[courseDisplayName]
-        except KeyError:
-            pass
-        
-        
-        # The --silent suppresses a column header line
-        # from being displayed ('course_display_name' and 'enrollment'):
-        mySqlCmd = [self.courseInfoScript,'-u',self.currUser,'--silent']
-        if self.mySQLPwd is not None and self.mySQLPwd != '':
-            mySqlCmd.extend(['-w',self.mySQLPwd])
-        mySqlCmd.extend([courseDisplayName])
-        
-        try:
-            pipeFromMySQL = subprocess.Popen(mySqlCmd,stdout=subprocess.PIPE,stderr=subprocess.PIPE).stdout
-        except Exception as e:
-            self.writeError('Error while searching for course names: %s' % `e`)
-            return None
-        enrollment = None
-        for courseNameAndEnrollment in pipeFromMySQL:
-            (courseName,enrollment) = courseNameAndEnrollment.strip().split('\t')
-            if len(courseName) > 0:
-                self.enrollmentCache[courseName] = int(enrollment)
-        return enrollment
+        return self.getEnrollmentService().getEnrollment(courseDisplayName)
       
     
+    def reportProgress(self, txt):
+        '''
+        Send a progress message to the browser if we were
+        called from exportClass; else print it.
+        '''
+        if self.parent is not None:
+            self.parent.writeResult('progress', txt)
+        else:
+            self.output(txt)
+
     def output(self, txt):
         print(txt)
         
@@ -0,0 +1,99 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+
+import os
+import tempfile
+import unittest
+
+from admissionController import AdmissionController
+from exportScheduler import ExportJob, ExportScheduler
+
+
+class CannedStatus(object):
+    '''
+    Stands in for a MySQLDB connection, answering
+    SHOW GLOBAL STATUS with the given values.
+    '''
+    def __init__(self):
+        self.status = {}
+
+    def query(self, queryStr):
+        return iter(self.status.items())
+
+
+class AdmissionControllerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.db = CannedStatus()
+        (fd, self.diskstats) = tempfile.mkstemp()
+        os.close(fd)
+        self.writeDiskstats(0)
+        self.savedDiskstats = AdmissionController.DISKSTATS
+        AdmissionController.DISKSTATS = self.diskstats
+        self.controller = AdmissionController(lambda: self.db, disks=['sda'], clock=lambda: self.now)
+
+    def tearDown(self):
+        AdmissionController.DISKSTATS = self.savedDiskstats
+        os.remove(self.diskstats)
+
+    def writeDiskstats(self, ioTicks):
+        with open(self.diskstats, 'w') as fd:
+            fd.write('   8       0 sda 100 0 800 50 100 0 800 50 0 %d 100\n' % ioTicks)
+            fd.write('   8       1 sda1 100 0 800 50 100 0 800 50 0 %d 100\n' % (ioTicks * 2))
+
+    def slotsAfterSample(self, maxRunning):
+        self.controller.sampleIfDue()
+        return self.controller.allowedSlots(maxRunning)
+
+    def testWatermarks(self):
+        self.db.status = {'Threads_running' : '4', 'Innodb_buffer_pool_reads' : '1000'}
+        self.assertEqual(3, self.slotsAfterSample(3))
+        # Busy server:
+        self.now += AdmissionController.SAMPLE_INTERVAL
+        self.db.status = {'Threads_running' : '40', 'Innodb_buffer_pool_reads' : '2000'}
+        self.assertEqual(AdmissionController.THROTTLED_SLOTS, self.slotsAfterSample(3))
+        self.assertIn('threadsRunning 40', self.controller.stateDescription())
+        # Between the watermarks, the controller stays throttled:
+        self.now += AdmissionController.SAMPLE_INTERVAL
+        self.db.status = {'Threads_running' : '20', 'Innodb_buffer_pool_reads' : '2000'}
+        self.assertEqual(AdmissionController.THROTTLED_SLOTS, self.slotsAfterSample(3))
+        self.now += AdmissionController.SAMPLE_INTERVAL
+        self.db.status = {'Threads_running' : '10', 'Innodb_buffer_pool_reads' : '2000'}
+        self.assertEqual(3, self.slotsAfterSample(3))
+        self.assertIsNone(self.controller.stateDescription())
+
+    def testRates(self):
+        self.db.status = {'Threads_running' : '1', 'Innodb_buffer_pool_reads' : '0'}
+        self.slotsAfterSample(2)
+        self.now += 10
+        self.db.status = {'Threads_running' : '1', 'Innodb_buffer_pool_reads' : '50000'}
+        self.writeDiskstats(9500)
+        self.slotsAfterSample(2)
+        self.assertEqual(5000, self.controller.metrics['bufferPoolReadsPerSec'])
+        # Only the watched disk counts:
+        self.assertEqual(95, self.controller.metrics['diskUtilPercent'])
+        self.assertTrue(self.controller.throttled)
+
+    def testSchedulerSlots(self):
+        scheduler = ExportScheduler(maxRunning=2, clock=lambda: self.now)
+        scheduler.admissionController = self.controller
+        (first, second) = (ExportJob('alice', 60), ExportJob('bob', 60))
+        self.controller.sampleIfDue()
+        scheduler.admit(first)
+        scheduler.admit(second)
+        self.assertFalse(scheduler.shouldYield(first))
+        self.now += AdmissionController.SAMPLE_INTERVAL
+        self.db.status = {'Threads_running' : '40'}
+        # The scheduler sees the new state only after a sample:
+        self.assertFalse(scheduler.shouldYield(first))
+        self.controller.sampleIfDue()
+        self.assertTrue(scheduler.shouldYield(first))
+        scheduler.release(first)
+        self.assertFalse(scheduler.shouldYield(second))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+
+import json
+import os
+import tempfile
+import unittest
+
+from costEstimator import EXPORT_SHAPES, CostEstimator, estimateRows
+from indexAdvisor import QUERY_SHAPES
+
+
+class CannedExplain(object):
+    '''
+    Stands in for a MySQLDB connection, answering every
+    EXPLAIN with the same plan row.
+    '''
+    def __init__(self, planRow):
+        self.planRow = planRow
+
+    def query(self, queryStr):
+        return iter([self.planRow])
+
+
+class CannedEnrollments(object):
+
+    def __init__(self, enrollments):
+        self.enrollments = enrollments
+
+    def getEnrollment(self, courseName):
+        return self.enrollments.get(courseName, None)
+
+    def allEnrollments(self):
+        return [(courseName, enrollment, True) for (courseName, enrollment) in self.enrollments.items()]
+
+
+class StaticStatsEstimator(CostEstimator):
+
+    def tableStats(self, db, table):
+        return (1000000, 200)
+
+
+class SampleValuesEstimator(StaticStatsEstimator):
+    '''
+    Records the courses for which sample values
+    are looked up, instead of querying them.
+    '''
+    def sampleValues(self, courseName, quarter=None):
+        self.sampledCourses.append(courseName)
+        return {'course' : courseName, 'quarter' : 'fall2014', 'surveyId' : 'SV_1'}
+
+    def estimateRequest(self, exportKinds, courseNames, quarter=None):
+        self.sampledCourses = []
+        return super(SampleValuesEstimator, self).estimateRequest(exportKinds, courseNames, quarter)
+
+
+class CostEstimatorTest(unittest.TestCase):
+
+    def testShapeNames(self):
+        shapeNames = set([shape.name for shape in QUERY_SHAPES])
+        for shapeList in EXPORT_SHAPES.values():
+            self.assertTrue(set(shapeList).issubset(shapeNames))
+
+    def testEstimateRows(self):
+        # Index access: EXPLAIN's estimate:
+        self.assertEqual(300, estimateRows(300, False, 1000000, 10, 100))
+        # Full scan: the course's share of the table:
+        self.assertEqual(100000, estimateRows(1000000, True, 1000000, 10, 100))
+        # Unknown enrollment: the whole table:
+        self.assertEqual(1000000, estimateRows(1000000, True, 1000000, None, 100))
+
+    def testEstimateExport(self):
+        enrollments = CannedEnrollments({'Medicine/HRP258/Statistics_in_Medicine' : 250,
+                                         'Engineering/CS106A/Fall2013' : 750})
+        sampleValues = {'course' : 'Medicine/HRP258/Statistics_in_Medicine', 'quarter' : 'fall2013', 'surveyId' : 'SV_1'}
+        # Index access, 50000 rows:
+        estimator = StaticStatsEstimator(CannedExplain((1, 'SIMPLE', 'ActivityGrade', 'ref', 'courseIdx', 'courseIdx', '767', 'const', 50000, 'Using where')),
+                                         enrollments)
+        estimate = estimator.estimateExport('grades', 'Medicine/HRP258/Statistics_in_Medicine', sampleValues, 1000)
+        self.assertEqual(50000, estimate['rows'])
+        self.assertEqual(50000 * 200, estimate['bytes'])
+        self.assertEqual(1, estimate['seconds'])
+        self.assertFalse(estimate['fullScan'])
+        # Table scan of the million rows, a quarter of which are the course's:
+        estimator = StaticStatsEstimator(CannedExplain((1, 'SIMPLE', 'ActivityGrade', 'ALL', None, None, None, None, 1000000, 'Using where')),
+                                         enrollments)
+        estimate = estimator.estimateExport('grades', 'Medicine/HRP258/Statistics_in_Medicine', sampleValues, 1000)
+        self.assertEqual(250000, estimate['rows'])
+        self.assertEqual(2, estimate['seconds'])
+        self.assertTrue(estimate['fullScan'])
+        # Engagement output is per learner:
+        estimate = estimator.estimateExport('engagementData', 'Medicine/HRP258/Statistics_in_Medicine', sampleValues, 1000)
+        self.assertEqual(250 * CostEstimator.OUTPUT_BYTES_PER_LEARNER['engagementData'], estimate['bytes'])
+
+    def testSampledCourses(self):
+        # Enrollments 10, 20, ..., 400:
+        enrollments = CannedEnrollments(dict([('Medicine/C%s/2014' % courseNum, 10 * courseNum) for courseNum in range(1, 41)]))
+        estimator = SampleValuesEstimator(CannedExplain((1, 'SIMPLE', 'FinalGrade', 'ref', 'courseIdx', 'courseIdx', '767', 'const', 100, 'Using where')),
+                                          enrollments)
+        estimate = estimator.estimateRequest(['grades'], sorted(enrollments.enrollments.keys()))
+        self.assertEqual(CostEstimator.MAX_ESTIMATED_COURSES, len(estimator.sampledCourses))
+        self.assertIn('Medicine/C1/2014', estimator.sampledCourses)
+        self.assertIn('Medicine/C40/2014', estimator.sampledCourses)
+        # One export per kind, scaled by enrollment:
+        self.assertEqual(1, len(estimate['exports']))
+        self.assertIsNone(estimate['exports'][0]['course'])
+        self.assertEqual(CostEstimator.MAX_ESTIMATED_COURSES, estimate['exports'][0]['sampledCourses'])
+        sampledEnrollment = sum(enrollments.getEnrollment(courseName) for courseName in estimator.sampledCourses)
+        self.assertEqual(int(CostEstimator.MAX_ESTIMATED_COURSES * 100 * 8200 / float(sampledEnrollment)), estimate['rows'])
+        # Few courses are all estimated:
+        estimate = estimator.estimateRequest(['grades'], ['Medicine/C1/2014', 'Medicine/C2/2014'])
+        self.assertEqual(['Medicine/C1/2014', 'Medicine/C2/2014'], [export['course'] for export in estimate['exports']])
+
+    def testLogEstimate(self):
+        (fd, logFile) = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            estimate = {'exports' : [], 'rows' : 10, 'bytes' : 2000, 'seconds' : 1}
+            CostEstimator.logEstimate({'courseId' : 'Engineering/CS106A/Fall2013', 'cryptoPwd' : 'secret'},
+                                      estimate, actualSeconds=3.5, logFile=logFile)
+            with open(logFile) as logFd:
+                entry = json.loads(logFd.readline())
+            self.assertEqual(3.5, entry['actualSeconds'])
+            self.assertEqual({'courseId' : 'Engineering/CS106A/Fall2013'}, entry['request'])
+        finally:
+            os.remove(logFile)
+
+if __name__ == "__main__":
+    unittest.main()
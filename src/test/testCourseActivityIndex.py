@@ -0,0 +1,76 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+
+import unittest
+
+from courseActivityIndex import CourseActivityIndex
+
+
+class RecordingDb(object):
+    '''
+    Stands in for a MySQLDB connection. Records all
+    statements, and answers each query with the rows
+    of the first answers entry whose key it contains.
+    '''
+    def __init__(self, answers):
+        self.answers = answers
+        self.statements = []
+
+    def query(self, queryStr):
+        self.statements.append(queryStr)
+        for (key, rows) in self.answers:
+            if key in queryStr:
+                return iter(rows)
+        return iter([])
+
+    def execute(self, statement):
+        self.statements.append(statement)
+
+
+class CourseActivityIndexTest(unittest.TestCase):
+
+    FALL_2014   = ('2014-09-01', '2014-11-30')
+    WINTER_2015 = ('2014-12-01', '2015-02-28')
+
+    def testDayCondition(self):
+        activityIndex = CourseActivityIndex(RecordingDb([]))
+        self.assertEqual("(activity_day BETWEEN '2014-09-01' AND '2014-11-30')",
+                         activityIndex.dayCondition([CourseActivityIndexTest.FALL_2014]))
+        self.assertEqual("(activity_day BETWEEN '2014-09-01' AND '2014-11-30' OR " +\
+                         "activity_day BETWEEN '2014-12-01' AND '2015-02-28')",
+                         activityIndex.dayCondition([CourseActivityIndexTest.FALL_2014, CourseActivityIndexTest.WINTER_2015]))
+
+    def testActivityCondition(self):
+        activityIndex = CourseActivityIndex(RecordingDb([]), db='unittest')
+        self.assertEqual("CourseInfo.course_display_name IN " +\
+                         "(SELECT course_display_name FROM unittest.CourseActivityDay " +\
+                         "WHERE (activity_day BETWEEN '2014-09-01' AND '2014-11-30'))",
+                         activityIndex.activityCondition([CourseActivityIndexTest.FALL_2014], 'CourseInfo.course_display_name'))
+        self.assertTrue(activityIndex.activityCondition([CourseActivityIndexTest.FALL_2014]).startswith('course_display_name IN (SELECT'))
+
+    def testActiveCourses(self):
+        db = RecordingDb([('CourseActivityDay', [('Medicine/HRP258/Statistics_in_Medicine',), ("Engineering/O'Hara/Fall2014",)])])
+        activityIndex = CourseActivityIndex(db)
+        self.assertEqual(['Medicine/HRP258/Statistics_in_Medicine', "Engineering/O'Hara/Fall2014"],
+                         activityIndex.activeCourses([CourseActivityIndexTest.FALL_2014, CourseActivityIndexTest.WINTER_2015]))
+        self.assertEqual(["SELECT DISTINCT course_display_name FROM Misc.CourseActivityDay " +\
+                          "WHERE (activity_day BETWEEN '2014-09-01' AND '2014-11-30' OR " +\
+                          "activity_day BETWEEN '2014-12-01' AND '2015-02-28');"],
+                         db.statements)
+
+    def testIncrementalRefresh(self):
+        db = RecordingDb([('information_schema', [(1,)]),
+                          ('MAX(activity_day)', [('2026-10-18',)]),
+                          ('COUNT(*)', [(42,)])])
+        self.assertEqual(42, CourseActivityIndex(db).refresh())
+        insert = [statement for statement in db.statements if statement.startswith('INSERT')][0]
+        # The latest indexed day is recomputed, not only later days added:
+        self.assertIn("WHERE time >= '2026-10-18' ", insert)
+        self.assertTrue(insert.endswith('ON DUPLICATE KEY UPDATE num_events = VALUES(num_events);'))
+        self.assertFalse(any(statement.startswith('RENAME') for statement in db.statements))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+
+import unittest
+
+from courseCatalog import CourseCatalog, likeLiterals, likeToRegex
+
+
+class CourseCatalogTest(unittest.TestCase):
+
+    courses = [('Medicine/HRP258/Statistics_in_Medicine', 26415),
+               ('Medicine/HRP214/Winter2014', 32),
+               ('Engineering/CS106A/Fall2013', 1200),
+               ('Engineering/db/Winter2014', 5000),
+               ('ohsx/Hmm/Spring', 3)]
+
+    def setUp(self):
+        self.catalog = CourseCatalog(lambda: CourseCatalogTest.courses)
+        self.catalog.refresh()
+
+    def testLikeTranslation(self):
+        self.assertIsNotNone(likeToRegex('Med%/HRP2_8/%').match('Medicine/HRP258/Statistics_in_Medicine'))
+        self.assertIsNone(likeToRegex('Med%/HRP2_8').match('Medicine/HRP258/Statistics_in_Medicine'))
+        # Escaped wildcards are literals:
+        self.assertIsNone(likeToRegex('a\\_b').match('axb'))
+        self.assertEqual(('med', ['med', '/hrp2', '8/']), likeLiterals('Med%/HRP2_8/%'))
+
+    def testPrefixMatch(self):
+        self.assertEqual([('Medicine/HRP214/Winter2014', 32),
+                          ('Medicine/HRP258/Statistics_in_Medicine', 26415)],
+                         self.catalog.match('Medicine/%'))
+        # Case insensitive, like MySQL's default collation:
+        self.assertEqual(2, len(self.catalog.match('medicine/%')))
+
+    def testSubstringMatch(self):
+        self.assertEqual(['Engineering/db/Winter2014', 'Medicine/HRP214/Winter2014'],
+                         [name for (name, enrollment) in self.catalog.match('%Winter2014')]) #@UnusedVariable
+        self.assertEqual([], self.catalog.match('%Summer%'))
+        self.assertEqual(5, len(self.catalog.match('%')))
+
+    def testExactMatch(self):
+        self.assertEqual([('ohsx/Hmm/Spring', 3)], self.catalog.match('ohsx/Hmm/Spring'))
+        self.assertEqual([], self.catalog.match('ohsx/Hmm'))
+
+    def testNotLoaded(self):
+        catalog = CourseCatalog(lambda: [])
+        self.assertRaises(ValueError, catalog.match, '%')
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+
+import unittest
+
+from courseEnrollmentSummary import CourseEnrollmentSummary
+
+
+class RecordingDb(object):
+    '''
+    Stands in for a MySQLDB connection. Records all
+    statements, and answers each query with the rows
+    of the first answers entry whose key it contains.
+    '''
+    def __init__(self, answers):
+        self.answers = answers
+        self.statements = []
+
+    def query(self, queryStr):
+        self.statements.append(queryStr)
+        for (key, rows) in self.answers:
+            if key in queryStr:
+                return iter(rows)
+        return iter([])
+
+    def execute(self, statement):
+        self.statements.append(statement)
+
+
+class CourseEnrollmentSummaryTest(unittest.TestCase):
+
+    def testIncrementalRefresh(self):
+        db = RecordingDb([('information_schema', [(1,)]),
+                          ('MAX(last_enrollment)', [('2026-10-18 04:00:00', '2026-10-17 12:00:00')]),
+                          ('UNION', [('Medicine/HRP258/Statistics_in_Medicine',), ("Engineering/O'Hara/Fall2013",)])])
+        self.assertEqual(2, CourseEnrollmentSummary(db).refresh())
+        changedQuery = [statement for statement in db.statements if 'UNION' in statement][0]
+        self.assertIn("created >= '2026-10-18 04:00:00'", changedQuery)
+        self.assertIn("modified_date >= '2026-10-17 12:00:00'", changedQuery)
+        # The changed courses' rows are replaced, not only overwritten:
+        (delete, insert) = db.statements[-2:]
+        self.assertTrue(delete.startswith('DELETE FROM Misc.CourseEnrollmentSummary'))
+        self.assertIn("'Engineering/O''Hara/Fall2013'", delete)
+        self.assertTrue(insert.startswith('INSERT INTO Misc.CourseEnrollmentSummary'))
+        self.assertIn("WHERE course_display_name IN ('Medicine/HRP258/Statistics_in_Medicine','Engineering/O''Hara/Fall2013')", insert)
+
+    def testNoCertificateWatermark(self):
+        db = RecordingDb([('information_schema', [(1,)]),
+                          ('MAX(last_enrollment)', [('2026-10-18 04:00:00', None)])])
+        self.assertEqual(0, CourseEnrollmentSummary(db).refresh())
+        changedQuery = [statement for statement in db.statements if 'UNION' in statement][0]
+        # Only certificates since the latest enrollment, not all of them:
+        self.assertIn("modified_date >= '2026-10-18 04:00:00'", changedQuery)
+        self.assertFalse(any(statement.startswith(('DELETE', 'INSERT')) for statement in db.statements))
+
+    def testFirstRefreshRebuilds(self):
+        db = RecordingDb([('COUNT(*)', [(42,)])])
+        self.assertEqual(42, CourseEnrollmentSummary(db).refresh())
+        self.assertTrue(any(statement.startswith('CREATE TABLE Misc.CourseEnrollmentSummaryNew (') for statement in db.statements))
+        self.assertTrue(any(statement.startswith('INSERT INTO Misc.CourseEnrollmentSummaryNew') for statement in db.statements))
+        self.assertIn('RENAME TABLE Misc.CourseEnrollmentSummaryNew TO Misc.CourseEnrollmentSummary;', db.statements)
+
+if __name__ == "__main__":
+    unittest.main()
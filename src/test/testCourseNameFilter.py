@@ -0,0 +1,59 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+
+import os
+import tempfile
+import unittest
+
+from courseNameFilter import CourseNameFilter
+
+
+class CourseNameFilterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.courseNameFilter = CourseNameFilter.getDefault()
+
+    def testDefaultExclusions(self):
+        for courseName in ['Medicine/HRP258/Statistics_in_Medicine',
+                           'Engineering/CS106A/Fall2013',
+                           'openedx,Medicine/HRP258/Statistics_in_Medicine,26415',
+                           'Medicine/Democracy101/Fall2013',
+                           'course-v1:Engineering+Puzzzles+2014',
+                           'Medicine/Parsefuzzy/Spring2015',
+                           'GSB/DavidUlrich_Leadership/2014']:
+            self.assertFalse(self.courseNameFilter.isExcluded(courseName), courseName)
+        for courseName in ['Engineering/Sandbox/Fall2013',
+                           'Medicine/Demo/Fall2013',
+                           'MonX/Statistics/2014',
+                           'Stanford/xxxx/yyyy',
+                           'Medicine/zzzTest/2014',
+                           'edX/DemoX/Demo_Course',
+                           'course-v1:JaneU+Chem101+2014',
+                           'SefuX/Test/2014',
+                           '2014/Medicine/Summer',
+                           '-/Medicine/Summer',
+                           '']:
+            self.assertTrue(self.courseNameFilter.isExcluded(courseName), courseName)
+
+    def testFilter(self):
+        self.assertEqual(['Engineering/CS106A/Fall2013'],
+                         self.courseNameFilter.filter(['Engineering/CS106A/Fall2013',
+                                                       'testtest/MedStats/2013-2015']))
+
+    def testConfigFile(self):
+        (fd, exclusionsFile) = tempfile.mkstemp()
+        try:
+            os.write(fd, '# Comment\n\nfoo/\n^bar\n')
+            os.close(fd)
+            courseNameFilter = CourseNameFilter(exclusionsFile)
+            self.assertEqual(['foo/', '^bar'], courseNameFilter.patterns)
+            self.assertEqual(['Baz/foo', 'Medicine/Sandbox'],
+                             courseNameFilter.filter(['Baz/foo', 'Medicine/Sandbox', 'bar/x', 'x/FOO/y']))
+        finally:
+            os.remove(exclusionsFile)
+
+if __name__ == "__main__":
+    unittest.main()
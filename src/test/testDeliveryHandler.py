@@ -0,0 +1,113 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import tornado.web
+from tornado.testing import AsyncHTTPTestCase
+
+from deliveryHandler import DeliveryHandler, parseRange
+
+
+class DeliveryHandlerTest(AsyncHTTPTestCase):
+
+    def setUp(self):
+        self.deliveryRoot = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.deliveryRoot, 'CME_MedStats_2013-2015'))
+        self.content = ''.join([chr(i % 256) for i in range(3 * DeliveryHandler.CHUNK_SIZE + 17)])
+        self.filePath = os.path.join(self.deliveryRoot, 'CME_MedStats_2013-2015', 'EventXtract.csv.zip')
+        with open(self.filePath, 'wb') as fd:
+            fd.write(self.content)
+        super(DeliveryHandlerTest, self).setUp()
+
+    def tearDown(self):
+        super(DeliveryHandlerTest, self).tearDown()
+        shutil.rmtree(self.deliveryRoot)
+
+    def get_app(self):
+        return tornado.web.Application([(r"/researcher/(.*)", DeliveryHandler, {'root' : self.deliveryRoot}),
+                                        (r"/protected/(.*)", DeliveryHandler, {'root' : self.deliveryRoot,
+                                                                               'credentials' : ('researcher', 'myClass')})])
+
+    def testAuthentication(self):
+        response = self.fetch('/protected/CME_MedStats_2013-2015/EventXtract.csv.zip')
+        self.assertEqual(401, response.code)
+        self.assertIn('Basic', response.headers['WWW-Authenticate'])
+        response = self.fetch('/protected/CME_MedStats_2013-2015/EventXtract.csv.zip',
+                              auth_username='researcher', auth_password='wrong')
+        self.assertEqual(401, response.code)
+        response = self.fetch('/protected/CME_MedStats_2013-2015/EventXtract.csv.zip',
+                              auth_username='researcher', auth_password='myClass')
+        self.assertEqual(200, response.code)
+        self.assertEqual(self.content, response.body)
+
+    def testWholeFile(self):
+        response = self.fetch('/researcher/CME_MedStats_2013-2015/EventXtract.csv.zip')
+        self.assertEqual(200, response.code)
+        self.assertEqual(self.content, response.body)
+        self.assertEqual('bytes', response.headers['Accept-Ranges'])
+
+    def testRange(self):
+        response = self.fetch('/researcher/CME_MedStats_2013-2015/EventXtract.csv.zip',
+                              headers={'Range' : 'bytes=100-'})
+        self.assertEqual(206, response.code)
+        self.assertEqual(self.content[100:], response.body)
+        self.assertEqual('bytes 100-%s/%s' % (len(self.content) - 1, len(self.content)),
+                         response.headers['Content-Range'])
+
+        # Resuming with a stale If-Range delivers the whole file:
+        response = self.fetch('/researcher/CME_MedStats_2013-2015/EventXtract.csv.zip',
+                              headers={'Range' : 'bytes=100-', 'If-Range' : '"stale"'})
+        self.assertEqual(200, response.code)
+        self.assertEqual(self.content, response.body)
+
+        response = self.fetch('/researcher/CME_MedStats_2013-2015/EventXtract.csv.zip',
+                              headers={'Range' : 'bytes=%s-' % len(self.content)})
+        self.assertEqual(416, response.code)
+
+    def testEtag(self):
+        response = self.fetch('/researcher/CME_MedStats_2013-2015/EventXtract.csv.zip')
+        etag = response.headers['Etag']
+        response = self.fetch('/researcher/CME_MedStats_2013-2015/EventXtract.csv.zip',
+                              headers={'If-None-Match' : etag})
+        self.assertEqual(304, response.code)
+
+        with open(os.path.join(self.deliveryRoot, 'CME_MedStats_2013-2015', 'MANIFEST'), 'w') as fd:
+            fd.write('da39a3ee5e6b4b0d3255bfef95601890afd80709  EventXtract.csv.zip\n')
+        response = self.fetch('/researcher/CME_MedStats_2013-2015/EventXtract.csv.zip', method='HEAD')
+        self.assertEqual('"da39a3ee5e6b4b0d3255bfef95601890afd80709"', response.headers['Etag'])
+
+    def testOutsideRoot(self):
+        response = self.fetch('/researcher/../../etc/passwd')
+        self.assertIn(response.code, [403, 404])
+        response = self.fetch('/researcher/CME_MedStats_2013-2015/')
+        self.assertEqual(200, response.code)
+        self.assertIn('EventXtract.csv.zip', response.body)
+
+    def testHiddenFiles(self):
+        with open(os.path.join(self.deliveryRoot, '.deliveryIndex.json'), 'w') as fd:
+            fd.write('{}')
+        os.mkdir(os.path.join(self.deliveryRoot, 'CME_MedStats_2013-2015', '.hidden'))
+        response = self.fetch('/researcher/.deliveryIndex.json')
+        self.assertEqual(404, response.code)
+        response = self.fetch('/researcher/%2EdeliveryIndex.json')
+        self.assertEqual(404, response.code)
+        response = self.fetch('/researcher/CME_MedStats_2013-2015/.hidden/')
+        self.assertEqual(404, response.code)
+
+    def testParseRange(self):
+        self.assertEqual((0, 99), parseRange('bytes=0-99', 1000))
+        self.assertEqual((900, 999), parseRange('bytes=-100', 1000))
+        self.assertEqual((500, 999), parseRange('bytes=500-5000', 1000))
+        self.assertIsNone(parseRange('bytes=0-9,20-29', 1000))
+        self.assertIsNone(parseRange('lines=0-9', 1000))
+        self.assertRaises(ValueError, parseRange, 'bytes=1000-', 1000)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+
+import datetime
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from deliveryStorage import DeliveryStorage, DeliveryStorageFull
+
+
+class DeliveryStorageTest(unittest.TestCase):
+
+    def setUp(self):
+        self.deliveryHome = tempfile.mkdtemp()
+        self.storage = DeliveryStorage(self.deliveryHome, quotaBytes=1000, minFreeBytes=0)
+        now = time.time()
+        # Three deliveries of 300 bytes each, downloaded
+        # one, two, and three hours ago:
+        for (hoursAgo, dirName) in [(1, 'CME_MedStats_2013-2015'), (2, 'QuarterlyRep_fall2014'), (3, 'Email_2014-01-01')]:
+            self.makeDelivery(dirName, 300)
+            self.storage.recordAccess(dirName)
+            with self.storage._lockedIndex() as index:
+                index['dirs'][dirName]['lastAccess'] = now - hoursAgo * 3600
+
+    def tearDown(self):
+        shutil.rmtree(self.deliveryHome)
+
+    def makeDelivery(self, dirName, numBytes):
+        os.mkdir(os.path.join(self.deliveryHome, dirName))
+        with open(os.path.join(self.deliveryHome, dirName, 'result.csv'), 'w') as fd:
+            fd.write('x' * numBytes)
+
+    def testEvictLeastRecentlyDownloaded(self):
+        # 900 of 1000 bytes in use; 250 more require
+        # removing the least recently downloaded delivery:
+        reservationId = self.storage.reserve(250)
+        (dirs, reservedBytes) = self.storage.usage()
+        self.assertEqual(['CME_MedStats_2013-2015', 'QuarterlyRep_fall2014'], sorted(dirs.keys()))
+        self.assertEqual(250, reservedBytes)
+        self.storage.release(reservationId)
+        self.assertEqual(0, self.storage.usage()[1])
+
+    def testRefusalKeepsDeliveries(self):
+        # Even evicting everything would not make room:
+        self.assertRaises(DeliveryStorageFull, self.storage.reserve, 1500)
+        self.assertEqual(3, len(self.storage.usage()[0]))
+
+    def testPreexistingDirsAreNotExpired(self):
+        self.makeDelivery('Old_Delivery', 10)
+        oldTime = time.time() - 365 * 86400
+        os.utime(os.path.join(self.deliveryHome, 'Old_Delivery'), (oldTime, oldTime))
+        self.storage.reserve(10)
+        self.assertTrue(os.path.isdir(os.path.join(self.deliveryHome, 'Old_Delivery')))
+
+    def testReservedDirsAreKept(self):
+        self.storage.reserve(100, 'Email_2014-01-01')
+        self.storage.reserve(250)
+        self.assertTrue(os.path.isdir(os.path.join(self.deliveryHome, 'Email_2014-01-01')))
+        self.assertFalse(os.path.isdir(os.path.join(self.deliveryHome, 'QuarterlyRep_fall2014')))
+
+    def testProtectedDirsAreKept(self):
+        # A wildcard export adds the directories it writes to:
+        reservationId = self.storage.reserve(10)
+        self.storage.protect(reservationId, os.path.join(self.deliveryHome, 'QuarterlyRep_fall2014'))
+        # Would fit only by evicting the protected directory too:
+        self.assertRaises(DeliveryStorageFull, self.storage.reserve, 800)
+        self.assertTrue(os.path.isdir(os.path.join(self.deliveryHome, 'QuarterlyRep_fall2014')))
+        self.storage.release(reservationId)
+        self.storage.reserve(800)
+        self.assertFalse(os.path.isdir(os.path.join(self.deliveryHome, 'QuarterlyRep_fall2014')))
+
+    def testRefuseUpFront(self):
+        self.assertRaises(DeliveryStorageFull, self.storage.reserve, 1500)
+
+    def testExpiry(self):
+        storage = DeliveryStorage(self.deliveryHome, quotaBytes=1000, minFreeBytes=0,
+                                  maxAge=datetime.timedelta(minutes=150))
+        self.assertEqual(['Email_2014-01-01'], storage.evictExpired())
+
+    def testRecordAccessLater(self):
+        self.storage.recordAccessLater(os.path.join(self.deliveryHome, 'Email_2014-01-01', 'result.csv'))
+        self.storage.accessQueue.join()
+        # Email_2014-01-01 is now the most recently downloaded:
+        self.storage.reserve(250)
+        self.assertEqual(['CME_MedStats_2013-2015', 'Email_2014-01-01'], sorted(self.storage.usage()[0].keys()))
+
+    def testTopLevelDir(self):
+        self.assertEqual('CME_MedStats_2013-2015',
+                         self.storage.topLevelDir(os.path.join(self.deliveryHome, 'CME_MedStats_2013-2015', 'result.csv')))
+        self.assertIsNone(self.storage.topLevelDir('/tmp'))
+
+if __name__ == "__main__":
+    unittest.main()
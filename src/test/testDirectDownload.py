@@ -0,0 +1,73 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+
+import gzip
+import StringIO
+import unittest
+
+import tornado.web
+from tornado.testing import AsyncHTTPTestCase
+
+from directDownload import DirectDownload, DirectDownloadHandler, DirectDownloadRegistry
+
+
+class InMemoryDownload(DirectDownload):
+    '''
+    Download whose rows are given, rather than queried.
+    '''
+    def __init__(self, fileName, rows, header=None):
+        super(InMemoryDownload, self).__init__(fileName, None, 'unittest', header=header)
+        self.testRows = rows
+
+    def rows(self):
+        return iter(self.testRows)
+
+
+class DirectDownloadTest(AsyncHTTPTestCase):
+
+    def setUp(self):
+        self.registry = DirectDownloadRegistry()
+        self.rows = [('abc', 'f', '1988', 'hs', 'USA', 'United States, of America')] +\
+                    [('user%s' % i, 'm', '1990', 'p', 'FRG', 'Germany') for i in range(20000)]
+        super(DirectDownloadTest, self).setUp()
+
+    def get_app(self):
+        return tornado.web.Application([(r"/download/(.*)", DirectDownloadHandler, {'registry' : self.registry})])
+
+    def expectedCsv(self, header):
+        lines = [','.join(header)] + ['abc,f,1988,hs,USA,"United States, of America"'] +\
+                ['user%s,m,1990,p,FRG,Germany' % i for i in range(20000)]
+        return '\n'.join(lines) + '\n'
+
+    def testStreaming(self):
+        header = ['anon_screen_name','gender','year_of_birth','level_of_education','country_three_letters','country_name']
+        token = self.registry.register(InMemoryDownload('demographics.csv', self.rows, header))
+        response = self.fetch('/download/%s' % token, use_gzip=False)
+        self.assertEqual(200, response.code)
+        self.assertEqual(self.expectedCsv(header), response.body)
+        self.assertIn('demographics.csv', response.headers['Content-Disposition'])
+
+        # Tokens are good for one download:
+        response = self.fetch('/download/%s' % token)
+        self.assertEqual(404, response.code)
+
+    def testCompression(self):
+        token = self.registry.register(InMemoryDownload('grades.csv', self.rows))
+        response = self.fetch('/download/%s' % token, use_gzip=False, headers={'Accept-Encoding' : 'gzip'})
+        self.assertEqual(200, response.code)
+        self.assertEqual('gzip', response.headers['Content-Encoding'])
+        csvText = gzip.GzipFile(fileobj=StringIO.StringIO(response.body)).read()
+        self.assertEqual(self.expectedCsv([])[1:], csvText)
+
+    def testExpiry(self):
+        registry = DirectDownloadRegistry(ttl=60)
+        download = InMemoryDownload('grades.csv', [])
+        token = registry.register(download)
+        download.created -= 120
+        self.assertIsNone(registry.claim(token))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from engagementCache import EngagementCache
+
+
+class EngagementCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cacheDir = tempfile.mkdtemp(prefix='engagementCacheTest')
+        self.resultDir = tempfile.mkdtemp(prefix='engagementCacheResults')
+        self.cache = EngagementCache(self.cacheDir, maxBytes=1000)
+        self.resultFiles = []
+        for part in ['summary', 'allData', 'weeklyEffort']:
+            resultFile = os.path.join(self.resultDir, 'tmpXyz_engagement_CME_MedStats_2013-2015_%s.csv' % part)
+            with open(resultFile, 'w') as fd:
+                fd.write('header\n%s\n' % part)
+            self.resultFiles.append(resultFile)
+
+    def tearDown(self):
+        shutil.rmtree(self.cacheDir, ignore_errors=True)
+        shutil.rmtree(self.resultDir, ignore_errors=True)
+
+    def testKey(self):
+        key = EngagementCache.makeKey('CME/MedStats/2013-2015', False, [2014, 2013], '2014-11-01 10:02:03')
+        self.assertEqual(key, EngagementCache.makeKey('CME/MedStats/2013-2015', 0, [2013, 2014], '2014-11-01 10:02:03'))
+        self.assertNotEqual(key, EngagementCache.makeKey('CME/MedStats/2013-2015', True, [2013, 2014], '2014-11-01 10:02:03'))
+        self.assertNotEqual(key, EngagementCache.makeKey('CME/MedStats/2013-2015', False, [2013, 2014], '2014-11-02 10:02:03'))
+
+    def testStoreAndLookup(self):
+        key = EngagementCache.makeKey('CME/MedStats/2013-2015', False, None, 'wm1')
+        self.assertIsNone(self.cache.lookup(key))
+        self.cache.store(key, *self.resultFiles)
+        cachedFiles = self.cache.lookup(key)
+        try:
+            self.assertEqual(3, len(cachedFiles))
+            self.assertTrue(cachedFiles[0].endswith('_engagement_CME_MedStats_2013-2015_summary.csv'))
+            with open(cachedFiles[2], 'r') as fd:
+                self.assertEqual('header\nweeklyEffort\n', fd.read())
+        finally:
+            for cachedFile in cachedFiles:
+                os.remove(cachedFile)
+
+    def testEvictedEntry(self):
+        key = EngagementCache.makeKey('CME/MedStats/2013-2015', False, None, 'wm1')
+        self.cache.store(key, *self.resultFiles)
+        # Evicted files make the entry a miss:
+        self.cache.exportCache.clear()
+        self.assertIsNone(self.cache.lookup(key))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+
+import unittest
+
+from courseCatalog import CourseCatalog
+from enrollmentService import EnrollmentService
+
+
+class EnrollmentServiceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.numLoads = 0
+        self.enrollments = [('Medicine/HRP258/Statistics_in_Medicine', 26415, True),
+                            ('Medicine/HRP214/Winter2014', 5, True),
+                            ('OHSx/Hmm/Spring', 3, True),
+                            ('Engineering/Sandbox/Fall2013', 400, True),
+                            ('Engineering/CS106A/Fall2013', 1200, False)]
+
+    def load(self):
+        self.numLoads += 1
+        return self.enrollments
+
+    def testLookups(self):
+        service = EnrollmentService(self.load)
+        self.assertEqual(26415, service.getEnrollment('Medicine/HRP258/Statistics_in_Medicine'))
+        self.assertIsNone(service.getEnrollment('Medicine/HRP258'))
+        self.assertEqual({'Medicine/HRP214/Winter2014' : 5},
+                         service.getEnrollments(['Medicine/HRP214/Winter2014', 'Unknown/Course/Name']))
+        self.assertEqual(1, self.numLoads)
+
+    def testTTL(self):
+        service = EnrollmentService(self.load, ttl=1000)
+        service.getEnrollment('Medicine/HRP214/Winter2014')
+        service.getEnrollment('Medicine/HRP214/Winter2014')
+        self.assertEqual(1, self.numLoads)
+        # Pretend the table is older than its TTL:
+        service.lastRefresh -= 2000
+        service.getEnrollment('Medicine/HRP214/Winter2014')
+        self.assertEqual(2, self.numLoads)
+
+    def testCatalogSelection(self):
+        service = EnrollmentService(self.load)
+        self.assertEqual(['Medicine/HRP258/Statistics_in_Medicine', 'OHSx/Hmm/Spring'],
+                         sorted([courseName for (courseName, enrollment) in CourseCatalog.selectCourses(service.allEnrollments())])) #@UnusedVariable
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from exportCache import ExportCache, getTableWatermark
+
+
+class CannedTableInfo(object):
+    '''
+    Stands in for a MySQLDB connection, answering the
+    information_schema and load log queries of getTableWatermark().
+    '''
+    def __init__(self, tableRow, latestLoad):
+        self.tableRow = tableRow
+        self.latestLoad = latestLoad
+
+    def query(self, queryStr):
+        if 'information_schema' in queryStr:
+            return iter([self.tableRow])
+        if self.latestLoad is None:
+            raise ValueError("Table 'Edx.LoadInfo' doesn't exist")
+        return iter([(self.latestLoad,)])
+
+
+class ExportCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cacheDir = tempfile.mkdtemp(prefix='exportCacheTest')
+        self.deliveryDir = tempfile.mkdtemp(prefix='exportCacheDelivery')
+        self.cache = ExportCache(self.cacheDir, maxBytes=100)
+
+    def tearDown(self):
+        shutil.rmtree(self.cacheDir, ignore_errors=True)
+        shutil.rmtree(self.deliveryDir, ignore_errors=True)
+
+    def testTableWatermark(self):
+        self.assertEqual('2026-10-18 04:00:00',
+                         getTableWatermark(CannedTableInfo(('2026-10-18 04:00:00', '2026-01-01 00:00:00'), None), 'Edx', 'EventXtract'))
+        # Without UPDATE_TIME, loads change the watermark:
+        beforeLoad = getTableWatermark(CannedTableInfo((None, '2026-01-01 00:00:00'), '2026-10-17 03:00:00'), 'Edx', 'EventXtract')
+        afterLoad = getTableWatermark(CannedTableInfo((None, '2026-01-01 00:00:00'), '2026-10-18 03:00:00'), 'Edx', 'EventXtract')
+        self.assertNotEqual(beforeLoad, afterLoad)
+        # Nothing to track changes by:
+        self.assertIsNone(getTableWatermark(CannedTableInfo((None, '2026-01-01 00:00:00'), None), 'Edx', 'EventXtract'))
+        self.assertIsNone(getTableWatermark(CannedTableInfo((None, '2026-01-01 00:00:00'), '2026-10-18 03:00:00'), 'EdxPrivate', 'Account'))
+
+    def testKeyIndependentOfArgOrder(self):
+        key1 = ExportCache.makeKey(table='EventXtract', course='CME/MedStats/2013-2015', pii=False)
+        key2 = ExportCache.makeKey(pii=False, course='CME/MedStats/2013-2015', table='EventXtract')
+        key3 = ExportCache.makeKey(table='EventXtract', course='CME/MedStats/2013-2015', pii=True)
+        self.assertEqual(key1, key2)
+        self.assertNotEqual(key1, key3)
+
+    def testStoreAndDeliver(self):
+        srcFile = self.makeFile('CME_MedStats_2013-2015_EventXtract.csv', 'abc,def\n1,2\n')
+        key = ExportCache.makeKey(table='EventXtract', course='CME/MedStats/2013-2015')
+        self.assertIsNone(self.cache.lookup(key))
+        self.cache.store(key, srcFile, meta={'numLines' : 2})
+        # Source must be untouched:
+        self.assertTrue(os.path.exists(srcFile))
+
+        destFile = os.path.join(self.deliveryDir, 'delivered.csv')
+        entry = self.cache.deliver(key, destFile)
+        self.assertEqual(2, entry['meta']['numLines'])
+        with open(destFile, 'r') as fd:
+            self.assertEqual('abc,def\n1,2\n', fd.read())
+
+    def testLRUEviction(self):
+        # Three 40-byte artifacts don't fit into 100 bytes:
+        keys = []
+        for i in range(3):
+            srcFile = self.makeFile('artifact%s.csv' % i, 'x' * 40)
+            key = ExportCache.makeKey(table='t', course='c%s' % i)
+            keys.append(key)
+            self.cache.store(key, srcFile)
+            if i == 1:
+                # Make artifact 0 the most recently used:
+                time.sleep(0.01)
+                self.assertIsNotNone(self.cache.lookup(keys[0]))
+        self.assertIsNotNone(self.cache.lookup(keys[0]))
+        self.assertIsNone(self.cache.lookup(keys[1]))
+        self.assertIsNotNone(self.cache.lookup(keys[2]))
+        self.assertTrue(self.cache.totalBytes() <= 100)
+
+    def makeFile(self, baseName, content):
+        path = os.path.join(self.deliveryDir, baseName)
+        with open(path, 'w') as fd:
+            fd.write(content)
+        return path
+
+if __name__ == "__main__":
+    unittest.main()
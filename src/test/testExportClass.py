@@ -19,7 +19,7 @@ import zipfile
 
 from pymysql_utils.pymysql_utils import MySQLDB
 
-from exportClass import CourseCSVServer
+from exportClass import CourseCSVServer, DataServer
 
 
 TEST_ALL = False
@@ -358,6 +358,30 @@ class ExportClassTest(unittest.TestCase):
             self.assertEqual('"def","m","1990","p","FRG","Germany"', allDemographicsLines[1].strip())
         os.remove(self.courseServer.latestDemographicsFilename)
 
+    @unittest.skipIf(not TEST_ALL, "Temporarily disabled")
+    def testDemographicsOneRowPerLearner(self):
+        self.buildSupportTables(TestSet.TWO_STUDENTS_ONE_CLASS)
+        # Learner 10 also has a grade in another course:
+        self.mysqldb.bulkInsert('UserGrade', ['user_int_id', 'course_id', 'anon_screen_name'],
+                                [(10, 'My/RealCourse/Summer2014', 'abc')])
+        fromClause = DataServer.demographicsFromClause(['CME/MedStats/2013-2015'], 'unittest', 'unittest')
+        numRows = self.mysqldb.query('SELECT COUNT(*) ' + fromClause).next()[0]
+        numLearners = self.mysqldb.query("SELECT COUNT(DISTINCT user_id) FROM unittest.true_courseenrollment " +\
+                                         "WHERE course_display_name = 'CME/MedStats/2013-2015'").next()[0]
+        self.assertEqual(numLearners, numRows)
+
+    @unittest.skipIf(not TEST_ALL, "Temporarily disabled")
+    def testDemographicsDirectDownloadRows(self):
+        self.buildSupportTables(TestSet.TWO_STUDENTS_ONE_CLASS)
+        self.mysqldb.bulkInsert('UserGrade', ['user_int_id', 'course_id', 'anon_screen_name'],
+                                [(10, 'My/RealCourse/Summer2014', 'abc')])
+        fromClause = DataServer.demographicsFromClause(['CME/MedStats/2013-2015'], 'unittest', 'unittest')
+        # The direct download's limit check, and the rows it streams:
+        numRows = self.mysqldb.query('SELECT COUNT(*) ' + fromClause).next()[0]
+        streamedRows = list(self.mysqldb.query('SELECT ' + DataServer.DEMOGRAPHICS_COLS + fromClause))
+        self.assertEqual(numRows, len(streamedRows))
+        self.assertEqual(len(set(streamedRows)), len(streamedRows))
+
     #******@unittest.skipIf(not TEST_ALL, "Temporarily disabled")    
     def testQuarterlyDemographics(self):
         self.buildSupportTables(TestSet.TWO_STUDENTS_ONE_CLASS)
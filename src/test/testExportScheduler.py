@@ -0,0 +1,74 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+
+import threading
+import unittest
+
+from exportScheduler import ExportJob, ExportScheduler
+
+
+class ExportSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.scheduler = ExportScheduler(maxRunning=1, clock=lambda: self.now)
+
+    def enqueue(self, job):
+        # Put a job in the queue without blocking:
+        job.enqueued = self.now
+        self.scheduler.waiting.append(job)
+        return job
+
+    def testShortestJobFirst(self):
+        self.scheduler.admit(ExportJob('alice', 100))
+        dump = self.enqueue(ExportJob('bob', 12 * 3600, 'EventXtract'))
+        grades = self.enqueue(ExportJob('carol', 5, 'grades'))
+        self.assertIs(grades, self.scheduler.nextJob())
+        self.assertEqual(2, self.scheduler.queuePosition(dump))
+
+    def testFairShare(self):
+        # Alice just had an hour of exports:
+        self.scheduler.usage['alice'] = (3600, self.now)
+        aliceJob = self.enqueue(ExportJob('alice', 100))
+        bobJob = self.enqueue(ExportJob('bob', 250))
+        self.assertIs(bobJob, self.scheduler.nextJob())
+        # Usage decays:
+        self.now += 4 * ExportScheduler.USAGE_HALF_LIFE
+        self.assertIs(aliceJob, self.scheduler.nextJob())
+
+    def testAging(self):
+        dump = self.enqueue(ExportJob('bob', 12 * 3600))
+        self.now += 12 * 3600
+        grades = self.enqueue(ExportJob('carol', 300))
+        self.assertIs(grades, self.scheduler.nextJob())
+        self.scheduler.waiting.remove(grades)
+        # After a day, the dump goes before newly arriving jobs:
+        self.now += 12 * 3600
+        self.enqueue(ExportJob('carol', 300))
+        self.assertIs(dump, self.scheduler.nextJob())
+
+    def testYield(self):
+        dump = ExportJob('bob', 12 * 3600)
+        self.scheduler.admit(dump)
+        self.assertFalse(self.scheduler.yieldSlot(dump, 0.1))
+        grades = ExportJob('carol', 5)
+        gradesDone = threading.Event()
+        def runGrades():
+            self.scheduler.admit(grades)
+            self.scheduler.release(grades)
+            gradesDone.set()
+        gradesThread = threading.Thread(target=runGrades)
+        gradesThread.start()
+        while len(self.scheduler.waiting) == 0:
+            gradesDone.wait(0.01)
+        self.assertTrue(self.scheduler.yieldSlot(dump, 0.5))
+        gradesThread.join()
+        self.assertTrue(gradesDone.is_set())
+        self.assertEqual([dump], self.scheduler.running)
+        self.assertEqual(6 * 3600, dump.remainingSeconds)
+
+if __name__ == "__main__":
+    unittest.main()
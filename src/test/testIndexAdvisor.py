@@ -0,0 +1,75 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+
+import unittest
+
+from indexAdvisor import QUERY_SHAPES, IndexAdvisor, QueryShape, explainRowToDict, hasIndexPrefix, isFullScan
+
+
+class RecordingDb(object):
+    '''
+    Stands in for a MySQLDB connection. Records all
+    statements, and answers every query with no rows.
+    '''
+    def __init__(self):
+        self.statements = []
+
+    def query(self, queryStr):
+        self.statements.append(queryStr)
+        return iter([])
+
+    def execute(self, statement):
+        self.statements.append(statement)
+
+class IndexAdvisorTest(unittest.TestCase):
+
+    def testExplainRowLayouts(self):
+        # MySQL 5.5/5.6 layout:
+        oldRow = (1, 'SIMPLE', 'EventXtract', 'ALL', None, None, None, None, 1000, 'Using where')
+        # MySQL 5.7+ layout, with partitions and filtered:
+        newRow = (1, 'SIMPLE', 'EventXtract', None, 'ref', 'courseIdx', 'courseIdx', '767', 'const', 20, 10.0, 'Using where')
+        oldDict = explainRowToDict(oldRow)
+        newDict = explainRowToDict(newRow)
+        self.assertTrue(isFullScan(oldDict))
+        self.assertFalse(isFullScan(newDict))
+        self.assertEqual('courseIdx', newDict['key'])
+        self.assertEqual(20, newDict['rows'])
+
+    def testIndexPrefix(self):
+        tableIndexes = {'PRIMARY'   : ['_id'],
+                        'courseIdx' : ['Course_display_name', 'quarter', 'time']}
+        self.assertTrue(hasIndexPrefix(tableIndexes, ['course_display_name']))
+        self.assertTrue(hasIndexPrefix(tableIndexes, ['course_display_name', 'quarter']))
+        self.assertFalse(hasIndexPrefix(tableIndexes, ['quarter']))
+
+    def testShapesInstantiate(self):
+        sampleValues = {'course' : 'Medicine/HRP258/Statistics_in_Medicine',
+                        'quarter' : 'fall2013',
+                        'surveyId' : 'SV_1'}
+        for shape in QUERY_SHAPES:
+            query = shape.instantiate(sampleValues, countOnly=True)
+            self.assertTrue(query.startswith('SELECT COUNT(*) FROM %s WHERE' % shape.fullTableName()))
+            self.assertNotIn('%(', query)
+
+    def testTimingAroundIndexCreation(self):
+        # Two shapes that share the recommended index:
+        shapes = [QueryShape('byCourse', 'Edx', 'ABExperiment', "course_display_name = '%(course)s'", ['course_display_name'], 'exportABExperiment'),
+                  QueryShape('byCourseLike', 'Edx', 'ABExperiment', "course_display_name LIKE '%(course)s'", ['course_display_name'], 'exportABExperiment')]
+        db = RecordingDb()
+        advisor = IndexAdvisor(db, 'Medicine/HRP258/Statistics_in_Medicine', 'fall2013', shapes)
+        del db.statements[:]
+        findings = [{'shape' : shape, 'missingIndex' : True, 'error' : None} for shape in shapes]
+        timings = advisor.createRecommendedIndexes(findings)
+        ddl = 'ALTER TABLE Edx.ABExperiment ADD INDEX exportIdx_course_display_name (course_display_name);'
+        self.assertEqual(['byCourse', 'byCourseLike'], [timing[0] for timing in timings])
+        self.assertEqual([ddl, ddl], [timing[1] for timing in timings])
+        # Both shapes are timed before the index exists, and each
+        # timed query is preceded by a warming run:
+        queries = [shape.instantiate(advisor.sampleValues, countOnly=True).replace('SELECT ', 'SELECT SQL_NO_CACHE ', 1) for shape in shapes]
+        self.assertEqual(2 * [queries[0]] + 2 * [queries[1]] + [ddl] + 2 * [queries[0]] + 2 * [queries[1]], db.statements)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+
+import StringIO
+import unittest
+
+import numpy as np
+
+from learnerPerformance import LearnerPerformanceComputer, groupMinMax, groupStats
+
+
+class LearnerPerformanceTest(unittest.TestCase):
+
+    def testGroupStatsMatchNumpy(self):
+        groupIds = np.array([0, 1, 0, 0, 1, 2])
+        values = np.array([1., 10., 3., 2., 20., np.nan])
+        stats = groupStats(groupIds, values, 4)
+        self.assertEqual([3, 2, 0, 0], list(stats['count']))
+        self.assertAlmostEqual(2., stats['mean'][0])
+        self.assertAlmostEqual(np.var([1., 3., 2.]), stats['var'][0])
+        self.assertAlmostEqual(np.percentile([1., 3., 2.], 25), stats['q0.25'][0])
+        self.assertAlmostEqual(np.percentile([10., 20.], 50), stats['q0.5'][1])
+        self.assertTrue(np.isnan(stats['mean'][2]))
+        self.assertTrue(np.isnan(stats['q0.75'][3]))
+
+    def testGroupMinMax(self):
+        (minima, maxima) = groupMinMax(np.array([1, 0, 1, 1]), np.array([5., 7., np.nan, 2.]), 3)
+        self.assertEqual([7., 2.], list(minima[:2]))
+        self.assertEqual([7., 5.], list(maxima[:2]))
+        self.assertTrue(np.isnan(minima[2]))
+
+    def testLearnerAndProblemTables(self):
+        rows = [('c1', 'learnerA', 'p1', 1.0, 2, 100, 200),
+                ('c1', 'learnerA', 'p2', 0.5, 1, 50, 60),
+                ('c1', 'learnerB', 'p1', None, 3, 300, 400),
+                ('c2', 'learnerA', 'p1', 0.0, 1, 10, 10)]
+        # Tiny batches, to exercise batch concatenation:
+        computer = LearnerPerformanceComputer(batchSize=3)
+        computer.addRows(rows)
+        (learnerRows, problemRows) = computer.compute()
+
+        self.assertEqual(['c1', 'learnerA', 'c1', 'learnerB', 'c2', 'learnerA'],
+                         [field for row in learnerRows for field in row[:2]])
+        learnerA = learnerRows[0]
+        self.assertEqual(2, learnerA[2])      # num_problems
+        self.assertEqual(3, learnerA[3])      # total_attempts
+        self.assertAlmostEqual(0.75, learnerA[5])
+        self.assertEqual(computer.formatTime(50), learnerA[10])
+        self.assertEqual(computer.formatTime(200), learnerA[11])
+        # LearnerB has no grade:
+        self.assertTrue(np.isnan(learnerRows[1][5]))
+
+        self.assertEqual(3, len(problemRows))
+        c1p1 = problemRows[0]
+        self.assertEqual(['c1', 'p1', 2, 5], c1p1[:4])
+
+        outFd = StringIO.StringIO()
+        computer.writeCSV(learnerRows, LearnerPerformanceComputer.LEARNER_HEADER, outFd)
+        lines = outFd.getvalue().splitlines()
+        self.assertEqual(4, len(lines))
+        self.assertTrue(lines[2].startswith('c1,learnerB,1,3,3.0000,,,'))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+'''
+
+import unittest
+
+from quarterlyReportExporter import QuarterlyReportExporter
+
+
+class RecordingDb(object):
+    '''
+    Stands in for a MySQLDB connection. Records all
+    statements, and answers each query with the rows
+    of the first answers entry whose key it contains.
+    '''
+    def __init__(self, answers):
+        self.answers = answers
+        self.statements = []
+
+    def query(self, queryStr):
+        self.statements.append(queryStr)
+        for (key, rows) in self.answers:
+            if key in queryStr:
+                return iter(rows)
+        return iter([])
+
+    def execute(self, statement):
+        self.statements.append(statement)
+
+
+class CannedDbExporter(QuarterlyReportExporter):
+    '''
+    QuarterlyReportExporter that talks to a RecordingDb,
+    rather than logging into MySQL.
+    '''
+    def __init__(self, db):
+        self.cannedDb = db
+        super(CannedDbExporter, self).__init__(testing=True)
+
+    def ensureOpenMySQLDb(self):
+        self.mysqlDb = self.cannedDb
+        return self.mysqlDb
+
+
+class QuarterlyReportExporterTest(unittest.TestCase):
+
+    # Answer to CourseActivityIndex.exists():
+    INDEX_EXISTS = ('information_schema', [(1,)])
+
+    def testQuarterCourseNamesFromIndex(self):
+        db = RecordingDb([QuarterlyReportExporterTest.INDEX_EXISTS,
+                          ('CourseInfo', [('Medicine/HRP258/Statistics_in_Medicine',)])])
+        exporter = CannedDbExporter(db)
+        self.assertEqual(['Medicine/HRP258/Statistics_in_Medicine'], exporter.getQuarterCourseNames(2014, 'fall', True))
+        self.assertEqual("SELECT DISTINCT course_display_name FROM unittest.CourseInfo " +\
+                         "WHERE CourseInfo.course_display_name IN " +\
+                         "(SELECT course_display_name FROM unittest.CourseActivityDay " +\
+                         "WHERE (activity_day BETWEEN '2014-09-01' AND '2014-11-30'));",
+                         db.statements[-1])
+        # The other reports of the same quarter reuse the names:
+        numStatements = len(db.statements)
+        exporter.getQuarterCourseNames(2014, 'fall', True)
+        self.assertEqual(numStatements, len(db.statements))
+
+    def testWholeYearFromIndex(self):
+        db = RecordingDb([QuarterlyReportExporterTest.INDEX_EXISTS])
+        CannedDbExporter(db).getQuarterCourseNames(2014, '%', True)
+        self.assertIn("WHERE (activity_day BETWEEN '2014-09-01' AND '2014-11-30' OR " +\
+                      "activity_day BETWEEN '2014-12-01' AND '2015-02-28' OR " +\
+                      "activity_day BETWEEN '2015-03-01' AND '2015-05-31' OR " +\
+                      "activity_day BETWEEN '2015-06-01' AND '2015-08-31'));",
+                      db.statements[-1])
+
+    def testQuarterCourseNamesWithoutIndex(self):
+        db = RecordingDb([])
+        CannedDbExporter(db).getQuarterCourseNames(2014, 'fall', True)
+        self.assertIn("EXISTS(SELECT 1        FROM unittest.EventXtract ", db.statements[-1])
+        self.assertIn("(time BETWEEN '2014-09-01' AND '2014-11-30')", db.statements[-1])
+        self.assertNotIn('CourseActivityDay', db.statements[-1])
+
+    def testPeriodCourseNamesFromIndex(self):
+        db = RecordingDb([QuarterlyReportExporterTest.INDEX_EXISTS,
+                          ('CASE', [(0, 'Medicine/HRP258/Statistics_in_Medicine'),
+                                    (1, 'Engineering/CS106A/Winter2015')])])
+        periods = [(2014, 'fall'), (2014, 'winter')]
+        periodCourseNames = CannedDbExporter(db).getPeriodCourseNames(periods, True)
+        self.assertEqual(['Medicine/HRP258/Statistics_in_Medicine'], periodCourseNames[(2014, 'fall')])
+        self.assertEqual(['Engineering/CS106A/Winter2015'], periodCourseNames[(2014, 'winter')])
+        # One query for all periods:
+        self.assertEqual(1, len([statement for statement in db.statements if 'CourseActivityDay' in statement and 'CASE' in statement]))
+        self.assertEqual("SELECT DISTINCT CASE " +\
+                         "WHEN activity_day BETWEEN '2014-09-01' AND '2014-11-30' THEN 0 " +\
+                         "WHEN activity_day BETWEEN '2014-12-01' AND '2015-02-28' THEN 1 " +\
+                         "END, course_display_name " +\
+                         "FROM unittest.CourseActivityDay " +\
+                         "WHERE (activity_day BETWEEN '2014-09-01' AND '2014-11-30' OR " +\
+                         "activity_day BETWEEN '2014-12-01' AND '2015-02-28')   " +\
+                         "AND course_display_name IN (SELECT course_display_name FROM unittest.CourseInfo);",
+                         db.statements[-1])
+
+    def testGetPeriods(self):
+        exporter = CannedDbExporter(RecordingDb([('academic_year', [(2015,), (2013,), (2014,)])]))
+        self.assertEqual([(2014, 'fall')], exporter.getPeriods(2014, 'fall'))
+        self.assertEqual([(2013, 'fall'), (2013, 'spring'), (2015, 'fall'), (2015, 'spring')],
+                         exporter.getPeriods('2013, 2015', 'Fall,spring'))
+        # Quarters are in the order in which they occur:
+        self.assertEqual([(2013, 'fall'), (2013, 'summer'), (2014, 'fall'), (2014, 'summer')],
+                         exporter.getPeriods('2013-2014', 'summer,fall'))
+        self.assertEqual([(2014, quarter) for quarter in ['fall', 'winter', 'spring', 'summer']],
+                         exporter.getPeriods('2014', 'all'))
+        self.assertEqual([(2013, 'winter'), (2014, 'winter'), (2015, 'winter')],
+                         exporter.getPeriods('%', 'winter'))
+        self.assertIn('FROM unittest.CourseInfo WHERE academic_year > 0', exporter.mysqlDb.statements[-1])
+        self.assertEqual(exporter.getPeriods('%', 'winter'), exporter.getPeriods('all', 'winter'))
+
+    def testInvalidPeriods(self):
+        exporter = CannedDbExporter(RecordingDb([]))
+        self.assertRaises(ValueError, exporter.getPeriods, 2014, 'autumn')
+        self.assertRaises(ValueError, exporter.getPeriods, 2014, 'fall,')
+        self.assertRaises(ValueError, exporter.getPeriods, '2013-', 'fall')
+        self.assertRaises(ValueError, exporter.getPeriods, 'fall2013', 'fall')
+
+    def testGetPeriodLabel(self):
+        exporter = CannedDbExporter(RecordingDb([]))
+        self.assertEqual('fall2014', exporter.getPeriodLabel([(2014, 'fall')]))
+        # Quarters after fall ran in the next calendar year:
+        self.assertEqual('winter2015', exporter.getPeriodLabel([(2014, 'winter')]))
+        self.assertEqual('fall2013-summer2015', exporter.getPeriodLabel(exporter.getPeriods('2013-2014', '%')))
+        self.assertEqual('spring2014-spring2016', exporter.getPeriodLabel(exporter.getPeriods('2013,2015', 'spring')))
+
+    def testPeriodAssignment(self):
+        # Index rows arrive in no particular order:
+        db = RecordingDb([QuarterlyReportExporterTest.INDEX_EXISTS,
+                          ('CASE', [(2, 'Engineering/CS106A/Spring2015'),
+                                    (0, 'Medicine/HRP258/Statistics_in_Medicine'),
+                                    (2L, 'Medicine/HRP258/Statistics_in_Medicine'),
+                                    (0, 'Engineering/CS106A/Fall2014')])])
+        periods = [(2014, 'fall'), (2014, 'winter'), (2014, 'spring')]
+        periodCourseNames = CannedDbExporter(db).getPeriodCourseNames(periods, True)
+        self.assertEqual(periods, periodCourseNames.keys())
+        self.assertEqual(['Medicine/HRP258/Statistics_in_Medicine', 'Engineering/CS106A/Fall2014'], periodCourseNames[(2014, 'fall')])
+        self.assertEqual([], periodCourseNames[(2014, 'winter')])
+        self.assertEqual(['Engineering/CS106A/Spring2015', 'Medicine/HRP258/Statistics_in_Medicine'], periodCourseNames[(2014, 'spring')])
+
+    def testPeriodAssignmentFromCourseInfo(self):
+        db = RecordingDb([('CourseInfo', [(2013, 'Fall', 'Engineering/CS106A/Fall2013'),
+                                          (2013, 'fall', 'Engineering/CS106A/Fall2013'),
+                                          # Year and quarter of different requested periods:
+                                          (2013, 'winter', 'Engineering/CS106B/Winter2014'),
+                                          (2014, 'winter', 'Medicine/HRP258/Winter2015')])])
+        periodCourseNames = CannedDbExporter(db).getPeriodCourseNames([(2013, 'fall'), (2014, 'winter')], False)
+        self.assertEqual(['Engineering/CS106A/Fall2013'], periodCourseNames[(2013, 'fall')])
+        self.assertEqual(['Medicine/HRP258/Winter2015'], periodCourseNames[(2014, 'winter')])
+
+    def testSinglePeriodAsBefore(self):
+        exporter = CannedDbExporter(RecordingDb([]))
+        # Result files used to be named <quarter><calendar year>:
+        for quarter in QuarterlyReportExporter.QUARTERS:
+            periods = exporter.getPeriods(2014, quarter)
+            self.assertEqual(1, len(periods))
+            self.assertEqual('%s%s' % (quarter, 2014 if quarter == 'fall' else 2015), exporter.getPeriodLabel(periods))
+        # Same courses as a single-quarter query finds:
+        courseInfoRows = [(2014, 'fall', 'Medicine/HRP258/Statistics_in_Medicine'),
+                          (2014, 'fall', 'Engineering/CS106A/Fall2014')]
+        periodCourseNames = CannedDbExporter(RecordingDb([('CourseInfo', courseInfoRows)])).getPeriodCourseNames([(2014, 'fall')], False)
+        quarterExporter = CannedDbExporter(RecordingDb([('CourseInfo', [(row[2],) for row in courseInfoRows])]))
+        self.assertEqual(quarterExporter.getQuarterCourseNames(2014, 'fall', False), periodCourseNames[(2014, 'fall')])
+
+if __name__ == "__main__":
+    unittest.main()
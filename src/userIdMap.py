@@ -0,0 +1,129 @@
+'''
+Created on Oct 19, 2026
+
+@author: paepcke
+
+Precomputed mapping between the three identifiers a learner
+has in our databases: the integer user id of the edX platform
+(user_int_id), the anonymized anon_screen_name, and the forum's
+forum_uid. Exports used to compute the latter two by calling the
+hashing UDFs EdxPrivate.idInt2Anon(), idInt2Forum(), and
+idForum2Anon() on every row. The map holds the results of these
+functions once per learner:
+
+   - Table EdxPrivate.UserIdMap(user_int_id, anon_screen_name, forum_uid),
+     with user_int_id as primary key, and indexes on the other two
+     columns. Exports join with it. Learners are added incrementally:
+     each refresh adds the auth_user ids beyond the largest one
+     already in the map.
+
+Meant to run from cron, e.g. nightly:
+
+    30 2 * * * python /home/dataman/Code/open_edx_class_export/src/userIdMap.py -u dataman
+'''
+
+import argparse
+import getpass
+import os
+import sys
+
+from pymysql_utils.pymysql_utils import MySQLDB
+
+
+class UserIdMap(object):
+    '''
+    Creation and incremental refresh of EdxPrivate.UserIdMap.
+    '''
+
+    DB = 'EdxPrivate'
+    TABLE = 'UserIdMap'
+
+    def __init__(self, mysqlDb):
+        '''
+        :param mysqlDb: open connection with privileges on EdxPrivate and edxprod
+        :type mysqlDb: MySQLDB
+        '''
+        self.mysqlDb = mysqlDb
+        self.fullName = '%s.%s' % (UserIdMap.DB, UserIdMap.TABLE)
+
+    def exists(self):
+        '''
+        Return True if the map table exists.
+        '''
+        try:
+            self.mysqlDb.query("SELECT 1 FROM information_schema.TABLES " +\
+                               "WHERE TABLE_SCHEMA = '%s' AND TABLE_NAME = '%s';" %\
+                               (UserIdMap.DB, UserIdMap.TABLE)).next()
+            return True
+        except StopIteration:
+            return False
+
+    def refresh(self, full=False):
+        '''
+        Add learners that joined since the last refresh. If full
+        is True, or the table does not exist, it is created from
+        scratch first.
+
+        :param full: if True, rebuild the whole map
+        :type full: Boolean
+        :return: number of learners in the map
+        :rtype: int
+        '''
+        if full:
+            self.mysqlDb.execute('DROP TABLE IF EXISTS %s;' % self.fullName)
+        if full or not self.exists():
+            self.mysqlDb.execute('CREATE TABLE %s (' % self.fullName +\
+                                 '  user_int_id int NOT NULL PRIMARY KEY,' +\
+                                 '  anon_screen_name varchar(40) NOT NULL,' +\
+                                 '  forum_uid varchar(40) NOT NULL,' +\
+                                 '  INDEX (anon_screen_name),' +\
+                                 '  INDEX (forum_uid)' +\
+                                 ') ENGINE=InnoDB;')
+        maxMappedId = self.mysqlDb.query('SELECT IFNULL(MAX(user_int_id), -1) FROM %s;' % self.fullName).next()[0]
+        self.mysqlDb.execute('INSERT INTO %s (user_int_id, anon_screen_name, forum_uid) ' % self.fullName +\
+                             'SELECT id, EdxPrivate.idInt2Anon(id), EdxPrivate.idInt2Forum(id) ' +\
+                             'FROM edxprod.auth_user ' +\
+                             'WHERE id > %s;' % maxMappedId)
+        return self.mysqlDb.query('SELECT COUNT(*) FROM %s;' % self.fullName).next()[0]
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(prog=os.path.basename(sys.argv[0]), formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('-u', '--user',
+                        action='store',
+                        help='User ID that is to log into MySQL. Default: the user who is invoking this script.')
+    parser.add_argument('-p', '--pwd',
+                        action='store_true',
+                        help='Request to be asked for pwd for operating MySQL;\n' +\
+                             '    default: content of scriptInvokingUser$Home/.ssh/mysql')
+    parser.add_argument('-w', '--password',
+                        action='store',
+                        help='User explicitly provided password to log into MySQL.')
+    parser.add_argument('--full',
+                        action='store_true',
+                        help='Rebuild the whole map, rather than adding new learners.')
+
+    args = parser.parse_args();
+
+    user = args.user if args.user is not None else getpass.getuser()
+    if args.password and args.pwd:
+        raise ValueError('Use either -p, or -w, but not both.')
+    if args.pwd:
+        pwd = getpass.getpass("Enter %s's MySQL password on localhost: " % user)
+    elif args.password:
+        pwd = args.password
+    else:
+        try:
+            with open(os.path.join(os.path.expanduser('~' + user), '.ssh/mysql')) as fd:
+                pwd = fd.readline().strip()
+        except IOError:
+            pwd = ''
+
+    mysqlDb = MySQLDB(user=user, passwd=pwd, db=UserIdMap.DB)
+    try:
+        userIdMap = UserIdMap(mysqlDb)
+        numLearners = userIdMap.refresh(full=args.full)
+        print('%s.%s maps %s learners.' % (UserIdMap.DB, UserIdMap.TABLE, numLearners))
+    finally:
+        mysqlDb.close()